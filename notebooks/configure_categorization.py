@@ -353,6 +353,7 @@ class CategoryTreeProcessor:
         self.gpc_file = gpc_file
         self.data_dir = data_dir
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.packed_attribute_files: List[str] = []
 
         # Load GPC data
         print(f"Loading GPC data from {gpc_file}...")
@@ -421,8 +422,34 @@ class CategoryTreeProcessor:
             json.dump(linted_attrs_dict, f)
         print(f"Saved attribute schemas to {output_file}")
 
+        self.packed_attribute_files = self.pack_attributes(linted_attrs_dict)
+
         return linted_attrs_dict
 
+    def pack_attributes(self, linted_attrs_dict: Dict) -> List[str]:
+        """Write the attribute schemas packed with an offset table for ranged reads"""
+        try:
+            from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+                pack_schemas,
+            )
+        except ImportError:
+            print(
+                "Warning: cannot import pack_schemas, skipping the packed schema. "
+                "Ensure the smart-product-onboarding packages are installed."
+            )
+            return []
+
+        index, data = pack_schemas(linted_attrs_dict)
+        # the packed file first, the index refers to it
+        (self.data_dir / index["data"]).write_bytes(data)
+        with open(self.data_dir / "attributes_schema.index.json", "w") as f:
+            json.dump(index, f)
+        print(
+            f"Saved packed attribute schemas to {self.data_dir / index['data']} "
+            f"({len(data) / 1_000_000:.1f} MB, {len(index['categories'])} categories)"
+        )
+        return [index["data"], "attributes_schema.index.json"]
+
 
 class MetaclassGenerator:
     """Generate metaclasses from category tree"""
@@ -984,6 +1011,9 @@ Examples:
                 "data/attributes_schema.json",
             )
             print("Uploaded attributes_schema.json")
+
+            # the packed file is uploaded before the index that refers to it
+            upload_to_s3(args.data_dir, config_bucket, processor.packed_attribute_files)
         else:
             print("\n" + "=" * 60)
             print("STEP 5: Skipping S3 Upload (--skip-upload)")
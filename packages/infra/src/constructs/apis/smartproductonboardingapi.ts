@@ -106,6 +106,10 @@ export class SmartProductOnboardingAPI extends Construct {
           "amzn_smart_product_onboarding_product_categorization.aws_lambda.categorization_apigw.handler",
         ],
         timeout: Duration.seconds(29),
+        environment: {
+          STREAMING: "True",
+          SPECULATIVE_CANDIDATES: "1",
+        },
       },
     );
 
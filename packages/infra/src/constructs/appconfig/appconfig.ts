@@ -70,6 +70,41 @@ export class AppConfigConstruct extends Construct {
                   properties: {
                     modelId: { type: "string", minLength: 1 },
                     temperature: { type: "number", minimum: 0, maximum: 1 },
+                    outputMode: { type: "string", enum: ["xml", "tool"] },
+                    partitionSize: { type: "integer", minimum: 1 },
+                    lexicon: { type: "boolean" },
+                    combinedMaxCandidates: { type: "integer", minimum: 0 },
+                    cascade: {
+                      type: "array",
+                      maxItems: 3,
+                      items: { $ref: "#/$defs/cascadeTier" },
+                    },
+                    routes: {
+                      type: "array",
+                      maxItems: 10,
+                      items: { $ref: "#/$defs/modelRoute" },
+                    },
+                  },
+                },
+                modelRoute: {
+                  type: "object",
+                  required: ["modelId", "weight"],
+                  additionalProperties: false,
+                  properties: {
+                    modelId: { type: "string", minLength: 1 },
+                    temperature: { type: "number", minimum: 0, maximum: 1 },
+                    weight: { type: "number", minimum: 0 },
+                  },
+                },
+                cascadeTier: {
+                  type: "object",
+                  required: ["modelId"],
+                  additionalProperties: false,
+                  properties: {
+                    modelId: { type: "string", minLength: 1 },
+                    temperature: { type: "number", minimum: 0, maximum: 1 },
+                    minConfidence: { type: "number", minimum: 0, maximum: 1 },
+                    requireAgreement: { type: "boolean" },
                   },
                 },
                 productGenerationConfig: {
@@ -68,6 +68,8 @@ export class AttributeExtractionTaskFunction extends lambda.DockerImageFunction
       reservedConcurrentExecutions: 40,
       memorySize: 512,
       architecture: lambda.Architecture.ARM_64,
+      // stage spans of the Powertools Tracer, see stage_timer.py
+      tracing: lambda.Tracing.ACTIVE,
     });
 
     const bedrockXacctRole: string | undefined =
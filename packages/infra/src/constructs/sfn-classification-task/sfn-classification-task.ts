@@ -24,6 +24,7 @@ export interface ClassificationTaskFunctionProps {
   appConfigConfigurationProfileId?: string;
   cmd?: string[];
   timeout?: Duration;
+  environment?: { [key: string]: string };
 }
 
 export class ClassificationTaskFunction extends lambda.DockerImageFunction {
@@ -65,16 +66,23 @@ export class ClassificationTaskFunction extends lambda.DockerImageFunction {
           APPCONFIG_CONFIGURATION_PROFILE_ID:
             props.appConfigConfigurationProfileId,
         }),
+        ...props.environment,
       },
       timeout: props.timeout ? props.timeout : Duration.minutes(10),
       reservedConcurrentExecutions: 40,
       memorySize: 512,
       architecture: lambda.Architecture.ARM_64,
+      // stage spans of the Powertools Tracer, see stage_timer.py
+      tracing: lambda.Tracing.ACTIVE,
     });
 
     this.role?.addToPrincipalPolicy(
       new iam.PolicyStatement({
-        actions: ["bedrock:ListFoundationModels", "bedrock:InvokeModel"],
+        actions: [
+          "bedrock:ListFoundationModels",
+          "bedrock:InvokeModel",
+          "bedrock:InvokeModelWithResponseStream",
+        ],
         resources: [
           Stack.of(this).formatArn({
             service: "bedrock",
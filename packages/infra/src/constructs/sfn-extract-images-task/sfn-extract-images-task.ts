@@ -44,6 +44,8 @@ export class ExtractImagesTaskFunction extends lambda.DockerImageFunction {
       ),
       environment: {
         IMAGES_BUCKET_NAME: props.imagesBucket.bucketName,
+        IMAGE_DECOMPRESSION_WORKERS: "2",
+        IMAGE_UPLOAD_WORKERS: "10",
       },
       timeout: Duration.seconds(600),
       memorySize: 768,
@@ -64,6 +64,8 @@ export class MetaclassTaskFunction extends lambda.DockerImageFunction {
       timeout: props.timeout ? props.timeout : Duration.seconds(900),
       memorySize: 512,
       architecture: lambda.Architecture.ARM_64,
+      // stage spans of the Powertools Tracer, see stage_timer.py
+      tracing: lambda.Tracing.ACTIVE,
     });
 
     this.addToRolePolicy(
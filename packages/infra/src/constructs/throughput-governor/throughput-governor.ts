@@ -0,0 +1,80 @@
+/**
+ * Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+ * SPDX-License-Identifier: MIT-0
+ */
+
+import {
+  aws_dynamodb as dynamodb,
+  aws_lambda as lambda,
+  RemovalPolicy,
+} from "aws-cdk-lib";
+import { NagSuppressions } from "cdk-nag";
+import { Construct } from "constructs";
+
+export type ThroughputLane = "interactive" | "small_batch" | "large_batch";
+
+export interface ThroughputGovernorProps {
+  /**
+   * Bedrock requests per minute shared by all the functions, per model ID.
+   * @default 400
+   */
+  readonly requestsPerMinute?: number;
+  /**
+   * Bedrock tokens per minute shared by all the functions, per model ID.
+   * @default 800000
+   */
+  readonly tokensPerMinute?: number;
+}
+
+/**
+ * DynamoDB table holding the Bedrock token buckets shared by the functions calling Bedrock.
+ *
+ * See amzn_smart_product_onboarding_core_utils.boto3_helper.throughput_governor.
+ */
+export class ThroughputGovernor extends Construct {
+  public readonly table: dynamodb.TableV2;
+  private readonly requestsPerMinute: number;
+  private readonly tokensPerMinute: number;
+
+  constructor(
+    scope: Construct,
+    id: string,
+    props: ThroughputGovernorProps = {},
+  ) {
+    super(scope, id);
+    this.requestsPerMinute = props.requestsPerMinute ?? 400;
+    this.tokensPerMinute = props.tokensPerMinute ?? 800000;
+
+    this.table = new dynamodb.TableV2(this, "BucketTable", {
+      partitionKey: { name: "pk", type: dynamodb.AttributeType.STRING },
+      removalPolicy: RemovalPolicy.DESTROY,
+      billing: dynamodb.Billing.onDemand(),
+      encryption: dynamodb.TableEncryptionV2.dynamoOwnedKey(),
+    });
+
+    NagSuppressions.addResourceSuppressions(this.table, [
+      {
+        id: "AwsSolutions-DDB3",
+        reason:
+          "This DynamoDB table is for ephemeral data so PITR is not needed",
+      },
+    ]);
+  }
+
+  /**
+   * Let a function pace its Bedrock calls through the governor, in the given lane.
+   */
+  public govern(fn: lambda.Function, lane: ThroughputLane) {
+    this.table.grantReadWriteData(fn);
+    fn.addEnvironment("THROUGHPUT_GOVERNOR_TABLE", this.table.tableName);
+    fn.addEnvironment("THROUGHPUT_LANE", lane);
+    fn.addEnvironment(
+      "BEDROCK_REQUESTS_PER_MINUTE",
+      this.requestsPerMinute.toString(),
+    );
+    fn.addEnvironment(
+      "BEDROCK_TOKENS_PER_MINUTE",
+      this.tokensPerMinute.toString(),
+    );
+  }
+}
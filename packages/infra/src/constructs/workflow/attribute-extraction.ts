@@ -34,6 +34,7 @@ export class AttributeExtractionTask extends sfn.StateMachineFragment {
         payload: sfn.TaskInput.fromObject({
           product: sfn.JsonPath.objectAt("$.product"),
           category: sfn.JsonPath.objectAt("$.classification"),
+          lane: sfn.JsonPath.stringAt("$.lane"),
         }),
         payloadResponseOnly: true,
         lambdaFunction: props.attributeExtractionTaskFunction,
@@ -47,7 +48,8 @@ export class AttributeExtractionTask extends sfn.StateMachineFragment {
     });
 
     attributeExtractionTask.addRetry({
-      errors: ["RateLimitError"],
+      // the deadline is mostly exceeded while throttled, so it backs off alike
+      errors: ["RateLimitError", "DeadlineExceeded"],
       backoffRate: 2,
       interval: Duration.seconds(15),
       maxAttempts: 10,
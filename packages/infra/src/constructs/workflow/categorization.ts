@@ -35,11 +35,20 @@ export class CategorizationTask extends sfn.StateMachineFragment {
       payload: sfn.TaskInput.fromObject({
         product: sfn.JsonPath.objectAt("$.product"),
         demo: sfn.JsonPath.objectAt("$.demo"),
+        lane: sfn.JsonPath.stringAt("$.lane"),
       }),
       payloadResponseOnly: true,
       lambdaFunction: props.metaclassTaskFunction,
     });
 
+    metaclassTask.addRetry({
+      errors: ["DeadlineExceeded"],
+      backoffRate: 2,
+      interval: Duration.seconds(15),
+      maxAttempts: 3,
+      jitterStrategy: sfn.JitterType.FULL,
+    });
+
     const classificationTask = new tasks.LambdaInvoke(
       this,
       "ClassificationTask",
@@ -49,6 +58,7 @@ export class CategorizationTask extends sfn.StateMachineFragment {
           product: sfn.JsonPath.objectAt("$.product"),
           metaclass: sfn.JsonPath.objectAt("$.metaclass"),
           demo: sfn.JsonPath.objectAt("$.demo"),
+          lane: sfn.JsonPath.stringAt("$.lane"),
         }),
         payloadResponseOnly: true,
         lambdaFunction: props.classificationTaskFunction,
@@ -60,7 +70,8 @@ export class CategorizationTask extends sfn.StateMachineFragment {
       maxAttempts: 2,
     });
     classificationTask.addRetry({
-      errors: ["RateLimitError"],
+      // the deadline is mostly exceeded while throttled, so it backs off alike
+      errors: ["RateLimitError", "DeadlineExceeded"],
       backoffRate: 2,
       interval: Duration.seconds(15),
       maxAttempts: 10,
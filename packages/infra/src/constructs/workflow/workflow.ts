@@ -4,7 +4,6 @@
  */
 
 import { PDKPipeline } from "@aws/pdk/pipeline";
-import { Semaphore } from "@dontirun/state-machine-semaphore";
 import {
   ArnFormat,
   aws_dynamodb as dynamodb,
@@ -13,12 +12,11 @@ import {
   aws_logs as logs,
   aws_s3 as s3,
   aws_stepfunctions as sfn,
-  aws_stepfunctions_tasks as tasks,
   RemovalPolicy,
   Stack,
 } from "aws-cdk-lib";
 import { NagSuppressions } from "cdk-nag";
-import { Construct, ConstructOrder } from "constructs";
+import { Construct } from "constructs";
 import { AttributeExtractionTask } from "./attribute-extraction";
 import { CategorizationTask } from "./categorization";
 import { ErrorStatusFragment } from "../api-persistence/error-status";
@@ -125,7 +123,24 @@ export class CategorizationWorkflow extends Construct {
       },
     );
 
-    categorization.next(attributeExtraction).next(outputState);
+    // products with few candidates get their attributes from the classification
+    // task, see combinedMaxCandidates in the AppConfig settings
+    const combinedAttributes = new sfn.Pass(this, "CombinedAttributes", {
+      parameters: {
+        attributes: sfn.JsonPath.listAt("$.classification.attributes"),
+      },
+      resultPath: "$.attributes",
+    });
+    const hasAttributes = new sfn.Choice(this, "HasAttributes?")
+      .when(
+        sfn.Condition.isPresent("$.classification.attributes"),
+        combinedAttributes,
+      )
+      .otherwise(attributeExtraction);
+
+    categorization.next(hasAttributes);
+    combinedAttributes.next(outputState);
+    attributeExtraction.next(outputState);
 
     const generateProduct = new SfnGenerateProduct(
       this,
@@ -171,6 +186,7 @@ export class CategorizationWorkflow extends Construct {
         itemSelector: {
           images_prefix: sfn.JsonPath.executionName,
           input: sfn.JsonPath.objectAt("$$.Map.Item.Value"),
+          lane: sfn.JsonPath.stringAt("$.lane"),
         },
         resultWriter: new sfn.ResultWriter({
           bucket: props.outputBucket,
@@ -208,35 +224,9 @@ export class CategorizationWorkflow extends Construct {
 
     const machineName = `${branchPrefix}BatchProductOnboarding`;
 
-    // Make sure only one instance of the workflow runs at a time to reduce Bedrock throttling
-    const semaphore = new Semaphore(this, "CategorizationSemaphore", {
-      lockName: machineName,
-      limit: 1,
-      job: categorizationMapWithStatus,
-      nextState: checkError,
-    });
-    updateStatusError.next(
-      semaphore.node
-        .findAll(ConstructOrder.POSTORDER)
-        .find(
-          (s) =>
-            s instanceof tasks.DynamoUpdateItem && s.id.includes("Release"),
-        ) as tasks.DynamoUpdateItem,
-    );
-
-    NagSuppressions.addResourceSuppressionsByPath(
-      Stack.of(this),
-      Stack.of(this).node.path +
-        "/StateMachineSempahoreTable920751a65a584e8ab7583460f6db686a",
-      [
-        {
-          id: "AwsSolutions-DDB3",
-          reason:
-            "This DynamoDB table is for ephemeral data so PITR is not needed",
-        },
-      ],
-      true,
-    );
+    // Batches run concurrently and share the Bedrock quota through the ThroughputGovernor
+    categorizationMapWithStatus.next(checkError);
+    updateStatusError.next(failState);
 
     const extractImagesChoice = new sfn.Choice(this, "DoExtractImages?")
       .when(sfn.Condition.isPresent("$.images_key"), extractImagesTask)
@@ -244,7 +234,18 @@ export class CategorizationWorkflow extends Construct {
 
     extractImagesTask.next(updateStatusWaiting);
 
-    updateStatusWaiting.next(semaphore);
+    // the throughput lane is derived from the batch size when the execution
+    // is created, executions started without one use the large batch lane
+    const setLane = new sfn.Pass(this, "SetLane", {
+      resultPath: "$.lane",
+      result: sfn.Result.fromString("large_batch"),
+    });
+    const hasLane = new sfn.Choice(this, "HasLane?")
+      .when(sfn.Condition.isNotPresent("$.lane"), setLane)
+      .otherwise(categorizationMapWithStatus);
+    setLane.next(categorizationMapWithStatus);
+
+    updateStatusWaiting.next(hasLane);
 
     sfn.State.findReachableStates(updateStatusWaiting, {
       includeErrorHandlers: true,
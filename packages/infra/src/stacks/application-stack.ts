@@ -24,6 +24,7 @@ import { SecureBucket } from "../constructs/secure-bucket";
 import { AttributeExtractionTaskFunction } from "../constructs/sfn-attributes-task/sfn-attributes-task";
 import { ClassificationTaskFunction } from "../constructs/sfn-classification-task/sfn-classification-task";
 import { MetaclassTaskFunction } from "../constructs/sfn-metaclass-task/sfn-metaclass-task";
+import { ThroughputGovernor } from "../constructs/throughput-governor/throughput-governor";
 import { Smartproductonboardingdemowebsite } from "../constructs/websites/smartproductonboardingdemowebsite";
 import { CategorizationWorkflow } from "../constructs/workflow/workflow";
 
@@ -243,6 +244,20 @@ export class ApplicationStack extends Stack {
       appConfigConfigurationProfileId: appConfig.configurationProfileId,
     });
 
+    // Bedrock quota shared by the batches and the API, with the API calls
+    // first. The lane of the batch functions is a default, each execution
+    // passes the lane derived from its batch size, see create_batch_execution
+    const throughputGovernor = new ThroughputGovernor(
+      this,
+      "ThroughputGovernor",
+    );
+    throughputGovernor.govern(metaclassTaskFunction, "large_batch");
+    throughputGovernor.govern(classificationTaskFunction, "large_batch");
+    throughputGovernor.govern(attributeExtractionFunction, "large_batch");
+    throughputGovernor.govern(api.metaclassFunction, "interactive");
+    throughputGovernor.govern(api.categorizeProductFunction, "interactive");
+    throughputGovernor.govern(api.extractAttributesFunction, "interactive");
+
     appConfig.grantRead(metaclassTaskFunction);
     appConfig.grantRead(classificationTaskFunction);
     appConfig.grantRead(attributeExtractionFunction);
@@ -18,11 +18,30 @@ from amzn_smart_product_onboarding_api_runtime.api.operation_config import (
     CreateBatchExecutionOperationResponses,
 )
 
-from .utils import get_sfn_client, get_dynamodb_resource
+from .utils import get_sfn_client, get_dynamodb_resource, get_s3_client
 
 INPUT_BUCKET_NAME = os.getenv("INPUT_BUCKET_NAME")
 CATEGORIZATION_MACHINE = os.getenv("CATEGORIZATION_MACHINE")
 SESSION_TABLE = os.getenv("SESSION_TABLE")
+# batches of at most this many products are paced in the small_batch throughput lane, larger ones in large_batch
+SMALL_BATCH_MAX_PRODUCTS = int(os.getenv("SMALL_BATCH_MAX_PRODUCTS", "100"))
+
+
+def batch_lane(s3, bucket: str, key: str) -> str:
+    """
+    Throughput lane of the batch in the input file, so that small batches are not starved by large ones.
+    Only reads the file up to the first product past SMALL_BATCH_MAX_PRODUCTS.
+    """
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    # one line per product after the header, products with line breaks in quoted fields count a few times
+    products = -1
+    for line in body.iter_lines():
+        if line.strip():
+            products += 1
+        if products > SMALL_BATCH_MAX_PRODUCTS:
+            body.close()
+            return "large_batch"
+    return "small_batch"
 
 
 def create_batch_execution(input: CreateBatchExecutionRequest, **kwargs) -> CreateBatchExecutionOperationResponses:
@@ -92,6 +111,12 @@ def create_batch_execution(input: CreateBatchExecutionRequest, **kwargs) -> Crea
     if input.body.compressed_images_file:
         payload["images_key"] = input.body.compressed_images_file
 
+    try:
+        payload["lane"] = batch_lane(get_s3_client(), INPUT_BUCKET_NAME, input.body.input_file)
+    except botocore.exceptions.ClientError as e:
+        # the workflow falls back to the lane of its functions, and reports the missing file itself
+        logger.warning(f"Could not count the products of {input.body.input_file}: {e}")
+
     logger.debug(f"Payload: {payload}")
 
     try:
@@ -34,7 +34,8 @@ class CategorizeProductRequestContent(BaseModel):
     product: ProductData
     possible_categories: Annotated[List[StrictStr], Field(strict=True, max_length=600)] = Field(alias="possibleCategories")
     demo: Optional[StrictBool] = None
-    __properties: ClassVar[List[str]] = ["product", "possibleCategories", "demo"]
+    extract_attributes: Optional[StrictBool] = Field(default=None, alias="extractAttributes", description="Also extract the attributes of the predicted category, possibleCategories most likely first.")
+    __properties: ClassVar[List[str]] = ["product", "possibleCategories", "demo", "extractAttributes"]
 
 
     model_config = {
@@ -90,7 +91,8 @@ class CategorizeProductRequestContent(BaseModel):
         _obj = cls.model_validate({
             "product": ProductData.from_dict(obj.get("product")) if obj.get("product") is not None else None,
             "possibleCategories": List[str].from_dict(obj.get("possibleCategories")) if obj.get("possibleCategories") is not None else None,
-            "demo": obj.get("demo")
+            "demo": obj.get("demo"),
+            "extractAttributes": obj.get("extractAttributes")
         })
         return _obj
 
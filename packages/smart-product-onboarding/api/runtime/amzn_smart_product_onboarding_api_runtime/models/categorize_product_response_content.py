@@ -21,6 +21,7 @@ from typing import Any, List, Union, ClassVar, Dict, Optional, TYPE_CHECKING
 from pydantic import Field, StrictStr, ValidationError, field_validator, BaseModel, SecretStr, StrictFloat, StrictInt, StrictBytes, StrictBool
 from decimal import Decimal
 from typing_extensions import Annotated, Literal
+from amzn_smart_product_onboarding_api_runtime.models.product_attribute import ProductAttribute
 try:
     from typing import Self
 except ImportError:
@@ -35,7 +36,8 @@ class CategorizeProductResponseContent(BaseModel):
     category_path: StrictStr = Field(alias="categoryPath")
     explanation: Optional[StrictStr] = None
     prompt: Optional[StrictStr] = None
-    __properties: ClassVar[List[str]] = ["categoryId", "categoryName", "categoryPath", "explanation", "prompt"]
+    attributes: Optional[Annotated[List[ProductAttribute], Field(strict=True, max_length=100)]] = None
+    __properties: ClassVar[List[str]] = ["categoryId", "categoryName", "categoryPath", "explanation", "prompt", "attributes"]
 
 
     model_config = {
@@ -73,6 +75,13 @@ class CategorizeProductResponseContent(BaseModel):
             },
             exclude_none=True,
         )
+        # override the default output from pydantic by calling `to_dict()` of each item in attributes (list)
+        _items = []
+        if self.attributes:
+            for _item in self.attributes:
+                if _item:
+                    _items.append(_item.to_dict())
+            _dict['attributes'] = _items
         return _dict
 
     @classmethod
@@ -90,7 +99,8 @@ class CategorizeProductResponseContent(BaseModel):
             "categoryName": obj.get("categoryName"),
             "categoryPath": obj.get("categoryPath"),
             "explanation": obj.get("explanation"),
-            "prompt": obj.get("prompt")
+            "prompt": obj.get("prompt"),
+            "attributes": [ProductAttribute.from_dict(_item) for _item in obj.get("attributes")] if obj.get("attributes") is not None else None
         })
         return _obj
 
@@ -13,26 +13,70 @@ from __future__ import annotations
 
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import boto3
 
+from amzn_smart_product_onboarding_core_utils.structured_output import OUTPUT_MODE_XML
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class CascadeTier:
+    """A model tried before the component's model, whose result is kept only if it passes the tier's checks.
+
+    :param min_confidence: Lowest self-reported confidence, between 0 and 1, to accept. ``None`` skips the check.
+    :param require_agreement: Only accept results that agree with the upstream signal, i.e. the metaclass candidates
+        for categorization or the enumerated values of the category schema for attribute extraction.
+    """
+
+    model_id: str
+    temperature: float = 0
+    min_confidence: float | None = None
+    require_agreement: bool = False
+
+
+@dataclass
+class ModelRoute:
+    """A model the component's requests are routed to, in proportion to its weight among the routes."""
+
+    model_id: str
+    temperature: float = 0
+    weight: float = 1
+
+
 @dataclass
 class AppConfigSettings:
-    """Runtime model settings retrieved from AppConfig."""
+    """Runtime model settings retrieved from AppConfig.
+
+    :param partition_size: Most attributes per attribute extraction call, see ``AttributesExtractor``
+    :param lexicon: Extract enumerated attribute values found verbatim without the model, see ``AttributesExtractor``
+    :param combined_max_candidates: Most metaclass candidates for which a product is categorized and its attributes
+        extracted in one call, see ``ProductClassifier.classify_and_extract``. 0 always uses separate calls.
+    """
 
     model_id: str
     temperature: float
+    output_mode: str = OUTPUT_MODE_XML
+    cascade: list[CascadeTier] = field(default_factory=list)
+    routes: list[ModelRoute] = field(default_factory=list)
+    partition_size: int | None = None
+    lexicon: bool = False
+    combined_max_candidates: int = 0
+
+    @property
+    def tiers(self) -> list[CascadeTier]:
+        """The cascade tiers followed by the component's model, which accepts any valid result."""
+        return [*self.cascade, CascadeTier(model_id=self.model_id, temperature=self.temperature)]
 
 
 class AppConfigClient:
     """Thin wrapper around the ``appconfigdata`` boto3 client.
 
     Maintains a session token across invocations so that AppConfig only
-    returns new data when the configuration has actually changed.
+    returns new data when the configuration has actually changed, and keeps
+    the last document for ``get_cached_configuration``.
     """
 
     def __init__(
@@ -46,6 +90,8 @@ class AppConfigClient:
         self._configuration_profile_id = configuration_profile_id
         self._client = boto3.client("appconfigdata")
         self._session_token: str | None = None
+        # the last configuration document received, read by get_cached_configuration
+        self._document: dict | None = None
 
     # ------------------------------------------------------------------
     # Public API
@@ -70,19 +116,8 @@ class AppConfigClient:
                 logger.info("AppConfig returned empty configuration body")
                 return None
 
-            config_document = json.loads(content)
-            component_config = config_document.get(component_key)
-            if component_config is None:
-                logger.warning(
-                    "Missing component key '%s' in AppConfig configuration",
-                    component_key,
-                )
-                return None
-
-            return AppConfigSettings(
-                model_id=component_config["modelId"],
-                temperature=component_config["temperature"],
-            )
+            self._document = json.loads(content)
+            return self._settings(component_key)
         except Exception:
             logger.warning(
                 "Failed to retrieve AppConfig configuration",
@@ -92,10 +127,61 @@ class AppConfigClient:
             self._session_token = None
             return None
 
+    def get_cached_configuration(self, component_key: str) -> AppConfigSettings | None:
+        """Return settings for *component_key* from the last document received, without polling AppConfig.
+
+        For the other components read in an invocation, as each poll uses up the session token.
+        """
+        if self._document is None:
+            return None
+        try:
+            return self._settings(component_key)
+        except Exception:
+            logger.warning(
+                "Failed to parse AppConfig configuration",
+                exc_info=True,
+            )
+            return None
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    def _settings(self, component_key: str) -> AppConfigSettings | None:
+        component_config = self._document.get(component_key)
+        if component_config is None:
+            logger.warning(
+                "Missing component key '%s' in AppConfig configuration",
+                component_key,
+            )
+            return None
+
+        return AppConfigSettings(
+            model_id=component_config["modelId"],
+            temperature=component_config["temperature"],
+            output_mode=component_config.get("outputMode", OUTPUT_MODE_XML),
+            cascade=[
+                CascadeTier(
+                    model_id=tier["modelId"],
+                    temperature=tier.get("temperature", 0),
+                    min_confidence=tier.get("minConfidence"),
+                    require_agreement=tier.get("requireAgreement", False),
+                )
+                for tier in component_config.get("cascade", [])
+            ],
+            routes=[
+                ModelRoute(
+                    model_id=route["modelId"],
+                    temperature=route.get("temperature", 0),
+                    weight=route.get("weight", 1),
+                )
+                for route in component_config.get("routes", [])
+            ],
+            partition_size=component_config.get("partitionSize"),
+            lexicon=component_config.get("lexicon", False),
+            combined_max_candidates=component_config.get("combinedMaxCandidates", 0),
+        )
+
     def _start_session(self) -> None:
         response = self._client.start_configuration_session(
             ApplicationIdentifier=self._application_id,
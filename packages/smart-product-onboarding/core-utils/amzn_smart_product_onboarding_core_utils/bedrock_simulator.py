@@ -0,0 +1,262 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Offline stand-in for the Bedrock Runtime client, for local runs and load tests.
+
+``BedrockRuntimeSimulator`` implements ``converse`` and ``converse_stream`` with the request and response shapes of
+the real client, so it can be passed anywhere the code takes a ``BedrockRuntimeClient``. Each model ID is scripted
+with a ``SimulatedModel``: a responder that writes the reply, a latency distribution, an output token rate, per-minute
+request and token quotas that raise ``ThrottlingException`` like the service does, and a rate of malformed responses.
+
+Token counts are estimated as characters/4, like the rate limiter does. ``time_scale`` shrinks every simulated delay,
+quota window included, so a load test can run minutes of traffic in seconds.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import botocore.exceptions
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import (
+    CHARS_PER_TOKEN,
+    block_text,
+    estimate_tokens,
+    request_text,
+)
+
+QUOTA_WINDOW_SECONDS = 60
+STREAM_CHUNK_CHARS = 16
+
+MALFORMED_TRUNCATED = "truncated"
+MALFORMED_GARBAGE = "garbage"
+MALFORMED_EMPTY = "empty"
+MALFORMED_KINDS = (MALFORMED_TRUNCATED, MALFORMED_GARBAGE, MALFORMED_EMPTY)
+
+GARBAGE_TEXT = "I'm sorry, but I can't provide a response in the requested format."
+
+LatencyDistribution = Callable[[random.Random], float]
+# receives the converse keyword arguments, returns the reply text (continuing any prefill) or the content blocks
+Responder = Callable[[dict[str, Any]], str | list[dict[str, Any]]]
+
+
+def constant_latency(seconds: float) -> LatencyDistribution:
+    return lambda rng: seconds
+
+
+def uniform_latency(low: float, high: float) -> LatencyDistribution:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float) -> LatencyDistribution:
+    """Long-tailed latency, as measured for model calls: ``median`` seconds, with ``sigma`` the spread of the log."""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def empty_responder(request: dict[str, Any]) -> str:
+    return ""
+
+
+@dataclass
+class SimulatedModel:
+    """Scripted behaviour of one model ID."""
+
+    responder: Responder = empty_responder
+    latency: LatencyDistribution = field(default_factory=lambda: constant_latency(0))
+    output_tokens_per_second: float | None = None
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    malformed_rate: float = 0
+    malformed_kinds: Sequence[str] = MALFORMED_KINDS
+
+
+def throttling_error(operation_name: str = "Converse") -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {
+            "Error": {"Code": "ThrottlingException", "Message": "Too many tokens, please wait before trying again."},
+            "ResponseMetadata": {"HTTPStatusCode": 429},
+        },
+        operation_name,
+    )
+
+
+class BedrockRuntimeSimulator:
+    """Fake Bedrock Runtime client scriptable per model ID.
+
+    :param models: Behaviour per model ID
+    :param default_model: Behaviour of model IDs missing from *models*
+    :param seed: Seed for latencies and malformed response injection
+    :param time_scale: Factor applied to every delay and to the quota window
+    """
+
+    def __init__(
+        self,
+        models: Mapping[str, SimulatedModel] | None = None,
+        default_model: SimulatedModel | None = None,
+        seed: int | None = None,
+        time_scale: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.models = dict(models or {})
+        self.default_model = default_model or SimulatedModel()
+        self.time_scale = time_scale
+        self.stats: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._random = random.Random(seed)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # (time, requests, tokens) recorded against each model's per-minute quotas
+        self._usage: defaultdict[str, deque[tuple[float, int, int]]] = defaultdict(deque)
+
+    def model(self, model_id: str) -> SimulatedModel:
+        return self.models.get(model_id, self.default_model)
+
+    def converse(self, **kwargs) -> dict[str, Any]:
+        model_id = kwargs["modelId"]
+        content, stop_reason, usage, first_token_latency = self._invoke(model_id, kwargs, "Converse")
+        generation_time = self._generation_time(model_id, usage["outputTokens"])
+        self._wait(first_token_latency + generation_time)
+        return {
+            "output": {"message": {"role": "assistant", "content": content}},
+            "stopReason": stop_reason,
+            "usage": usage,
+            "metrics": {"latencyMs": round((first_token_latency + generation_time) * self.time_scale * 1000)},
+        }
+
+    def converse_stream(self, **kwargs) -> dict[str, Any]:
+        model_id = kwargs["modelId"]
+        content, stop_reason, usage, first_token_latency = self._invoke(model_id, kwargs, "ConverseStream")
+        return {"stream": self._stream(model_id, content, stop_reason, usage, first_token_latency)}
+
+    def _invoke(
+        self, model_id: str, request: dict[str, Any], operation_name: str
+    ) -> tuple[list[dict[str, Any]], str, dict[str, int], float]:
+        model = self.model(model_id)
+        input_tokens = estimate_tokens(request_text(request))
+        self._admit(model_id, model, input_tokens, operation_name)
+
+        content, stop_reason = _reply_content(model.responder(request), request.get("inferenceConfig") or {})
+        with self._lock:
+            malformed = self._random.random() < model.malformed_rate
+            kind = self._random.choice(list(model.malformed_kinds)) if malformed else None
+            first_token_latency = max(0.0, model.latency(self._random))
+        if kind:
+            content, stop_reason = _malform(content, kind)
+
+        output_tokens = estimate_tokens("".join(block_text(block) for block in content))
+        with self._lock:
+            # output tokens count against the quota once they are generated
+            self._usage[model_id].append((self._clock(), 0, output_tokens))
+            stats = self.stats[model_id]
+            stats["requests"] += 1
+            stats["inputTokens"] += input_tokens
+            stats["outputTokens"] += output_tokens
+            if kind:
+                stats["malformed"] += 1
+                stats[f"malformed_{kind}"] += 1
+        usage = {
+            "inputTokens": input_tokens,
+            "outputTokens": output_tokens,
+            "totalTokens": input_tokens + output_tokens,
+        }
+        return content, stop_reason, usage, first_token_latency
+
+    def _admit(self, model_id: str, model: SimulatedModel, input_tokens: int, operation_name: str) -> None:
+        """Record the request against the model's quotas, or raise ThrottlingException if it does not fit."""
+        with self._lock:
+            now = self._clock()
+            window = self._usage[model_id]
+            while window and window[0][0] <= now - QUOTA_WINDOW_SECONDS * self.time_scale:
+                window.popleft()
+            requests = sum(requests for _, requests, _ in window)
+            tokens = sum(tokens for _, _, tokens in window)
+            if (model.requests_per_minute is not None and requests >= model.requests_per_minute) or (
+                model.tokens_per_minute is not None and tokens + input_tokens > model.tokens_per_minute
+            ):
+                self.stats[model_id]["throttled"] += 1
+                raise throttling_error(operation_name)
+            window.append((now, 1, input_tokens))
+
+    def _generation_time(self, model_id: str, output_tokens: int) -> float:
+        tokens_per_second = self.model(model_id).output_tokens_per_second
+        return output_tokens / tokens_per_second if tokens_per_second else 0.0
+
+    def _wait(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            self._sleep(seconds * self.time_scale)
+
+    def _stream(
+        self,
+        model_id: str,
+        content: list[dict[str, Any]],
+        stop_reason: str,
+        usage: dict[str, int],
+        first_token_latency: float,
+    ) -> Iterator[dict[str, Any]]:
+        yield {"messageStart": {"role": "assistant"}}
+        self._wait(first_token_latency)
+        for index, block in enumerate(content):
+            if "toolUse" in block:
+                tool_use = block["toolUse"]
+                yield {
+                    "contentBlockStart": {
+                        "start": {"toolUse": {"toolUseId": tool_use["toolUseId"], "name": tool_use["name"]}},
+                        "contentBlockIndex": index,
+                    }
+                }
+                chunks, delta_key = _chunks(json.dumps(tool_use["input"])), "toolUse"
+            else:
+                chunks, delta_key = _chunks(block.get("text", "")), "text"
+            for chunk in chunks:
+                self._wait(self._generation_time(model_id, estimate_tokens(chunk)))
+                delta = {"toolUse": {"input": chunk}} if delta_key == "toolUse" else {"text": chunk}
+                yield {"contentBlockDelta": {"delta": delta, "contentBlockIndex": index}}
+            yield {"contentBlockStop": {"contentBlockIndex": index}}
+        yield {"messageStop": {"stopReason": stop_reason}}
+        latency_ms = round((first_token_latency + self._generation_time(model_id, usage["outputTokens"])) * 1000)
+        yield {"metadata": {"usage": usage, "metrics": {"latencyMs": round(latency_ms * self.time_scale)}}}
+
+
+def _reply_content(reply: str | list[dict[str, Any]], inference_config: dict[str, Any]) -> tuple[list, str]:
+    if not isinstance(reply, str):
+        return reply, "tool_use" if any("toolUse" in block for block in reply) else "end_turn"
+
+    text, stop_reason = reply, "end_turn"
+    stops = [(text.find(stop), stop) for stop in inference_config.get("stopSequences", [])]
+    stops = [(position, stop) for position, stop in stops if position != -1]
+    if stops:
+        text, stop_reason = text[: min(stops)[0]], "stop_sequence"
+    max_tokens = inference_config.get("maxTokens")
+    if max_tokens is not None and estimate_tokens(text) > max_tokens:
+        text, stop_reason = text[: max_tokens * CHARS_PER_TOKEN], "max_tokens"
+    return [{"text": text}], stop_reason
+
+
+def _malform(content: list[dict[str, Any]], kind: str) -> tuple[list[dict[str, Any]], str]:
+    if kind == MALFORMED_GARBAGE:
+        return [{"text": GARBAGE_TEXT}], "end_turn"
+    if kind == MALFORMED_EMPTY:
+        return [{"text": ""}], "end_turn"
+    # truncated: the reply stops halfway, as if the output token limit was hit
+    truncated = []
+    for block in content:
+        if "toolUse" in block:
+            tool_input = block["toolUse"].get("input", {})
+            kept = dict(list(tool_input.items())[: len(tool_input) // 2])
+            truncated.append({"toolUse": {**block["toolUse"], "input": kept}})
+        else:
+            text = block.get("text", "")
+            truncated.append({"text": text[: len(text) // 2]})
+    return truncated, "max_tokens"
+
+
+def _chunks(text: str) -> list[str]:
+    return [text[i : i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
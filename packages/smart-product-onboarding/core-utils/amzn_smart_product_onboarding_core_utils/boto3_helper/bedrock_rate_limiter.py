@@ -0,0 +1,356 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Client-side pacing of Bedrock calls.
+
+Every model ID gets two token buckets, one for requests per minute and one for tokens per minute. A call reserves one
+request and its estimated input tokens before it is sent, and sleeps if either bucket is in debt. The estimate is
+corrected with the usage returned by the model, output tokens included. Without configured quotas the limiter lets
+calls through until the first ``ThrottlingException``; from then on the model's rate is cut to a fraction of the
+throughput it achieved over the last minute and grows back a little with every successful call. Throttles of calls
+sent before the last cut do not cut the rate again.
+
+``RateLimitedBedrockRuntime`` wraps a Bedrock Runtime client so that all the call sites sharing the client share its
+limiter. Inside ``Deadline.call`` it passes the deadline to the limiter, so a call is not sent after a wait that ran
+past it.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import botocore.exceptions
+
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline, current_deadline
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+if TYPE_CHECKING:
+    from mypy_boto3_bedrock_runtime import BedrockRuntimeClient
+
+    from amzn_smart_product_onboarding_core_utils.boto3_helper.throughput_governor import ThroughputGovernor
+
+CHARS_PER_TOKEN = 4
+WINDOW_SECONDS = 60
+# lowest rates a throttle can cut to, so a throttle on the first calls does not stall the model for minutes
+MIN_REQUESTS_PER_MINUTE = 10
+MIN_TOKENS_PER_MINUTE = 20000
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def block_text(block: dict[str, Any]) -> str:
+    if "text" in block:
+        return block["text"]
+    if "toolUse" in block:
+        return json.dumps(block["toolUse"].get("input", {}))
+    if "toolResult" in block:
+        return "".join(block_text(inner) for inner in block["toolResult"].get("content", []))
+    return ""
+
+
+def request_text(request: dict[str, Any]) -> str:
+    """Text of the system prompt, messages and tool configuration of a Converse request."""
+    parts = [block.get("text", "") for block in request.get("system") or []]
+    for message in request.get("messages", []):
+        parts += [block_text(block) for block in message["content"]]
+    if request.get("toolConfig"):
+        parts.append(json.dumps(request["toolConfig"]))
+    return "".join(parts)
+
+
+def is_throttling(error: botocore.exceptions.ClientError) -> bool:
+    # errors raised mid-stream by converse_stream use lower camel case codes, e.g. throttlingException
+    return error.response["Error"]["Code"].lower() == "throttlingexception"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate_per_minute``, holding at most a minute's worth.
+
+    Reservations may take the bucket into debt; the caller then waits until the debt is refilled. Not thread-safe on
+    its own, the limiter holds a lock around it.
+    """
+
+    def __init__(self, rate_per_minute: float | None, now: float):
+        self.rate_per_minute = rate_per_minute
+        self.level = rate_per_minute or 0.0
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if self.rate_per_minute is not None:
+            elapsed = now - self.updated
+            self.level = min(self.rate_per_minute, self.level + elapsed * self.rate_per_minute / WINDOW_SECONDS)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take *amount* from the bucket and return the seconds to wait before using it."""
+        if self.rate_per_minute is None:
+            return 0.0
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level * WINDOW_SECONDS / self.rate_per_minute)
+
+    def adjust(self, amount: float, now: float) -> None:
+        if self.rate_per_minute is not None:
+            self._refill(now)
+            self.level -= amount
+
+    def set_rate(self, rate_per_minute: float, now: float, drain: bool = False) -> None:
+        self._refill(now)
+        self.rate_per_minute = rate_per_minute
+        self.level = min(self.level, 0.0 if drain else rate_per_minute)
+
+
+@dataclass
+class ModelRateState:
+    requests: TokenBucket
+    tokens: TokenBucket
+    max_requests_per_minute: float | None
+    max_tokens_per_minute: float | None
+    # (time, tokens) of the calls of the last minute, to measure the throughput when a throttle arrives
+    history: deque[tuple[float, int]] = field(default_factory=deque)
+    counters: Counter[str] = field(default_factory=Counter)
+    last_cut: float = -math.inf
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Per model ID request and token pacing, adapted from observed throttles.
+
+    :param requests_per_minute: Request quota of every model, or ``None`` to learn it from throttles
+    :param tokens_per_minute: Token quota of every model, or ``None`` to learn it from throttles
+    :param decrease: Factor applied to the observed throughput when a call is throttled
+    :param increase: Growth of the rate after each successful call, up to the configured quota
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        decrease: float = 0.7,
+        increase: float = 0.005,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.decrease = decrease
+        self.increase = increase
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._models: dict[str, ModelRateState] = {}
+        self._limits: defaultdict[str, tuple[float | None, float | None]] = defaultdict(
+            lambda: (self.requests_per_minute, self.tokens_per_minute)
+        )
+
+    def set_limits(
+        self, model_id: str, requests_per_minute: float | None = None, tokens_per_minute: float | None = None
+    ) -> None:
+        """Configure the quotas of one model ID, e.g. from its Bedrock service quotas."""
+        with self._lock:
+            self._limits[model_id] = (requests_per_minute, tokens_per_minute)
+            self._models.pop(model_id, None)
+
+    def _state(self, model_id: str, now: float) -> ModelRateState:
+        state = self._models.get(model_id)
+        if state is None:
+            requests_per_minute, tokens_per_minute = self._limits[model_id]
+            state = self._models[model_id] = ModelRateState(
+                requests=TokenBucket(requests_per_minute, now),
+                tokens=TokenBucket(tokens_per_minute, now),
+                max_requests_per_minute=requests_per_minute,
+                max_tokens_per_minute=tokens_per_minute,
+            )
+        return state
+
+    def acquire(self, model_id: str, tokens: int, deadline: Deadline | None = None) -> float:
+        """Reserve one request and *tokens* for *model_id*, sleeping until they are available.
+
+        :param deadline: Raise ``DeadlineExceeded`` instead of waiting when the call would no longer have time to run
+            after the wait. The reservation is given back.
+        :return: Seconds waited
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._state(model_id, now)
+            wait = max(state.requests.reserve(1, now), state.tokens.reserve(tokens, now))
+            late = deadline is not None and wait + deadline.min_call_seconds > deadline.remaining()
+            if late:
+                state.requests.adjust(-1, now)
+                state.tokens.adjust(-tokens, now)
+                state.counters["deadline_exceeded"] += 1
+            else:
+                state.counters["requests"] += 1
+                if wait > 0:
+                    state.counters["delayed"] += 1
+                    state.wait_seconds += wait
+                    state.max_wait_seconds = max(state.max_wait_seconds, wait)
+        if late:
+            deadline.check(f"rate limiter wait for {model_id}", wait + deadline.min_call_seconds)
+        if wait > 0:
+            logger.info({"rate_limiter_wait_ms": round(wait * 1000), "model_id": model_id})
+            self._sleep(wait)
+        return wait
+
+    def record_usage(self, model_id: str, estimated_tokens: int, total_tokens: int) -> None:
+        """Correct the reservation of a successful call with its actual usage, and let the rate grow back."""
+        with self._lock:
+            now = self._clock()
+            state = self._state(model_id, now)
+            state.tokens.adjust(total_tokens - estimated_tokens, now)
+            state.history.append((now, total_tokens))
+            self._trim_history(state, now)
+            for bucket, ceiling in (
+                (state.requests, state.max_requests_per_minute),
+                (state.tokens, state.max_tokens_per_minute),
+            ):
+                if bucket.rate_per_minute is not None:
+                    rate = bucket.rate_per_minute * (1 + self.increase)
+                    bucket.set_rate(rate if ceiling is None else min(rate, ceiling), now)
+
+    def now(self) -> float:
+        return self._clock()
+
+    def record_throttle(self, model_id: str, sent_at: float | None = None) -> None:
+        """Cut the rates of *model_id* below the throughput it was throttled at.
+
+        :param sent_at: ``now()`` when the throttled call was sent. Calls sent before the last cut were paced at the
+            old rate, their throttles are counted without cutting the rate again.
+        """
+        with self._lock:
+            now = self._clock()
+            state = self._state(model_id, now)
+            state.counters["throttles"] += 1
+            if sent_at is not None and sent_at < state.last_cut:
+                return
+            state.last_cut = now
+            self._trim_history(state, now)
+            observed_requests = len(state.history) + 1
+            observed_tokens = sum(tokens for _, tokens in state.history)
+            for bucket, observed, floor, ceiling in (
+                (state.requests, observed_requests, MIN_REQUESTS_PER_MINUTE, state.max_requests_per_minute),
+                (state.tokens, observed_tokens, MIN_TOKENS_PER_MINUTE, state.max_tokens_per_minute),
+            ):
+                rate = max(floor, observed * self.decrease)
+                bucket.set_rate(rate if ceiling is None else min(rate, ceiling), now, drain=True)
+            requests_per_minute, tokens_per_minute = state.requests.rate_per_minute, state.tokens.rate_per_minute
+        logger.warning(
+            {
+                "rate_limiter_throttled": model_id,
+                "requests_per_minute": requests_per_minute,
+                "tokens_per_minute": tokens_per_minute,
+            }
+        )
+
+    def _trim_history(self, state: ModelRateState, now: float) -> None:
+        while state.history and state.history[0][0] <= now - WINDOW_SECONDS:
+            state.history.popleft()
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Wait-time and throttle metrics, and current rates, per model ID."""
+        with self._lock:
+            return {
+                model_id: {
+                    "requests": state.counters["requests"],
+                    "delayed": state.counters["delayed"],
+                    "throttles": state.counters["throttles"],
+                    "deadline_exceeded": state.counters["deadline_exceeded"],
+                    "wait_ms": round(state.wait_seconds * 1000),
+                    "max_wait_ms": round(state.max_wait_seconds * 1000),
+                    "requests_per_minute": state.requests.rate_per_minute,
+                    "tokens_per_minute": state.tokens.rate_per_minute,
+                }
+                for model_id, state in self._models.items()
+            }
+
+
+def _env_rate(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+BEDROCK_RATE_LIMITER = AdaptiveRateLimiter(
+    requests_per_minute=_env_rate("BEDROCK_REQUESTS_PER_MINUTE"),
+    tokens_per_minute=_env_rate("BEDROCK_TOKENS_PER_MINUTE"),
+)
+
+
+class RateLimitedBedrockRuntime:
+    """Bedrock Runtime client whose ``converse`` and ``converse_stream`` calls are paced by a rate limiter, or by the
+    account-wide ``ThroughputGovernor``.
+
+    Other attributes are passed through to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        client: "BedrockRuntimeClient",
+        limiter: "AdaptiveRateLimiter | ThroughputGovernor" = BEDROCK_RATE_LIMITER,
+    ):
+        self.client = client
+        self.limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def converse(self, **kwargs) -> dict[str, Any]:
+        model_id = kwargs["modelId"]
+        estimated = estimate_tokens(request_text(kwargs))
+        self.limiter.acquire(model_id, estimated, current_deadline())
+        sent_at = self.limiter.now()
+        try:
+            response = self.client.converse(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            if is_throttling(e):
+                self.limiter.record_throttle(model_id, sent_at)
+            raise
+        self.limiter.record_usage(model_id, estimated, response.get("usage", {}).get("totalTokens", estimated))
+        return response
+
+    def converse_stream(self, **kwargs) -> dict[str, Any]:
+        model_id = kwargs["modelId"]
+        estimated = estimate_tokens(request_text(kwargs))
+        self.limiter.acquire(model_id, estimated, current_deadline())
+        sent_at = self.limiter.now()
+        try:
+            response = self.client.converse_stream(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            if is_throttling(e):
+                self.limiter.record_throttle(model_id, sent_at)
+            raise
+        return {**response, "stream": self._paced_stream(model_id, estimated, sent_at, response["stream"])}
+
+    def _paced_stream(self, model_id: str, estimated: int, sent_at: float, stream) -> Iterator[dict[str, Any]]:
+        # a stream closed early, e.g. once the prediction is complete, ends before its metadata event: its usage is
+        # then estimated from the text received, as the tokens generated until then are spent
+        output = []
+        recorded = False
+        try:
+            for event in stream:
+                if "contentBlockDelta" in event:
+                    output.append(event["contentBlockDelta"]["delta"].get("text", ""))
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+                    self.limiter.record_usage(model_id, estimated, usage.get("totalTokens", estimated))
+                    recorded = True
+                yield event
+        except botocore.exceptions.ClientError as e:
+            if is_throttling(e):
+                self.limiter.record_throttle(model_id, sent_at)
+                recorded = True
+            raise
+        finally:
+            if not recorded:
+                self.limiter.record_usage(model_id, estimated, estimated + estimate_tokens("".join(output)))
+            if hasattr(stream, "close"):
+                stream.close()
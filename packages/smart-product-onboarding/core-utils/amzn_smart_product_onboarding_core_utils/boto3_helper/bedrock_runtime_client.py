@@ -2,7 +2,10 @@
 # SPDX-License-Identifier: MIT-0
 
 import os
-from typing import TYPE_CHECKING, Union
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Union
 
 import boto3
 import botocore.exceptions
@@ -14,6 +17,23 @@ from tenacity import (
     wait_random_exponential,
 )
 
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import (
+    BEDROCK_RATE_LIMITER,
+    RateLimitedBedrockRuntime,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.refreshing_credentials import (
+    BackgroundRefreshingCredentials,
+    assume_role_fetcher,
+    refreshing_session,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.regional_bedrock_pool import RegionalBedrockPool
+from amzn_smart_product_onboarding_core_utils.boto3_helper.throughput_governor import (
+    LANE_LARGE_BATCH,
+    LANES,
+    DynamoDBBucketStore,
+    ThroughputGovernor,
+)
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline, call_within, stop_at_deadline
 from amzn_smart_product_onboarding_core_utils.exceptions import (
     ModelResponseError,
     RateLimitError,
@@ -33,25 +53,39 @@ if TYPE_CHECKING:
 else:
     BedrockRuntimeClient = object
 
+EARLY_TERMINATION = "early_termination"
+
+# the shared rate limiter paces the retried call once a throttle has cut the model's rate, this wait only spreads out
+# the retries of concurrent calls
+THROTTLE_RETRY_WAIT = wait_random_exponential(multiplier=0.5, max=4)
+
 BEDROCK_XACCT_ROLE = os.getenv("BEDROCK_XACCT_ROLE")
 BEDROCK_XACCT_REGION = os.getenv(
     "BEDROCK_XACCT_REGION", "us-west-2"
 )  # we assume cross-account role happens in PDX by default
 
+# the DynamoDB table shared by all the functions calling Bedrock, see throughput_governor
+THROUGHPUT_GOVERNOR_TABLE = os.getenv("THROUGHPUT_GOVERNOR_TABLE")
+THROUGHPUT_LANE = os.getenv("THROUGHPUT_LANE", LANE_LARGE_BATCH)
+
+# comma-separated regions to spread the calls over, the first one preferred, see regional_bedrock_pool
+BEDROCK_REGIONS = [region.strip() for region in os.getenv("BEDROCK_REGIONS", "").split(",") if region.strip()]
+
+# credentials of the cross-account role, renewed in the background, or None without BEDROCK_XACCT_ROLE
+BEDROCK_XACCT_CREDENTIALS: BackgroundRefreshingCredentials | None = None
+
 if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
     client_kwargs = {"region_name": os.getenv("AWS_REGION", "us-east-1")}
+    session = boto3
 
     if BEDROCK_XACCT_ROLE:
         sts = boto3.client("sts", config=Config(retries={"max_attempts": 3, "mode": "adaptive"}))
 
-        response = sts.assume_role(
-            RoleArn=BEDROCK_XACCT_ROLE,
-            RoleSessionName="x-acct-role-for-smart-product-onboarding",
+        BEDROCK_XACCT_CREDENTIALS = BackgroundRefreshingCredentials(
+            assume_role_fetcher(sts, BEDROCK_XACCT_ROLE, "x-acct-role-for-smart-product-onboarding"),
+            name=BEDROCK_XACCT_ROLE,
         )
-
-        client_kwargs["aws_access_key_id"] = response["Credentials"]["AccessKeyId"]
-        client_kwargs["aws_secret_access_key"] = response["Credentials"]["SecretAccessKey"]
-        client_kwargs["aws_session_token"] = response["Credentials"]["SessionToken"]
+        session = refreshing_session(BEDROCK_XACCT_CREDENTIALS)
 
         # x-acct region
         client_kwargs["region_name"] = BEDROCK_XACCT_REGION
@@ -60,29 +94,84 @@ if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
         region_name=client_kwargs["region_name"],
         connect_timeout=120,
         read_timeout=120,
+        # throttles are paced by the rate limiter, which only sees the ones botocore does not retry itself
         retries={
-            "max_attempts": 10,
-            "mode": "adaptive",
+            "max_attempts": 3,
+            "mode": "standard",
         },
     )
 
-    LAMBDA_BEDROCK_RUNTIME_CLIENT: "BedrockRuntimeClient" = boto3.client(
-        "bedrock-runtime", config=retry_config, **client_kwargs
-    )
+    if len(BEDROCK_REGIONS) > 1:
+        # throttles fail over to the next region at once instead of being retried by botocore
+        pool_config = retry_config.merge(Config(retries={"total_max_attempts": 1, "mode": "standard"}))
+        bedrock_client = RegionalBedrockPool(
+            {
+                region: session.client("bedrock-runtime", config=pool_config, region_name=region)
+                for region in BEDROCK_REGIONS
+            }
+        )
+    else:
+        bedrock_client = session.client("bedrock-runtime", config=retry_config, **client_kwargs)
+
+    requests_per_minute = BEDROCK_RATE_LIMITER.requests_per_minute
+    tokens_per_minute = BEDROCK_RATE_LIMITER.tokens_per_minute
+    if THROUGHPUT_GOVERNOR_TABLE and requests_per_minute and tokens_per_minute:
+        limiter = ThroughputGovernor(
+            DynamoDBBucketStore(boto3.client("dynamodb"), THROUGHPUT_GOVERNOR_TABLE),
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            lane=THROUGHPUT_LANE,
+        )
+    else:
+        if THROUGHPUT_GOVERNOR_TABLE:
+            logger.warning("THROUGHPUT_GOVERNOR_TABLE needs BEDROCK_REQUESTS_PER_MINUTE and BEDROCK_TOKENS_PER_MINUTE")
+        limiter = BEDROCK_RATE_LIMITER
+
+    LAMBDA_BEDROCK_RUNTIME_CLIENT: "BedrockRuntimeClient" = RateLimitedBedrockRuntime(bedrock_client, limiter)
 else:
     LAMBDA_BEDROCK_RUNTIME_CLIENT = object
 
 
+def use_throughput_lane(lane: str | None) -> None:
+    """Pace the calls of this invocation in *lane*, e.g. the lane the state machine derived from the batch size.
+
+    Without a lane, the function's ``THROUGHPUT_LANE`` is used. Only applies when the client is paced by the governor.
+    """
+    limiter = getattr(LAMBDA_BEDROCK_RUNTIME_CLIENT, "limiter", None)
+    if not isinstance(limiter, ThroughputGovernor):
+        return
+    if lane is not None and lane not in LANES:
+        logger.warning({"unknown_throughput_lane": lane, "lane": THROUGHPUT_LANE})
+        lane = None
+    limiter.lane = lane or THROUGHPUT_LANE
+
+
+def log_bedrock_client_metrics() -> None:
+    """Log the metrics of the client: the wait-time and throttle metrics of the rate limiter or governor pacing it, per
+    model ID, and the refreshes of the cross-account credentials."""
+    limiter = getattr(LAMBDA_BEDROCK_RUNTIME_CLIENT, "limiter", None)
+    if isinstance(limiter, ThroughputGovernor):
+        logger.info({"governor_metrics": limiter.metrics()})
+    elif limiter is not None:
+        logger.info({"rate_limiter_metrics": limiter.metrics()})
+    if BEDROCK_XACCT_CREDENTIALS is not None:
+        logger.info({"credentials_metrics": BEDROCK_XACCT_CREDENTIALS.metrics()})
+
+
 def handle_bedrock_client_error(func):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except botocore.exceptions.ClientError as error:
-            if error.response["Error"]["Code"] == "ThrottlingException":
-                logger.error(error.response["Error"]["Code"])
+            # errors raised mid-stream by converse_stream use lower camel case codes, e.g. throttlingException
+            code = error.response["Error"]["Code"]
+            code = code[:1].upper() + code[1:]
+            if code == "ThrottlingException":
+                logger.error(code)
                 raise RateLimitError(error)
-            elif error.response["Error"]["Code"] in (
+            elif code in (
                 "ModelTimeoutException",
+                "ModelStreamErrorException",
                 "InternalServerException",
                 "ServiceUnavailableException",
             ):
@@ -95,8 +184,8 @@ def handle_bedrock_client_error(func):
 
 @retry(
     retry=retry_if_exception_type(RateLimitError),
-    stop=stop_after_attempt(3),
-    wait=wait_random_exponential(multiplier=2, max=60, min=30),
+    stop=stop_after_attempt(3) | stop_at_deadline,
+    wait=THROTTLE_RETRY_WAIT,
     reraise=True,
 )
 @handle_bedrock_client_error
@@ -107,6 +196,7 @@ def get_model_response(
     response_open: str = None,
     response_close: str = None,
     temperature: float = 0,
+    deadline: Deadline | None = None,
 ) -> "ConverseResponseTypeDef":
     if response_open:
         messages.append(
@@ -122,7 +212,10 @@ def get_model_response(
     if response_close:
         inference_config["stopSequences"].append(response_close)
 
-    response = bedrock.converse(
+    response = call_within(
+        deadline,
+        "converse",
+        bedrock.converse,
         modelId=model_id,
         messages=messages,
         inferenceConfig=inference_config,
@@ -141,7 +234,7 @@ def extract_response_text(response: dict) -> str:
 
 def build_full_response(response: dict, response_open: str = "", response_close: str = "") -> str:
     text = extract_response_text(response)
-    if response["stopReason"] == "stop_sequence":
+    if response["stopReason"] in ("stop_sequence", EARLY_TERMINATION):
         return response_open + text + response_close
     elif response["stopReason"] == "end_turn" and text.endswith(response_close):
         return response_open + text
@@ -155,3 +248,69 @@ def build_full_response(response: dict, response_open: str = "", response_close:
             }
         )
         raise ModelResponseError(response["stopReason"])
+
+
+@dataclass
+class StreamMetrics:
+    """Latency of a streamed Converse call, measured from when the request was sent."""
+
+    time_to_first_token_ms: float | None = None
+    time_to_stop_ms: float | None = None
+    terminated_early: bool = False
+
+
+@handle_bedrock_client_error
+def converse_stream_until(
+    bedrock: "BedrockRuntimeClient",
+    until: Callable[[str], bool] | None = None,
+    started: float | None = None,
+    deadline: Deadline | None = None,
+    **converse_kwargs: Any,
+) -> tuple[dict, StreamMetrics]:
+    """Call ``converse_stream`` and assemble a ``converse``-shaped response from the events.
+
+    :param bedrock: Bedrock Runtime Client
+    :param until: Called with the text received so far after every delta. Once it returns ``True`` the stream is
+        closed and the response is returned with stop reason ``EARLY_TERMINATION``.
+    :param started: ``time.perf_counter()`` value to measure latencies from. Defaults to now.
+    :param deadline: Raise ``DeadlineExceeded`` instead of waiting for the response or reading the stream past it
+    :param converse_kwargs: Arguments passed to ``converse_stream``
+    """
+    started = time.perf_counter() if started is None else started
+    metrics = StreamMetrics()
+    text = ""
+    stop_reason = None
+    usage: dict = {}
+
+    stream = call_within(deadline, "converse_stream", bedrock.converse_stream, **converse_kwargs)["stream"]
+    try:
+        for event in stream:
+            if deadline is not None:
+                deadline.check("converse_stream", needed=0)
+            if "contentBlockDelta" in event:
+                delta = event["contentBlockDelta"]["delta"].get("text", "")
+                if metrics.time_to_first_token_ms is None:
+                    metrics.time_to_first_token_ms = (time.perf_counter() - started) * 1000
+                text += delta
+                if until is not None and until(text):
+                    stop_reason = EARLY_TERMINATION
+                    metrics.terminated_early = True
+                    break
+            elif "messageStop" in event:
+                stop_reason = event["messageStop"]["stopReason"]
+            elif "metadata" in event:
+                usage = event["metadata"].get("usage", {})
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+    metrics.time_to_stop_ms = (time.perf_counter() - started) * 1000
+    logger.info({"usage": usage, "stream_metrics": asdict(metrics)})
+    return (
+        {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "stopReason": stop_reason,
+            "usage": usage,
+        },
+        metrics,
+    )
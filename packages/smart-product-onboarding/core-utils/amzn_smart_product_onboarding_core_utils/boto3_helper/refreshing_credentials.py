@@ -0,0 +1,220 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Temporary credentials renewed in the background, for clients that call another account through an assumed role.
+
+The credentials are fetched once when the client is built. A background thread fetches new ones ahead of their
+expiry, while the current ones keep signing requests. Lambda freezes the execution environment between invocations,
+so a refresh can also be due when a request is signed: the request then starts the refresh in the background and is
+signed with the current credentials. A request only waits for a refresh when the credentials have already expired,
+e.g. after the environment was frozen for longer than their lifetime.
+"""
+
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+import boto3
+import botocore.session
+from botocore.credentials import CredentialProvider, CredentialResolver, Credentials, ReadOnlyCredentials
+
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+if TYPE_CHECKING:
+    from mypy_boto3_sts import STSClient
+
+# refresh this long before the credentials expire, the session of an assumed role lasts an hour by default
+DEFAULT_REFRESH_BEFORE_SECONDS = 15 * 60
+# wait between attempts when a background refresh fails while the current credentials are still valid
+RETRY_AFTER_FAILURE_SECONDS = 30
+
+
+def assume_role_fetcher(
+    sts_client: "STSClient",
+    role_arn: str,
+    session_name: str,
+    duration_seconds: int = 3600,
+) -> Callable[[], tuple[ReadOnlyCredentials, datetime]]:
+    """Return a function assuming *role_arn* and returning its credentials with their expiry time."""
+
+    def fetch() -> tuple[ReadOnlyCredentials, datetime]:
+        response = sts_client.assume_role(
+            RoleArn=role_arn, RoleSessionName=session_name, DurationSeconds=duration_seconds
+        )
+        credentials = response["Credentials"]
+        frozen = ReadOnlyCredentials(
+            credentials["AccessKeyId"], credentials["SecretAccessKey"], credentials["SessionToken"]
+        )
+        return frozen, credentials["Expiration"]
+
+    return fetch
+
+
+class BackgroundRefreshingCredentials(Credentials):
+    """botocore credentials that are swapped for new ones by a background thread before they expire.
+
+    :param fetch: Returns new credentials and their expiry time, e.g. ``assume_role_fetcher``
+    :param name: Name of the credentials in the logs, e.g. the role ARN
+    :param refresh_before_seconds: How long before the expiry a refresh starts, at most half the lifetime of the
+        credentials
+    :param clock: Current time as a timezone aware datetime
+    """
+
+    method = "background-refresh"
+
+    def __init__(
+        self,
+        fetch: Callable[[], tuple[ReadOnlyCredentials, datetime]],
+        name: str,
+        refresh_before_seconds: float = DEFAULT_REFRESH_BEFORE_SECONDS,
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ):
+        self._fetch = fetch
+        self.name = name
+        self.refresh_before_seconds = refresh_before_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._timer: threading.Timer | None = None
+        self._retry_at: datetime | None = None
+        self.counters: Counter[str] = Counter()
+        self.last_refresh_ms: float | None = None
+        self._frozen, self._expiry = self._timed_fetch()
+        self._refresh_at = self._next_refresh(self._expiry)
+        # the keys are read through the properties below, their setters ignore what Credentials assigns
+        super().__init__(self._frozen.access_key, self._frozen.secret_key, self._frozen.token, method=self.method)
+        self._schedule()
+
+    # botocore reads the keys through these properties and get_frozen_credentials
+    @property
+    def access_key(self) -> str:
+        return self.get_frozen_credentials().access_key
+
+    @access_key.setter
+    def access_key(self, value: str) -> None:
+        pass
+
+    @property
+    def secret_key(self) -> str:
+        return self.get_frozen_credentials().secret_key
+
+    @secret_key.setter
+    def secret_key(self, value: str) -> None:
+        pass
+
+    @property
+    def token(self) -> str:
+        return self.get_frozen_credentials().token
+
+    @token.setter
+    def token(self, value: str) -> None:
+        pass
+
+    def seconds_to_expiry(self) -> float:
+        return (self._expiry - self._clock()).total_seconds()
+
+    def _next_refresh(self, expiry: datetime) -> datetime:
+        lifetime = (expiry - self._clock()).total_seconds()
+        return expiry - timedelta(seconds=min(self.refresh_before_seconds, lifetime / 2))
+
+    def get_frozen_credentials(self) -> ReadOnlyCredentials:
+        now = self._clock()
+        if now >= self._expiry:
+            # nothing valid to sign with, the request has to wait for new credentials
+            self.counters["blocking_refreshes"] += 1
+            self.refresh()
+        elif now >= self._refresh_at and (self._retry_at is None or now >= self._retry_at):
+            # the timer did not fire, e.g. while the execution environment was frozen
+            self._refresh_in_background()
+        with self._lock:
+            return self._frozen
+
+    def _timed_fetch(self) -> tuple[ReadOnlyCredentials, datetime]:
+        started = time.perf_counter()
+        frozen, expiry = self._fetch()
+        self.last_refresh_ms = (time.perf_counter() - started) * 1000
+        self.counters["refreshes"] += 1
+        logger.info(
+            {
+                "credentials_refresh": self.name,
+                "refresh_ms": round(self.last_refresh_ms),
+                "expires_in_s": round((expiry - self._clock()).total_seconds()),
+            }
+        )
+        return frozen, expiry
+
+    def refresh(self) -> None:
+        """Fetch new credentials now and swap them in."""
+        try:
+            frozen, expiry = self._timed_fetch()
+        except Exception:
+            self.counters["refresh_failures"] += 1
+            self._retry_at = self._clock() + timedelta(seconds=RETRY_AFTER_FAILURE_SECONDS)
+            logger.exception({"credentials_refresh_failed": self.name, "expires_in_s": self.seconds_to_expiry()})
+            raise
+        with self._lock:
+            self._frozen, self._expiry = frozen, expiry
+            self._refresh_at = self._next_refresh(expiry)
+            self._retry_at = None
+        self._schedule()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # logged by refresh, the current credentials stay in use until the retry
+            self._schedule(RETRY_AFTER_FAILURE_SECONDS)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _schedule(self, delay: float | None = None) -> None:
+        if delay is None:
+            delay = max((self._refresh_at - self._clock()).total_seconds(), 0)
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def metrics(self) -> dict[str, Any]:
+        """Refresh counts, duration of the last refresh and time left on the current credentials."""
+        return {
+            **self.counters,
+            "last_refresh_ms": round(self.last_refresh_ms) if self.last_refresh_ms is not None else None,
+            "expires_in_s": round(self.seconds_to_expiry()),
+        }
+
+
+class _BackgroundRefreshingProvider(CredentialProvider):
+    METHOD = BackgroundRefreshingCredentials.method
+    CANONICAL_NAME = "customBackgroundRefresh"
+
+    def __init__(self, credentials: BackgroundRefreshingCredentials):
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self) -> BackgroundRefreshingCredentials:
+        return self.credentials
+
+
+def refreshing_session(credentials: BackgroundRefreshingCredentials, region_name: str | None = None) -> boto3.Session:
+    """boto3 session whose clients sign their requests with *credentials*.
+
+    The credentials are the only provider of the session's credential resolver, so the session never falls back to
+    the credentials of the function's own role.
+    """
+    session = botocore.session.Session()
+    session.register_component("credential_provider", CredentialResolver([_BackgroundRefreshingProvider(credentials)]))
+    return boto3.Session(botocore_session=session, region_name=region_name)
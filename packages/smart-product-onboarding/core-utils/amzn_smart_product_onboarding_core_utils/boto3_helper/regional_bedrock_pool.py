@@ -0,0 +1,169 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Bedrock Runtime clients in several regions behind the interface of a single client.
+
+Each call goes to the healthiest region: the one with the lowest expected latency, which is its recent latency
+divided by the share of its recent calls that were not throttled. The first region is preferred while nothing sets
+it apart. A small share of the calls probes another region, so the health of the regions that lost the traffic keeps
+being measured. A throttled call is sent to the next region right away instead of waiting for the throttled one, and the
+throttled region is skipped for a short cool-down. The caller only sees a throttle when every region throttled.
+
+Model IDs must be valid in every region, e.g. cross-region inference profiles of one geography.
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+import botocore.exceptions
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import is_throttling
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+# weight of the newest call in the moving averages of latency and throttle rate
+SMOOTHING = 0.2
+DEFAULT_COOLDOWN_SECONDS = 5
+DEFAULT_PROBE_RATE = 0.05
+# a region that throttles every call still gets a finite expected latency, so it can recover
+MAX_THROTTLE_RATE = 0.95
+FAILOVER_CODES = ("ServiceUnavailableException", "InternalServerException")
+
+
+@dataclass
+class RegionHealth:
+    latency_ms: float | None = None
+    throttle_rate: float = 0.0
+    cooldown_until: float = 0.0
+    counters: Counter[str] = field(default_factory=Counter)
+
+    def expected_latency_ms(self, default_latency_ms: float) -> float:
+        latency_ms = self.latency_ms if self.latency_ms is not None else default_latency_ms
+        return latency_ms / (1 - min(self.throttle_rate, MAX_THROTTLE_RATE))
+
+
+class RegionalBedrockPool:
+    """Route ``converse`` and ``converse_stream`` calls across regional clients, failing over on throttles.
+
+    :param clients: Bedrock Runtime clients by region, the preferred region first
+    :param cooldown_seconds: How long a region is skipped after a throttle
+    :param probe_rate: Share of the calls sent to another region than the healthiest one, to keep measuring it
+    """
+
+    def __init__(
+        self,
+        clients: Mapping[str, Any],
+        cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS,
+        probe_rate: float = DEFAULT_PROBE_RATE,
+        clock: Callable[[], float] = time.monotonic,
+        seed: int | None = None,
+    ):
+        if not clients:
+            raise ValueError("A regional pool needs at least one client")
+        self.clients = dict(clients)
+        self.cooldown_seconds = cooldown_seconds
+        self.probe_rate = probe_rate
+        self._clock = clock
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._health = {region: RegionHealth() for region in self.clients}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(next(iter(self.clients.values())), name)
+
+    def regions(self) -> list[str]:
+        """Regions in the order a call tries them: out of cool-down first, then by expected latency."""
+        now = self._clock()
+        with self._lock:
+            known = [health.latency_ms for health in self._health.values() if health.latency_ms is not None]
+            # regions without calls yet are assumed as fast as the fastest known one
+            default_latency_ms = min(known) if known else 0.0
+            order = list(self.clients)
+            ranked = sorted(
+                order,
+                key=lambda region: (
+                    max(self._health[region].cooldown_until - now, 0),
+                    self._health[region].expected_latency_ms(default_latency_ms),
+                    order.index(region),
+                ),
+            )
+            probes = [region for region in ranked[1:] if self._health[region].cooldown_until <= now]
+            if probes and self._random.random() < self.probe_rate:
+                probe = self._random.choice(probes)
+                ranked.remove(probe)
+                ranked.insert(0, probe)
+            return ranked
+
+    def _record(
+        self, region: str, latency_ms: float | None = None, throttled: bool = False, mid_stream: bool = False
+    ) -> None:
+        with self._lock:
+            health = self._health[region]
+            # a throttle raised mid-stream belongs to a request already counted
+            if not mid_stream:
+                health.counters["requests"] += 1
+            health.throttle_rate += SMOOTHING * ((1.0 if throttled else 0.0) - health.throttle_rate)
+            if throttled:
+                health.counters["throttles"] += 1
+                health.cooldown_until = self._clock() + self.cooldown_seconds
+            if latency_ms is not None:
+                health.latency_ms = (
+                    latency_ms
+                    if health.latency_ms is None
+                    else health.latency_ms + SMOOTHING * (latency_ms - health.latency_ms)
+                )
+
+    def _call(self, operation: str, kwargs: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+        error: botocore.exceptions.ClientError | None = None
+        for attempt, region in enumerate(self.regions()):
+            if attempt:
+                with self._lock:
+                    self._health[region].counters["failovers"] += 1
+                logger.warning({"bedrock_failover": region, "model_id": kwargs.get("modelId")})
+            started = self._clock()
+            try:
+                response = getattr(self.clients[region], operation)(**kwargs)
+            except botocore.exceptions.ClientError as e:
+                throttled = is_throttling(e)
+                if not throttled and e.response["Error"]["Code"] not in FAILOVER_CODES:
+                    raise
+                self._record(region, throttled=throttled)
+                error = e
+                continue
+            self._record(region, latency_ms=(self._clock() - started) * 1000)
+            return region, response
+        raise error
+
+    def converse(self, **kwargs) -> dict[str, Any]:
+        _, response = self._call("converse", kwargs)
+        return response
+
+    def converse_stream(self, **kwargs) -> dict[str, Any]:
+        # the latency of a stream is its time to the response headers, a throttle raised mid-stream cannot fail over
+        region, response = self._call("converse_stream", kwargs)
+        return {**response, "stream": self._watched(region, response["stream"])}
+
+    def _watched(self, region: str, stream) -> Iterator[dict[str, Any]]:
+        try:
+            yield from stream
+        except botocore.exceptions.ClientError as e:
+            if is_throttling(e):
+                self._record(region, throttled=True, mid_stream=True)
+            raise
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Requests, throttles, failovers, latency and throttle rate of this process, per region."""
+        with self._lock:
+            return {
+                region: {
+                    **health.counters,
+                    "latency_ms": round(health.latency_ms) if health.latency_ms is not None else None,
+                    "throttle_rate": round(health.throttle_rate, 3),
+                }
+                for region, health in self._health.items()
+            }
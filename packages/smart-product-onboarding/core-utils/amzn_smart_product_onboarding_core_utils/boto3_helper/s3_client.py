@@ -1,10 +1,12 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import io
 import os
-import boto3
+from collections import deque
 from typing import TYPE_CHECKING
 
+import boto3
 
 if TYPE_CHECKING:
     # mypy_boto3_* is a test-dependency only and not available at runtime
@@ -25,3 +27,119 @@ else:
 
 def get_s3_object_body(s3: S3Client, bucket: str, key: str) -> bytes:
     return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+# bytes fetched by each ranged GET of S3RangedFile, at least
+S3_READ_AHEAD = 4 * 1024 * 1024
+# blocks kept by S3RangedFile, so readers taking turns on neighbouring ranges don't fetch them again
+S3_CACHED_BLOCKS = 2
+
+
+class S3RangedFile(io.RawIOBase):
+    """Seekable, read-only file object over an S3 object, read with ranged GETs instead of downloading it whole.
+
+    A read fetches at least ``read_ahead`` bytes from where it starts and keeps them for the reads that follow, so
+    sequential reads take one GET per block. Reads within ``read_ahead`` of the end fetch the last block, which holds
+    the end records a reader like ``zipfile`` looks for first. Larger reads are fetched as they are, without caching.
+    The last ``cached_blocks`` blocks are kept, for the members ``zipfile`` reads from several threads in turn. The
+    file itself is not thread-safe, ``zipfile`` serializes the reads. The GETs are conditional on the ETag seen when
+    opening, so an object replaced meanwhile fails the read rather than mixing two versions.
+
+    :param s3: S3 client
+    :param bucket: Bucket of the object
+    :param key: Key of the object
+    :param read_ahead: Bytes fetched by each GET, at least
+    :param cached_blocks: Blocks kept for the reads that follow
+    """
+
+    def __init__(
+        self,
+        s3: S3Client,
+        bucket: str,
+        key: str,
+        read_ahead: int = S3_READ_AHEAD,
+        cached_blocks: int = S3_CACHED_BLOCKS,
+    ):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.read_ahead = read_ahead
+        head = s3.head_object(Bucket=bucket, Key=key)
+        self.size: int = head["ContentLength"]
+        self._etag: str | None = head.get("ETag")
+        self._position = 0
+        # (start, data) of the blocks kept, the most recent last
+        self._blocks: deque[tuple[int, bytes]] = deque(maxlen=cached_blocks)
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            # like a file on disk, zipfile relies on it when probing small archives
+            raise OSError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = max(0, self.size - self._position)
+        size = remaining if size is None or size < 0 else min(size, remaining)
+        chunks = []
+        while size > 0:
+            for block_start, block in self._blocks:
+                offset = self._position - block_start
+                if 0 <= offset < len(block):
+                    chunk = block[offset : offset + size]
+                    break
+            else:
+                if size < self.read_ahead:
+                    block_start = min(self._position, max(0, self.size - self.read_ahead))
+                    self._blocks.append((block_start, self._fetch(block_start, self.read_ahead)))
+                    continue
+                chunk = self._fetch(self._position, size)
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def close(self) -> None:
+        self._blocks.clear()
+        super().close()
+
+    def _fetch(self, start: int, length: int) -> bytes:
+        end = min(start + length, self.size) - 1
+        kwargs = {"IfMatch": self._etag} if self._etag else {}
+        response = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}", **kwargs)
+        data = response["Body"].read()
+        if len(data) != end - start + 1:
+            raise OSError(
+                f"Ranged GET of s3://{self.bucket}/{self.key} returned {len(data)} of {end - start + 1} bytes"
+            )
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
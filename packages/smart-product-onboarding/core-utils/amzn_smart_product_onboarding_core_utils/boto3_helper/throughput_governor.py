@@ -0,0 +1,297 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Account-wide pacing of Bedrock calls, shared by every Lambda function through a DynamoDB table.
+
+Each model ID has one item holding a requests per minute and a tokens per minute bucket. A call takes one request and
+its estimated tokens with a conditional write, so concurrent functions never spend the same capacity twice, and waits
+for the buckets to refill when they are short.
+
+Priority lanes share the buckets: the interactive lane may empty them, while the batch lanes must leave a reserve of
+capacity for the lanes above them. A small batch therefore runs alongside a large one instead of queueing behind it,
+and interactive requests find capacity even when both batches are running.
+
+``InMemoryBucketStore`` stands in for the table in tests and local runs.
+"""
+
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any
+
+import botocore.exceptions
+
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
+from amzn_smart_product_onboarding_core_utils.exceptions import RetryableError
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb import DynamoDBClient
+
+LANE_INTERACTIVE = "interactive"
+LANE_SMALL_BATCH = "small_batch"
+LANE_LARGE_BATCH = "large_batch"
+LANES = (LANE_INTERACTIVE, LANE_SMALL_BATCH, LANE_LARGE_BATCH)
+
+# share of each bucket a lane has to leave untouched for the lanes above it
+DEFAULT_LANE_RESERVES = {LANE_INTERACTIVE: 0.0, LANE_SMALL_BATCH: 0.2, LANE_LARGE_BATCH: 0.4}
+
+WINDOW_SECONDS = 60
+MAX_POLL_SECONDS = 5
+MAX_WRITE_ATTEMPTS = 10
+MAX_CONFLICT_BACKOFF_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class BucketState:
+    requests: float
+    tokens: float
+    updated: float
+    version: int = 0
+    # when a throttle last emptied the buckets
+    throttled: float = 0.0
+
+
+class BucketStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> BucketState | None: ...
+
+    @abstractmethod
+    def put(self, key: str, state: BucketState, expected_version: int | None) -> bool:
+        """Write *state* if the stored version is still *expected_version*, or if there is none when ``None``.
+
+        :return: Whether the write happened
+        """
+
+
+class InMemoryBucketStore(BucketStore):
+    def __init__(self):
+        self._items: dict[str, BucketState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> BucketState | None:
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, key: str, state: BucketState, expected_version: int | None) -> bool:
+        with self._lock:
+            current = self._items.get(key)
+            if (current.version if current else None) != expected_version:
+                return False
+            self._items[key] = state
+            return True
+
+
+class DynamoDBBucketStore(BucketStore):
+    """Buckets stored in a DynamoDB table with a string partition key ``pk``."""
+
+    def __init__(self, dynamodb_client: "DynamoDBClient", table_name: str):
+        self.dynamodb_client = dynamodb_client
+        self.table_name = table_name
+
+    def get(self, key: str) -> BucketState | None:
+        item = self.dynamodb_client.get_item(
+            TableName=self.table_name, Key={"pk": {"S": key}}, ConsistentRead=True
+        ).get("Item")
+        if item is None:
+            return None
+        return BucketState(
+            requests=float(item["requests"]["N"]),
+            tokens=float(item["tokens"]["N"]),
+            updated=float(item["updated"]["N"]),
+            version=int(item["version"]["N"]),
+            throttled=float(item.get("throttled", {"N": "0"})["N"]),
+        )
+
+    def put(self, key: str, state: BucketState, expected_version: int | None) -> bool:
+        condition: dict[str, Any] = (
+            {"ConditionExpression": "attribute_not_exists(pk)"}
+            if expected_version is None
+            else {
+                "ConditionExpression": "version = :expected",
+                "ExpressionAttributeValues": {":expected": {"N": str(expected_version)}},
+            }
+        )
+        try:
+            self.dynamodb_client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "pk": {"S": key},
+                    "requests": {"N": repr(state.requests)},
+                    "tokens": {"N": repr(state.tokens)},
+                    "updated": {"N": repr(state.updated)},
+                    "version": {"N": str(state.version)},
+                    "throttled": {"N": repr(state.throttled)},
+                },
+                **condition,
+            )
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+
+class ThroughputGovernor:
+    """Per model ID request and token buckets shared through a ``BucketStore``, with priority lanes.
+
+    It has the interface of ``AdaptiveRateLimiter``, so ``RateLimitedBedrockRuntime`` can be paced by either.
+
+    :param store: Where the buckets are kept
+    :param requests_per_minute: Request quota of each model ID
+    :param tokens_per_minute: Token quota of each model ID
+    :param lane: Lane of the calls, one of ``LANES``. Can be changed between calls.
+    :param limits: Quotas of specific model IDs, as ``(requests_per_minute, tokens_per_minute)``
+    """
+
+    def __init__(
+        self,
+        store: BucketStore,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        lane: str = LANE_LARGE_BATCH,
+        limits: Mapping[str, tuple[float, float]] | None = None,
+        lane_reserves: Mapping[str, float] = DEFAULT_LANE_RESERVES,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if lane not in lane_reserves:
+            raise ValueError(f"Unknown lane {lane}, expected one of {list(lane_reserves)}")
+        self.store = store
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.lane = lane
+        self.limits = dict(limits or {})
+        self.lane_reserves = lane_reserves
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counters: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._wait_seconds: defaultdict[str, float] = defaultdict(float)
+        self._max_wait_seconds: defaultdict[str, float] = defaultdict(float)
+
+    def now(self) -> float:
+        return self._clock()
+
+    def _limits(self, model_id: str) -> tuple[float, float]:
+        return self.limits.get(model_id, (self.requests_per_minute, self.tokens_per_minute))
+
+    def _refilled(self, model_id: str, state: BucketState | None, now: float) -> BucketState:
+        requests_per_minute, tokens_per_minute = self._limits(model_id)
+        if state is None:
+            return BucketState(requests=requests_per_minute, tokens=tokens_per_minute, updated=now, version=-1)
+        elapsed = max(0.0, now - state.updated) / WINDOW_SECONDS
+        return replace(
+            state,
+            requests=min(requests_per_minute, state.requests + elapsed * requests_per_minute),
+            tokens=min(tokens_per_minute, state.tokens + elapsed * tokens_per_minute),
+            updated=now,
+        )
+
+    def _update(self, model_id: str, change: Callable[[BucketState], BucketState | float]) -> float:
+        """Apply *change* to the refilled buckets with a conditional write, retrying on concurrent writes.
+
+        *change* returns the new state, or the seconds to wait when the buckets are short.
+        """
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            stored = self.store.get(model_id)
+            current = self._refilled(model_id, stored, self._clock())
+            changed = change(current)
+            if not isinstance(changed, BucketState):
+                return changed
+            expected_version = stored.version if stored is not None else None
+            if self.store.put(model_id, replace(changed, version=current.version + 1), expected_version):
+                return 0.0
+            with self._lock:
+                self._counters[model_id]["conflicts"] += 1
+            self._sleep(random.uniform(0, MAX_CONFLICT_BACKOFF_SECONDS))
+        raise RetryableError(f"Could not update the throughput buckets of {model_id}, too many concurrent writers")
+
+    def acquire(self, model_id: str, tokens: int, deadline: Deadline | None = None) -> float:
+        """Take one request and *tokens* for *model_id* in the governor's lane, sleeping until they are available.
+
+        :param deadline: Raise ``DeadlineExceeded`` instead of waiting when the call would no longer have time to run
+            after the buckets refill
+        :return: Seconds waited
+        """
+        requests_per_minute, tokens_per_minute = self._limits(model_id)
+        reserve = self.lane_reserves[self.lane]
+        request_floor = reserve * requests_per_minute
+        token_floor = reserve * tokens_per_minute
+        # a call larger than the lane's share of the bucket would never fit
+        tokens = min(tokens, tokens_per_minute - token_floor)
+
+        def take(state: BucketState) -> BucketState | float:
+            missing_requests = request_floor + 1 - state.requests
+            missing_tokens = token_floor + tokens - state.tokens
+            if missing_requests > 0 or missing_tokens > 0:
+                missing = max(missing_requests / requests_per_minute, missing_tokens / tokens_per_minute)
+                return missing * WINDOW_SECONDS
+            return replace(state, requests=state.requests - 1, tokens=state.tokens - tokens)
+
+        waited = 0.0
+        while (wait := self._update(model_id, take)) > 0:
+            if deadline is not None and wait + deadline.min_call_seconds > deadline.remaining():
+                with self._lock:
+                    self._counters[model_id]["deadline_exceeded"] += 1
+                deadline.check(f"governor wait for {model_id}", wait + deadline.min_call_seconds)
+            wait = min(wait, MAX_POLL_SECONDS)
+            self._sleep(wait)
+            waited += wait
+
+        with self._lock:
+            self._counters[model_id]["requests"] += 1
+            self._counters[model_id][f"requests_{self.lane}"] += 1
+            if waited > 0:
+                self._counters[model_id]["delayed"] += 1
+                self._wait_seconds[model_id] += waited
+                self._max_wait_seconds[model_id] = max(self._max_wait_seconds[model_id], waited)
+        if waited > 0:
+            logger.info({"governor_wait_ms": round(waited * 1000), "model_id": model_id, "lane": self.lane})
+        return waited
+
+    def record_usage(self, model_id: str, estimated_tokens: int, total_tokens: int) -> None:
+        """Take the tokens the call used beyond its estimate, or give back the ones it did not use.
+
+        Given back tokens do not fill the bucket past ``tokens_per_minute``, as a refill does not.
+        """
+        if total_tokens != estimated_tokens:
+            extra = total_tokens - estimated_tokens
+            _, tokens_per_minute = self._limits(model_id)
+            self._update(model_id, lambda state: replace(state, tokens=min(tokens_per_minute, state.tokens - extra)))
+
+    def record_throttle(self, model_id: str, sent_at: float | None = None) -> None:
+        """Empty the buckets of *model_id*, so every function backs off until they refill.
+
+        :param sent_at: ``now()`` when the throttled call was sent. Calls sent before the buckets were last emptied, by
+            any function, are counted without emptying them again.
+        """
+
+        def empty(state: BucketState) -> BucketState | float:
+            if sent_at is not None and sent_at < state.throttled:
+                return 0.0
+            return replace(
+                state, requests=min(state.requests, 0), tokens=min(state.tokens, 0), throttled=state.updated
+            )
+
+        self._update(model_id, empty)
+        with self._lock:
+            self._counters[model_id]["throttles"] += 1
+        logger.warning({"governor_throttled": model_id, "lane": self.lane})
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Wait-time, throttle and write conflict metrics of this process, per model ID."""
+        with self._lock:
+            return {
+                model_id: {
+                    **counters,
+                    "wait_ms": round(self._wait_seconds[model_id] * 1000),
+                    "max_wait_ms": round(self._max_wait_seconds[model_id] * 1000),
+                }
+                for model_id, counters in self._counters.items()
+            }
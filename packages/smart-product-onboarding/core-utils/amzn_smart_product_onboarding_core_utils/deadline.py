@@ -0,0 +1,140 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+The time left to an invocation, so that its retries and waits stop before the Lambda timeout does.
+
+A timed out invocation loses its work and is retried by Step Functions anyway, after paying for the whole timeout. With
+a deadline, a call is not started, a retry not waited for and a response not awaited past the time left: the
+invocation fails fast with ``DeadlineExceeded``, a retryable error, instead.
+
+The components take an optional deadline, ``None`` leaves them unbounded, e.g. in local runs without a Lambda context.
+A call made with ``Deadline.call`` can read its deadline with ``current_deadline``, so that the waits of the Bedrock
+rate limiters inside it give up in time too, instead of sending a request whose result is no longer awaited.
+"""
+
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+from tenacity import RetryCallState
+
+from amzn_smart_product_onboarding_core_utils.exceptions import DeadlineExceeded
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+T = TypeVar("T")
+
+# kept back from the Lambda timeout to log and return the error
+DEFAULT_RESERVE_SECONDS = 2.0
+# a model call is not started, or retried, with less time left than this
+DEFAULT_MIN_CALL_SECONDS = 5.0
+
+# botocore fixes the read timeout of a client when it is created, calls bounded by a deadline are awaited from here
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="deadline")
+_current_deadline: ContextVar["Deadline | None"] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> "Deadline | None":
+    """Deadline of the ``Deadline.call`` running in this thread, ``None`` outside one."""
+    return _current_deadline.get()
+
+
+class Deadline:
+    """Point in time after which an invocation's work is lost.
+
+    :param expires_at: Time of the deadline on the *clock*
+    :param min_call_seconds: Least time left to start or retry a call
+    :param clock: Monotonic clock in seconds
+    """
+
+    def __init__(
+        self,
+        expires_at: float,
+        min_call_seconds: float = DEFAULT_MIN_CALL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.expires_at = expires_at
+        self.min_call_seconds = min_call_seconds
+        self._clock = clock
+
+    @classmethod
+    def after(cls, seconds: float, clock: Callable[[], float] = time.monotonic, **kwargs) -> "Deadline":
+        return cls(clock() + seconds, clock=clock, **kwargs)
+
+    @classmethod
+    def from_context(
+        cls, context: Any, reserve_seconds: float = DEFAULT_RESERVE_SECONDS, **kwargs
+    ) -> "Deadline | None":
+        """Deadline of a Lambda invocation, *reserve_seconds* before its timeout, or ``None`` without a context."""
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return None
+        return cls.after(context.get_remaining_time_in_millis() / 1000 - reserve_seconds, **kwargs)
+
+    def remaining(self) -> float:
+        """Seconds left, negative once the deadline has passed."""
+        return self.expires_at - self._clock()
+
+    def check(self, operation: str, needed: float | None = None) -> None:
+        """Raise ``DeadlineExceeded`` if fewer than *needed* seconds, by default ``min_call_seconds``, are left."""
+        needed = self.min_call_seconds if needed is None else needed
+        remaining = self.remaining()
+        if remaining < needed:
+            logger.warning({"deadline_exceeded": operation, "remaining_s": round(remaining, 3), "needed_s": needed})
+            raise DeadlineExceeded(f"{operation} needs {needed}s, {max(remaining, 0):.1f}s left")
+
+    def call(self, operation: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call *func* if there is time for it and stop waiting for its result at the deadline.
+
+        The call itself cannot be interrupted, it finishes in the background and its result is dropped. It reads the
+        deadline with ``current_deadline`` to stop waiting for a rate limiter, or not start at all, once it is too late.
+        """
+        self.check(operation)
+        future = _executor.submit(self._run, operation, func, args, kwargs)
+        try:
+            return future.result(timeout=self.remaining())
+        except FutureTimeoutError:
+            logger.warning({"deadline_exceeded": operation, "remaining_s": 0})
+            raise DeadlineExceeded(f"{operation} did not respond before the deadline") from None
+
+    def _run(self, operation: str, func: Callable[..., T], args: tuple, kwargs: dict[str, Any]) -> T:
+        # the call may have queued for a worker until it no longer has time to run
+        self.check(operation)
+        token = _current_deadline.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_deadline.reset(token)
+
+
+def call_within(deadline: Deadline | None, operation: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """``deadline.call`` that calls *func* directly without a deadline."""
+    if deadline is None:
+        return func(*args, **kwargs)
+    return deadline.call(operation, func, *args, **kwargs)
+
+
+def _deadline_of(retry_state: RetryCallState) -> Deadline | None:
+    # functions take the deadline as an argument, methods read the deadline of their instance
+    deadline = retry_state.kwargs.get("deadline")
+    if deadline is None and retry_state.args:
+        deadline = getattr(retry_state.args[0], "deadline", None)
+    return deadline if isinstance(deadline, Deadline) else None
+
+
+def stop_at_deadline(retry_state: RetryCallState) -> bool:
+    """tenacity stop raising ``DeadlineExceeded`` when the next attempt would start too close to the deadline.
+
+    The deadline is the ``deadline`` keyword argument of the retried function, or the ``deadline`` attribute of the
+    instance of a retried method. Combine with an attempt limit, e.g. ``stop_after_attempt(3) | stop_at_deadline``.
+    """
+    deadline = _deadline_of(retry_state)
+    if deadline is None:
+        return False
+    try:
+        deadline.check(f"retry of {retry_state.fn.__name__}", deadline.min_call_seconds + retry_state.upcoming_sleep)
+    except DeadlineExceeded as e:
+        raise e from retry_state.outcome.exception()
+    return False
@@ -9,6 +9,10 @@ class RateLimitError(Exception):
     pass
 
 
+class DeadlineExceeded(RetryableError):
+    """The invocation has too little time left to finish, raised before it is timed out and its work lost."""
+
+
 class ModelResponseError(RetryableError):
     pass
 
@@ -0,0 +1,145 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Extract enumerated attribute values that appear verbatim in a product's text, without a model call.
+
+Many attributes of the GS1 GPC schema have small closed value sets (colours, materials, sizes) whose values are
+often written as is in the title or description. ``AttributeLexicon`` indexes the values of a category's enumerated
+attributes in an Aho-Corasick automaton, so a product's text is scanned once for all of them, and keeps the
+attributes that matched exactly one value. Only unambiguous matches are kept:
+
+- values listed by more than one attribute, or generic like "Other" or "Unclassified", are not indexed
+- a match must start and end on a word boundary, and a match inside a longer one is dropped ("navy" in "navy blue")
+- an attribute with matches of two or more values is left to the model
+"""
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+
+GENERIC_VALUES = {
+    "yes",
+    "no",
+    "other",
+    "others",
+    "unclassified",
+    "unidentified",
+    "unknown",
+    "not applicable",
+    "not specified",
+    "none",
+    "null",
+}
+# shorter values (single letters, e.g. clothing sizes) match too much prose
+MIN_VALUE_LENGTH = 2
+
+
+class AhoCorasick:
+    """Find every occurrence of a set of patterns in one pass over the text.
+
+    :param patterns: Patterns to find, matched case-sensitively
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        if pattern and pattern not in self._output[state]:
+            self._output[state].append(pattern)
+
+    def _link(self) -> None:
+        """Set the failure links breadth first, each state also outputs the patterns of its failure state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> Iterator[tuple[int, int, str]]:
+        """Yield ``(start, end, pattern)`` of every occurrence, overlapping ones included, by end position."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield position + 1 - len(pattern), position + 1, pattern
+
+
+def _at_boundary(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class AttributeLexicon:
+    """Index of the enumerated values of a category's attribute schema.
+
+    :param attributes_schema: Attribute schema of the category, attributes with a ``Title`` and their values as
+        ``Childs``
+    """
+
+    def __init__(self, attributes_schema: list[dict]):
+        owners: dict[str, set[str]] = {}
+        titles: dict[tuple[str, str], str] = {}
+        for attribute in attributes_schema:
+            if "Title" not in attribute:
+                continue
+            for child in attribute.get("Childs") or []:
+                value = child.get("Title", "").strip().lower()
+                if len(value) < MIN_VALUE_LENGTH or value in GENERIC_VALUES:
+                    continue
+                owners.setdefault(value, set()).add(attribute["Title"])
+                titles.setdefault((attribute["Title"], value), child["Title"])
+
+        # value -> (attribute title, value title), for the values only one attribute lists
+        self.values = {
+            value: (attribute, titles[attribute, value])
+            for value, attributes in owners.items()
+            if len(attributes) == 1
+            for attribute in attributes
+        }
+        self._automaton = AhoCorasick(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def match(self, text: str) -> dict[str, str]:
+        """Attribute titles mapped to the value title they unambiguously matched in *text*, in order of appearance."""
+        text = text.lower()
+        matches = sorted(
+            (
+                (start, end, value)
+                for start, end, value in self._automaton.find(text)
+                if _at_boundary(text, start, end)
+            ),
+            key=lambda match: (match[0], -match[1]),
+        )
+
+        found: dict[str, set[str]] = {}
+        covered_until = 0
+        for _start, end, value in matches:
+            # sorted by start then longest first, so a match ending within the previous one is inside it
+            if end <= covered_until:
+                continue
+            covered_until = end
+            attribute, title = self.values[value]
+            found.setdefault(attribute, set()).add(title)
+
+        return {attribute: titles.pop() for attribute, titles in found.items() if len(titles) == 1}
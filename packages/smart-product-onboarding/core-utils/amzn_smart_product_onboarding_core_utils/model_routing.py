@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Weighted routing of a component's requests across several models, with latency, token and error counters per model.
+
+The routes come from the component's AppConfig settings, so traffic can be shifted between models or inference
+profiles without a deployment. Without routes every request goes to the configured ``modelId``.
+"""
+
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Any
+
+from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigSettings
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+
+class UsageMeter:
+    """Bedrock Runtime client wrapper adding up the tokens of the ``converse`` and ``converse_stream`` calls."""
+
+    def __init__(self, client):
+        self.client = client
+        self.input_tokens = 0
+        self.output_tokens = 0
+        # the calls of one request can run concurrently, e.g. the partitions of an attribute extraction
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _add(self, usage: dict | None) -> None:
+        if usage:
+            with self._lock:
+                self.input_tokens += usage.get("inputTokens", 0)
+                self.output_tokens += usage.get("outputTokens", 0)
+
+    def converse(self, **kwargs):
+        response = self.client.converse(**kwargs)
+        self._add(response.get("usage"))
+        return response
+
+    def converse_stream(self, **kwargs):
+        response = self.client.converse_stream(**kwargs)
+        return {**response, "stream": self._metered(response["stream"])}
+
+    def _metered(self, stream) -> Iterator[dict]:
+        for event in stream:
+            if "metadata" in event:
+                self._add(event["metadata"].get("usage"))
+            yield event
+
+
+class ModelRouter:
+    """Pick a route for each request and count requests, errors, latency and tokens per model ID.
+
+    :param name: Component name used in the logs
+    :param seed: Seed of the route choice, for reproducible tests
+    """
+
+    def __init__(self, name: str, seed: int | None = None):
+        self.name = name
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._max_latency_ms: defaultdict[str, int] = defaultdict(int)
+
+    def choose(self, settings: AppConfigSettings) -> AppConfigSettings:
+        """Return *settings* with the model ID and temperature of a route picked by weight, if there are routes."""
+        routes = [route for route in settings.routes if route.weight > 0]
+        if not routes:
+            return settings
+        with self._lock:
+            route = self.random.choices(routes, weights=[route.weight for route in routes])[0]
+        return replace(settings, model_id=route.model_id, temperature=route.temperature)
+
+    @contextmanager
+    def track(self, model_id: str, meter: UsageMeter | None = None) -> Iterator[None]:
+        """Count the request made in the block against *model_id*, with the tokens *meter* adds up meanwhile.
+
+        The meter must not be shared with requests running concurrently, as in a Lambda execution environment.
+        """
+        started = time.perf_counter()
+        input_tokens, output_tokens = (meter.input_tokens, meter.output_tokens) if meter else (0, 0)
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            latency_ms = round((time.perf_counter() - started) * 1000)
+            with self._lock:
+                counters = self._counters[model_id]
+                counters["requests"] += 1
+                counters["latency_ms"] += latency_ms
+                if meter:
+                    counters["input_tokens"] += meter.input_tokens - input_tokens
+                    counters["output_tokens"] += meter.output_tokens - output_tokens
+                if error:
+                    counters["errors"] += 1
+                    counters[f"errors_{error}"] += 1
+                self._max_latency_ms[model_id] = max(self._max_latency_ms[model_id], latency_ms)
+            logger.info({"route": self.name, "model_id": model_id, "latency_ms": latency_ms, "error": error})
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Requests, error rate, latency and tokens of this process, per model ID."""
+        with self._lock:
+            return {
+                model_id: {
+                    **counters,
+                    "error_rate": counters["errors"] / counters["requests"],
+                    "avg_latency_ms": round(counters["latency_ms"] / counters["requests"]),
+                    "max_latency_ms": self._max_latency_ms[model_id],
+                }
+                for model_id, counters in self._counters.items()
+            }
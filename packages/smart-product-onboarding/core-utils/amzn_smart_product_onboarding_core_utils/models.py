@@ -3,7 +3,10 @@
 
 from typing import Optional, TypedDict, Type
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from amzn_smart_product_onboarding_core_utils.json_to_xml import json_to_compact_xml
+from amzn_smart_product_onboarding_core_utils.lexicon import AttributeLexicon
 
 
 def create_typed_dict_from_model[T: BaseModel](model: type[T]) -> type[TypedDict]:
@@ -56,6 +59,50 @@ class CategorySchema(BaseModel):
     subcategory_name: str
     attributes_schema: Optional[list[dict]] = None
 
+    _attributes_schema_xml: Optional[str] = PrivateAttr(default=None)
+    _partitions: dict[int, list["CategorySchema"]] = PrivateAttr(default_factory=dict)
+    _lexicon: Optional[AttributeLexicon] = PrivateAttr(default=None)
+
+    @property
+    def attributes_schema_xml(self) -> str:
+        """The attribute schema as compact XML for the extraction prompt, rendered once per schema."""
+        if self._attributes_schema_xml is None:
+            self._attributes_schema_xml = json_to_compact_xml(self.attributes_schema or [])
+        return self._attributes_schema_xml
+
+    def partitions(self, size: int) -> list["CategorySchema"]:
+        """The schema split into schemas of at most *size* attributes, in schema order, kept once split."""
+        attributes = self.attributes_schema or []
+        if len(attributes) <= size:
+            return [self]
+        if size not in self._partitions:
+            self._partitions[size] = [
+                CategorySchema(
+                    category_name=self.category_name,
+                    subcategory_name=self.subcategory_name,
+                    attributes_schema=attributes[start : start + size],
+                )
+                for start in range(0, len(attributes), size)
+            ]
+        return self._partitions[size]
+
+    @property
+    def lexicon(self) -> AttributeLexicon:
+        """Index of the enumerated attribute values, built once per schema."""
+        if self._lexicon is None:
+            self._lexicon = AttributeLexicon(self.attributes_schema or [])
+        return self._lexicon
+
+    def without(self, titles: set[str]) -> "CategorySchema":
+        """The schema without the attributes titled *titles*."""
+        return CategorySchema(
+            category_name=self.category_name,
+            subcategory_name=self.subcategory_name,
+            attributes_schema=[
+                attribute for attribute in self.attributes_schema or [] if attribute.get("Title") not in titles
+            ],
+        )
+
 
 class Attribute(BaseModel):
     name: str
@@ -64,6 +111,7 @@ class Attribute(BaseModel):
 
 class Attributes(BaseModel):
     attributes: list[Attribute]
+    confidence: Optional[float] = Field(default=None, ge=0, le=1, description="Self-reported confidence")
 
 
 # Schemas
@@ -72,6 +120,7 @@ class ProductReadyForMetaclass(BaseModel):
 
     product: Product = Field(..., description="Product to classify")
     demo: Optional[bool] = Field(description="Demo mode", default=False)
+    lane: Optional[str] = Field(default=None, description="Throughput lane of the batch, see throughput_governor")
 
 
 class MetaclassPrediction(BaseModel):
@@ -89,6 +138,7 @@ class ProductReadyForCategorization(BaseModel):
     metaclass: MetaclassPrediction = Field(..., description="Metaclass prediction")
     demo: Optional[bool] = Field(description="Demo mode", default=False)
     dryrun: Optional[bool] = Field(default=False, description="Dryrun mode")
+    lane: Optional[str] = Field(default=None, description="Throughput lane of the batch, see throughput_governor")
 
 
 class CategorizationPrediction(BaseModel):
@@ -98,11 +148,13 @@ class CategorizationPrediction(BaseModel):
     predicted_category_name: str = Field(..., description="Predicted category name")
     explanation: str = Field(..., description="Explanation for category selection")
     prompt: Optional[str] = Field(description="Prompt used for categorization", default=None)
+    confidence: Optional[float] = Field(default=None, ge=0, le=1, description="Self-reported confidence")
 
 
 class ExtractAttributesRequest(BaseModel):
     product: Product
     category: CategorizationPrediction
+    lane: Optional[str] = Field(default=None, description="Throughput lane of the batch, see throughput_governor")
 
 
 class ExtractAttributesResponse(BaseModel):
@@ -0,0 +1,147 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Latency of the stages of the pipeline, so that a product's time can be split between them.
+
+Each stage is timed into a Powertools Tracer subsegment, annotated with the stage and model ID, and into the
+``StageLatency`` EMF metric with ``Stage`` and ``ModelId`` dimensions. The metric keeps every value, so CloudWatch
+serves its p50, p95 and p99. Outside Lambda, or without Powertools, the stages are only timed in memory: ``summary``
+still reports them, e.g. for local runs and benchmarks.
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+STAGE_REPHRASE = "rephrase"
+STAGE_SINGULARIZE = "singularize"
+STAGE_VECTOR_CACHE = "vector_cache"
+STAGE_VECTOR_DYNAMODB = "vector_dynamodb"
+STAGE_FAISS_SEARCH = "faiss_search"
+STAGE_PROMPT_RENDER = "prompt_render"
+STAGE_CONVERSE = "converse"
+STAGE_XML_PARSE = "xml_parse"
+STAGE_SCHEMA_LOAD = "schema_load"
+STAGE_LEXICON = "lexicon"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DEFAULT_NAMESPACE = "SmartProductOnboarding"
+LATENCY_METRIC = "StageLatency"
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Nearest-rank percentile of *values*, *share* between 0 and 1."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class StageTimer:
+    """Time the stages of an invocation and publish them with ``flush``.
+
+    :param namespace: EMF namespace, ``POWERTOOLS_METRICS_NAMESPACE`` when set
+    :param enabled: Publish spans and metrics through Powertools. Defaults to running in Lambda.
+    """
+
+    def __init__(
+        self,
+        namespace: str | None = None,
+        enabled: bool | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.namespace = namespace or os.getenv("POWERTOOLS_METRICS_NAMESPACE", DEFAULT_NAMESPACE)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._latencies: defaultdict[tuple[str, str | None], list[float]] = defaultdict(list)
+        self._tracer = None
+        self._metrics = None
+        if enabled if enabled is not None else bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME")):
+            try:
+                from aws_lambda_powertools import Tracer
+                from aws_lambda_powertools.metrics import EphemeralMetrics
+            except ImportError:
+                logger.warning("aws_lambda_powertools is not installed, stages are only timed in memory")
+            else:
+                self._tracer = Tracer()
+                self._metrics = EphemeralMetrics(namespace=self.namespace)
+
+    @property
+    def enabled(self) -> bool:
+        return self._metrics is not None
+
+    @contextmanager
+    def stage(self, name: str, model_id: str | None = None) -> Iterator[None]:
+        """Time the body as stage *name*, of the model *model_id* for the stages calling one."""
+        started = self._clock()
+        try:
+            if self._tracer is None:
+                yield
+            else:
+                with self._tracer.provider.in_subsegment(name=f"## {name}") as subsegment:
+                    subsegment.put_annotation(key="stage", value=name)
+                    if model_id:
+                        subsegment.put_annotation(key="model_id", value=model_id)
+                    yield
+        finally:
+            latency_ms = (self._clock() - started) * 1000
+            with self._lock:
+                self._latencies[(name, model_id)].append(latency_ms)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Count and p50, p95 and p99 latency in milliseconds of each stage since the last flush."""
+        by_stage: defaultdict[str, list[float]] = defaultdict(list)
+        with self._lock:
+            for (name, _), latencies in self._latencies.items():
+                by_stage[name] += latencies
+        return {
+            name: {
+                "count": len(latencies),
+                "total_ms": round(sum(latencies), 3),
+                **{f"p{p}_ms": round(percentile(latencies, p / 100), 3) for p in (50, 95, 99)},
+            }
+            for name, latencies in by_stage.items()
+        }
+
+    def flush(self) -> dict[str, dict[str, Any]]:
+        """Log the summary, publish the latencies as EMF metrics and start over. Returns the summary."""
+        summary = self.summary()
+        with self._lock:
+            latencies, self._latencies = self._latencies, defaultdict(list)
+        if summary:
+            logger.info({"stage_latency": summary})
+        if self._metrics is not None:
+            from aws_lambda_powertools.metrics import MetricUnit
+
+            for (name, model_id), values in latencies.items():
+                self._metrics.add_dimension(name="Stage", value=name)
+                if model_id:
+                    self._metrics.add_dimension(name="ModelId", value=model_id)
+                for value in values:
+                    self._metrics.add_metric(name=LATENCY_METRIC, unit=MetricUnit.Milliseconds, value=value)
+                self._metrics.flush_metrics()
+        return summary
+
+    def flush_after(self, handler: F) -> F:
+        """Decorate a Lambda handler to flush after each invocation, including the failed ones."""
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self.flush()
+
+        return wrapper
+
+
+# shared by the components of a function, flushed by its handler after each invocation
+STAGE_TIMER = StageTimer()
@@ -0,0 +1,69 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Structured output through Converse tool use.
+
+Instead of prefilling an XML opener and parsing the text, the model is forced to call a single tool whose input
+schema is derived from a pydantic model. The tool input arrives as JSON and can be validated directly.
+"""
+
+from collections.abc import Collection
+from typing import Any
+
+from pydantic import BaseModel
+
+from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.logger import logger
+
+OUTPUT_MODE_XML = "xml"
+OUTPUT_MODE_TOOL = "tool"
+OUTPUT_MODES = (OUTPUT_MODE_XML, OUTPUT_MODE_TOOL)
+
+
+def tool_input_schema(model: type[BaseModel], exclude: Collection[str] = ()) -> dict[str, Any]:
+    """JSON schema of *model* without the *exclude* fields, for use as a tool ``inputSchema``."""
+    schema = model.model_json_schema()
+    for field in exclude:
+        schema.get("properties", {}).pop(field, None)
+        if field in schema.get("required", []):
+            schema["required"].remove(field)
+    return schema
+
+
+def tool_config(
+    model: type[BaseModel],
+    name: str,
+    description: str,
+    exclude: Collection[str] = (),
+) -> dict[str, Any]:
+    """Converse ``toolConfig`` with one tool for *model* that the model is required to call."""
+    return {
+        "tools": [
+            {
+                "toolSpec": {
+                    "name": name,
+                    "description": description,
+                    "inputSchema": {"json": tool_input_schema(model, exclude)},
+                }
+            }
+        ],
+        "toolChoice": {"tool": {"name": name}},
+    }
+
+
+def extract_tool_use(response: dict, name: str) -> dict[str, Any]:
+    """Return the ``toolUse`` block for tool *name* from a Converse response."""
+    try:
+        content = response["output"]["message"]["content"]
+    except KeyError as e:
+        logger.error(f"Failed to get tool use from response: {response}")
+        raise ModelResponseError("Failed to get tool use from response") from e
+
+    for block in content:
+        tool_use = block.get("toolUse")
+        if tool_use and tool_use.get("name") == name:
+            return tool_use
+
+    logger.error({"stopReason": response.get("stopReason"), "content": content, "tool": name})
+    raise ModelResponseError(f"Model did not call the {name} tool")
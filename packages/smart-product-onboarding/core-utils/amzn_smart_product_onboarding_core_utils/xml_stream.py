@@ -0,0 +1,222 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Single-pass, incremental parser for the XML responses of the models.
+
+``XmlStreamParser`` is fed the response in chunks, e.g. the deltas of ``converse_stream``, and builds the same nested
+dicts and lists as ``xml_output.parse_response``:
+
+- an element without child elements is its text, ``""`` when empty
+- an element with child elements is a dict of them, its own text is dropped
+- a child element that repeats becomes a list
+- top-level elements are returned as a dict, without the synthetic root ``parse_response`` wraps them in
+
+The content of ``cdata_tags`` is kept as is up to the closing tag, like ``parse_response`` does by wrapping it in
+CDATA. Everything else is scanned once, one compiled pattern finding the markup from one match to the next, and each
+element's value is added to its parent as it closes, instead of a regex pass per CDATA tag, an lxml parse that may be
+repeated with a synthetic root, and a walk of the resulting tree.
+
+Unlike ``parse_response``, which raises ``ValueError`` on malformed XML, the parser is lenient with what the models
+write: a ``<`` that does not start a tag, a bare ``&`` and an unknown entity are kept as text. A closing tag closes the
+elements left open inside it, and a stray closing tag is ignored. At ``close`` the elements still open are closed and
+an incomplete tag is dropped, so a truncated response still yields what it holds. With ``stop_after``, ``feed``
+returns ``True`` once all those elements have closed, and the rest of the response is ignored.
+"""
+
+import re
+from collections.abc import Collection, Iterable
+from typing import Any
+
+# a tag, a CDATA section, a comment, a processing instruction or a declaration, or the start of a CDATA section, a
+# comment or a processing instruction whose end has not arrived yet
+_MARKUP = re.compile(
+    r"<(/?)([A-Za-z_][\w.:-]*)(\s[^<>]*?)?(/?)>"
+    r"|<!\[CDATA\[(.*?)\]\]>"
+    r"|<!--.*?-->"
+    r"|<\?.*?\?>"
+    r"|<!(?!\[CDATA\[|--)[^<>]*>"
+    r"|(<!\[CDATA\[|<!--|<\?)",
+    re.DOTALL,
+)
+# what may start markup that has not fully arrived yet
+_MARKUP_START = re.compile(r"<(?:[/!?A-Za-z_]|$)")
+_ENTITY = re.compile(r"&(#x[0-9a-fA-F]+|#[0-9]+|lt|gt|amp|quot|apos);")
+_ENTITIES = {"lt": "<", "gt": ">", "amp": "&", "quot": '"', "apos": "'"}
+# an entity split across chunks is held back until its ";" arrives
+_MAX_ENTITY_LENGTH = 12
+
+# an open element: its tag, its text and the values of its closed child elements
+_TAG, _TEXT, _CHILDREN = range(3)
+
+
+def _unescape(text: str) -> str:
+    if "&" not in text:
+        return text
+
+    def replace(match: re.Match) -> str:
+        entity = match.group(1)
+        if entity[0] != "#":
+            return _ENTITIES[entity]
+        return chr(int(entity[2:], 16) if entity[1] in "xX" else int(entity[1:]))
+
+    return _ENTITY.sub(replace, text)
+
+
+class XmlStreamParser:
+    """Parse an XML response fed in chunks into nested dicts and lists.
+
+    :param cdata_tags: Tags with content that may contain XML tags that shouldn't get parsed
+    :param stop_after: Tags after whose closing the rest of the response is not needed
+    """
+
+    def __init__(self, cdata_tags: Collection[str] | None = None, stop_after: Collection[str] | None = None):
+        self.cdata_tags = set(cdata_tags or ())
+        self.pending_tags = set(stop_after or ())
+        self.stopping = bool(self.pending_tags)
+        self.done = False
+        self.fed_chars = 0
+        self._watched_chars = 0
+        self._root: list = [None, [], None]
+        self._stack = [self._root]
+        self._buffer = ""
+        self._raw_tag: str | None = None
+
+    def feed(self, chunk: str) -> bool:
+        """Parse *chunk*, and return whether the elements of ``stop_after`` have all closed."""
+        if self.done:
+            return True
+        self.fed_chars += len(chunk)
+        buffer = self._buffer + chunk
+        self._buffer = "" if self.done else buffer[self._parse(buffer) :]
+        return self.done
+
+    def watch(self, text: str) -> bool:
+        """Feed the part of *text* not watched yet, as ``converse_stream_until`` passes the text received so far.
+
+        A prefill of the response, which is not part of that text, is fed with ``feed`` before the stream starts.
+        """
+        chunk = text[self._watched_chars :]
+        self._watched_chars = len(text)
+        return self.feed(chunk)
+
+    def close(self) -> dict[str, Any] | str:
+        """Close the elements left open and return the parsed response."""
+        if not self.done:
+            buffer = self._buffer
+            if self._raw_tag is None:
+                # the last tag was cut off
+                match = _MARKUP_START.search(buffer)
+                buffer = _unescape(buffer[: match.start()] if match else buffer)
+            self._stack[-1][_TEXT].append(buffer)
+            self._buffer = ""
+            self.done = True
+        while len(self._stack) > 1:
+            self._close_top()
+        if self._root[_CHILDREN] is None:
+            return "".join(self._root[_TEXT])
+        return self._root[_CHILDREN]
+
+    def _parse(self, buffer: str) -> int:
+        """Parse as much of *buffer* as is complete and return the characters consumed."""
+        position = 0
+        if self._raw_tag is not None:
+            position = self._raw(buffer, position)
+            if self._raw_tag is not None:
+                return position
+
+        search = _MARKUP.search
+        while not self.done:
+            match = search(buffer, position)
+            if match is None:
+                break
+            start = match.start()
+            if start > position:
+                self._stack[-1][_TEXT].append(_unescape(buffer[position:start]))
+            closing, tag, attributes, self_closing, cdata, unfinished = match.groups()
+            if unfinished:
+                return start
+            position = match.end()
+
+            if tag is None:
+                if cdata:
+                    self._stack[-1][_TEXT].append(cdata)
+            elif closing:
+                self._close(tag)
+            else:
+                self._stack.append([tag, [], None])
+                if self_closing:
+                    self._close(tag)
+                elif tag in self.cdata_tags and not attributes:
+                    self._raw_tag = tag
+                    position = self._raw(buffer, position)
+                    if self._raw_tag is not None:
+                        return position
+        if self.done:
+            return len(buffer)
+
+        # keep back markup and an entity that have not fully arrived
+        end = len(buffer)
+        match = _MARKUP_START.search(buffer, position)
+        if match:
+            end = match.start()
+        ampersand = buffer.rfind("&", position, end)
+        if ampersand != -1 and end - ampersand < _MAX_ENTITY_LENGTH and ";" not in buffer[ampersand:end]:
+            end = ampersand
+        if end > position:
+            self._stack[-1][_TEXT].append(_unescape(buffer[position:end]))
+        return end
+
+    def _raw(self, buffer: str, position: int) -> int:
+        """Take the content of the open CDATA tag as is, up to its closing tag or what may be its start."""
+        closing = f"</{self._raw_tag}>"
+        end = buffer.find(closing, position)
+        if end == -1:
+            safe = max(position, len(buffer) - len(closing) + 1)
+            self._stack[-1][_TEXT].append(buffer[position:safe])
+            return safe
+        self._stack[-1][_TEXT].append(buffer[position:end])
+        self._close(self._raw_tag)
+        self._raw_tag = None
+        return end + len(closing)
+
+    def _close(self, tag: str) -> None:
+        # a closing tag closes the elements left open inside it, a stray one is ignored
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth][_TAG] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > depth:
+            self._close_top()
+        if self.stopping and tag in self.pending_tags:
+            self.pending_tags.discard(tag)
+            self.done = not self.pending_tags
+
+    def _close_top(self) -> None:
+        tag, text, children = self._stack.pop()
+        # the text of an element with child elements is dropped, like parse_response does
+        value = children if children is not None else "".join(text)
+        parent = self._stack[-1]
+        siblings = parent[_CHILDREN]
+        if siblings is None:
+            parent[_CHILDREN] = {tag: value}
+        elif tag not in siblings:
+            siblings[tag] = value
+        elif isinstance(siblings[tag], list):
+            siblings[tag].append(value)
+        else:
+            siblings[tag] = [siblings[tag], value]
+
+
+def parse_xml_stream(
+    chunks: Iterable[str],
+    cdata_tags: Collection[str] | None = None,
+    stop_after: Collection[str] | None = None,
+) -> dict[str, Any] | str:
+    """Parse the XML response in *chunks*, reading no further than needed for ``stop_after``."""
+    parser = XmlStreamParser(cdata_tags=cdata_tags, stop_after=stop_after)
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser.close()
@@ -16,6 +16,8 @@ from botocore.exceptions import ClientError
 from amzn_smart_product_onboarding_core_utils.appconfig_client import (
     AppConfigClient,
     AppConfigSettings,
+    CascadeTier,
+    ModelRoute,
 )
 
 APP_ID = "test-app-id"
@@ -82,6 +84,86 @@ class TestSuccessfulRetrieval:
             assert result.model_id == expected["modelId"]
             assert result.temperature == expected["temperature"]
 
+    def test_output_mode_defaults_to_xml_and_is_read_when_set(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        config = {**VALID_CONFIG, "attributeExtraction": {**VALID_CONFIG["attributeExtraction"], "outputMode": "tool"}}
+
+        results = {}
+        for key in ("productCategorization", "attributeExtraction"):
+            mock_boto3_client.get_latest_configuration.return_value = {
+                "NextPollConfigurationToken": "next-token",
+                "Configuration": _make_stream(json.dumps(config).encode()),
+            }
+            results[key] = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID).get_configuration(key)
+
+        assert results["productCategorization"].output_mode == "xml"
+        assert results["attributeExtraction"].output_mode == "tool"
+
+    def test_cascade_tiers_come_before_the_component_model(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        cascade = [{"modelId": "us.amazon.nova-micro-v1:0", "minConfidence": 0.8, "requireAgreement": True}]
+        categorization = {**VALID_CONFIG["productCategorization"], "cascade": cascade}
+        config = {**VALID_CONFIG, "productCategorization": categorization}
+        mock_boto3_client.get_latest_configuration.return_value = {
+            "NextPollConfigurationToken": "next-token",
+            "Configuration": _make_stream(json.dumps(config).encode()),
+        }
+
+        result = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID).get_configuration("productCategorization")
+
+        assert result.tiers == [
+            CascadeTier(model_id="us.amazon.nova-micro-v1:0", min_confidence=0.8, require_agreement=True),
+            CascadeTier(model_id="us.anthropic.claude-3-haiku-20240307-v1:0", temperature=0),
+        ]
+
+    def test_routes_are_read_with_default_temperature(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        routes = [{"modelId": "a", "weight": 3}, {"modelId": "b", "temperature": 0.2, "weight": 1}]
+        extraction = {**VALID_CONFIG["attributeExtraction"], "routes": routes}
+        mock_boto3_client.get_latest_configuration.return_value = {
+            "NextPollConfigurationToken": "next-token",
+            "Configuration": _make_stream(json.dumps({**VALID_CONFIG, "attributeExtraction": extraction}).encode()),
+        }
+
+        result = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID).get_configuration("attributeExtraction")
+
+        assert result.routes == [ModelRoute("a", 0, 3), ModelRoute("b", 0.2, 1)]
+
+    def test_partition_size_is_read_when_set(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        extraction = {**VALID_CONFIG["attributeExtraction"], "partitionSize": 10}
+        mock_boto3_client.get_latest_configuration.return_value = {
+            "NextPollConfigurationToken": "next-token",
+            "Configuration": _make_stream(json.dumps({**VALID_CONFIG, "attributeExtraction": extraction}).encode()),
+        }
+
+        result = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID).get_configuration("attributeExtraction")
+
+        assert result.partition_size == 10
+
+    def test_lexicon_is_read_when_set(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        extraction = {**VALID_CONFIG["attributeExtraction"], "lexicon": True}
+        mock_boto3_client.get_latest_configuration.return_value = {
+            "NextPollConfigurationToken": "next-token",
+            "Configuration": _make_stream(json.dumps({**VALID_CONFIG, "attributeExtraction": extraction}).encode()),
+        }
+
+        result = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID).get_configuration("attributeExtraction")
+
+        assert result.lexicon is True
+        assert AppConfigSettings(model_id="a", temperature=0).lexicon is False
+
     def test_starts_session_with_correct_parameters(self, mock_boto3_client):
         mock_boto3_client.start_configuration_session.return_value = {
             "InitialConfigurationToken": "initial-token",
@@ -150,6 +232,58 @@ class TestEmptyBody:
         assert result is None
 
 
+    def test_returns_none_on_empty_body_after_a_document(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        mock_boto3_client.get_latest_configuration.side_effect = [
+            {
+                "NextPollConfigurationToken": "second-token",
+                "Configuration": _make_stream(json.dumps(VALID_CONFIG).encode()),
+            },
+            {
+                "NextPollConfigurationToken": "third-token",
+                "Configuration": _make_stream(b""),
+            },
+        ]
+
+        client = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID)
+        client.get_configuration("productCategorization")
+        result = client.get_configuration("attributeExtraction")
+
+        assert result is None
+        # the last document is still read by get_cached_configuration
+        assert client.get_cached_configuration("attributeExtraction").model_id == "us.amazon.nova-premier-v1:0"
+
+
+class TestCachedConfiguration:
+    """Reads the other components of an invocation without polling again."""
+
+    def test_returns_none_before_any_document(self, mock_boto3_client):
+        client = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID)
+
+        assert client.get_cached_configuration("attributeExtraction") is None
+        mock_boto3_client.get_latest_configuration.assert_not_called()
+
+    def test_reads_component_from_last_document_without_polling(self, mock_boto3_client):
+        mock_boto3_client.start_configuration_session.return_value = {
+            "InitialConfigurationToken": "initial-token",
+        }
+        mock_boto3_client.get_latest_configuration.return_value = {
+            "NextPollConfigurationToken": "next-token",
+            "Configuration": _make_stream(json.dumps(VALID_CONFIG).encode()),
+        }
+
+        client = AppConfigClient(APP_ID, ENV_ID, PROFILE_ID)
+        client.get_configuration("productCategorization")
+        result = client.get_cached_configuration("attributeExtraction")
+
+        assert result is not None
+        assert result.model_id == "us.amazon.nova-premier-v1:0"
+        assert mock_boto3_client.get_latest_configuration.call_count == 1
+        assert client.get_cached_configuration("unknownComponent") is None
+
+
 class TestNetworkError:
     """Validates Requirement 4.6: Returns None and resets session on network errors."""
 
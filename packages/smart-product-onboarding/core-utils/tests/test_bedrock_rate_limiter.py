@@ -0,0 +1,178 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import BedrockRuntimeSimulator, SimulatedModel
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import (
+    MIN_REQUESTS_PER_MINUTE,
+    AdaptiveRateLimiter,
+    RateLimitedBedrockRuntime,
+    estimate_tokens,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import converse_stream_until
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
+from amzn_smart_product_onboarding_core_utils.exceptions import DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _messages(text="Hello"):
+    return [{"role": "user", "content": [{"text": text}]}]
+
+
+def test_requests_are_paced_at_the_configured_rate(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+
+    waits = [limiter.acquire("m", 10) for _ in range(62)]
+
+    # a minute's worth of burst, then one request per second
+    assert waits[:60] == [0] * 60
+    assert waits[60:] == [pytest.approx(1), pytest.approx(1)]
+    assert limiter.metrics()["m"]["delayed"] == 2
+    assert limiter.metrics()["m"]["wait_ms"] == 2000
+
+
+def test_tokens_are_paced_and_corrected_with_actual_usage(clock):
+    limiter = AdaptiveRateLimiter(tokens_per_minute=600, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire("m", 100) == 0
+    limiter.record_usage("m", 100, 700)
+    # 100 tokens of debt refill at 10 tokens/s, the next 100 tokens wait for 20s
+    assert limiter.acquire("m", 100) == pytest.approx(20)
+
+
+def test_wait_past_the_deadline_fails_and_gives_back_the_reservation(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, clock=clock, sleep=clock.sleep)
+    for _ in range(60):
+        limiter.acquire("m", 10)
+
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire("m", 10, Deadline.after(5.5, min_call_seconds=5, clock=clock))
+
+    assert clock.now == 0
+    assert limiter.acquire("m", 10, Deadline.after(6, min_call_seconds=5, clock=clock)) == pytest.approx(1)
+    assert limiter.metrics()["m"]["deadline_exceeded"] == 1
+    assert limiter.metrics()["m"]["requests"] == 61
+
+
+def test_models_are_paced_independently(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=1, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire("a", 1)
+    assert limiter.acquire("b", 1) == 0
+    assert limiter.acquire("a", 1) == pytest.approx(60)
+
+
+def test_throttle_cuts_the_rate_below_the_observed_throughput_and_success_grows_it_back(clock):
+    limiter = AdaptiveRateLimiter(clock=clock, sleep=clock.sleep)
+    for _ in range(99):
+        limiter.acquire("m", 10)
+        limiter.record_usage("m", 10, 10)
+    limiter.acquire("m", 10)
+
+    limiter.record_throttle("m")
+
+    metrics = limiter.metrics()["m"]
+    assert metrics["throttles"] == 1
+    assert metrics["requests_per_minute"] == pytest.approx(70)
+    assert limiter.acquire("m", 10) == pytest.approx(60 / 70)
+
+    limiter.record_usage("m", 10, 10)
+    assert limiter.metrics()["m"]["requests_per_minute"] > 70
+
+
+def test_throttles_of_calls_sent_before_the_last_cut_do_not_cut_again(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=100, clock=clock, sleep=clock.sleep)
+    for _ in range(50):
+        limiter.record_usage("m", 0, 0)
+    sent_at = limiter.now()
+    clock.now += 1
+
+    limiter.record_throttle("m")
+    limiter.record_throttle("m", sent_at)
+
+    metrics = limiter.metrics()["m"]
+    assert metrics["throttles"] == 2
+    assert metrics["requests_per_minute"] == pytest.approx(51 * 0.7)
+
+
+def test_throttle_rate_has_a_floor(clock):
+    limiter = AdaptiveRateLimiter(clock=clock, sleep=clock.sleep)
+
+    limiter.record_throttle("m")
+
+    assert limiter.metrics()["m"]["requests_per_minute"] == MIN_REQUESTS_PER_MINUTE
+
+
+def test_rate_grows_back_to_the_configured_quota_only(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=100, clock=clock, sleep=clock.sleep)
+    limiter.record_throttle("m")
+
+    for _ in range(1000):
+        limiter.record_usage("m", 0, 0)
+
+    assert limiter.metrics()["m"]["requests_per_minute"] == 100
+
+
+def test_wrapped_client_records_throttles_and_usage(clock):
+    simulator = BedrockRuntimeSimulator(
+        {"m": SimulatedModel(responder=lambda request: "x" * 400, requests_per_minute=1)},
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    limiter = AdaptiveRateLimiter(clock=clock, sleep=clock.sleep)
+    bedrock = RateLimitedBedrockRuntime(simulator, limiter)
+
+    bedrock.converse(modelId="m", messages=_messages())
+    with pytest.raises(ClientError):
+        bedrock.converse(modelId="m", messages=_messages())
+
+    metrics = limiter.metrics()["m"]
+    assert metrics["throttles"] == 1
+    assert metrics["requests_per_minute"] == MIN_REQUESTS_PER_MINUTE
+    assert metrics["tokens_per_minute"] is not None
+
+
+def test_wrapped_client_paces_streams(clock):
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "streamed " * 10)})
+    limiter = AdaptiveRateLimiter(tokens_per_minute=10000, clock=clock, sleep=clock.sleep)
+    bedrock = RateLimitedBedrockRuntime(simulator, limiter)
+
+    response, _ = converse_stream_until(bedrock, modelId="m", messages=_messages())
+
+    assert response["output"]["message"]["content"][0]["text"] == "streamed " * 10
+    assert limiter.metrics()["m"]["requests"] == 1
+
+
+def test_wrapped_client_records_usage_of_streams_closed_early():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "streamed " * 100)})
+    limiter = MagicMock(spec=AdaptiveRateLimiter)
+    bedrock = RateLimitedBedrockRuntime(simulator, limiter)
+
+    response, metrics = converse_stream_until(
+        bedrock, until=lambda text: len(text) >= 40, modelId="m", messages=_messages()
+    )
+
+    # no metadata event arrives, the output tokens are estimated from the text received
+    assert metrics.terminated_early
+    model_id, estimated, total = limiter.record_usage.call_args.args
+    assert total == estimated + estimate_tokens(response["output"]["message"]["content"][0]["text"])
+    limiter.record_usage.assert_called_once()
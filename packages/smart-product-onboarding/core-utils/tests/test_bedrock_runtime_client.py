@@ -0,0 +1,58 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import EventStreamError
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
+    EARLY_TERMINATION,
+    converse_stream_until,
+)
+from amzn_smart_product_onboarding_core_utils.exceptions import RateLimitError
+
+
+def _events(*deltas):
+    for delta in deltas:
+        yield {"contentBlockDelta": {"delta": {"text": delta}, "contentBlockIndex": 0}}
+    yield {"messageStop": {"stopReason": "end_turn"}}
+    yield {"metadata": {"usage": {"inputTokens": 10, "outputTokens": 5, "totalTokens": 15}}}
+
+
+def test_converse_stream_until_assembles_full_response():
+    bedrock = MagicMock()
+    bedrock.converse_stream.return_value = {"stream": _events("hello ", "world")}
+
+    response, metrics = converse_stream_until(bedrock, modelId="test-model", messages=[])
+
+    assert response["output"]["message"]["content"][0]["text"] == "hello world"
+    assert response["stopReason"] == "end_turn"
+    assert response["usage"]["totalTokens"] == 15
+    assert not metrics.terminated_early
+    assert metrics.time_to_first_token_ms <= metrics.time_to_stop_ms
+
+
+def test_converse_stream_until_terminates_early():
+    bedrock = MagicMock()
+    bedrock.converse_stream.return_value = {"stream": _events("hello ", "world", "ignored")}
+
+    response, metrics = converse_stream_until(bedrock, until=lambda text: "world" in text, modelId="m", messages=[])
+
+    assert response["output"]["message"]["content"][0]["text"] == "hello world"
+    assert response["stopReason"] == EARLY_TERMINATION
+    assert metrics.terminated_early
+
+
+def test_converse_stream_until_maps_stream_throttling_to_rate_limit_error():
+    def throttled():
+        yield {"contentBlockDelta": {"delta": {"text": "partial"}, "contentBlockIndex": 0}}
+        raise EventStreamError(
+            {"Error": {"Code": "throttlingException", "Message": "Too many requests"}}, "ConverseStream"
+        )
+
+    bedrock = MagicMock()
+    bedrock.converse_stream.return_value = {"stream": throttled()}
+
+    with pytest.raises(RateLimitError):
+        converse_stream_until(bedrock, modelId="m", messages=[])
@@ -0,0 +1,142 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+from botocore.exceptions import ClientError
+from tenacity import stop_after_attempt
+
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import (
+    GARBAGE_TEXT,
+    MALFORMED_GARBAGE,
+    MALFORMED_TRUNCATED,
+    BedrockRuntimeSimulator,
+    SimulatedModel,
+    constant_latency,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
+    converse_stream_until,
+    get_model_response,
+)
+from amzn_smart_product_onboarding_core_utils.exceptions import RateLimitError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _messages(text="Hello"):
+    return [{"role": "user", "content": [{"text": text}]}]
+
+
+def test_converse_applies_stop_sequences_and_estimates_usage():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "answer</response> ignored")})
+
+    response = simulator.converse(
+        modelId="m", messages=_messages("x" * 40), inferenceConfig={"stopSequences": ["</response>"]}
+    )
+
+    assert response["output"]["message"]["content"] == [{"text": "answer"}]
+    assert response["stopReason"] == "stop_sequence"
+    assert response["usage"] == {"inputTokens": 10, "outputTokens": 2, "totalTokens": 12}
+    assert simulator.stats["m"]["requests"] == 1
+
+
+def test_converse_truncates_at_max_tokens():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "x" * 100)})
+
+    response = simulator.converse(modelId="m", messages=_messages(), inferenceConfig={"maxTokens": 5})
+
+    assert response["output"]["message"]["content"][0]["text"] == "x" * 20
+    assert response["stopReason"] == "max_tokens"
+
+
+def test_latency_and_token_rate_are_scaled():
+    clock = FakeClock()
+    model = SimulatedModel(
+        responder=lambda request: "x" * 40, latency=constant_latency(2.0), output_tokens_per_second=5
+    )
+    simulator = BedrockRuntimeSimulator({"m": model}, time_scale=0.5, clock=clock, sleep=clock.sleep)
+
+    response = simulator.converse(modelId="m", messages=_messages())
+
+    # 2s to the first token plus 10 tokens at 5 tokens/s, halved
+    assert clock.now == pytest.approx(2.0)
+    assert response["metrics"]["latencyMs"] == 2000
+
+
+def test_requests_per_minute_quota_raises_throttling_until_the_window_passes():
+    clock = FakeClock()
+    simulator = BedrockRuntimeSimulator(
+        {"m": SimulatedModel(requests_per_minute=2)}, clock=clock, sleep=clock.sleep
+    )
+
+    simulator.converse(modelId="m", messages=_messages())
+    simulator.converse(modelId="m", messages=_messages())
+    with pytest.raises(ClientError) as e:
+        simulator.converse(modelId="m", messages=_messages())
+    assert e.value.response["Error"]["Code"] == "ThrottlingException"
+    assert simulator.stats["m"]["throttled"] == 1
+
+    clock.now += 60
+    simulator.converse(modelId="m", messages=_messages())
+    assert simulator.stats["m"]["requests"] == 3
+
+
+def test_tokens_per_minute_quota_counts_input_and_output_tokens():
+    clock = FakeClock()
+    model = SimulatedModel(responder=lambda request: "x" * 40, tokens_per_minute=25)
+    simulator = BedrockRuntimeSimulator({"m": model}, clock=clock, sleep=clock.sleep)
+
+    simulator.converse(modelId="m", messages=_messages("x" * 40))  # 10 in + 10 out
+    with pytest.raises(ClientError):
+        simulator.converse(modelId="m", messages=_messages("x" * 40))
+
+
+def test_throttling_maps_to_rate_limit_error_in_the_client_helpers():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(requests_per_minute=0)}, time_scale=0)
+    with pytest.raises(RateLimitError):
+        get_model_response.retry_with(stop=stop_after_attempt(1))(simulator, "m", _messages())
+
+
+def test_malformed_responses_are_injected():
+    simulator = BedrockRuntimeSimulator(
+        {
+            "garbage": SimulatedModel(
+                responder=lambda request: "<a>b</a>", malformed_rate=1, malformed_kinds=[MALFORMED_GARBAGE]
+            ),
+            "truncated": SimulatedModel(
+                responder=lambda request: [{"toolUse": {"toolUseId": "t", "name": "n", "input": {"a": 1, "b": 2}}}],
+                malformed_rate=1,
+                malformed_kinds=[MALFORMED_TRUNCATED],
+            ),
+        },
+        seed=0,
+    )
+
+    garbage = simulator.converse(modelId="garbage", messages=_messages())
+    truncated = simulator.converse(modelId="truncated", messages=_messages())
+
+    assert garbage["output"]["message"]["content"] == [{"text": GARBAGE_TEXT}]
+    assert truncated["output"]["message"]["content"][0]["toolUse"]["input"] == {"a": 1}
+    assert truncated["stopReason"] == "max_tokens"
+    assert simulator.stats["garbage"]["malformed_garbage"] == 1
+
+
+def test_converse_stream_matches_converse():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "streamed " * 10)})
+
+    response, metrics = converse_stream_until(simulator, modelId="m", messages=_messages())
+
+    assert response["output"]["message"]["content"][0]["text"] == "streamed " * 10
+    assert response["stopReason"] == "end_turn"
+    assert response["usage"]["outputTokens"] == 23
+    assert not metrics.terminated_early
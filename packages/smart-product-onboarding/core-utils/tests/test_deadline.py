@@ -0,0 +1,137 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from tenacity import wait_fixed
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import (
+    AdaptiveRateLimiter,
+    RateLimitedBedrockRuntime,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
+    converse_stream_until,
+    get_model_response,
+)
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline, current_deadline
+from amzn_smart_product_onboarding_core_utils.exceptions import DeadlineExceeded, RateLimitError, RetryableError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+def _throttled(*args, **kwargs):
+    raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}}, "Converse")
+
+
+def test_deadline_from_context_keeps_a_reserve():
+    clock = FakeClock()
+
+    deadline = Deadline.from_context(FakeContext(30_000), reserve_seconds=2, clock=clock)
+
+    assert deadline.remaining() == 28
+    assert Deadline.from_context(None) is None
+
+
+def test_check_raises_a_retryable_error():
+    clock = FakeClock()
+    deadline = Deadline.after(10, min_call_seconds=5, clock=clock)
+
+    deadline.check("converse")
+    clock.now = 6
+
+    with pytest.raises(DeadlineExceeded) as error:
+        deadline.check("converse")
+    assert isinstance(error.value, RetryableError)
+
+
+def test_retry_that_would_overrun_the_deadline_fails_fast():
+    bedrock = MagicMock()
+    bedrock.converse.side_effect = _throttled
+    deadline = Deadline.after(3, min_call_seconds=2.5)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as error:
+        get_model_response.retry_with(wait=wait_fixed(1))(bedrock, "m", [], deadline=deadline)
+
+    # the retry is not waited for, the throttle is kept as the cause
+    assert time.monotonic() - started < 0.5
+    assert bedrock.converse.call_count == 1
+    assert isinstance(error.value.__cause__, RateLimitError)
+
+
+def test_retries_without_a_deadline_are_unchanged():
+    bedrock = MagicMock()
+    bedrock.converse.side_effect = _throttled
+
+    with pytest.raises(RateLimitError):
+        get_model_response.retry_with(wait=wait_fixed(0))(bedrock, "m", [])
+
+    assert bedrock.converse.call_count == 3
+
+
+def test_response_is_not_awaited_past_the_deadline():
+    bedrock = MagicMock()
+    bedrock.converse.side_effect = lambda **kwargs: time.sleep(2)
+    deadline = Deadline.after(0.3, min_call_seconds=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        get_model_response(bedrock, "m", [], deadline=deadline)
+
+    assert time.monotonic() - started < 1
+
+
+def test_stream_is_not_read_past_the_deadline():
+    clock = FakeClock()
+    deadline = Deadline.after(10, min_call_seconds=1, clock=clock)
+
+    def events():
+        yield {"contentBlockDelta": {"delta": {"text": "partial"}, "contentBlockIndex": 0}}
+        clock.now = 11
+        yield {"contentBlockDelta": {"delta": {"text": "late"}, "contentBlockIndex": 0}}
+
+    bedrock = MagicMock()
+    bedrock.converse_stream.return_value = {"stream": events()}
+
+    with pytest.raises(DeadlineExceeded):
+        converse_stream_until(bedrock, deadline=deadline, modelId="m", messages=[])
+
+
+def test_rate_limited_call_is_not_sent_after_a_wait_past_the_deadline():
+    bedrock = MagicMock()
+    bedrock.converse.return_value = {"usage": {"totalTokens": 1}}
+    sleep = MagicMock()
+    client = RateLimitedBedrockRuntime(bedrock, AdaptiveRateLimiter(requests_per_minute=1, sleep=sleep))
+    deadline = Deadline.after(10, min_call_seconds=1)
+
+    deadline.call("converse", client.converse, modelId="m", messages=[])
+    with pytest.raises(DeadlineExceeded):
+        deadline.call("converse", client.converse, modelId="m", messages=[])
+
+    # the second call would wait a minute for the rate limiter, it is neither waited for nor sent
+    assert bedrock.converse.call_count == 1
+    sleep.assert_not_called()
+
+
+def test_current_deadline_is_set_within_the_call_only():
+    deadline = Deadline.after(10, min_call_seconds=1)
+
+    assert deadline.call("converse", current_deadline) is deadline
+    assert current_deadline() is None
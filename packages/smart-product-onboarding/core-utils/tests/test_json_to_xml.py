@@ -3,7 +3,7 @@
 
 import pytest
 
-from amzn_smart_product_onboarding_core_utils.json_to_xml import json_to_xml
+from amzn_smart_product_onboarding_core_utils.json_to_xml import json_to_compact_xml, json_to_xml
 
 
 @pytest.fixture
@@ -63,3 +63,13 @@ def test_it_can_create_with_list(with_list):
   buzz
 </foo>"""
     )
+
+
+def test_compact_xml_has_no_padding(nested_json, with_list):
+    # when
+    nested = json_to_compact_xml(nested_json)
+    listed = json_to_compact_xml([with_list, {"bar": "fizz"}])
+
+    # then
+    assert nested == "<foo><bar><fizz>buzz</fizz></bar></foo>"
+    assert listed == "<foo>fizz\nbuzz</foo>\n<bar>fizz</bar>"
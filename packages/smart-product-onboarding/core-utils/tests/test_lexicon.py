@@ -0,0 +1,65 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.lexicon import AhoCorasick, AttributeLexicon
+
+
+@pytest.fixture
+def attributes_schema():
+    return [
+        {
+            "Title": "Colour",
+            "Childs": [{"Title": "NAVY"}, {"Title": "NAVY BLUE"}, {"Title": "RED"}, {"Title": "OTHER"}],
+        },
+        {"Title": "Material", "Childs": [{"Title": "COTTON"}, {"Title": "POLYESTER"}, {"Title": "OTHER"}]},
+        {"Title": "Size", "Childs": [{"Title": "S"}, {"Title": "XL"}]},
+        {"Title": "Closure", "Childs": [{"Title": "ZIP"}, {"Title": "RED"}]},
+        {"Title": "Care Instructions"},
+    ]
+
+
+def test_automaton_finds_overlapping_patterns():
+    # when
+    matches = list(AhoCorasick(["he", "she", "hers", "his"]).find("ushers"))
+
+    # then
+    assert sorted(matches) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+
+def test_lexicon_matches_unambiguous_values_on_word_boundaries(attributes_schema):
+    # when
+    matches = AttributeLexicon(attributes_schema).match("Navy blue cotton hoodie, XL, with zipper pocket\nRed trim")
+
+    # then
+    assert matches == {"Colour": "NAVY BLUE", "Material": "COTTON", "Size": "XL"}
+
+
+def test_lexicon_drops_a_match_inside_a_longer_one():
+    # given values inside a longer one, at its start and at its end
+    lexicon = AttributeLexicon(
+        [{"Title": "Colour", "Childs": [{"Title": "NAVY"}, {"Title": "BLUE"}, {"Title": "NAVY BLUE"}]}]
+    )
+
+    # when
+    matches = lexicon.match("Hoodie in navy blue")
+
+    # then
+    assert matches == {"Colour": "NAVY BLUE"}
+
+
+def test_lexicon_leaves_attributes_with_several_values_to_the_model(attributes_schema):
+    # when
+    matches = AttributeLexicon(attributes_schema).match("Cotton and polyester blend, navy with zip")
+
+    # then
+    assert matches == {"Colour": "NAVY", "Closure": "ZIP"}
+
+
+def test_lexicon_skips_shared_generic_and_short_values(attributes_schema):
+    # when
+    lexicon = AttributeLexicon(attributes_schema)
+
+    # then
+    assert set(lexicon.values) == {"navy", "navy blue", "cotton", "polyester", "xl", "zip"}
@@ -0,0 +1,73 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+from collections import Counter
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigSettings, ModelRoute
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import BedrockRuntimeSimulator, SimulatedModel
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import converse_stream_until
+from amzn_smart_product_onboarding_core_utils.model_routing import ModelRouter, UsageMeter
+
+
+def _messages():
+    return [{"role": "user", "content": [{"text": "Hello"}]}]
+
+
+def test_settings_without_routes_are_unchanged():
+    settings = AppConfigSettings(model_id="a", temperature=0.3)
+
+    assert ModelRouter("test").choose(settings) is settings
+
+
+def test_routes_are_chosen_by_weight():
+    settings = AppConfigSettings(
+        model_id="default",
+        temperature=0,
+        routes=[
+            ModelRoute(model_id="fast", temperature=0.1, weight=3),
+            ModelRoute(model_id="slow", weight=1),
+            ModelRoute(model_id="drained", weight=0),
+        ],
+    )
+    router = ModelRouter("test", seed=1)
+
+    chosen = Counter(router.choose(settings).model_id for _ in range(4000))
+
+    assert set(chosen) == {"fast", "slow"}
+    assert chosen["fast"] / 4000 == pytest.approx(0.75, abs=0.03)
+    assert router.choose(AppConfigSettings(model_id="x", temperature=0, routes=[ModelRoute("fast", 0.1)])) == (
+        AppConfigSettings(model_id="fast", temperature=0.1, routes=[ModelRoute("fast", 0.1)])
+    )
+
+
+def test_usage_meter_adds_up_converse_and_stream_tokens():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "x" * 40)})
+    meter = UsageMeter(simulator)
+
+    meter.converse(modelId="m", messages=_messages())
+    converse_stream_until(meter, modelId="m", messages=_messages())
+
+    assert simulator.stats["m"]["requests"] == 2
+    assert meter.output_tokens == simulator.stats["m"]["outputTokens"]
+    assert meter.input_tokens == simulator.stats["m"]["inputTokens"]
+
+
+def test_track_counts_latency_tokens_and_errors_per_model():
+    simulator = BedrockRuntimeSimulator({"m": SimulatedModel(responder=lambda request: "x" * 40)})
+    meter = UsageMeter(simulator)
+    router = ModelRouter("test")
+
+    with router.track("m", meter):
+        meter.converse(modelId="m", messages=_messages())
+    with pytest.raises(ValueError), router.track("m", meter):
+        raise ValueError("invalid response")
+
+    metrics = router.metrics()["m"]
+    assert metrics["requests"] == 2
+    assert metrics["errors"] == 1
+    assert metrics["errors_ValueError"] == 1
+    assert metrics["error_rate"] == 0.5
+    assert metrics["output_tokens"] == simulator.stats["m"]["outputTokens"]
+    assert metrics["input_tokens"] == simulator.stats["m"]["inputTokens"]
@@ -0,0 +1,142 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import threading
+from datetime import UTC, datetime, timedelta
+
+import boto3
+import pytest
+from botocore.credentials import ReadOnlyCredentials
+from moto import mock_aws
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.refreshing_credentials import (
+    BackgroundRefreshingCredentials,
+    assume_role_fetcher,
+    refreshing_session,
+)
+
+START = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class FakeFetcher:
+    """Returns credentials valid for an hour, numbered by call, optionally waiting for ``release`` first."""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.done = threading.Event()
+        self.fail = False
+
+    def __call__(self) -> tuple[ReadOnlyCredentials, datetime]:
+        self.release.wait(5)
+        self.calls += 1
+        try:
+            if self.fail:
+                raise RuntimeError("sts unavailable")
+            return ReadOnlyCredentials(f"key{self.calls}", "secret", "token"), self.clock.now + timedelta(hours=1)
+        finally:
+            self.done.set()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fetcher(clock):
+    return FakeFetcher(clock)
+
+
+def test_due_refresh_runs_in_the_background_without_blocking_the_request(clock, fetcher):
+    credentials = BackgroundRefreshingCredentials(fetcher, name="role", clock=clock)
+    assert credentials.access_key == "key1"
+
+    clock.now += timedelta(minutes=50)
+    fetcher.release.clear()
+    fetcher.done.clear()
+
+    # the refresh is due, the request is signed with the current credentials while it runs
+    assert credentials.get_frozen_credentials().access_key == "key1"
+    fetcher.release.set()
+    assert fetcher.done.wait(5)
+    credentials._timer.cancel()
+
+    for _ in range(50):
+        if credentials.access_key == "key2":
+            break
+        threading.Event().wait(0.01)
+    assert credentials.access_key == "key2"
+    assert credentials.metrics()["refreshes"] == 2
+    assert credentials.metrics()["expires_in_s"] == 3600
+
+
+def test_expired_credentials_are_refreshed_before_signing(clock, fetcher):
+    credentials = BackgroundRefreshingCredentials(fetcher, name="role", clock=clock)
+
+    clock.now += timedelta(hours=2)
+
+    assert credentials.get_frozen_credentials().access_key == "key2"
+    assert credentials.metrics()["blocking_refreshes"] == 1
+
+
+def test_failed_background_refresh_keeps_the_current_credentials(clock, fetcher):
+    credentials = BackgroundRefreshingCredentials(fetcher, name="role", clock=clock)
+    clock.now += timedelta(minutes=50)
+    fetcher.fail = True
+    fetcher.done.clear()
+
+    assert credentials.access_key == "key1"
+    assert fetcher.done.wait(5)
+    for _ in range(50):
+        if not credentials._refreshing:
+            break
+        threading.Event().wait(0.01)
+
+    assert credentials.metrics()["refresh_failures"] == 1
+    # the failed refresh is retried later, not on every request
+    assert credentials.access_key == "key1"
+    assert fetcher.calls == 2
+
+
+def test_refresh_starts_by_half_life_for_short_sessions(clock):
+    def fetch():
+        return ReadOnlyCredentials("key", "secret", "token"), clock.now + timedelta(minutes=20)
+
+    credentials = BackgroundRefreshingCredentials(fetch, name="role", clock=clock)
+
+    assert credentials._refresh_at == START + timedelta(minutes=10)
+
+
+@mock_aws
+def test_session_clients_sign_with_the_assumed_role():
+    sts = boto3.client("sts", region_name="us-east-1")
+    role_arn = "arn:aws:iam::123456789012:role/bedrock"
+    credentials = BackgroundRefreshingCredentials(assume_role_fetcher(sts, role_arn, "test"), name=role_arn)
+
+    session = refreshing_session(credentials, region_name="us-east-1")
+    identity = session.client("sts").get_caller_identity()
+
+    assert identity["Arn"].startswith("arn:aws:sts::123456789012:assumed-role/bedrock/")
+    assert session.get_credentials().get_frozen_credentials().access_key == credentials.access_key
+
+
+def test_session_resolves_the_refreshed_credentials_only(clock, fetcher):
+    credentials = BackgroundRefreshingCredentials(fetcher, name="role", clock=clock)
+    session = refreshing_session(credentials, region_name="us-east-1")
+
+    credentials.refresh()
+
+    assert session.get_credentials() is credentials
+    assert session.get_credentials().method == "background-refresh"
+    assert session.get_credentials().get_frozen_credentials().access_key == "key2"
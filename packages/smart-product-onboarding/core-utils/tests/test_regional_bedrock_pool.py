@@ -0,0 +1,137 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+from botocore.exceptions import ClientError
+from tenacity import stop_after_attempt
+
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import (
+    BedrockRuntimeSimulator,
+    SimulatedModel,
+    constant_latency,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
+    converse_stream_until,
+    get_model_response,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.regional_bedrock_pool import RegionalBedrockPool
+from amzn_smart_product_onboarding_core_utils.exceptions import RateLimitError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _region(clock, latency=0.5, requests_per_minute=None):
+    return BedrockRuntimeSimulator(
+        {
+            "m": SimulatedModel(
+                responder=lambda request: "answer",
+                latency=constant_latency(latency),
+                output_tokens_per_second=None,
+                requests_per_minute=requests_per_minute,
+            )
+        },
+        clock=clock,
+        sleep=clock.sleep,
+    )
+
+
+def _messages():
+    return [{"role": "user", "content": [{"text": "Hello"}]}]
+
+
+def test_preferred_region_is_used_while_healthy(clock):
+    regions = {"us-east-1": _region(clock), "us-west-2": _region(clock)}
+    pool = RegionalBedrockPool(regions, probe_rate=0, clock=clock)
+
+    for _ in range(5):
+        pool.converse(modelId="m", messages=_messages())
+
+    assert regions["us-east-1"].stats["m"]["requests"] == 5
+    assert regions["us-west-2"].stats["m"]["requests"] == 0
+    assert pool.metrics()["us-east-1"]["latency_ms"] == 500
+
+
+def test_throttle_fails_over_at_once_and_cools_the_region_down(clock):
+    regions = {"us-east-1": _region(clock, requests_per_minute=1), "us-west-2": _region(clock)}
+    pool = RegionalBedrockPool(regions, cooldown_seconds=5, probe_rate=0, clock=clock)
+    pool.converse(modelId="m", messages=_messages())
+
+    throttled_at = clock.now
+    pool.converse(modelId="m", messages=_messages())
+
+    # the only time spent is the latency of the call in the second region
+    assert clock.now - throttled_at == pytest.approx(0.5)
+    assert regions["us-east-1"].stats["m"]["throttled"] == 1
+    assert pool.metrics()["us-west-2"]["failovers"] == 1
+    assert pool.regions() == ["us-west-2", "us-east-1"]
+
+    clock.now += 5
+    # out of cool-down, but its throttle rate still makes the first region slower than the second
+    assert pool.regions() == ["us-west-2", "us-east-1"]
+
+
+def test_slower_region_loses_the_traffic(clock):
+    regions = {"us-east-1": _region(clock, latency=2), "us-west-2": _region(clock, latency=0.5)}
+    pool = RegionalBedrockPool(regions, probe_rate=0.2, clock=clock, seed=0)
+
+    for _ in range(100):
+        pool.converse(modelId="m", messages=_messages())
+
+    # probes measure the second region, which then wins on latency
+    assert regions["us-west-2"].stats["m"]["requests"] > regions["us-east-1"].stats["m"]["requests"]
+    pool.probe_rate = 0
+    assert pool.regions() == ["us-west-2", "us-east-1"]
+
+
+def test_throttle_in_every_region_reaches_the_call_site(clock):
+    regions = {"us-east-1": _region(clock, requests_per_minute=1), "us-west-2": _region(clock, requests_per_minute=1)}
+    pool = RegionalBedrockPool(regions, probe_rate=0, clock=clock)
+    # the first call spends the quota of the first region, the second fails over and spends the other one
+    pool.converse(modelId="m", messages=_messages())
+    pool.converse(modelId="m", messages=_messages())
+
+    with pytest.raises(RateLimitError):
+        get_model_response.retry_with(stop=stop_after_attempt(1))(pool, "m", _messages())
+
+    assert pool.metrics()["us-east-1"]["throttles"] == 2
+    assert pool.metrics()["us-west-2"]["throttles"] == 1
+
+
+class InvalidRequestClient:
+    def converse(self, **kwargs):
+        raise ClientError({"Error": {"Code": "ValidationException", "Message": "invalid"}}, "Converse")
+
+
+def test_other_client_errors_do_not_fail_over(clock):
+    regions = {"us-east-1": InvalidRequestClient(), "us-west-2": _region(clock)}
+    pool = RegionalBedrockPool(regions, probe_rate=0, clock=clock)
+
+    with pytest.raises(ClientError):
+        pool.converse(modelId="m", messages=_messages())
+
+    assert regions["us-west-2"].stats["m"]["requests"] == 0
+
+
+def test_streams_go_through_the_pool(clock):
+    regions = {"us-east-1": _region(clock, requests_per_minute=1), "us-west-2": _region(clock)}
+    pool = RegionalBedrockPool(regions, probe_rate=0, clock=clock)
+    pool.converse(modelId="m", messages=_messages())
+
+    response, _ = converse_stream_until(pool, modelId="m", messages=_messages())
+
+    assert response["output"]["message"]["content"][0]["text"] == "answer"
+    assert regions["us-west-2"].stats["m"]["requests"] == 1
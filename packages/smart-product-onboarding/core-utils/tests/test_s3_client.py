@@ -0,0 +1,117 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import io
+import random
+import zipfile
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import S3RangedFile
+
+CONTENT = random.Random(0).randbytes(10_000)
+
+
+class FakeS3:
+    def __init__(self, content: bytes, short: bool = False):
+        self.content = content
+        self.short = short
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self.content), "ETag": '"etag"'}
+
+    def get_object(self, Bucket, Key, Range, IfMatch):
+        assert IfMatch == '"etag"'
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        self.ranges.append((start, end))
+        return {"Body": io.BytesIO(self.content[start : end + (0 if self.short else 1)])}
+
+
+def test_reads_match_the_object_wherever_they_seek():
+    # given
+    file = S3RangedFile(FakeS3(CONTENT), "bucket", "key", read_ahead=512)
+    rng = random.Random(1)
+
+    # then
+    for _ in range(200):
+        position, size = rng.randrange(len(CONTENT) + 100), rng.randrange(2000)
+        assert file.seek(position) == position
+        assert file.read(size) == CONTENT[position : position + size]
+        assert file.tell() == min(position + size, max(position, len(CONTENT)))
+    file.seek(-100, io.SEEK_END)
+    assert file.read() == CONTENT[-100:]
+    with pytest.raises(OSError):
+        file.seek(-1)
+
+
+def test_sequential_reads_are_served_from_the_read_ahead():
+    # given
+    s3 = FakeS3(CONTENT)
+    file = S3RangedFile(s3, "bucket", "key", read_ahead=1000)
+
+    # when
+    data = b"".join(file.read(100) for _ in range(15))
+    file.read(3000)
+
+    # then
+    assert data == CONTENT[:1500]
+    # two blocks, then the part of a large read past the second block fetched as is
+    assert s3.ranges == [(0, 999), (1000, 1999), (2000, 4499)]
+    assert file.requests == 3
+    assert file.bytes_fetched == 4500
+
+
+def test_readers_taking_turns_on_two_blocks_fetch_each_once():
+    # given
+    s3 = FakeS3(CONTENT)
+    file = S3RangedFile(s3, "bucket", "key", read_ahead=1000)
+
+    # when
+    for position in (0, 1000, 100, 1100, 200, 1200):
+        file.seek(position)
+        file.read(100)
+
+    # then
+    assert s3.ranges == [(0, 999), (1000, 1999)]
+
+
+def test_reads_near_the_end_fetch_the_last_block():
+    # given
+    s3 = FakeS3(CONTENT)
+    file = S3RangedFile(s3, "bucket", "key", read_ahead=1000)
+
+    # when
+    file.seek(-22, io.SEEK_END)
+    file.read(22)
+    file.seek(-600, io.SEEK_END)
+    file.read(100)
+
+    # then
+    assert s3.ranges == [(len(CONTENT) - 1000, len(CONTENT) - 1)]
+
+
+def test_zipfile_reads_members_without_downloading_the_archive():
+    # given
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i in range(20):
+            archive.writestr(f"image{i}.jpg", CONTENT[i * 500 : i * 500 + 500])
+    s3 = FakeS3(buffer.getvalue())
+
+    # when
+    with zipfile.ZipFile(S3RangedFile(s3, "bucket", "key", read_ahead=2048)) as archive:
+        members = [archive.read(info) for info in archive.infolist()[:4]]
+
+    # then
+    assert members == [CONTENT[i * 500 : i * 500 + 500] for i in range(4)]
+    assert sum(end - start + 1 for start, end in s3.ranges) < len(buffer.getvalue())
+
+
+def test_short_ranged_get_fails_the_read():
+    # given
+    file = S3RangedFile(FakeS3(CONTENT, short=True), "bucket", "key", read_ahead=512)
+
+    # then
+    with pytest.raises(OSError, match="returned 511 of 512 bytes"):
+        file.read(10)
@@ -0,0 +1,88 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.stage_timer import (
+    LATENCY_METRIC,
+    STAGE_CONVERSE,
+    STAGE_XML_PARSE,
+    StageTimer,
+    percentile,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7
+
+
+def test_stages_are_timed_without_powertools_locally():
+    clock = FakeClock()
+    timer = StageTimer(enabled=False, clock=clock)
+
+    for latency in (0.1, 0.2, 0.3):
+        with timer.stage(STAGE_CONVERSE, "model"):
+            clock.now += latency
+    with pytest.raises(ValueError), timer.stage(STAGE_XML_PARSE):
+        clock.now += 0.01
+        raise ValueError("invalid XML")
+
+    summary = timer.flush()
+
+    assert not timer.enabled
+    assert summary[STAGE_CONVERSE]["count"] == 3
+    assert summary[STAGE_CONVERSE]["p50_ms"] == pytest.approx(200)
+    assert summary[STAGE_CONVERSE]["p99_ms"] == pytest.approx(300)
+    assert summary[STAGE_XML_PARSE]["count"] == 1
+    assert timer.summary() == {}
+
+
+def test_flush_after_flushes_failed_invocations_too():
+    timer = StageTimer(enabled=False, clock=FakeClock())
+
+    @timer.flush_after
+    def handler(event, context):
+        with timer.stage(STAGE_CONVERSE):
+            if event["fail"]:
+                raise ValueError("throttled")
+        return "ok"
+
+    assert handler({"fail": False}, None) == "ok"
+    assert timer.summary() == {}
+    with pytest.raises(ValueError):
+        handler({"fail": True}, None)
+    assert timer.summary() == {}
+    assert handler.__name__ == "handler"
+
+
+def test_flush_publishes_emf_latencies_per_stage_and_model(capsys):
+    clock = FakeClock()
+    timer = StageTimer(namespace="Test", enabled=True, clock=clock)
+
+    for model_id, latency in (("a", 0.1), ("a", 0.2), ("b", 0.3)):
+        with timer.stage(STAGE_CONVERSE, model_id):
+            clock.now += latency
+    capsys.readouterr()
+    timer.flush()
+
+    blobs = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    by_model = {blob["ModelId"]: blob for blob in blobs}
+    assert by_model["a"]["Stage"] == STAGE_CONVERSE
+    assert by_model["a"][LATENCY_METRIC] == pytest.approx([100, 200])
+    assert by_model["b"][LATENCY_METRIC] == pytest.approx([300])
+    assert by_model["a"]["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "Test"
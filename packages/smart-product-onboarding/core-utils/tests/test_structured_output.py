@@ -0,0 +1,48 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.models import CategorizationPrediction
+from amzn_smart_product_onboarding_core_utils.structured_output import (
+    extract_tool_use,
+    tool_config,
+    tool_input_schema,
+)
+
+
+def test_tool_input_schema_drops_excluded_fields():
+    schema = tool_input_schema(CategorizationPrediction, exclude=("prompt",))
+
+    assert "prompt" not in schema["properties"]
+    assert set(schema["required"]) == {"predicted_category_id", "predicted_category_name", "explanation"}
+
+
+def test_tool_config_forces_the_tool():
+    config = tool_config(CategorizationPrediction, name="record", description="Record it")
+
+    assert config["toolChoice"] == {"tool": {"name": "record"}}
+    spec = config["tools"][0]["toolSpec"]
+    assert spec["name"] == "record"
+    assert spec["inputSchema"]["json"]["properties"].keys() == CategorizationPrediction.model_fields.keys()
+
+
+def test_extract_tool_use_returns_matching_block():
+    tool_use = {"toolUseId": "1", "name": "record", "input": {"a": 1}}
+    response = {"output": {"message": {"content": [{"text": "thinking"}, {"toolUse": tool_use}]}}}
+
+    assert extract_tool_use(response, "record") == tool_use
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"output": {"message": {"content": [{"text": "no tool"}]}}, "stopReason": "end_turn"},
+        {"output": {"message": {"content": [{"toolUse": {"toolUseId": "1", "name": "other", "input": {}}}]}}},
+        {"output": {}},
+    ],
+)
+def test_extract_tool_use_raises_when_tool_not_called(response):
+    with pytest.raises(ModelResponseError):
+        extract_tool_use(response, "record")
@@ -0,0 +1,194 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from amzn_smart_product_onboarding_core_utils.boto3_helper.throughput_governor import (
+    LANE_INTERACTIVE,
+    LANE_LARGE_BATCH,
+    LANE_SMALL_BATCH,
+    BucketState,
+    DynamoDBBucketStore,
+    InMemoryBucketStore,
+    ThroughputGovernor,
+)
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
+from amzn_smart_product_onboarding_core_utils.exceptions import DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _governor(store, clock, lane, requests_per_minute=10, tokens_per_minute=10_000):
+    return ThroughputGovernor(
+        store, requests_per_minute, tokens_per_minute, lane=lane, clock=clock, sleep=clock.sleep
+    )
+
+
+def test_functions_share_the_buckets_of_the_store(clock):
+    store = InMemoryBucketStore()
+    first = _governor(store, clock, LANE_INTERACTIVE)
+    second = _governor(store, clock, LANE_INTERACTIVE)
+
+    for _ in range(5):
+        assert first.acquire("m", 10) == 0
+        assert second.acquire("m", 10) == 0
+
+    # the 10 requests of the minute are spent, the next one waits for a refill of 6s
+    assert first.acquire("m", 10) == pytest.approx(6)
+    assert first.metrics()["m"]["delayed"] == 1
+
+
+def test_batch_lanes_leave_a_reserve_for_the_lanes_above(clock):
+    store = InMemoryBucketStore()
+    large_batch = _governor(store, clock, LANE_LARGE_BATCH)
+    small_batch = _governor(store, clock, LANE_SMALL_BATCH)
+    interactive = _governor(store, clock, LANE_INTERACTIVE)
+
+    # the large batch stops at 40% of the bucket, the small one at 20%
+    assert [large_batch.acquire("m", 10) for _ in range(6)] == [0] * 6
+    assert [small_batch.acquire("m", 10) for _ in range(2)] == [0] * 2
+    assert [interactive.acquire("m", 10) for _ in range(2)] == [0] * 2
+
+    assert large_batch.acquire("m", 10) > 0
+
+
+def test_tokens_are_paced_and_corrected_with_actual_usage(clock):
+    store = InMemoryBucketStore()
+    governor = _governor(store, clock, LANE_INTERACTIVE, requests_per_minute=100, tokens_per_minute=600)
+
+    assert governor.acquire("m", 100) == 0
+    governor.record_usage("m", 100, 600)
+
+    assert store.get("m").tokens == pytest.approx(0)
+    assert governor.acquire("m", 100) == pytest.approx(10)
+
+
+def test_unused_tokens_given_back_do_not_overfill_the_bucket(clock):
+    store = InMemoryBucketStore()
+    governor = _governor(store, clock, LANE_INTERACTIVE, requests_per_minute=100, tokens_per_minute=600)
+    governor.acquire("m", 500)
+
+    # the bucket refilled while the call ran, and the call used less than estimated
+    clock.now += 60
+    governor.record_usage("m", 500, 50)
+
+    assert store.get("m").tokens == pytest.approx(600)
+
+
+def test_throttle_empties_the_buckets_for_everyone(clock):
+    store = InMemoryBucketStore()
+    first = _governor(store, clock, LANE_INTERACTIVE)
+    second = _governor(store, clock, LANE_INTERACTIVE)
+    first.acquire("m", 10)
+
+    first.record_throttle("m")
+
+    assert second.acquire("m", 10) == pytest.approx(6)
+    assert first.metrics()["m"]["throttles"] == 1
+
+
+def test_throttles_of_calls_sent_before_the_buckets_were_emptied_do_not_empty_them_again(clock):
+    store = InMemoryBucketStore()
+    first = _governor(store, clock, LANE_INTERACTIVE)
+    second = _governor(store, clock, LANE_INTERACTIVE)
+    sent_at = first.now()
+    first.acquire("m", 10)
+    second.acquire("m", 10)
+
+    clock.now += 1
+    first.record_throttle("m", sent_at)
+    clock.now += 29
+    second.record_throttle("m", sent_at)
+
+    # the stale throttle left the requests refilled since the first one
+    assert second.acquire("m", 10) == 0
+    second.record_throttle("m", second.now())
+    assert store.get("m").requests == pytest.approx(0)
+    assert second.metrics()["m"]["throttles"] == 2
+
+
+def test_wait_past_the_deadline_fails_without_taking_capacity(clock):
+    store = InMemoryBucketStore()
+    governor = _governor(store, clock, LANE_INTERACTIVE)
+    for _ in range(10):
+        governor.acquire("m", 10)
+
+    with pytest.raises(DeadlineExceeded):
+        governor.acquire("m", 10, Deadline.after(10, min_call_seconds=5, clock=clock))
+
+    assert clock.now == 1_000
+    assert store.get("m").requests == pytest.approx(0)
+    assert governor.metrics()["m"]["deadline_exceeded"] == 1
+
+
+def test_concurrent_acquires_never_spend_the_same_capacity_twice():
+    store = InMemoryBucketStore()
+    governor = ThroughputGovernor(store, 50, 1_000_000, lane=LANE_INTERACTIVE, clock=lambda: 0.0)
+
+    threads = [threading.Thread(target=governor.acquire, args=("m", 1)) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.get("m").requests == pytest.approx(0)
+    assert store.get("m").version == 49
+
+
+def test_unknown_lane_is_rejected():
+    with pytest.raises(ValueError):
+        ThroughputGovernor(InMemoryBucketStore(), 10, 1000, lane="urgent")
+
+
+@mock_aws
+def test_dynamodb_store_writes_conditionally():
+    client = boto3.client("dynamodb", region_name="us-east-1")
+    client.create_table(
+        TableName="governor",
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "pk", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    store = DynamoDBBucketStore(client, "governor")
+
+    assert store.get("m") is None
+    assert store.put("m", BucketState(requests=9, tokens=90.5, updated=1.5, version=0), None)
+    assert not store.put("m", BucketState(requests=8, tokens=80, updated=2, version=0), None)
+    assert store.put("m", BucketState(requests=8, tokens=80, updated=2, version=1), 0)
+    assert not store.put("m", BucketState(requests=7, tokens=70, updated=3, version=1), 0)
+
+    assert store.get("m") == BucketState(requests=8, tokens=80, updated=2, version=1)
+
+
+def test_invocation_lane_overrides_the_function_lane(clock, monkeypatch):
+    from amzn_smart_product_onboarding_core_utils.boto3_helper import bedrock_runtime_client
+    from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import RateLimitedBedrockRuntime
+
+    governor = _governor(InMemoryBucketStore(), clock, LANE_LARGE_BATCH)
+    client = RateLimitedBedrockRuntime(None, governor)
+    monkeypatch.setattr(bedrock_runtime_client, "LAMBDA_BEDROCK_RUNTIME_CLIENT", client)
+
+    bedrock_runtime_client.use_throughput_lane(LANE_SMALL_BATCH)
+    assert governor.lane == LANE_SMALL_BATCH
+    bedrock_runtime_client.use_throughput_lane("urgent")
+    assert governor.lane == bedrock_runtime_client.THROUGHPUT_LANE
+    bedrock_runtime_client.use_throughput_lane(None)
+    assert governor.lane == bedrock_runtime_client.THROUGHPUT_LANE
@@ -0,0 +1,164 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+from amzn_smart_product_onboarding_core_utils.xml_output import parse_response
+from amzn_smart_product_onboarding_core_utils.xml_stream import XmlStreamParser, parse_xml_stream
+
+PREDICTION_CDATA_TAGS = ["predicted_category_id", "predicted_category_name", "explanation"]
+BATCH_CDATA_TAGS = ["product_id", *PREDICTION_CDATA_TAGS]
+
+CATEGORIZATION = """<response>
+<thinking>
+- Key features: insulated, 750 ml, stainless steel, keeps drinks cold for 24 hours
+- Top categories: Drinkware > Water Bottles (1), Kitchen > Flasks (2)
+- The product is carried around, so bottles fit better than flasks
+</thinking>
+<prediction>
+<predicted_category_id>1</predicted_category_id>
+<predicted_category_name>Drinkware > Water Bottles</predicted_category_name>
+<explanation>A reusable bottle for drinks on the go. "Flask" would be < 50% of a match & is for the kitchen.
+</explanation>
+</prediction>
+</response>"""
+
+ATTRIBUTES = """<response>
+<scratchpad>Colour &amp; material are in the title, capacity is 750 ml.</scratchpad>
+<attributes>
+<attribute>
+<name>Colour</name>
+<value>NAVY &amp; WHITE</value>
+</attribute>
+<attribute>
+<name>Material</name>
+<value>STAINLESS STEEL</value>
+</attribute>
+<attribute>
+<name>Capacity</name>
+<value></value>
+</attribute>
+</attributes>
+<confidence>0.9</confidence>
+</response>"""
+
+SINGLE_ATTRIBUTE = """<response><scratchpad>Only the colour is mentioned.</scratchpad>
+<attributes><attribute><name>Colour</name><value>RED</value></attribute></attributes></response>"""
+
+BATCH_PREDICTION = """<prediction>
+<product_id>sku-42</product_id>
+<predicted_category_id>other</predicted_category_id>
+<predicted_category_name>Other</predicted_category_name>
+<explanation>None of the <candidate_categories> fits a garden hose.</explanation>
+</prediction>"""
+
+COMBINED = CATEGORIZATION.removesuffix("</response>") + ATTRIBUTES.split("\n", 2)[2]
+
+RESPONSES = [
+    pytest.param(CATEGORIZATION, PREDICTION_CDATA_TAGS, id="categorization"),
+    pytest.param(ATTRIBUTES, None, id="attributes"),
+    pytest.param(SINGLE_ATTRIBUTE, None, id="single-attribute"),
+    pytest.param(BATCH_PREDICTION, BATCH_CDATA_TAGS, id="batch-prediction"),
+    pytest.param(COMBINED, PREDICTION_CDATA_TAGS, id="combined"),
+    pytest.param("<thinking>first</thinking><prediction><id>1</id></prediction>", None, id="without-root"),
+    pytest.param("<response><thinking></thinking><empty/></response>", ["thinking"], id="empty-elements"),
+    pytest.param("<response>&#65;&#x42;<![CDATA[<c>]]></response>", None, id="entities-and-cdata"),
+]
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("response, cdata_tags", RESPONSES)
+def test_stream_matches_parse_response_fed_whole(response, cdata_tags):
+    # when
+    result = parse_xml_stream([response], cdata_tags=cdata_tags)
+
+    # then
+    assert result == parse_response(response, cdata_tags=cdata_tags)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16])
+@pytest.mark.parametrize("response, cdata_tags", RESPONSES)
+def test_stream_matches_parse_response_fed_in_chunks(response, cdata_tags, size):
+    # when
+    result = parse_xml_stream(chunked(response, size), cdata_tags=cdata_tags)
+
+    # then
+    assert result == parse_response(response, cdata_tags=cdata_tags)
+
+
+def test_stream_closes_truncated_response():
+    # given
+    truncated = ATTRIBUTES[: ATTRIBUTES.index("<value>STAINLESS") + len("<value>STAIN")]
+
+    # when
+    result = parse_xml_stream(chunked(truncated + "</val", 5))
+
+    # then
+    assert result["response"]["attributes"]["attribute"] == [
+        {"name": "Colour", "value": "NAVY & WHITE"},
+        {"name": "Material", "value": "STAIN"},
+    ]
+
+
+def test_stream_keeps_stray_markup_as_text():
+    # when
+    result = parse_xml_stream(["<a>1 < 2 & 3 &unknown; x</b> y</a>"])
+
+    # then
+    assert result == {"a": "1 < 2 & 3 &unknown; x y"}
+
+
+def test_stream_stops_once_wanted_elements_close():
+    # given
+    parser = XmlStreamParser(cdata_tags=PREDICTION_CDATA_TAGS, stop_after=["prediction"])
+    chunks = chunked(COMBINED, 16)
+
+    # when
+    fed = 0
+    for chunk in chunks:
+        fed += 1
+        if parser.feed(chunk):
+            break
+    result = parser.close()
+
+    # then
+    assert fed < len(chunks)
+    assert result["response"]["prediction"] == parse_response(CATEGORIZATION, PREDICTION_CDATA_TAGS)["response"][
+        "prediction"
+    ]
+    assert "attributes" not in result["response"]
+
+
+def test_watch_feeds_the_text_received_so_far():
+    # given
+    parser = XmlStreamParser(cdata_tags=PREDICTION_CDATA_TAGS, stop_after=["prediction"])
+
+    # when
+    received = ""
+    for chunk in chunked(COMBINED, 7):
+        received += chunk
+        if parser.watch(received):
+            break
+
+    # then
+    assert parser.close()["response"]["prediction"]["predicted_category_id"] == "1"
+    assert parser.fed_chars == len(received) < len(COMBINED)
+
+
+def test_watch_after_a_prefill_feeds_only_the_streamed_text():
+    # given
+    prefill = "<response>\n<thinking>"
+    parser = XmlStreamParser(cdata_tags=PREDICTION_CDATA_TAGS)
+    parser.feed(prefill)
+
+    # when
+    received = ""
+    for chunk in chunked(COMBINED.removeprefix(prefill), 5):
+        received += chunk
+        parser.watch(received)
+
+    # then
+    assert parser.close() == parse_response(COMBINED, cdata_tags=PREDICTION_CDATA_TAGS)
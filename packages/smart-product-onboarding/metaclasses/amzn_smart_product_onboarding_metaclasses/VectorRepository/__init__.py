@@ -5,6 +5,7 @@ from abc import ABC, abstractmethod
 from typing import Optional, TYPE_CHECKING
 
 import numpy as np
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
 
 if TYPE_CHECKING:
     import numpy.typing as npt
@@ -12,7 +13,9 @@ if TYPE_CHECKING:
 
 class VectorRepository(ABC):
     @abstractmethod
-    def get_vectors_by_words(self, words: list[str]) -> "list[npt.NDArray[np.float32]]":
+    def get_vectors_by_words(
+        self, words: list[str], deadline: Deadline | None = None
+    ) -> "list[npt.NDArray[np.float32]]":
         pass
 
     @abstractmethod
@@ -7,6 +7,12 @@ from typing import Optional, TYPE_CHECKING, Sequence, Union
 import faiss
 import numpy as np
 import time
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
+from amzn_smart_product_onboarding_core_utils.stage_timer import (
+    STAGE_TIMER,
+    STAGE_VECTOR_CACHE,
+    STAGE_VECTOR_DYNAMODB,
+)
 
 from amzn_smart_product_onboarding_metaclasses.VectorRepository import VectorRepository
 
@@ -28,23 +34,35 @@ class DynamoDBVectorRepository(VectorRepository):
         self.vector_cache[word] = vector
 
     def get_vectors_by_words(
-        self, words: list[str]
+        self, words: list[str], deadline: Deadline | None = None
     ) -> list[Union[None, "npt.NDArray[np.float32]"]]:
         word_vectors: list[Union[None, "npt.NDArray[np.float32]"]] = [None] * len(words)
         word_to_index: dict[str, int] = {word: idx for idx, word in enumerate(words)}
         keys_to_fetch = []
 
         # Check cache first
-        for word in words:
-            cached_vector = self.get_cached_vector(word)
-            if cached_vector is not None:
-                word_vectors[word_to_index[word]] = cached_vector
-            else:
-                keys_to_fetch.append({"word": {"S": word}})
+        with STAGE_TIMER.stage(STAGE_VECTOR_CACHE):
+            for word in words:
+                cached_vector = self.get_cached_vector(word)
+                if cached_vector is not None:
+                    word_vectors[word_to_index[word]] = cached_vector
+                else:
+                    keys_to_fetch.append({"word": {"S": word}})
 
         if not keys_to_fetch:
             return word_vectors
 
+        with STAGE_TIMER.stage(STAGE_VECTOR_DYNAMODB):
+            self._fetch_vectors(keys_to_fetch, word_vectors, word_to_index, deadline)
+        return word_vectors
+
+    def _fetch_vectors(
+        self,
+        keys_to_fetch: list[dict],
+        word_vectors: list[Union[None, "npt.NDArray[np.float32]"]],
+        word_to_index: dict[str, int],
+        deadline: Deadline | None,
+    ) -> None:
         # Prepare DynamoDB batch request in chunks of 100 keys
         for i in range(0, len(keys_to_fetch), 100):
             chunk = keys_to_fetch[i : i + 100]
@@ -56,6 +74,8 @@ class DynamoDBVectorRepository(VectorRepository):
             retries = 0
 
             while request_items:
+                if deadline is not None:
+                    deadline.check("batch_get_item", needed=0)
                 response = self.dynamodb_client.batch_get_item(
                     RequestItems=request_items
                 )
@@ -69,6 +89,9 @@ class DynamoDBVectorRepository(VectorRepository):
                 if "UnprocessedKeys" in response:
                     if retries >= max_retries:
                         raise RuntimeError("Max retries exceeded for batch_get_item")
+                    if deadline is not None:
+                        # the retry still needs time to run after the backoff
+                        deadline.check("batch_get_item retry", needed=2 * backoff_time)
                     time.sleep(backoff_time)
                     backoff_time *= 2
                     retries += 1
@@ -76,8 +99,6 @@ class DynamoDBVectorRepository(VectorRepository):
                 else:
                     request_items = None
 
-        return word_vectors
-
     @staticmethod
     def _extract_normalized_vector(
         vector_data: Sequence[dict[str, Decimal]]
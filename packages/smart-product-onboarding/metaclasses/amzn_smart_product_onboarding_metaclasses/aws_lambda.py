@@ -7,6 +7,8 @@ import os
 from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigClient
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
+    use_throughput_lane,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.dynamodb_client import (
     LAMBDA_DDB_CLIENT,
@@ -17,10 +19,13 @@ from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
 from amzn_smart_product_onboarding_core_utils.boto3_helper.ssm_client import (
     LAMBDA_SSM_CLIENT,
 )
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
 from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.model_routing import ModelRouter, UsageMeter
 from amzn_smart_product_onboarding_core_utils.models import (
     ProductReadyForMetaclass,
 )
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
 from aws_lambda_powertools.utilities.parser import event_parser
 
 from amzn_smart_product_onboarding_metaclasses.category_vector_index import (
@@ -42,7 +47,7 @@ BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-micro-v1:0")
 ssm = LAMBDA_SSM_CLIENT
 s3 = LAMBDA_S3_CLIENT
 dynamodb = LAMBDA_DDB_CLIENT
-bedrock = LAMBDA_BEDROCK_RUNTIME_CLIENT
+bedrock = UsageMeter(LAMBDA_BEDROCK_RUNTIME_CLIENT)
 
 # AppConfig client for runtime configuration
 appconfig_client = AppConfigClient(
@@ -50,6 +55,8 @@ appconfig_client = AppConfigClient(
     environment_id=os.getenv("APPCONFIG_ENVIRONMENT_ID", ""),
     configuration_profile_id=os.getenv("APPCONFIG_CONFIGURATION_PROFILE_ID", ""),
 )
+# kept across invocations so its metrics cover the life of the execution environment
+router = ModelRouter("metaclassClassification")
 
 # download and load config files
 config_paths: dict[str, str] = json.loads(ssm.get_parameter(Name=CONFIG_PATHS_PARAM)["Parameter"]["Value"])
@@ -114,21 +121,28 @@ metaclass_classifier = MetaclassClassifier(
 )
 
 
+@STAGE_TIMER.flush_after
 @event_parser(model=ProductReadyForMetaclass)
-def handler(event: ProductReadyForMetaclass, _):
+def handler(event: ProductReadyForMetaclass, context):
     logger.debug(f"Event received {event.model_dump_json()}")
+    use_throughput_lane(event.lane)
 
     # Fetch runtime configuration from AppConfig
     config = appconfig_client.get_configuration("metaclassClassification")
     if config:
+        config = router.choose(config)
         metaclass_classifier.model_id = config.model_id
         metaclass_classifier.temperature = config.temperature
     else:
         metaclass_classifier.model_id = BEDROCK_MODEL_ID
         metaclass_classifier.temperature = 0
+    metaclass_classifier.deadline = Deadline.from_context(context)
 
     demo = event.demo
-    prediction = metaclass_classifier.classify(event.product)
+    with router.track(metaclass_classifier.model_id, bedrock):
+        prediction = metaclass_classifier.classify(event.product)
+    logger.info({"model_metrics": router.metrics()})
+    log_bedrock_client_metrics()
     if not demo:
         prediction.clean_title = None
         prediction.findings = None
@@ -14,6 +14,7 @@ from amzn_smart_product_onboarding_api_runtime.interceptors import INTERCEPTORS
 from amzn_smart_product_onboarding_api_runtime.response import Response
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.dynamodb_client import (
     LAMBDA_DDB_CLIENT,
@@ -25,6 +26,7 @@ from amzn_smart_product_onboarding_core_utils.boto3_helper.ssm_client import (
     LAMBDA_SSM_CLIENT,
 )
 from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
 from amzn_smart_product_onboarding_core_utils.models import (
     Product,
 )
@@ -127,6 +129,7 @@ metaclass_classifier = MetaclassClassifier(
 )
 
 
+@STAGE_TIMER.flush_after
 def metaclass(event: MetaclassRequest, **kwargs) -> MetaclassOperationResponses:
     logger.debug(f"Event received {event}")
     demo = event.body.demo
@@ -142,6 +145,7 @@ def metaclass(event: MetaclassRequest, **kwargs) -> MetaclassOperationResponses:
         logger.error(f"Error while predicting metaclass: {e}")
         return Response.internal_failure("Internal server error")
 
+    log_bedrock_client_metrics()
     logger.debug(f"Prediction {prediction.model_dump_json()}")
     try:
         return Response.success(
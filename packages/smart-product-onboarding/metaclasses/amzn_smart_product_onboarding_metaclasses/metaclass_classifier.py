@@ -9,6 +9,7 @@ from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_clien
     build_full_response,
     get_model_response,
 )
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
 from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
 from amzn_smart_product_onboarding_core_utils.logger import logger
 from amzn_smart_product_onboarding_core_utils.models import (
@@ -16,6 +17,13 @@ from amzn_smart_product_onboarding_core_utils.models import (
     Product,
     WordFinding,
 )
+from amzn_smart_product_onboarding_core_utils.stage_timer import (
+    STAGE_FAISS_SEARCH,
+    STAGE_PROMPT_RENDER,
+    STAGE_REPHRASE,
+    STAGE_SINGULARIZE,
+    STAGE_TIMER,
+)
 
 from amzn_smart_product_onboarding_metaclasses.category_vector_index import (
     CategoryVectorIndex,
@@ -57,14 +65,11 @@ class MetaclassClassifier:
         self.language = language
         self.model_id = model_id or DEFAULT_MODEL_ID
         self.temperature = temperature
+        # set per invocation, bounds the model and DynamoDB calls to the time the invocation has left
+        self.deadline: Deadline | None = None
 
-    def create_rephrase_prompt(
-        self,
-        product_text: str,
-    ) -> str:
-        """Use Jinja2 to fill in a prompt from the `product_category` template."""
         # nosemgrep: direct-use-of-jinja2,missing-autoescape-disabled - jinja2 output is not rendered by a browser
-        template = (
+        self.template = (
             #  amazonq-ignore-next-line
             jinja2.Environment(  # nosec B701 - template output is not used on a website
                 loader=jinja2.FileSystemLoader(os.path.join(os.path.dirname(__file__), "prompt_templates")),
@@ -73,8 +78,13 @@ class MetaclassClassifier:
             ).get_template("rephrase.jinja2")
         )
 
+    def create_rephrase_prompt(
+        self,
+        product_text: str,
+    ) -> str:
+        """Use Jinja2 to fill in a prompt from the `rephrase` template."""
         # nosemgrep: direct-use-of-jinja2 - jinja2 output is not rendered by a browser
-        prompt = template.render(
+        prompt = self.template.render(
             product_text=product_text,
             language=self.language,
         )
@@ -86,7 +96,8 @@ class MetaclassClassifier:
         response_close = '"}'
 
         product_text = "\n".join([product.title, product.short_description or "", product.description])
-        prompt = self.create_rephrase_prompt(product_text)
+        with STAGE_TIMER.stage(STAGE_PROMPT_RENDER):
+            prompt = self.create_rephrase_prompt(product_text)
         messages = [
             {
                 "role": "user",
@@ -98,14 +109,16 @@ class MetaclassClassifier:
             },
         ]
 
-        response = get_model_response(
-            self.bedrock,
-            self.model_id,
-            messages,
-            response_open,
-            response_close,
-            temperature=self.temperature,
-        )
+        with STAGE_TIMER.stage(STAGE_REPHRASE, self.model_id):
+            response = get_model_response(
+                self.bedrock,
+                self.model_id,
+                messages,
+                response_open,
+                response_close,
+                temperature=self.temperature,
+                deadline=self.deadline,
+            )
         logger.info({"usage": response["usage"]})
         text = build_full_response(response, response_open, response_close)
         logger.debug({"response_text": text})
@@ -120,7 +133,8 @@ class MetaclassClassifier:
         rephrased = self.normalize_product(product)
         logger.info(f"Rephrased title: {rephrased}")
         clean_text = rephrased.lower()
-        clean_text = self.text_cleaner.singularize_sentence(clean_text)
+        with STAGE_TIMER.stage(STAGE_SINGULARIZE):
+            clean_text = self.text_cleaner.singularize_sentence(clean_text)
         logger.info(f"Clean text: {clean_text}")
         words = clean_text.split()
         if len(words) > WORD_LIMIT:
@@ -179,11 +193,12 @@ class MetaclassClassifier:
         Check each word for matching category words using vector embeddings.
         """
         word_findings: list[WordFinding] = []
-        word_vectors = self.word_embeddings.get_vectors_by_words(words)
+        word_vectors = self.word_embeddings.get_vectors_by_words(words, deadline=self.deadline)
         for i, vector in enumerate(word_vectors):
             if vector is None:
                 continue
-            results = self.category_vector_index.search(vector, 1, 0.4)
+            with STAGE_TIMER.stage(STAGE_FAISS_SEARCH):
+                results = self.category_vector_index.search(vector, 1, 0.4)
             for word, distance in results:
                 word_findings.append(
                     WordFinding(
@@ -197,9 +212,14 @@ class MetaclassClassifier:
         return word_findings
 
     def get_possible_categories(self, findings: list[WordFinding]) -> list[str]:
-        """For each finding get the list of category IDs associated with each word."""
-        possible = set()
+        """For each finding get the list of category IDs associated with each word.
+
+        The categories are ranked by the summed score of the findings of their words, so the first ones are the most
+        likely, e.g. for speculative attribute extraction. Ties keep the order of the findings.
+        """
+        support: dict[str, float] = {}
         for finding in findings:
-            possible.update(self.word_map.get(finding.word, []))
+            for category_id in self.word_map.get(finding.word, []):
+                support[category_id] = support.get(category_id, 0) + finding.score
 
-        return list(possible)
+        return sorted(support, key=lambda category_id: -support[category_id])
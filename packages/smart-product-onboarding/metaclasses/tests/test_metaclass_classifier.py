@@ -165,7 +165,7 @@ def test_get_possible_categories(classifier):
     ]
 
     categories = classifier.get_possible_categories(findings)
-    assert set(categories) == {"BOOK_CATEGORY", "MATCHED_CATEGORY"}
+    assert categories == ["BOOK_CATEGORY", "MATCHED_CATEGORY"]
 
 
 def test_classify(classifier):
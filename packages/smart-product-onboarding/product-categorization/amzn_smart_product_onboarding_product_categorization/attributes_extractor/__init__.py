@@ -7,16 +7,34 @@ import operator
 import os
 import time
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 
 import jinja2
+from amzn_smart_product_onboarding_core_utils.appconfig_client import CascadeTier
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import converse_stream_until
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline, call_within
 from amzn_smart_product_onboarding_core_utils.exceptions import (
     ModelResponseError,
     RateLimitError,
     RetryableError,
 )
-from amzn_smart_product_onboarding_core_utils.json_to_xml import json_to_xml
+from amzn_smart_product_onboarding_core_utils.stage_timer import (
+    STAGE_CONVERSE,
+    STAGE_LEXICON,
+    STAGE_PROMPT_RENDER,
+    STAGE_SCHEMA_LOAD,
+    STAGE_TIMER,
+    STAGE_XML_PARSE,
+)
+from amzn_smart_product_onboarding_core_utils.structured_output import (
+    OUTPUT_MODE_TOOL,
+    OUTPUT_MODE_XML,
+    extract_tool_use,
+    tool_config,
+)
 from amzn_smart_product_onboarding_core_utils.xml_output import parse_response
+from amzn_smart_product_onboarding_core_utils.xml_stream import XmlStreamParser
 from botocore.exceptions import ClientError
 from cachetools import TTLCache, cachedmethod
 from pydantic import ValidationError
@@ -30,15 +48,39 @@ else:
 
 from amzn_smart_product_onboarding_core_utils.logger import logger
 from amzn_smart_product_onboarding_core_utils.models import (
+    Attribute,
     Attributes,
     CategorySchema,
     Product,
 )
 
+from amzn_smart_product_onboarding_product_categorization.model_cascade import (
+    REJECTED_DISAGREEMENT,
+    REJECTED_LOW_CONFIDENCE,
+    ModelCascade,
+)
+
 logger.name = "AttributesExtractor"
 
 EMPTY_RESPONSE = Attributes(attributes=[])
 
+ATTRIBUTES_TOOL_NAME = "record_attributes"
+ATTRIBUTES_TOOL_CONFIG = tool_config(
+    Attributes,
+    name=ATTRIBUTES_TOOL_NAME,
+    description="Record the attributes extracted from the product title and description.",
+    exclude=("confidence",),
+)
+CONFIDENT_ATTRIBUTES_TOOL_CONFIG = tool_config(
+    Attributes,
+    name=ATTRIBUTES_TOOL_NAME,
+    description="Record the attributes extracted from the product title and description and how confident you are.",
+)
+
+# shared by the extractions of an execution environment, each extraction of a partitioned schema waits for its calls
+_partition_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="attribute-partition")
+NULL_VALUES = {"", "null", "none"}
+
 
 class CategorySchemaNotFound(Exception): ...
 
@@ -61,8 +103,16 @@ class GPCSchemaRetriever(SchemaRetriever):
         self,
     ) -> None:
         schema_obj = io.BytesIO()
+        started = time.perf_counter()
         try:
             self.schema_storage.download_fileobj(Key=self.schema_path, Fileobj=schema_obj)
+            logger.info(
+                {
+                    "schema_download": self.schema_path,
+                    "s3_bytes": schema_obj.tell(),
+                    "s3_ms": round((time.perf_counter() - started) * 1000, 3),
+                }
+            )
             schema_obj.seek(0)
             self.schema = json.load(schema_obj)
         except ClientError as e:
@@ -82,6 +132,16 @@ class GPCSchemaRetriever(SchemaRetriever):
 
 
 class AttributesExtractor:
+    """Extract the attributes of a product from the attribute schema of its category.
+
+    :param partition_size: Most attributes per model call. Larger schemas are split into partitions of this size,
+        extracted concurrently and merged. ``None`` extracts the whole schema in one call.
+    :param lexicon: Extract the enumerated values that appear verbatim in the product title or description without
+        the model, which is only asked for the other attributes, or not called when none remain.
+    :param streaming: In the XML mode, stream the response and parse it as it arrives, so only its last delta is left
+        to parse once the model is done.
+    """
+
     response_open: str = "<response><scratchpad>"
     response_close: str = "</response>"
 
@@ -91,10 +151,20 @@ class AttributesExtractor:
         schema_retriever: SchemaRetriever,
         model_id: str | None = None,
         temperature: float = 0,
+        output_mode: str = OUTPUT_MODE_XML,
+        partition_size: int | None = None,
+        lexicon: bool = False,
+        streaming: bool = False,
     ):
         self.bedrock_runtime_client = bedrock_runtime_client
         self.schema_retriever = schema_retriever
         self.temperature = temperature
+        self.output_mode = output_mode
+        self.partition_size = partition_size
+        self.lexicon = lexicon
+        self.streaming = streaming
+        # set per invocation, bounds the model calls to the time the invocation has left
+        self.deadline: Deadline | None = None
 
         # nosemgrep: direct-use-of-jinja2,missing-autoescape-disabled - jinja2 output is not rendered by a browser
         self.template = jinja2.Environment(  # nosec B701 - template output is not used on a website
@@ -107,33 +177,157 @@ class AttributesExtractor:
         self.model_id = "global.anthropic.claude-sonnet-4-5-20250929-v1:0" if model_id is None else model_id
 
     def extract_attributes(self, product: Product, category_id: str) -> Attributes:
-        category_schema = self.schema_retriever.get(category_id)
+        category_schema = self._get_schema(category_id)
+        if category_schema is None:
+            return EMPTY_RESPONSE
 
+        return self._extract_schema(self.bedrock_runtime_client, category_schema, product)
+
+    def extract_attributes_cascade(
+        self,
+        product: Product,
+        category_id: str,
+        cascade: ModelCascade[Attributes],
+    ) -> Attributes:
+        """Extract with the first tier of *cascade* whose attributes parse and pass the tier's checks.
+
+        Tiers before the last ask for a self-reported confidence when they have a ``min_confidence``, and with
+        ``require_agreement`` only accept attributes named in the schema, with one of the enumerated values when the
+        schema lists them.
+        """
+        category_schema = self._get_schema(category_id)
         if category_schema is None:
             return EMPTY_RESPONSE
+        enumerated = schema_values(category_schema)
+
+        def call(tier: CascadeTier, bedrock, final: bool) -> Attributes:
+            request_confidence = not final and tier.min_confidence is not None
+            return self._extract_schema(
+                bedrock, category_schema, product, tier.model_id, tier.temperature, request_confidence
+            )
+
+        def rejection(attributes: Attributes, tier: CascadeTier) -> str | None:
+            if tier.min_confidence is not None and (attributes.confidence or 0) < tier.min_confidence:
+                return REJECTED_LOW_CONFIDENCE
+            if tier.require_agreement and not agrees_with_schema(attributes, enumerated):
+                return REJECTED_DISAGREEMENT
+            return None
+
+        return cascade.run(self.bedrock_runtime_client, call, rejection)
+
+    def _get_schema(self, category_id: str) -> CategorySchema | None:
+        with STAGE_TIMER.stage(STAGE_SCHEMA_LOAD):
+            category_schema = self.schema_retriever.get(category_id)
+
+        if category_schema is None:
+            return None
 
         logger.debug(f"CATEGORY SCHEMA: {category_schema.model_dump()}")
 
         if category_schema.attributes_schema is None:
             logger.warning(f"CATEGORY {category_schema.category_name} HAS NO ATTRIBUTE SCHEMA")
-            return EMPTY_RESPONSE
-
-        prompt = self.create_prompt(category_schema, product)
+            return None
+        return category_schema
 
-        messages = [
-            {"role": "user", "content": [{"text": prompt}]},
-            {"role": "assistant", "content": [{"text": self.response_open}]},
-        ]
+    def _extract_schema(
+        self,
+        bedrock_runtime_client: "BedrockRuntimeClient",
+        category_schema: CategorySchema,
+        product: Product,
+        model_id: str | None = None,
+        temperature: float | None = None,
+        request_confidence: bool = False,
+    ) -> Attributes:
+        """Extract the attributes of *category_schema*, in concurrent calls when it has more than one partition."""
+        matched = self._match_lexicon(category_schema, product) if self.lexicon else None
+        if matched:
+            # an exact match of a listed value is certain, it does not lower the confidence of the model's attributes
+            matched = Attributes(attributes=matched.attributes, confidence=1 if request_confidence else None)
+            category_schema = category_schema.without({attribute.name for attribute in matched.attributes})
+            if not category_schema.attributes_schema:
+                return matched
+
+        def extract(schema: CategorySchema) -> Attributes:
+            with STAGE_TIMER.stage(STAGE_PROMPT_RENDER):
+                prompt = self.create_prompt(schema, product, request_confidence=request_confidence)
+            return self._extract(bedrock_runtime_client, prompt, model_id, temperature, request_confidence)
+
+        partitions = category_schema.partitions(self.partition_size) if self.partition_size else [category_schema]
+        if len(partitions) == 1:
+            results = [extract(category_schema)]
+        else:
+            logger.info({"attribute_partitions": len(partitions), "partition_size": self.partition_size})
+            futures = [_partition_executor.submit(extract, partition) for partition in partitions]
+            try:
+                results = [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        if matched:
+            return merge_attributes([matched, *results])
+        return results[0] if len(results) == 1 else merge_attributes(results)
+
+    def _match_lexicon(self, category_schema: CategorySchema, product: Product) -> Attributes:
+        """The enumerated attributes whose value appears unambiguously in the product title or description."""
+        with STAGE_TIMER.stage(STAGE_LEXICON):
+            matches = category_schema.lexicon.match(f"{product.title}\n{product.description}")
+        logger.info(
+            {
+                "lexicon_attributes": len(matches),
+                "schema_attributes": len(category_schema.attributes_schema or []),
+            }
+        )
+        return Attributes(attributes=[Attribute(name=name, value=value) for name, value in matches.items()])
 
-        try:
-            response = self.bedrock_runtime_client.converse(
-                modelId=self.model_id,
-                inferenceConfig={
-                    "temperature": self.temperature,
+    def _extract(
+        self,
+        bedrock_runtime_client: "BedrockRuntimeClient",
+        prompt: str,
+        model_id: str | None = None,
+        temperature: float | None = None,
+        request_confidence: bool = False,
+    ) -> Attributes:
+        temperature = self.temperature if temperature is None else temperature
+        if self.output_mode == OUTPUT_MODE_TOOL:
+            converse_kwargs = {
+                "inferenceConfig": {"temperature": temperature},
+                "messages": [{"role": "user", "content": [{"text": prompt}]}],
+                "toolConfig": CONFIDENT_ATTRIBUTES_TOOL_CONFIG if request_confidence else ATTRIBUTES_TOOL_CONFIG,
+            }
+        else:
+            converse_kwargs = {
+                "inferenceConfig": {
+                    "temperature": temperature,
                     "stopSequences": [self.response_close],
                 },
-                messages=messages,
-            )
+                "messages": [
+                    {"role": "user", "content": [{"text": prompt}]},
+                    {"role": "assistant", "content": [{"text": self.response_open}]},
+                ],
+            }
+
+        parser = None
+        try:
+            with STAGE_TIMER.stage(STAGE_CONVERSE, model_id or self.model_id):
+                if self.streaming and self.output_mode != OUTPUT_MODE_TOOL:
+                    parser = XmlStreamParser()
+                    parser.feed(self.response_open)
+                    response, _ = converse_stream_until(
+                        bedrock_runtime_client,
+                        until=parser.watch,
+                        deadline=self.deadline,
+                        modelId=model_id or self.model_id,
+                        **converse_kwargs,
+                    )
+                else:
+                    response = call_within(
+                        self.deadline,
+                        "converse",
+                        bedrock_runtime_client.converse,
+                        modelId=model_id or self.model_id,
+                        **converse_kwargs,
+                    )
         except ClientError as e:
             # TODO: extract error handling to a decorator
             if e.response["Error"]["Code"] == "ThrottlingException":
@@ -146,26 +340,32 @@ class AttributesExtractor:
             ):
                 logger.exception(e)
                 raise RetryableError(e)
+            raise
         logger.info({"usage": response["usage"]})
-        attributes = self._parse_response(response)
+        if self.output_mode == OUTPUT_MODE_TOOL:
+            attributes = self._parse_tool_response(response)
+        else:
+            attributes = self._parse_response(response, parser)
         print(f"ATTRIBUTES ARE: {attributes}")
 
         return attributes
 
-    def create_prompt(self, category_schema, product: Product) -> str:
+    def create_prompt(self, category_schema, product: Product, request_confidence: bool = False) -> str:
         """Use Jinja2 to fill in a prompt from the `product_category` template."""
         prompt = self.template.render(
             category=category_schema.category_name,
             subcategory=category_schema.subcategory_name,
-            attributes_schema=json_to_xml(category_schema.attributes_schema),
+            attributes_schema=category_schema.attributes_schema_xml,
             product=product,
+            output_mode=self.output_mode,
+            request_confidence=request_confidence,
         )
 
         logger.debug(f"prompt: {prompt}")
 
         return prompt
 
-    def _parse_response(self, response) -> Attributes:
+    def _parse_response(self, response, parser: XmlStreamParser | None = None) -> Attributes:
         try:
             text = response["output"]["message"]["content"][0]["text"]
         except KeyError:
@@ -180,11 +380,64 @@ class AttributesExtractor:
             logger.error(f"Stop reason: {response['stopReason']}")
             raise ModelResponseError(f"Invalid stop reason: {response['stopReason']}")
         try:
-            parsed_response = parse_response(xml_response)
+            with STAGE_TIMER.stage(STAGE_XML_PARSE):
+                # a streamed response was fed to the parser as it arrived, only its last delta is left to parse
+                parsed_response = parser.close() if parser is not None else parse_response(xml_response)
             attributes = parsed_response["response"]["attributes"]["attribute"]
             attributes = [attributes] if not isinstance(attributes, list) else attributes
-            return Attributes.model_validate({"attributes": attributes})
-        except (ValueError, ValidationError, KeyError) as e:
+            confidence = parsed_response["response"].get("confidence")
+            return Attributes.model_validate({"attributes": attributes, "confidence": confidence})
+        except (ValueError, ValidationError, KeyError, TypeError) as e:
             logger.exception(e)
             logger.error(f"Failed to parse extracted attributes from response: {xml_response}")
             raise ModelResponseError("Failed to parse extracted attributes from response")
+
+    def _parse_tool_response(self, response) -> Attributes:
+        tool_use = extract_tool_use(response, ATTRIBUTES_TOOL_NAME)
+        try:
+            return Attributes.model_validate(tool_use["input"])
+        except ValidationError as e:
+            logger.exception(e)
+            logger.error(f"Failed to validate extracted attributes from tool input: {tool_use}")
+            raise ModelResponseError("Failed to parse extracted attributes from response") from e
+
+
+def _is_null(attribute: Attribute) -> bool:
+    return isinstance(attribute.value, str) and attribute.value.strip().lower() in NULL_VALUES
+
+
+def merge_attributes(results: list[Attributes]) -> Attributes:
+    """Merge the attributes extracted from the partitions of a schema, in partition order.
+
+    An attribute named by several partitions, compared case-insensitively, keeps its first value that is not null, so
+    the result does not depend on which call returned first. The confidence is the lowest of the partitions.
+    """
+    merged: dict[str, Attribute] = {}
+    for result in results:
+        for attribute in result.attributes:
+            key = attribute.name.strip().lower()
+            if key not in merged or (_is_null(merged[key]) and not _is_null(attribute)):
+                merged[key] = attribute
+    confidences = [result.confidence for result in results]
+    confidence = None if None in confidences else min(confidences)
+    return Attributes(attributes=list(merged.values()), confidence=confidence)
+
+
+def schema_values(category_schema: CategorySchema) -> dict[str, set[str]]:
+    """Attribute names of the schema mapped to their enumerated values, empty for free-form attributes."""
+    return {
+        attribute["Title"].lower(): {child["Title"].lower() for child in attribute.get("Childs") or []}
+        for attribute in category_schema.attributes_schema or []
+        if "Title" in attribute
+    }
+
+
+def agrees_with_schema(attributes: Attributes, enumerated: dict[str, set[str]]) -> bool:
+    """Whether every attribute is named in the schema and, when the schema enumerates its values, has one of them."""
+    for attribute in attributes.attributes:
+        values = enumerated.get(attribute.name.lower())
+        if values is None:
+            return False
+        if values and isinstance(attribute.value, str) and attribute.value.lower() not in values | {"null"}:
+            return False
+    return True
@@ -0,0 +1,319 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import hashlib
+import json
+import os
+import posixpath
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.models import CategorySchema
+from botocore.exceptions import ClientError
+from cachetools import LRUCache
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import SchemaRetriever
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3.service_resource import Bucket
+else:
+    Bucket = object
+
+DEFAULT_MAX_CATEGORIES = 512
+# how often the store asks S3 whether the schema changed, a check without a change transfers no body
+DEFAULT_CHECK_INTERVAL_SECONDS = 60
+_NOT_MODIFIED = ("304", "NotModified")
+
+PACKED_FORMAT = "packed-v1"
+# a schema path ending with it is the offset table of a packed schema, see pack_schemas
+PACKED_INDEX_SUFFIX = ".index.json"
+
+
+def pack_schemas(schemas: dict[str, Any], name: str = "attributes_schema") -> tuple[dict[str, Any], bytes]:
+    """Pack the category schemas of an attribute schema document into one file and its offset table.
+
+    The file holds one compact JSON record per line, the table maps each category ID to the offset and length of its
+    record, so that a reader fetches one category with a ranged GET. The file is named after its content, write it
+    before the table and a reader of the previous table keeps reading the previous file.
+
+    :return: The offset table, to write as ``<name>.index.json``, and the file, to write next to it as its ``data``
+    """
+    data = bytearray()
+    categories = {}
+    for category_id, schema in schemas.items():
+        record = json.dumps(schema, separators=(",", ":")).encode()
+        categories[str(category_id)] = [len(data), len(record)]
+        data += record + b"\n"
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    index = {"format": PACKED_FORMAT, "data": f"{name}.{digest}.jsonl", "categories": categories}
+    return index, bytes(data)
+
+
+class SchemaSource(ABC):
+    """Where the schema documents are read from."""
+
+    @abstractmethod
+    def read(self, key: str, etag: str | None = None) -> tuple[bytes | None, str]:
+        """Body and ETag of *key*, the body is None when the ETag is still *etag*."""
+
+    @abstractmethod
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        """*length* bytes of *key* from *offset*."""
+
+
+class S3SchemaSource(SchemaSource):
+    """Documents of an S3 bucket, read with conditional and ranged GETs."""
+
+    def __init__(self, bucket: Bucket):
+        self.bucket = bucket
+
+    def read(self, key: str, etag: str | None = None) -> tuple[bytes | None, str]:
+        conditions = {"IfNoneMatch": etag} if etag else {}
+        try:
+            response = self.bucket.Object(key).get(**conditions)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in _NOT_MODIFIED:
+                return None, etag
+            raise
+        return response["Body"].read(), response["ETag"]
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        response = self.bucket.Object(key).get(Range=f"bytes={offset}-{offset + length - 1}")
+        return response["Body"].read()
+
+    def __str__(self) -> str:
+        return str(self.bucket)
+
+
+class LocalSchemaSource(SchemaSource):
+    """Documents of a local directory, for tests and benchmarks. The ETag is the file's size and modification time."""
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+
+    def read(self, key: str, etag: str | None = None) -> tuple[bytes | None, str]:
+        path = self.root / key
+        stat = path.stat()
+        current = f'"{stat.st_size}-{stat.st_mtime_ns}"'
+        if current == etag:
+            return None, etag
+        return path.read_bytes(), current
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        with open(self.root / key, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def __str__(self) -> str:
+        return str(self.root)
+
+
+class CategorySchemaStore(SchemaRetriever):
+    """Category schemas of the attribute schema document, kept for the life of the execution environment.
+
+    Create it once per module, not per invocation. The document is downloaded once and again only when its ETag
+    changed, checked with a conditional GET at most every ``check_interval_seconds``. The schema of a category is only
+    validated when it is first asked for, and the validated schemas are kept in an LRU of ``max_categories``.
+
+    The store is shared by concurrent extractions. Reads from the storage run outside the lock, which only guards the
+    cache: a request for a category already being read waits for that read, other categories are read concurrently,
+    and the schemas loaded keep being served while a version check runs.
+
+    :param schema_storage: S3 bucket of the document, or another source of it
+    :param schema_path: Key of the document, a JSON object of category IDs to category schemas
+    """
+
+    def __init__(
+        self,
+        schema_storage: "Bucket | SchemaSource",
+        schema_path: str,
+        max_categories: int = DEFAULT_MAX_CATEGORIES,
+        check_interval_seconds: float = DEFAULT_CHECK_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.schema_storage = schema_storage
+        self.source = schema_storage if isinstance(schema_storage, SchemaSource) else S3SchemaSource(schema_storage)
+        self.schema_path = schema_path
+        self.check_interval_seconds = check_interval_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._document: dict[str, Any] | None = None
+        self._etag: str | None = None
+        self._checked_at = 0.0
+        self._schemas: LRUCache[str, CategorySchema | None] = LRUCache(maxsize=max_categories)
+        # the version check and the category reads in flight, for the requests arriving meanwhile to wait for
+        self._checking: Future | None = None
+        self._reading: dict[str, Future] = {}
+        self.counters: Counter[str] = Counter()
+        self.s3_ms = 0.0
+
+    @property
+    def version(self) -> str | None:
+        """ETag of the document the schemas are read from."""
+        return self._etag
+
+    def get(self, category_id: str) -> CategorySchema | None:
+        self._check_version()
+        with self._lock:
+            if category_id in self._schemas:
+                self.counters["hits"] += 1
+                return self._schemas[category_id]
+            reading = self._reading.get(category_id)
+            reader = reading is None
+            if reader:
+                self.counters["misses"] += 1
+                reading = self._reading[category_id] = Future()
+                document, etag = self._document, self._etag
+            else:
+                self.counters["waits"] += 1
+        if not reader:
+            return reading.result()
+
+        try:
+            record = self._record(document, category_id)
+            if record is None:
+                logger.error(f"DID NOT FIND CATEGORY {category_id}")
+                schema = None
+            else:
+                schema = CategorySchema.model_validate(record)
+        except BaseException as e:
+            with self._lock:
+                del self._reading[category_id]
+            reading.set_exception(e)
+            raise
+        with self._lock:
+            del self._reading[category_id]
+            # a schema read from a version replaced meanwhile is not cached
+            if etag == self._etag:
+                self._schemas[category_id] = schema
+        reading.set_result(schema)
+        return schema
+
+    def _record(self, document: dict[str, Any], category_id: str) -> dict[str, Any] | None:
+        return document.get(category_id)
+
+    def _load(self, body: bytes) -> dict[str, Any]:
+        return json.loads(body)
+
+    def _count_read(self, started: float, body: bytes | None) -> None:
+        with self._lock:
+            self.s3_ms += (time.perf_counter() - started) * 1000
+            self.counters["s3_requests"] += 1
+            if body is not None:
+                self.counters["s3_bytes"] += len(body)
+
+    def _check_version(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._document is not None and now - self._checked_at < self.check_interval_seconds:
+                return
+            checking = self._checking
+            checker = checking is None
+            if checker:
+                checking = self._checking = Future()
+                self._checked_at = now
+                etag = self._etag
+            elif self._document is not None:
+                # another request is checking, the schemas loaded stay in use meanwhile
+                return
+        if not checker:
+            checking.result()
+            return
+
+        try:
+            self._read_version(etag)
+        except BaseException as e:
+            with self._lock:
+                self._checking = None
+            checking.set_exception(e)
+            raise
+        with self._lock:
+            self._checking = None
+        checking.set_result(None)
+
+    def _read_version(self, etag: str | None) -> None:
+        started = time.perf_counter()
+        try:
+            body, etag = self.source.read(self.schema_path, etag)
+        except (ClientError, OSError) as e:
+            self._count_read(started, None)
+            if self._document is not None:
+                # the check failed, the schemas already loaded stay valid until the next one
+                logger.warning({"schema_version_check_failed": self.schema_path, "error": str(e)})
+                return
+            raise Exception(
+                f"Failed to load schema from storage {self.schema_storage} and path {self.schema_path}: {str(e)}"
+            ) from e
+        self._count_read(started, body)
+        if body is None:
+            with self._lock:
+                self.counters["not_modified"] += 1
+            return
+        document = self._load(body)
+        with self._lock:
+            self.counters["versions"] += 1
+            self._document, self._etag = document, etag
+            self._schemas.clear()
+        logger.info({"schema_version": etag, "schema_path": self.schema_path, "s3_bytes": len(body)})
+
+    def metrics(self, reset: bool = False) -> dict[str, Any]:
+        """S3 requests, bytes and latency, and LRU hits and misses, since the last reset."""
+        with self._lock:
+            metrics = {
+                "s3_requests": 0,
+                "s3_bytes": 0,
+                **self.counters,
+                "s3_ms": round(self.s3_ms, 3),
+                "cached_categories": len(self._schemas),
+            }
+            if reset:
+                self.counters.clear()
+                self.s3_ms = 0.0
+        return metrics
+
+
+class PackedCategorySchemaStore(CategorySchemaStore):
+    """Category schemas of a packed attribute schema, see ``pack_schemas``.
+
+    Only the offset table is downloaded and version checked, the schema of a category is fetched with a ranged GET of
+    its record when it is first asked for.
+
+    :param schema_path: Key of the offset table, the packed file is read from the same prefix
+    """
+
+    def _load(self, body: bytes) -> dict[str, Any]:
+        index = json.loads(body)
+        if index.get("format") != PACKED_FORMAT:
+            raise ValueError(f"{self.schema_path} is not a {PACKED_FORMAT} schema index")
+        return {**index, "data": posixpath.join(posixpath.dirname(self.schema_path), index["data"])}
+
+    def _record(self, document: dict[str, Any], category_id: str) -> dict[str, Any] | None:
+        location = document["categories"].get(category_id)
+        if location is None:
+            return None
+        offset, length = location
+        started = time.perf_counter()
+        record = None
+        try:
+            record = self.source.read_range(document["data"], offset, length)
+        except (ClientError, OSError) as e:
+            raise Exception(
+                f"Failed to load schema from storage {self.schema_storage} and path {document['data']}: {str(e)}"
+            ) from e
+        finally:
+            self._count_read(started, record)
+        return json.loads(record)
+
+
+def category_schema_store(schema_storage: "Bucket | SchemaSource", schema_path: str, **kwargs) -> CategorySchemaStore:
+    """The store of the schema at *schema_path*, packed when it is the offset table of a packed schema."""
+    if schema_path.endswith(PACKED_INDEX_SUFFIX):
+        return PackedCategorySchemaStore(schema_storage, schema_path, **kwargs)
+    return CategorySchemaStore(schema_storage, schema_path, **kwargs)
@@ -6,28 +6,38 @@ import os
 from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigClient
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
+    use_throughput_lane,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
     LAMBDA_S3_RESOURCE,
 )
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
 from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.model_routing import ModelRouter, UsageMeter
 from amzn_smart_product_onboarding_core_utils.models import (
     Attribute,
+    Attributes,
     ExtractAttributesRequest,
     ExtractAttributesResponse,
     ExtractAttributesResponseDict,
 )
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
+from amzn_smart_product_onboarding_core_utils.structured_output import OUTPUT_MODE_XML
 from aws_lambda_powertools.utilities.parser import event_parser
 
-from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
-    AttributesExtractor,
-    GPCSchemaRetriever,
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    category_schema_store,
 )
+from amzn_smart_product_onboarding_product_categorization.model_cascade import ModelCascade
 
 logger.name = "AttributeExtraction"
 
 CONFIG_BUCKET_NAME = os.getenv("CONFIG_BUCKET_NAME")
 CONFIG_BUCKET = LAMBDA_S3_RESOURCE.Bucket(CONFIG_BUCKET_NAME)
+# data/attributes_schema.index.json reads the packed schema written by the configuration script
+ATTRIBUTES_SCHEMA_PATH = os.getenv("ATTRIBUTES_SCHEMA_PATH", "data/attributes_schema.json")
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "us.amazon.nova-premier-v1:0")
 
 # AppConfig client for runtime configuration
@@ -36,30 +46,63 @@ appconfig_client = AppConfigClient(
     environment_id=os.getenv("APPCONFIG_ENVIRONMENT_ID", ""),
     configuration_profile_id=os.getenv("APPCONFIG_CONFIGURATION_PROFILE_ID", ""),
 )
+bedrock = UsageMeter(LAMBDA_BEDROCK_RUNTIME_CLIENT)
 
+# kept across invocations so their metrics cover the life of the execution environment
+router = ModelRouter("attributeExtraction")
+cascade: ModelCascade[Attributes] | None = None
+schema_store = category_schema_store(schema_storage=CONFIG_BUCKET, schema_path=ATTRIBUTES_SCHEMA_PATH)
 
+
+@STAGE_TIMER.flush_after
 @event_parser(model=ExtractAttributesRequest)
-def handler(event: ExtractAttributesRequest, _) -> ExtractAttributesResponseDict:
+def handler(event: ExtractAttributesRequest, context) -> ExtractAttributesResponseDict:
+    global cascade
     logger.debug(f"Event received: {event.model_dump_json()}")
+    use_throughput_lane(event.lane)
 
     # Fetch runtime configuration from AppConfig
     config = appconfig_client.get_configuration("attributeExtraction")
     if config:
+        config = router.choose(config)
         model_id = config.model_id
         temperature = config.temperature
+        output_mode = config.output_mode
+        partition_size = config.partition_size
+        lexicon = config.lexicon
     else:
         model_id = BEDROCK_MODEL_ID
         temperature = 0
+        output_mode = OUTPUT_MODE_XML
+        partition_size = None
+        lexicon = False
 
-    schema_retriever = GPCSchemaRetriever(schema_storage=CONFIG_BUCKET, schema_path="data/attributes_schema.json")
     attributes_extractor = AttributesExtractor(
-        bedrock_runtime_client=LAMBDA_BEDROCK_RUNTIME_CLIENT,
-        schema_retriever=schema_retriever,
+        bedrock_runtime_client=bedrock,
+        schema_retriever=schema_store,
         model_id=model_id,
         temperature=temperature,
+        output_mode=output_mode,
+        partition_size=partition_size,
+        lexicon=lexicon,
     )
+    attributes_extractor.deadline = Deadline.from_context(context)
 
-    extracted_attributes = attributes_extractor.extract_attributes(event.product, event.category.predicted_category_id)
+    with router.track(model_id, bedrock):
+        if config and config.cascade:
+            if cascade is None or cascade.tiers != config.tiers:
+                cascade = ModelCascade("attributeExtraction", config.tiers)
+            extracted_attributes = attributes_extractor.extract_attributes_cascade(
+                event.product, event.category.predicted_category_id, cascade
+            )
+            logger.info({"cascade_metrics": cascade.metrics()})
+        else:
+            extracted_attributes = attributes_extractor.extract_attributes(
+                event.product, event.category.predicted_category_id
+            )
+    logger.info({"model_metrics": router.metrics()})
+    log_bedrock_client_metrics()
+    logger.info({"schema_store": schema_store.metrics(reset=True)})
 
     response = ExtractAttributesResponse(
         attributes=[Attribute(name=attr.name, value=attr.value) for attr in extracted_attributes.attributes]
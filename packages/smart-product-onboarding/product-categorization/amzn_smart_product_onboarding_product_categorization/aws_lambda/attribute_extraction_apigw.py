@@ -17,6 +17,7 @@ from amzn_smart_product_onboarding_api_runtime.response import Response
 
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
     LAMBDA_S3_RESOURCE,
@@ -27,40 +28,44 @@ from amzn_smart_product_onboarding_core_utils.exceptions import (
     ModelResponseError,
 )
 from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
 from amzn_smart_product_onboarding_core_utils.models import Product
 from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
-    GPCSchemaRetriever,
     AttributesExtractor,
 )
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    category_schema_store,
+)
 
 logger.name = "AttributeExtraction"
 
 CONFIG_BUCKET_NAME = os.getenv("CONFIG_BUCKET_NAME")
 CONFIG_BUCKET = LAMBDA_S3_RESOURCE.Bucket(CONFIG_BUCKET_NAME)
+# data/attributes_schema.index.json reads the packed schema written by the configuration script
+ATTRIBUTES_SCHEMA_PATH = os.getenv("ATTRIBUTES_SCHEMA_PATH", "data/attributes_schema.json")
 MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+# API Gateway calls are latency critical: parse the response as it streams in
+STREAMING = os.getenv("STREAMING", "True") == "True"
 
 if os.getenv("BEDROCK_XACCT_ROLE") and MODEL_ID[:3] != "us.":
     # when using cross-acct roles we would like to use CRIS (Cross-Region Inference)
     MODEL_ID = "us." + MODEL_ID
 
+# kept for the life of the execution environment, only downloads the schema again when it changed
+schema_store = category_schema_store(schema_storage=CONFIG_BUCKET, schema_path=ATTRIBUTES_SCHEMA_PATH)
+
 
+@STAGE_TIMER.flush_after
 def extract_attributes(
     event: ExtractAttributesRequest, **kwargs
 ) -> ExtractAttributesOperationResponses:
     logger.debug(f"Event received: {event}")
 
-    try:
-        schema_retriever = GPCSchemaRetriever(
-            schema_storage=CONFIG_BUCKET, schema_path="data/attributes_schema.json"
-        )
-    except Exception as e:
-        logger.exception(e)
-        logger.error(f"Error while retrieving schema: {e}")
-        return Response.internal_failure("Internal server error")
     attributes_extractor = AttributesExtractor(
         bedrock_runtime_client=LAMBDA_BEDROCK_RUNTIME_CLIENT,
-        schema_retriever=schema_retriever,
+        schema_retriever=schema_store,
         model_id=MODEL_ID,
+        streaming=STREAMING,
     )
 
     try:
@@ -80,6 +85,8 @@ def extract_attributes(
         logger.exception(e)
         logger.error(f"Error while extracting attributes: {e}")
         return Response.internal_failure("Internal server error")
+    logger.info({"schema_store": schema_store.metrics(reset=True)})
+    log_bedrock_client_metrics()
 
     try:
         response = ExtractAttributesResponseContent(
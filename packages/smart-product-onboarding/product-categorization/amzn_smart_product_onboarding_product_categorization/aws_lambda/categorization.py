@@ -4,26 +4,37 @@
 import json
 import os
 
-from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigClient
+from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigClient, AppConfigSettings
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
+    use_throughput_lane,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
     LAMBDA_S3_CLIENT,
+    LAMBDA_S3_RESOURCE,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.ssm_client import (
     LAMBDA_SSM_CLIENT,
 )
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
 from amzn_smart_product_onboarding_core_utils.logger import logger
-from amzn_smart_product_onboarding_core_utils.models import (
-    ProductCategory,
-    ProductReadyForCategorization,
-)
+from amzn_smart_product_onboarding_core_utils.model_routing import ModelRouter, UsageMeter
+from amzn_smart_product_onboarding_core_utils.models import CategorizationPrediction, ProductReadyForCategorization
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
+from amzn_smart_product_onboarding_core_utils.structured_output import OUTPUT_MODE_XML
 from aws_lambda_powertools.utilities.parser import event_parser
 
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    category_schema_store,
+)
+from amzn_smart_product_onboarding_product_categorization.model_cascade import ModelCascade
 from amzn_smart_product_onboarding_product_categorization.product_classifier import (
     ProductClassifier,
 )
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import (
+    CategoryStore,
+)
 
 logger.name = "categorization_handler"
 
@@ -31,6 +42,9 @@ CONFIG_BUCKET_NAME = os.getenv("CONFIG_BUCKET_NAME")
 CONFIG_PATHS_PARAM = os.getenv("CONFIG_PATHS_PARAM")
 DEMO = os.getenv("DEMO", False) == "True"
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+# the combined categorization and attribute extraction call uses the attribute extraction model
+ATTRIBUTES_MODEL_ID = os.getenv("ATTRIBUTES_MODEL_ID", "us.amazon.nova-premier-v1:0")
+ATTRIBUTES_SCHEMA_PATH = os.getenv("ATTRIBUTES_SCHEMA_PATH", "data/attributes_schema.json")
 
 if os.getenv("BEDROCK_XACCT_ROLE") and BEDROCK_MODEL_ID[:3] != "us.":
     # when using cross-acct roles we would like to use CRIS (Cross-Region Inference)
@@ -38,7 +52,7 @@ if os.getenv("BEDROCK_XACCT_ROLE") and BEDROCK_MODEL_ID[:3] != "us.":
 
 ssm = LAMBDA_SSM_CLIENT
 s3 = LAMBDA_S3_CLIENT
-bedrock = LAMBDA_BEDROCK_RUNTIME_CLIENT
+bedrock = UsageMeter(LAMBDA_BEDROCK_RUNTIME_CLIENT)
 
 # AppConfig client for runtime configuration
 appconfig_client = AppConfigClient(
@@ -49,43 +63,119 @@ appconfig_client = AppConfigClient(
 
 # download and load config files
 config_paths: dict[str, str] = json.loads(ssm.get_parameter(Name=CONFIG_PATHS_PARAM)["Parameter"]["Value"])
-category_tree: dict[str, ProductCategory] = {
-    k: ProductCategory.model_validate(v)
-    for k, v in json.loads(
-        s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["categoryTree"])["Body"].read()
-    ).items()
-}
+category_tree = CategoryStore.from_json(
+    s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["categoryTree"])["Body"].read()
+)
 always_categories: list[str] = json.loads(
     s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["alwaysCategories"])["Body"].read()
 )
 
 product_classifier = ProductClassifier(
-    bedrock=LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    bedrock=bedrock,
     category_tree=category_tree,
     always_categories=always_categories,
     include_prompt=DEMO,
     model_id=BEDROCK_MODEL_ID,
 )
+# kept across invocations so their metrics cover the life of the execution environment
+router = ModelRouter("productCategorization")
+cascade: ModelCascade[CategorizationPrediction] | None = None
+schema_store = category_schema_store(
+    schema_storage=LAMBDA_S3_RESOURCE.Bucket(CONFIG_BUCKET_NAME), schema_path=ATTRIBUTES_SCHEMA_PATH
+)
 
 
+@STAGE_TIMER.flush_after
 @event_parser(model=ProductReadyForCategorization)
-def handler(event: ProductReadyForCategorization, _):
+def handler(event: ProductReadyForCategorization, context):
     logger.debug(f"Event received {event.model_dump_json()}")
+    use_throughput_lane(event.lane)
 
     # Fetch runtime configuration from AppConfig
     config = appconfig_client.get_configuration("productCategorization")
     if config:
+        config = router.choose(config)
         product_classifier.model_id = config.model_id
         product_classifier.temperature = config.temperature
+        product_classifier.output_mode = config.output_mode
     else:
         product_classifier.model_id = BEDROCK_MODEL_ID
         product_classifier.temperature = 0
+        product_classifier.output_mode = OUTPUT_MODE_XML
+    product_classifier.deadline = Deadline.from_context(context)
 
-    prediction = product_classifier.classify(
-        event.product,
-        event.metaclass.possible_categories,
-        include_prompt=event.demo,
-        dryrun=event.dryrun,
-    )
+    attributes = None
+    extraction_config = _combined_extraction_config(event, config)
+    if extraction_config:
+        # few candidates: categorize and extract the attributes in one call, skipping the attribute extraction task
+        model_id = router.choose(extraction_config).model_id
+        with router.track(model_id, bedrock):
+            prediction, attributes = product_classifier.classify_and_extract(
+                event.product,
+                event.metaclass.possible_categories,
+                schema_store,
+                model_id=model_id,
+                include_prompt=event.demo,
+            )
+        logger.info({"schema_store": schema_store.metrics(reset=True)})
+        if prediction is None:
+            # the prediction could not be repaired, classifying again is a call to the categorization model
+            prediction = _classify(event, config)
+    else:
+        prediction = _classify(event, config)
+    logger.info({"model_metrics": router.metrics()})
+    log_bedrock_client_metrics()
     logger.debug(f"Prediction: {prediction.model_dump_json()}")
+    if attributes is not None:
+        # read by the workflow in place of the attribute extraction task's output
+        return {**prediction.model_dump(), "attributes": attributes.model_dump()["attributes"]}
     return prediction.model_dump()
+
+
+def _combined_extraction_config(
+    event: ProductReadyForCategorization, config: AppConfigSettings | None
+) -> AppConfigSettings | None:
+    """The attribute extraction settings of a combined call, or ``None`` when the calls are made separately.
+
+    The combined call uses a model picked among the attribute extraction routes. Neither component's cascade applies
+    to it, so a cascade configured for either one keeps the calls separate.
+    """
+    if (
+        not config
+        or config.combined_max_candidates <= 0
+        or config.cascade
+        or event.dryrun
+        or len(event.metaclass.possible_categories) > config.combined_max_candidates
+    ):
+        return None
+    # from the document just polled, as a second poll in the invocation would find nothing changed
+    extraction_config = appconfig_client.get_cached_configuration("attributeExtraction")
+    if extraction_config is None:
+        return AppConfigSettings(model_id=ATTRIBUTES_MODEL_ID, temperature=0)
+    if extraction_config.cascade:
+        # run by the attribute extraction task
+        return None
+    return extraction_config
+
+
+def _classify(event: ProductReadyForCategorization, config: AppConfigSettings | None) -> CategorizationPrediction:
+    global cascade
+    with router.track(product_classifier.model_id, bedrock):
+        if config and config.cascade and not event.dryrun:
+            if cascade is None or cascade.tiers != config.tiers:
+                cascade = ModelCascade("productCategorization", config.tiers)
+            prediction = product_classifier.classify_cascade(
+                event.product,
+                event.metaclass.possible_categories,
+                cascade,
+                include_prompt=event.demo,
+            )
+            logger.info({"cascade_metrics": cascade.metrics()})
+        else:
+            prediction = product_classifier.classify(
+                event.product,
+                event.metaclass.possible_categories,
+                include_prompt=event.demo,
+                dryrun=event.dryrun,
+            )
+    return prediction
@@ -6,6 +6,7 @@ import os
 
 from amzn_smart_product_onboarding_api_runtime import (
     CategorizeProductResponseContent,
+    ProductAttribute,
 )
 from amzn_smart_product_onboarding_api_runtime.api.operation_config import (
     categorize_product_handler,
@@ -17,9 +18,11 @@ from amzn_smart_product_onboarding_api_runtime.response import Response
 
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
     LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    log_bedrock_client_metrics,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
     LAMBDA_S3_CLIENT,
+    LAMBDA_S3_RESOURCE,
 )
 from amzn_smart_product_onboarding_core_utils.boto3_helper.ssm_client import (
     LAMBDA_SSM_CLIENT,
@@ -30,10 +33,23 @@ from amzn_smart_product_onboarding_core_utils.exceptions import (
     ModelResponseError,
 )
 from amzn_smart_product_onboarding_core_utils.logger import logger
-from amzn_smart_product_onboarding_core_utils.models import ProductCategory
+from amzn_smart_product_onboarding_core_utils.stage_timer import STAGE_TIMER
+from amzn_smart_product_onboarding_core_utils.models import Product
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
+    AttributesExtractor,
+)
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    category_schema_store,
+)
 from amzn_smart_product_onboarding_product_categorization.product_classifier import (
     ProductClassifier,
 )
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import (
+    CategoryStore,
+)
+from amzn_smart_product_onboarding_product_categorization.speculative_extraction import (
+    SpeculativeExtraction,
+)
 
 logger.name = "categorization_handler"
 
@@ -41,10 +57,21 @@ CONFIG_BUCKET_NAME = os.getenv("CONFIG_BUCKET_NAME")
 CONFIG_PATHS_PARAM = os.getenv("CONFIG_PATHS_PARAM")
 DEMO = os.getenv("DEMO", False) == "True"
 MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+# API Gateway calls are latency critical: stream the response and stop reading once the prediction closes
+STREAMING = os.getenv("STREAMING", "True") == "True"
+MAX_THINKING_CHARS = int(os.environ["MAX_THINKING_CHARS"]) if os.getenv("MAX_THINKING_CHARS") else None
+# used when the request asks for the attributes too
+ATTRIBUTES_MODEL_ID = os.getenv("ATTRIBUTES_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+ATTRIBUTES_SCHEMA_PATH = os.getenv("ATTRIBUTES_SCHEMA_PATH", "data/attributes_schema.json")
+# top-ranked possible categories whose attributes are extracted while the product is categorized
+SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", "1"))
 
-if os.getenv("BEDROCK_XACCT_ROLE") and MODEL_ID[:3] != "us.":
+if os.getenv("BEDROCK_XACCT_ROLE"):
     # when using cross-acct roles we would like to use CRIS (Cross-Region Inference)
-    MODEL_ID = "us." + MODEL_ID
+    if MODEL_ID[:3] != "us.":
+        MODEL_ID = "us." + MODEL_ID
+    if ATTRIBUTES_MODEL_ID[:3] != "us.":
+        ATTRIBUTES_MODEL_ID = "us." + ATTRIBUTES_MODEL_ID
 
 ssm = LAMBDA_SSM_CLIENT
 s3 = LAMBDA_S3_CLIENT
@@ -54,14 +81,11 @@ bedrock = LAMBDA_BEDROCK_RUNTIME_CLIENT
 config_paths: dict[str, str] = json.loads(
     ssm.get_parameter(Name=CONFIG_PATHS_PARAM)["Parameter"]["Value"]
 )
-category_tree: dict[str, ProductCategory] = {
-    k: ProductCategory.model_validate(v)
-    for k, v in json.loads(
-        s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["categoryTree"])[
-            "Body"
-        ].read()
-    ).items()
-}
+category_tree = CategoryStore.from_json(
+    s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["categoryTree"])[
+        "Body"
+    ].read()
+)
 always_categories: list[str] = json.loads(
     s3.get_object(Bucket=CONFIG_BUCKET_NAME, Key=config_paths["alwaysCategories"])[
         "Body"
@@ -74,19 +98,60 @@ product_classifier = ProductClassifier(
     always_categories=always_categories,
     include_prompt=DEMO,
     model_id=MODEL_ID,
+    streaming=STREAMING,
+    max_thinking_chars=MAX_THINKING_CHARS,
+)
+
+schema_store = category_schema_store(
+    schema_storage=LAMBDA_S3_RESOURCE.Bucket(CONFIG_BUCKET_NAME),
+    schema_path=ATTRIBUTES_SCHEMA_PATH,
+)
+attributes_extractor = AttributesExtractor(
+    bedrock_runtime_client=LAMBDA_BEDROCK_RUNTIME_CLIENT,
+    schema_retriever=schema_store,
+    model_id=ATTRIBUTES_MODEL_ID,
+    streaming=STREAMING,
+)
+speculation = SpeculativeExtraction(
+    "categorizeProduct", candidates=SPECULATIVE_CANDIDATES
 )
 
 
+@STAGE_TIMER.flush_after
 def categorize_product(
     event: CategorizeProductRequest, **kwargs
 ) -> CategorizeProductOperationResponses:
     logger.debug(f"Event received {event}")
-    try:
-        prediction = product_classifier.classify(
+
+    def categorize():
+        return product_classifier.classify(
             event.body.product,
             event.body.possible_categories,
             include_prompt=event.body.demo,
         )
+
+    extracted_attributes = None
+    try:
+        if event.body.extract_attributes:
+            # possibleCategories come ranked from the metaclass endpoint
+            prediction, extracted_attributes = speculation.run(
+                attributes_extractor,
+                Product(
+                    title=event.body.product.title,
+                    description=event.body.product.description,
+                    metadata=event.body.product.metadata,
+                ),
+                event.body.possible_categories,
+                categorize,
+            )
+            logger.info(
+                {
+                    "speculation_metrics": speculation.metrics(),
+                    "schema_store": schema_store.metrics(reset=True),
+                }
+            )
+        else:
+            prediction = categorize()
     except (RateLimitError, RetryableError, ModelResponseError) as e:
         logger.exception(e)
         logger.error(f"Retryable error while categorizing: {e}")
@@ -96,6 +161,7 @@ def categorize_product(
         logger.error(f"Error while categorizing: {e}")
         return Response.internal_failure("Internal server error")
 
+    log_bedrock_client_metrics()
     logger.debug(f"Prediction: {prediction.model_dump_json()}")
     try:
         return Response.success(
@@ -107,6 +173,14 @@ def categorize_product(
                 ].formatted_path,
                 explanation=prediction.explanation,
                 prompt=prediction.prompt if event.body.demo else None,
+                attributes=(
+                    [
+                        ProductAttribute(name=attr.name, value=attr.value)
+                        for attr in extracted_attributes.attributes
+                    ]
+                    if extracted_attributes is not None
+                    else None
+                ),
             )
         )
     except Exception as e:
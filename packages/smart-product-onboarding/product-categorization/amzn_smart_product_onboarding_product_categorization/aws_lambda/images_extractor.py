@@ -3,6 +3,7 @@
 
 import os
 
+from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
 from aws_lambda_powertools.utilities.parser import event_parser
 
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import (
@@ -14,7 +15,10 @@ from amzn_smart_product_onboarding_core_utils.models import (
     ExtractImagesResponseDict,
     ExtractImagesResponse,
 )
+from amzn_smart_product_onboarding_core_utils.stage_timer import DEFAULT_NAMESPACE
 from amzn_smart_product_onboarding_product_categorization.images_extractor import (
+    DECOMPRESSION_WORKERS,
+    UPLOAD_WORKERS,
     ImagesExtractor,
 )
 
@@ -23,6 +27,10 @@ logger.name = "ImagesExtractor"
 IMAGES_BUCKET_NAME = os.getenv("IMAGES_BUCKET_NAME")
 if not IMAGES_BUCKET_NAME:
     raise ValueError("IMAGES_BUCKET_NAME environment variable not set")
+IMAGE_DECOMPRESSION_WORKERS = int(os.getenv("IMAGE_DECOMPRESSION_WORKERS", str(DECOMPRESSION_WORKERS)))
+IMAGE_UPLOAD_WORKERS = int(os.getenv("IMAGE_UPLOAD_WORKERS", str(UPLOAD_WORKERS)))
+
+metrics = EphemeralMetrics(namespace=os.getenv("POWERTOOLS_METRICS_NAMESPACE", DEFAULT_NAMESPACE))
 
 
 @event_parser(model=ExtractImagesRequest)
@@ -34,7 +42,20 @@ def handler(event: ExtractImagesRequest, _) -> ExtractImagesResponseDict:
     images_prefix = event.prefix
     logger.info(f"Extracting images from {images_zip_key} to {images_prefix}")
 
-    extractor = ImagesExtractor(s3=LAMBDA_S3_CLIENT, bucket=IMAGES_BUCKET_NAME)
-    extractor.process_zip_file(images_zip_key, images_prefix)
+    extractor = ImagesExtractor(
+        s3=LAMBDA_S3_CLIENT,
+        bucket=IMAGES_BUCKET_NAME,
+        decompression_workers=IMAGE_DECOMPRESSION_WORKERS,
+        upload_workers=IMAGE_UPLOAD_WORKERS,
+        queue_size=2 * IMAGE_UPLOAD_WORKERS,
+    )
+    extraction = extractor.process_zip_file(images_zip_key, images_prefix)
+
+    metrics.add_metric(name="ExtractedImages", unit=MetricUnit.Count, value=extraction.images)
+    metrics.add_metric(name="ExtractedImagesRate", unit=MetricUnit.CountPerSecond, value=extraction.images_per_second)
+    metrics.add_metric(
+        name="ExtractedImagesThroughput", unit=MetricUnit.MegabytesPerSecond, value=extraction.mb_per_second
+    )
+    metrics.flush_metrics()
 
     return ExtractImagesResponse(images_prefix=images_prefix).model_dump()
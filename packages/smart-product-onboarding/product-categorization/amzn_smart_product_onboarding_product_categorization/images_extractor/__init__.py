@@ -1,44 +1,208 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import queue
+import threading
+import time
 import zipfile
-import io
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import IO
 
+from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import S3_READ_AHEAD, S3Client, S3RangedFile
 from amzn_smart_product_onboarding_core_utils.logger import logger
 
-from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import S3Client
-
 logger.name = "images_extractor"
 
 SUPPORTED_IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "webp", "gif"]
+DECOMPRESSION_WORKERS = 2
+UPLOAD_WORKERS = 10
+# extracted images waiting for an upload worker
+QUEUE_SIZE = 2 * UPLOAD_WORKERS
+# larger images are streamed from the archive into a multipart upload instead of being extracted whole
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# smallest part S3 accepts, but for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+MB = 1024 * 1024
+
+
+@dataclass
+class ExtractionMetrics:
+    """Throughput of the extraction of an archive."""
+
+    images: int = 0
+    image_bytes: int = 0
+    multipart_uploads: int = 0
+    seconds: float = 0.0
+    archive_bytes: int = 0
+    bytes_fetched: int = 0
+    ranged_gets: int = 0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.image_bytes / MB / self.seconds if self.seconds else 0.0
 
 
 class ImagesExtractor:
-    def __init__(self, s3: S3Client, bucket: str):
+    """Extract the images of a zip archive in S3 and upload them next to it.
+
+    The archive is read with ranged GETs rather than downloaded. Decompression workers extract its images in archive
+    order into a bounded queue, and upload workers take them from it, so at most ``queue_size`` plus one per worker
+    extracted images are held at once: when the uploads fall behind, the decompression waits. Images larger than
+    ``multipart_threshold`` aren't extracted whole, an upload worker streams them into a multipart upload, one part at
+    a time.
+
+    :param s3: S3 client
+    :param bucket: Bucket of the archive and the images
+    :param read_ahead: Bytes of the archive fetched by each ranged GET, at least
+    :param decompression_workers: Threads extracting images from the archive
+    :param upload_workers: Threads uploading images
+    :param queue_size: Extracted images waiting for an upload worker, at most
+    :param multipart_threshold: Size of the images uploaded in parts
+    :param part_size: Size of the parts, at least 5 MiB
+    """
+
+    def __init__(
+        self,
+        s3: S3Client,
+        bucket: str,
+        read_ahead: int = S3_READ_AHEAD,
+        decompression_workers: int = DECOMPRESSION_WORKERS,
+        upload_workers: int = UPLOAD_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+        multipart_threshold: int = MULTIPART_THRESHOLD,
+        part_size: int = MULTIPART_PART_SIZE,
+    ):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"Multipart part size must be at least {MIN_PART_SIZE} bytes")
         self.s3 = s3
         self.bucket = bucket
+        self.read_ahead = read_ahead
+        self.decompression_workers = decompression_workers
+        self.upload_workers = upload_workers
+        self.queue_size = queue_size
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
 
     def upload_image_to_s3(self, key: str, image_data: bytes) -> None:
         self.s3.put_object(Bucket=self.bucket, Key=key, Body=image_data, ContentType=get_content_type(image_data))
 
-    def process_zip_file(self, key: str, image_prefix: str) -> None:
-        with io.BytesIO() as tmpfile:
-            self.s3.download_fileobj(self.bucket, key, tmpfile)
-            tmpfile.seek(0)
-
-            with zipfile.ZipFile(tmpfile, "r") as zip_ref:
-                image_files = extract_images_from_zip(zip_ref)
-
-                def upload_image(img_file):
-                    logger.debug(f"Extracting and uploading {img_file.filename}")
-                    image_data = zip_ref.read(img_file)
-                    self.upload_image_to_s3(f"{image_prefix}/{img_file.filename}", image_data)
-
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    futures = [executor.submit(upload_image, img_file) for img_file in image_files]
-                    for future in as_completed(futures):
-                        future.result()
+    def upload_large_image_to_s3(self, key: str, image: IO[bytes]) -> None:
+        """Stream *image* into a multipart upload, holding one part in memory at a time."""
+        part = image.read(self.part_size)
+        upload_id = self.s3.create_multipart_upload(
+            Bucket=self.bucket, Key=key, ContentType=get_content_type(part)
+        )["UploadId"]
+        parts = []
+        try:
+            while part:
+                part_number = len(parts) + 1
+                response = self.s3.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=part
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+                part = image.read(self.part_size)
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+
+    def process_zip_file(self, key: str, image_prefix: str) -> ExtractionMetrics:
+        started = time.perf_counter()
+        metrics = ExtractionMetrics()
+        archive = S3RangedFile(self.s3, self.bucket, key, read_ahead=self.read_ahead)
+        with archive, zipfile.ZipFile(archive, "r") as zip_ref:
+            # in archive order, so each ranged GET also serves the members that follow
+            members: queue.SimpleQueue[zipfile.ZipInfo] = queue.SimpleQueue()
+            for img_file in sorted(extract_images_from_zip(zip_ref), key=lambda img_file: img_file.header_offset):
+                members.put(img_file)
+            # an image, or None for a large one to stream, and None once the decompression is done
+            extracted: queue.Queue[tuple[zipfile.ZipInfo, bytes | None] | None] = queue.Queue(self.queue_size)
+            # the first error of a worker, which the others stop on instead of waiting on each other
+            errors: list[Exception] = []
+            lock = threading.Lock()
+
+            def fail(error: Exception) -> None:
+                with lock:
+                    errors.append(error)
+
+            def decompress() -> None:
+                while not errors:
+                    try:
+                        img_file = members.get_nowait()
+                    except queue.Empty:
+                        return
+                    logger.debug(f"Extracting {img_file.filename}")
+                    try:
+                        if img_file.file_size > self.multipart_threshold:
+                            extracted.put((img_file, None))
+                        else:
+                            extracted.put((img_file, zip_ref.read(img_file)))
+                    except Exception as e:
+                        fail(e)
+
+            def upload() -> None:
+                while (item := extracted.get()) is not None:
+                    if errors:
+                        # keep draining the queue, so that no decompression worker stays blocked on it
+                        continue
+                    img_file, image_data = item
+                    image_key = f"{image_prefix}/{img_file.filename}"
+                    try:
+                        if image_data is None:
+                            with zip_ref.open(img_file) as image:
+                                self.upload_large_image_to_s3(image_key, image)
+                        else:
+                            self.upload_image_to_s3(image_key, image_data)
+                    except Exception as e:
+                        fail(e)
+                        continue
+                    with lock:
+                        metrics.images += 1
+                        metrics.image_bytes += img_file.file_size
+                        if image_data is None:
+                            metrics.multipart_uploads += 1
+
+            with (
+                ThreadPoolExecutor(max_workers=self.decompression_workers) as decompressors,
+                ThreadPoolExecutor(max_workers=self.upload_workers) as uploaders,
+            ):
+                uploads = [uploaders.submit(upload) for _ in range(self.upload_workers)]
+                decompressions = [decompressors.submit(decompress) for _ in range(self.decompression_workers)]
+                for future in decompressions:
+                    future.result()
+                for _ in uploads:
+                    extracted.put(None)
+                for future in uploads:
+                    future.result()
+            if errors:
+                raise errors[0]
+
+        metrics.seconds = time.perf_counter() - started
+        metrics.archive_bytes = archive.size
+        metrics.bytes_fetched = archive.bytes_fetched
+        metrics.ranged_gets = archive.requests
+        logger.info(
+            {
+                "images": metrics.images,
+                "image_bytes": metrics.image_bytes,
+                "multipart_uploads": metrics.multipart_uploads,
+                "seconds": round(metrics.seconds, 3),
+                "images_per_second": round(metrics.images_per_second, 1),
+                "mb_per_second": round(metrics.mb_per_second, 1),
+                "archive_bytes": metrics.archive_bytes,
+                "bytes_fetched": metrics.bytes_fetched,
+                "ranged_gets": metrics.ranged_gets,
+            }
+        )
+        return metrics
 
 
 def is_supported_image(filename: str) -> bool:
@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Model cascades: try cheaper models first and escalate to a stronger one only when their result is not trusted.
+
+Each tier is called in order. The result of a tier that is not the last is kept if it validates and passes the
+tier's checks, otherwise the next tier is called. The last tier is the component's own model and behaves as without a
+cascade. Acceptance, latency and token usage are counted per tier.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Sequence
+from typing import Any, Generic, TypeVar
+
+from amzn_smart_product_onboarding_core_utils.appconfig_client import CascadeTier
+from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.model_routing import UsageMeter
+
+T = TypeVar("T")
+
+REJECTED_LOW_CONFIDENCE = "low_confidence"
+REJECTED_DISAGREEMENT = "disagreement"
+REJECTED_INVALID = "invalid"
+
+
+class ModelCascade(Generic[T]):
+    """Run a call through the tiers until one result is accepted.
+
+    :param name: Component name used in the logs and metrics
+    :param tiers: Models in the order they are tried, the last one being the component's model
+    """
+
+    def __init__(self, name: str, tiers: Sequence[CascadeTier]):
+        if not tiers:
+            raise ValueError("A cascade needs at least one tier")
+        self.name = name
+        self.tiers = list(tiers)
+        self._lock = threading.Lock()
+        self._counters: defaultdict[str, Counter[str]] = defaultdict(Counter)
+
+    def run(
+        self,
+        client,
+        call: Callable[[CascadeTier, UsageMeter, bool], T],
+        rejection: Callable[[T, CascadeTier], str | None],
+    ) -> T:
+        """Return the result of the first accepted tier.
+
+        :param client: Bedrock Runtime client, metered for each tier and passed to *call*
+        :param call: Calls the model of a tier, given the tier, the client and whether it is the last tier
+        :param rejection: Reason to reject the result of a tier that is not the last, or ``None`` to accept it
+        """
+        for index, tier in enumerate(self.tiers):
+            final = index == len(self.tiers) - 1
+            meter = UsageMeter(client)
+            started = time.perf_counter()
+            reason = None
+            try:
+                result = call(tier, meter, final)
+                if not final:
+                    reason = rejection(result, tier)
+            except ModelResponseError:
+                if final:
+                    self._record(index, tier, started, meter, "error")
+                    raise
+                reason = REJECTED_INVALID
+            self._record(index, tier, started, meter, reason)
+            if reason is None:
+                return result
+        raise AssertionError("The last tier always returns or raises")
+
+    def _record(self, index: int, tier: CascadeTier, started: float, meter: UsageMeter, reason: str | None) -> None:
+        latency_ms = round((time.perf_counter() - started) * 1000)
+        with self._lock:
+            counters = self._counters[tier.model_id]
+            counters["attempts"] += 1
+            counters["accepted" if reason is None else f"rejected_{reason}"] += 1
+            counters["latency_ms"] += latency_ms
+            counters["input_tokens"] += meter.input_tokens
+            counters["output_tokens"] += meter.output_tokens
+        logger.info(
+            {
+                "cascade": self.name,
+                "tier": index,
+                "model_id": tier.model_id,
+                "accepted": reason is None,
+                "rejection": reason,
+                "latency_ms": latency_ms,
+                "input_tokens": meter.input_tokens,
+                "output_tokens": meter.output_tokens,
+            }
+        )
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Attempts, acceptance rate, average latency and tokens of this process, per tier model ID."""
+        with self._lock:
+            return {
+                model_id: {
+                    **counters,
+                    "acceptance_rate": counters["accepted"] / counters["attempts"],
+                    "avg_latency_ms": round(counters["latency_ms"] / counters["attempts"]),
+                }
+                for model_id, counters in self._counters.items()
+            }
@@ -2,7 +2,12 @@
 # SPDX-License-Identifier: MIT-0
 
 import os
-from collections.abc import Iterable
+import re
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Collection, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from functools import cached_property
 from typing import TYPE_CHECKING
 
 import botocore.exceptions
@@ -11,7 +16,6 @@ from tenacity import (
     retry,
     retry_if_exception_type,
     stop_after_attempt,
-    wait_random_exponential,
 )
 
 if TYPE_CHECKING:
@@ -24,9 +28,15 @@ else:
     ConverseResponseTypeDef = dict
     MessageTypeDef = dict
     MessageOutputTypeDef = dict
+from amzn_smart_product_onboarding_core_utils.appconfig_client import CascadeTier
 from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import (
+    EARLY_TERMINATION,
+    THROTTLE_RETRY_WAIT,
     BedrockRuntimeClient,
+    StreamMetrics,
+    converse_stream_until,
 )
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline, call_within, stop_at_deadline
 from amzn_smart_product_onboarding_core_utils.exceptions import (
     ModelResponseError,
     RateLimitError,
@@ -34,43 +44,215 @@ from amzn_smart_product_onboarding_core_utils.exceptions import (
 )
 from amzn_smart_product_onboarding_core_utils.logger import logger
 from amzn_smart_product_onboarding_core_utils.models import (
+    Attributes,
     CategorizationPrediction,
+    CategorySchema,
     Product,
     ProductCategory,
 )
+from amzn_smart_product_onboarding_core_utils.stage_timer import (
+    STAGE_CONVERSE,
+    STAGE_PROMPT_RENDER,
+    STAGE_SCHEMA_LOAD,
+    STAGE_TIMER,
+    STAGE_XML_PARSE,
+)
+from amzn_smart_product_onboarding_core_utils.structured_output import (
+    OUTPUT_MODE_TOOL,
+    OUTPUT_MODE_XML,
+    extract_tool_use,
+    tool_config,
+)
 from amzn_smart_product_onboarding_core_utils.xml_output import parse_response
+from amzn_smart_product_onboarding_core_utils.xml_stream import XmlStreamParser
 from pydantic import ValidationError
 
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import SchemaRetriever
+from amzn_smart_product_onboarding_product_categorization.model_cascade import (
+    REJECTED_DISAGREEMENT,
+    REJECTED_LOW_CONFIDENCE,
+    ModelCascade,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_resolver import (
+    CategoryResolver,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import (
+    CategoryEntry,
+    CategoryStore,
+)
+
 logger.name = "product_classifier"
 DEFAULT_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
 
+PREDICTION_TOOL_NAME = "record_category_prediction"
+PREDICTION_TOOL_CONFIG = tool_config(
+    CategorizationPrediction,
+    name=PREDICTION_TOOL_NAME,
+    description="Record the category selected for the product and why it was selected.",
+    exclude=("prompt", "confidence"),
+)
+# cascade tiers that check the self-reported confidence ask the model for it
+CONFIDENT_PREDICTION_TOOL_CONFIG = tool_config(
+    CategorizationPrediction,
+    name=PREDICTION_TOOL_NAME,
+    description="Record the category selected for the product, why it was selected and how confident you are.",
+    exclude=("prompt",),
+)
+HALLUCINATION_CORRECTION = (
+    "The predicted_category_id does not exist in the list of candidate categories, or the "
+    "name of the predicted_category_id did not match the predicted_category_name. "
+    "Please provide a corrected response that ensures the predicted category exists "
+    "in the candidate list and matches the predicted name. Include both the corrected "
+    "category ID and name in your response in the same XML format."
+)
+TOOL_HALLUCINATION_CORRECTION = HALLUCINATION_CORRECTION.replace("in the same XML format", "using the same tool")
+
+# classify_many packs several products into one prompt until the estimated tokens reach the budget
+CHARS_PER_TOKEN = 4
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_BATCH_TOKEN_BUDGET = 16000
+BATCH_MAX_OUTPUT_TOKENS = 4096
+BATCH_OUTPUT_TOKENS_PER_PRODUCT = 120
+BATCH_PRODUCT_OVERHEAD_TOKENS = 30
+BATCH_RESPONSE_OPEN = "<response>"
+_BATCH_PREDICTION_RE = re.compile(r"<prediction>(.*?)</prediction>", re.DOTALL)
+
+THINKING_CLOSE = "</thinking>"
+PREDICTION_OPEN = "<prediction>"
+PREDICTION_CLOSE = "</prediction>"
+
+# classify_and_extract answers with the prediction and the attributes of its category in one response
+PREDICTION_CDATA_TAGS = ["predicted_category_id", "predicted_category_name", "explanation"]
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _estimate_product_tokens(product: Product) -> int:
+    text_length = len(product.title) + len(product.short_description or "") + len(product.description)
+    metadata_length = len(str(product.metadata)) if product.metadata else 0
+    return (
+        (text_length + metadata_length) // CHARS_PER_TOKEN
+        + BATCH_PRODUCT_OVERHEAD_TOKENS
+        + BATCH_OUTPUT_TOKENS_PER_PRODUCT
+    )
+
+
+class _PredictionWatcher:
+    """Incrementally scan streamed text for the end of the prediction, or for thinking that runs over budget."""
+
+    def __init__(self, max_thinking_chars: int | None = None, thinking_closed: bool = False):
+        self.max_thinking_chars = max_thinking_chars
+        self.thinking_closed = thinking_closed
+        self.thinking_exceeded = False
+        self.prediction_end = -1
+        self._scanned = 0
+
+    def __call__(self, text: str) -> bool:
+        # only rescan the tail that could hold a tag split across deltas
+        start = max(0, self._scanned - len(PREDICTION_CLOSE))
+        self._scanned = len(text)
+        if not self.thinking_closed:
+            if text.find(THINKING_CLOSE, start) != -1:
+                self.thinking_closed = True
+            elif self.max_thinking_chars is not None and len(text) > self.max_thinking_chars:
+                self.thinking_exceeded = True
+                return True
+        index = text.find(PREDICTION_CLOSE, start)
+        if index != -1:
+            self.prediction_end = index + len(PREDICTION_CLOSE)
+            return True
+        return False
+
+    def truncate(self, text: str) -> str:
+        """Drop whatever followed ``</prediction>`` in the delta that closed it."""
+        return text[: self.prediction_end] if self.prediction_end != -1 else text
+
+
+@dataclass(frozen=True)
+class _ModelCall:
+    """Client, model and options of the model calls of one classification.
+
+    Passed down with the calls rather than set on the classifier, so that classifications with other models, e.g. the
+    tiers of a cascade, can run on the same classifier from several threads.
+    """
+
+    bedrock: "BedrockRuntimeClient"
+    model_id: str
+    temperature: float
+    # cheaper cascade tiers report a confidence and escalate instead of a model repair
+    request_confidence: bool = False
+    model_repair: bool = True
+
 
 class ProductClassifier:
     response_open = "<response>\n<thinking>"
     response_close = "</response>"
+    no_thinking_response_open = f"<response>\n<thinking>{THINKING_CLOSE}\n{PREDICTION_OPEN}"
 
     def __init__(
         self,
         bedrock: "BedrockRuntimeClient",
-        category_tree: dict[str, ProductCategory],
+        category_tree: Mapping[str, ProductCategory],
         always_categories: list[str] = None,
         model_id: str = DEFAULT_MODEL_ID,
         include_prompt: bool = False,
         temperature: float = 0,
+        local_repair: bool = True,
+        streaming: bool = False,
+        max_thinking_chars: int | None = None,
+        output_mode: str = OUTPUT_MODE_XML,
     ):
         """
         :param bedrock: Bedrock Runtime Client
-        :param category_tree: Mapping of category IDs to ProductCategory
+        :param category_tree: Mapping of category IDs to ProductCategory, e.g. a CategoryStore
         :param always_categories: List of category IDs of where titles are the name of the work.
         :param model_id: Amazon Bedrock model ID
         :param temperature: Temperature for model inference
+        :param local_repair: Try to repair invalid predictions from the category tree before asking the model again
+        :param streaming: Use converse_stream and stop reading as soon as the prediction is complete
+        :param max_thinking_chars: Cap on the chain of thought. 0 skips it entirely; any other cap needs streaming.
+        :param output_mode: "xml" to parse a prefilled XML response, "tool" to force a tool call validated as JSON.
+            Streaming and the thinking cap only apply to the XML mode.
+        :raises ValueError: If a non-zero thinking cap is set without streaming
         """
-        self.category_tree = category_tree
+        if max_thinking_chars and not streaming:
+            raise ValueError(f"max_thinking_chars={max_thinking_chars} needs streaming, only 0 applies without it")
+        self.category_tree = (
+            category_tree if isinstance(category_tree, CategoryStore) else CategoryStore.from_categories(category_tree)
+        )
         self.bedrock = bedrock
         self.always_categories = always_categories if always_categories else []
         self.model_id = model_id
         self.include_prompt = include_prompt
         self.temperature = temperature
+        self.local_repair = local_repair
+        self.hallucination_repairs: Counter[str] = Counter()
+        self.streaming = streaming
+        self.max_thinking_chars = max_thinking_chars
+        self.last_stream_metrics: StreamMetrics | None = None
+        self.output_mode = output_mode
+        # set per invocation, bounds the model calls and their retries to the time the invocation has left
+        self.deadline: Deadline | None = None
+
+        self.batch_stats: Counter[str] = Counter()
+        self.combined_stats: Counter[str] = Counter()
+
+        # nosemgrep: direct-use-of-jinja2,missing-autoescape-disabled - jinja2 output is not rendered by a browser
+        environment = jinja2.Environment(  # nosec B701 - template output is not used on a website
+            loader=jinja2.FileSystemLoader(os.path.join(os.path.dirname(__file__), "prompt_templates")),
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        self.template = environment.get_template("product_category.jinja2")
+        self.batch_template = environment.get_template("product_category_batch.jinja2")
+        self.combined_template = environment.get_template("product_category_attributes.jinja2")
+
+    @cached_property
+    def category_resolver(self) -> CategoryResolver:
+        # index the precomputed entries instead of validating every category
+        return CategoryResolver(self.category_tree.entries())
 
     def classify(
         self,
@@ -84,42 +266,372 @@ class ProductClassifier:
         # Call LLM
         # Return predicted category and explanation
         all_candidate_categories_ids = set(candidate_category_ids + self.always_categories)
-        candidate_categories = self.get_categories(all_candidate_categories_ids)
-        prompt = self.create_prompt(product, candidate_categories)
-        prediction = self.get_product_category(prompt, dryrun=dryrun)
+        prompt = self._render_prompt(product, all_candidate_categories_ids)
+        prediction = self.get_product_category(prompt, dryrun=dryrun, candidate_ids=all_candidate_categories_ids)
         if self.include_prompt or include_prompt:
             prediction.prompt = prompt
         return prediction
 
+    def _render_prompt(self, product: Product, category_ids: Iterable[str], request_confidence: bool = False) -> str:
+        # the prompt only needs the pre-rendered fragments, so the candidates are not validated
+        candidate_categories = [self.category_tree.entry(cat_id) for cat_id in category_ids]
+        with STAGE_TIMER.stage(STAGE_PROMPT_RENDER):
+            return self.create_prompt(product, candidate_categories, request_confidence=request_confidence)
+
+    def _model_call(self, model_id: str | None = None) -> _ModelCall:
+        """The calls of a classification with the classifier's own client and model, or another *model_id*."""
+        return _ModelCall(self.bedrock, model_id or self.model_id, self.temperature)
+
+    def classify_cascade(
+        self,
+        product: Product,
+        candidate_category_ids: list[str],
+        cascade: ModelCascade[CategorizationPrediction],
+        include_prompt: bool = False,
+        dryrun: bool = False,
+    ) -> CategorizationPrediction:
+        """Classify with the first tier of *cascade* whose prediction is valid and passes the tier's checks.
+
+        Tiers before the last ask for a self-reported confidence when they have a ``min_confidence``, and with
+        ``require_agreement`` only accept a category among the metaclass candidates. An invalid prediction that cannot
+        be repaired locally escalates to the next tier instead of asking the same model to correct it.
+        """
+        all_candidate_categories_ids = set(candidate_category_ids + self.always_categories)
+
+        def call(tier: CascadeTier, bedrock, final: bool) -> CategorizationPrediction:
+            model_call = _ModelCall(
+                bedrock,
+                tier.model_id,
+                tier.temperature,
+                request_confidence=not final and tier.min_confidence is not None,
+                model_repair=final,
+            )
+            prompt = self._render_prompt(product, all_candidate_categories_ids, model_call.request_confidence)
+            prediction = self.get_product_category(
+                prompt, dryrun=dryrun, candidate_ids=all_candidate_categories_ids, model_call=model_call
+            )
+            if self.include_prompt or include_prompt:
+                prediction.prompt = prompt
+            return prediction
+
+        def rejection(prediction: CategorizationPrediction, tier: CascadeTier) -> str | None:
+            if tier.min_confidence is not None and (prediction.confidence or 0) < tier.min_confidence:
+                return REJECTED_LOW_CONFIDENCE
+            if tier.require_agreement and prediction.predicted_category_id not in candidate_category_ids:
+                return REJECTED_DISAGREEMENT
+            return None
+
+        return cascade.run(self.bedrock, call, rejection)
+
+    def classify_and_extract(
+        self,
+        product: Product,
+        candidate_category_ids: list[str],
+        schema_retriever: SchemaRetriever,
+        model_id: str | None = None,
+        include_prompt: bool = False,
+    ) -> tuple[CategorizationPrediction | None, Attributes | None]:
+        """Classify the product and extract the attributes of its category in one model call.
+
+        Meant for products with few candidate categories, as the prompt holds the attribute schema of every candidate.
+        The call is always made in the XML mode. With ``streaming`` the whole response is streamed and parsed as it
+        arrives, so only its last delta is left to parse once the model is done.
+
+        :param schema_retriever: Attribute schemas of the candidate categories
+        :param model_id: Model of the call, e.g. the attribute extraction model. Defaults to ``model_id``.
+        :return: The prediction and its attributes. The attributes are ``None`` when they cannot be used and must be
+            extracted separately: the response had no valid attributes, or the predicted category was repaired. Both
+            are ``None`` when the prediction cannot be repaired locally, for the caller to classify the product again
+            with ``classify`` and count that call against the categorization model.
+        """
+        all_candidate_categories_ids = set(candidate_category_ids + self.always_categories)
+        candidate_categories = [self.category_tree.entry(cat_id) for cat_id in all_candidate_categories_ids]
+        with STAGE_TIMER.stage(STAGE_SCHEMA_LOAD):
+            schemas = {cat_id: schema_retriever.get(cat_id) for cat_id in sorted(all_candidate_categories_ids)}
+        schemas = {cat_id: schema for cat_id, schema in schemas.items() if schema and schema.attributes_schema}
+        with STAGE_TIMER.stage(STAGE_PROMPT_RENDER):
+            prompt = self.create_combined_prompt(product, candidate_categories, schemas)
+
+        self.combined_stats["requests"] += 1
+        model_call = self._model_call(model_id)
+        messages = [{"role": "user", "content": [{"text": prompt}]}]
+        if self.streaming:
+            response, parser = self._get_parsed_stream(messages, model_call)
+        else:
+            response, parser = self._get_model_response(messages, model_call=model_call), None
+        xml_response = self._build_xml_response(response, self._extract_response_text(response))
+        prediction, attributes = self._handle_combined_response(xml_response, parser)
+
+        if not self.validate_prediction(prediction):
+            repaired = self._repair_locally(prediction, all_candidate_categories_ids)
+            if repaired is None:
+                self.combined_stats["reclassified"] += 1
+                logger.info({"combined_stats": dict(self.combined_stats)})
+                return None, None
+            # the attributes were extracted for the category the model named
+            prediction, attributes = repaired, None
+        if prediction.predicted_category_id not in schemas:
+            attributes = Attributes(attributes=[])
+        if attributes is None:
+            self.combined_stats["without_attributes"] += 1
+        logger.info({"combined_stats": dict(self.combined_stats)})
+
+        prediction.predicted_category_name = self.category_tree[prediction.predicted_category_id].formatted_path
+        if self.include_prompt or include_prompt:
+            prediction.prompt = prompt
+        return prediction, attributes
+
+    def create_combined_prompt(
+        self,
+        product: Product,
+        candidate_categories: Iterable[ProductCategory | CategoryEntry],
+        schemas: Mapping[str, CategorySchema],
+    ) -> str:
+        """Use Jinja2 to fill in a prompt from the `product_category_attributes` template."""
+        # nosemgrep: direct-use-of-jinja2 - jinja2 output is not rendered by a browser
+        prompt = self.combined_template.render(
+            product=product,
+            candidate_categories="".join(
+                self.category_tree.entry(category.id).xml_fragment for category in candidate_categories
+            ),
+            attribute_schemas=list(schemas.items()),
+        )
+        logger.debug({"prompt": prompt})
+        return prompt
+
+    def _handle_combined_response(
+        self, xml_response: str, parser: XmlStreamParser | None = None
+    ) -> tuple[CategorizationPrediction, Attributes | None]:
+        try:
+            with STAGE_TIMER.stage(STAGE_XML_PARSE):
+                if parser is not None:
+                    # fed while the response streamed in, only what arrived last is left to parse
+                    parsed_response = parser.close()["response"]
+                else:
+                    parsed_response = parse_response(xml_response, cdata_tags=PREDICTION_CDATA_TAGS)["response"]
+            prediction = CategorizationPrediction.model_validate(parsed_response["prediction"])
+        except (ValueError, ValidationError, KeyError, TypeError) as e:
+            logger.exception(e)
+            logger.error(f"Failed to parse prediction from response: {xml_response}")
+            raise ModelResponseError("Failed to parse prediction from response") from e
+
+        try:
+            attributes = parsed_response["attributes"] or {"attribute": []}
+            attributes = attributes["attribute"]
+            attributes = [attributes] if not isinstance(attributes, list) else attributes
+            return prediction, Attributes.model_validate({"attributes": attributes})
+        except (ValidationError, KeyError, TypeError) as e:
+            logger.error({"invalid_combined_attributes": str(e)})
+            return prediction, None
+
+    def classify_many(
+        self,
+        items: Sequence[tuple[Product, list[str]]],
+        max_batch_size: int = DEFAULT_BATCH_SIZE,
+        token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET,
+        max_retries: int = 1,
+        include_prompt: bool = False,
+    ) -> list[CategorizationPrediction | ModelResponseError]:
+        """Classify many products with several products per model call.
+
+        Products are grouped by their set of candidate categories and each group is packed into prompts of up to
+        ``max_batch_size`` products, fewer if their estimated prompt and output tokens would exceed ``token_budget``.
+        Every prediction is validated on its own; products with a missing or invalid prediction are retried in new
+        batches, up to ``max_retries`` times.
+
+        :param items: Pairs of product and candidate category IDs, as passed to ``classify``
+        :return: One result per item, in order. Products that could not be classified get a ModelResponseError.
+        """
+        results: list[CategorizationPrediction | ModelResponseError | None] = [None] * len(items)
+        groups: dict[tuple[str, ...], list[int]] = defaultdict(list)
+        for index, (_, candidate_category_ids) in enumerate(items):
+            groups[tuple(sorted(set(candidate_category_ids) | set(self.always_categories)))].append(index)
+
+        for candidate_ids, pending in groups.items():
+            candidates = [self.category_tree.entry(cat_id) for cat_id in candidate_ids]
+            for attempt in range(max_retries + 1):
+                if attempt:
+                    self.batch_stats["retried"] += len(pending)
+                failed = []
+                for batch in self._pack_batches(items, pending, candidates, max_batch_size, token_budget):
+                    failed += self._classify_batch(items, batch, candidates, results, include_prompt)
+                pending = failed
+                if not pending:
+                    break
+            for index in pending:
+                self.batch_stats["failed"] += 1
+                results[index] = ModelResponseError(f"No valid prediction for product {index}")
+
+        self.batch_stats["products"] += len(items)
+        logger.info({"batch_stats": dict(self.batch_stats)})
+        return results
+
+    def create_batch_prompt(
+        self,
+        products: Sequence[Product],
+        candidate_categories: Iterable[ProductCategory | CategoryEntry],
+    ) -> str:
+        """Use Jinja2 to fill in a prompt from the `product_category_batch` template. Products get IDs from 1."""
+        # nosemgrep: direct-use-of-jinja2 - jinja2 output is not rendered by a browser
+        prompt = self.batch_template.render(
+            products=[(str(position), product) for position, product in enumerate(products, 1)],
+            candidate_categories="".join(
+                self.category_tree.entry(category.id).xml_fragment for category in candidate_categories
+            ),
+        )
+        logger.debug({"prompt": prompt})
+        return prompt
+
+    def _pack_batches(
+        self,
+        items: Sequence[tuple[Product, list[str]]],
+        indices: list[int],
+        candidates: list[CategoryEntry],
+        max_batch_size: int,
+        token_budget: int,
+    ) -> Iterator[list[int]]:
+        """Split *indices* into batches that fit the batch size and the estimated token budget."""
+        base_tokens = _estimate_tokens(self.create_batch_prompt([], candidates))
+        max_products = max(1, min(max_batch_size, BATCH_MAX_OUTPUT_TOKENS // BATCH_OUTPUT_TOKENS_PER_PRODUCT))
+        batch: list[int] = []
+        tokens = base_tokens
+        for index in indices:
+            product_tokens = _estimate_product_tokens(items[index][0])
+            if batch and (len(batch) >= max_products or tokens + product_tokens > token_budget):
+                yield batch
+                batch, tokens = [], base_tokens
+            batch.append(index)
+            tokens += product_tokens
+        if batch:
+            yield batch
+
+    def _classify_batch(
+        self,
+        items: Sequence[tuple[Product, list[str]]],
+        batch: list[int],
+        candidates: list[CategoryEntry],
+        results: list,
+        include_prompt: bool,
+    ) -> list[int]:
+        """Classify one batch into *results* and return the indices of the products without a valid prediction."""
+        prompt = self.create_batch_prompt([items[index][0] for index in batch], candidates)
+        self.batch_stats["requests"] += 1
+        try:
+            response = self._get_model_response(
+                [{"role": "user", "content": [{"text": prompt}]}],
+                response_open=BATCH_RESPONSE_OPEN,
+                max_tokens=BATCH_MAX_OUTPUT_TOKENS,
+            )
+            with STAGE_TIMER.stage(STAGE_XML_PARSE):
+                predictions = self._parse_batch_predictions(self._extract_response_text(response))
+        except ModelResponseError as e:
+            logger.exception(e)
+            return list(batch)
+
+        candidate_ids = {candidate.id for candidate in candidates}
+        failed = []
+        for position, index in enumerate(batch, 1):
+            prediction = predictions.get(str(position))
+            if prediction is not None and not self.validate_prediction(prediction):
+                prediction = self._repair_locally(prediction, candidate_ids)
+            if prediction is None:
+                failed.append(index)
+                continue
+            category = self.category_tree.entry(prediction.predicted_category_id)
+            prediction.predicted_category_name = category.formatted_path
+            if self.include_prompt or include_prompt:
+                prediction.prompt = prompt
+            results[index] = prediction
+        return failed
+
+    def _parse_batch_predictions(self, text: str) -> dict[str, CategorizationPrediction]:
+        """Parse every complete ``<prediction>`` on its own, so one malformed prediction does not fail the batch."""
+        predictions = {}
+        for match in _BATCH_PREDICTION_RE.finditer(text):
+            try:
+                parsed = parse_response(
+                    match.group(0),
+                    cdata_tags=[
+                        "product_id",
+                        "predicted_category_id",
+                        "predicted_category_name",
+                        "explanation",
+                    ],
+                )["prediction"]
+                product_id = parsed.pop("product_id").strip()
+                predictions.setdefault(product_id, CategorizationPrediction.model_validate(parsed))
+            except (ValueError, ValidationError, KeyError, AttributeError) as e:
+                logger.error({"invalid_batch_prediction": match.group(0), "error": str(e)})
+        return predictions
+
     def get_categories(self, possible_categories: Iterable[str]) -> list[ProductCategory]:
         return [self.category_tree[cat_id] for cat_id in possible_categories]
 
-    def create_prompt(self, product: Product, candidate_categories: Iterable[ProductCategory]) -> str:
-        """Use Jinja2 to fill in a prompt from the `product_category` template."""
-        # nosemgrep: direct-use-of-jinja2,missing-autoescape-disabled - jinja2 output is not rendered by a browser
-        template = jinja2.Environment(  # nosec B701 - template output is not used on a website
-            loader=jinja2.FileSystemLoader(os.path.join(os.path.dirname(__file__), "prompt_templates")),
-            trim_blocks=True,
-            lstrip_blocks=True,
-        ).get_template("product_category.jinja2")
+    def create_prompt(
+        self,
+        product: Product,
+        candidate_categories: Iterable[ProductCategory | CategoryEntry],
+        request_confidence: bool = False,
+    ) -> str:
+        """Use Jinja2 to fill in a prompt from the `product_category` template.
+
+        The candidate categories are joined from the fragments pre-rendered by the category store.
 
+        :param request_confidence: Ask for a self-reported confidence in tool mode, as the cheaper cascade tiers do
+        """
         # nosemgrep: direct-use-of-jinja2 - jinja2 output is not rendered by a browser
-        prompt = template.render(
+        prompt = self.template.render(
             product=product,
-            candidate_categories=candidate_categories,
+            candidate_categories="".join(
+                self.category_tree.entry(category.id).xml_fragment for category in candidate_categories
+            ),
+            output_mode=self.output_mode,
+            request_confidence=request_confidence,
         )
         logger.debug({"prompt": prompt})
         return prompt
 
-    def get_product_category(self, prompt: str, dryrun: bool = False) -> CategorizationPrediction:
+    def get_product_category(
+        self,
+        prompt: str,
+        dryrun: bool = False,
+        candidate_ids: Collection[str] | None = None,
+        model_call: _ModelCall | None = None,
+    ) -> CategorizationPrediction:
+        model_call = model_call or self._model_call()
         messages = [
             {
                 "role": "user",
                 "content": [{"text": prompt}],
             },
         ]
+        if self.output_mode == OUTPUT_MODE_TOOL and not dryrun:
+            model_reply = self._get_tool_response(messages, model_call)
+            prediction = self._handle_tool_prediction(model_reply)
+        else:
+            model_reply = self._get_xml_response(messages, model_call, dryrun)
+            prediction = self._handle_prediction(model_reply, prompt)
+
+        if not dryrun and not self.validate_prediction(prediction):
+            prediction = self._repair_prediction(prediction, model_reply, prompt, model_call, candidate_ids)
+
+        # set category name to full path
+        prediction.predicted_category_name = self.category_tree[prediction.predicted_category_id].formatted_path
+
+        return prediction
+
+    def _get_xml_response(self, messages: list[MessageTypeDef], model_call: _ModelCall, dryrun: bool = False) -> str:
+        """Get the model response as a complete ``<response>`` XML document."""
+        response_open = self.response_open
         if not dryrun:
-            response = self._get_model_response(messages)
+            if self.max_thinking_chars == 0:
+                response_open = self.no_thinking_response_open
+            if self.streaming:
+                response = self._get_streamed_model_response(messages, response_open, model_call)
+            elif response_open != self.response_open:
+                response = self._get_model_response(messages, response_open=response_open, model_call=model_call)
+            else:
+                response = self._get_model_response(messages, model_call=model_call)
         else:
             response = {
                 "output": {
@@ -139,52 +651,199 @@ class ProductClassifier:
                 "stopReason": "stop_sequence",
             }
         text = self._extract_response_text(response)
-        xml_response = self._build_xml_response(response, text)
-        prediction = self._handle_prediction(xml_response, prompt)
+        return self._build_xml_response(response, text, response_open)
 
-        if not dryrun and not self.validate_prediction(prediction):
-            full_response = xml_response
-            response = self._handle_hallucination(full_response, prompt)
+    def _repair_prediction(
+        self,
+        prediction: CategorizationPrediction,
+        model_reply: str | ConverseResponseTypeDef,
+        prompt: str,
+        model_call: _ModelCall,
+        candidate_ids: Collection[str] | None = None,
+    ) -> CategorizationPrediction:
+        """Fix an invalid prediction locally if it is unambiguous, otherwise ask the model to correct it."""
+        repaired = self._repair_locally(prediction, candidate_ids)
+        if repaired is not None:
+            return repaired
+        if not model_call.model_repair:
+            raise ModelResponseError("Hallucination detected")
+
+        self.hallucination_repairs["llm"] += 1
+        logger.info({"hallucination_repair": "llm"})
+        if self.output_mode == OUTPUT_MODE_TOOL:
+            response = self._handle_tool_hallucination(model_reply, prompt, model_call)
+            prediction = self._handle_tool_prediction(response)
+        else:
+            response = self._handle_hallucination(model_reply, prompt, model_call)
             text = self._extract_response_text(response)
             xml_response = self._build_xml_response(response, text)
             prediction = self._handle_prediction(xml_response, prompt)
-            if not self.validate_prediction(prediction):
-                logger.error(f"Hallucination detected twice: {full_response}")
-                raise ModelResponseError("Hallucination detected")
+        if not self.validate_prediction(prediction):
+            self.hallucination_repairs["failed"] += 1
+            logger.error(f"Hallucination detected twice: {model_reply}")
+            raise ModelResponseError("Hallucination detected")
+        return prediction
 
-        # set category name to full path
-        prediction.predicted_category_name = " > ".join(
-            [l.name for l in self.category_tree[prediction.predicted_category_id].full_path]
+    def _repair_locally(
+        self,
+        prediction: CategorizationPrediction,
+        candidate_ids: Collection[str] | None = None,
+    ) -> CategorizationPrediction | None:
+        if not self.local_repair:
+            return None
+        category_id = self.category_resolver.resolve(prediction, candidate_ids)
+        if category_id is None:
+            return None
+        self.hallucination_repairs["local"] += 1
+        logger.info(
+            {
+                "hallucination_repair": "local",
+                "predicted_category_id": prediction.predicted_category_id,
+                "predicted_category_name": prediction.predicted_category_name,
+                "repaired_category_id": category_id,
+            }
+        )
+        return prediction.model_copy(
+            update={
+                "predicted_category_id": category_id,
+                "predicted_category_name": self.category_tree.entry(category_id).name,
+            }
         )
-
-        return prediction
 
     @retry(
         retry=retry_if_exception_type(RateLimitError),
-        stop=stop_after_attempt(3),
-        wait=wait_random_exponential(multiplier=2, max=60, min=30),
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=THROTTLE_RETRY_WAIT,
         reraise=True,
     )
-    def _get_model_response(self, messages: list[MessageTypeDef | MessageOutputTypeDef]) -> ConverseResponseTypeDef:
+    def _get_model_response(
+        self,
+        messages: list[MessageTypeDef | MessageOutputTypeDef],
+        response_open: str | None = None,
+        max_tokens: int | None = None,
+        model_call: _ModelCall | None = None,
+    ) -> ConverseResponseTypeDef:
+        model_call = model_call or self._model_call()
+        inference_config = {
+            "temperature": model_call.temperature,
+            "stopSequences": [self.response_close],
+        }
+        if max_tokens is not None:
+            inference_config["maxTokens"] = max_tokens
         try:
-            response = self.bedrock.converse(
-                modelId=self.model_id,
+            with STAGE_TIMER.stage(STAGE_CONVERSE, model_call.model_id):
+                response = call_within(
+                    self.deadline,
+                    "converse",
+                    model_call.bedrock.converse,
+                    modelId=model_call.model_id,
+                    messages=messages
+                    + [
+                        {
+                            "role": "assistant",
+                            "content": [{"text": response_open or self.response_open}],
+                        },
+                    ],
+                    inferenceConfig=inference_config,
+                )
+            logger.info({"usage": response["usage"]})
+            return response
+        except botocore.exceptions.ClientError as e:
+            self._handle_client_error(e)
+
+    @retry(
+        retry=retry_if_exception_type(RateLimitError),
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=THROTTLE_RETRY_WAIT,
+        reraise=True,
+    )
+    def _get_streamed_model_response(
+        self,
+        messages: list[MessageTypeDef | MessageOutputTypeDef],
+        response_open: str,
+        model_call: _ModelCall | None = None,
+    ) -> ConverseResponseTypeDef:
+        """Stream the response and stop reading once ``</prediction>`` closes.
+
+        If the chain of thought grows past ``max_thinking_chars`` the stream is abandoned and the model is asked to
+        continue from the truncated thinking, straight into the prediction.
+        """
+        model_call = model_call or self._model_call()
+        started = time.perf_counter()
+        watcher = _PredictionWatcher(self.max_thinking_chars, thinking_closed=response_open.endswith(PREDICTION_OPEN))
+        response, metrics = self._converse_stream(messages, response_open, watcher, started, model_call)
+        text = watcher.truncate(response["output"]["message"]["content"][0]["text"])
+
+        thinking_capped = watcher.thinking_exceeded
+        if thinking_capped:
+            thinking = text[: self.max_thinking_chars] + f"{THINKING_CLOSE}\n{PREDICTION_OPEN}"
+            watcher = _PredictionWatcher(thinking_closed=True)
+            response, continuation_metrics = self._converse_stream(
+                messages, response_open + thinking, watcher, started, model_call
+            )
+            text = thinking + watcher.truncate(response["output"]["message"]["content"][0]["text"])
+            metrics.time_to_stop_ms = continuation_metrics.time_to_stop_ms
+            metrics.terminated_early = continuation_metrics.terminated_early
+        response["output"]["message"]["content"][0]["text"] = text
+
+        self.last_stream_metrics = metrics
+        logger.info(
+            {
+                "time_to_first_token_ms": metrics.time_to_first_token_ms,
+                "time_to_prediction_ms": metrics.time_to_stop_ms,
+                "prediction_terminated_early": metrics.terminated_early,
+                "thinking_capped": thinking_capped,
+            }
+        )
+        return response
+
+    @retry(
+        retry=retry_if_exception_type(RateLimitError),
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=THROTTLE_RETRY_WAIT,
+        reraise=True,
+    )
+    def _get_parsed_stream(
+        self,
+        messages: list[MessageTypeDef | MessageOutputTypeDef],
+        model_call: _ModelCall | None = None,
+    ) -> tuple[ConverseResponseTypeDef, XmlStreamParser]:
+        """Stream the whole response, feeding it to a parser as it arrives."""
+        parser = XmlStreamParser(cdata_tags=PREDICTION_CDATA_TAGS)
+        parser.feed(self.response_open)
+        response, metrics = self._converse_stream(
+            messages, self.response_open, parser.watch, time.perf_counter(), model_call or self._model_call()
+        )
+        self.last_stream_metrics = metrics
+        return response, parser
+
+    def _converse_stream(
+        self,
+        messages: list[MessageTypeDef | MessageOutputTypeDef],
+        response_open: str,
+        watcher: Callable[[str], bool],
+        started: float,
+        model_call: _ModelCall,
+    ) -> tuple[ConverseResponseTypeDef, StreamMetrics]:
+        with STAGE_TIMER.stage(STAGE_CONVERSE, model_call.model_id):
+            return converse_stream_until(
+                model_call.bedrock,
+                until=watcher,
+                started=started,
+                deadline=self.deadline,
+                modelId=model_call.model_id,
                 messages=messages
                 + [
                     {
                         "role": "assistant",
-                        "content": [{"text": self.response_open}],
+                        "content": [{"text": response_open}],
                     },
                 ],
                 inferenceConfig={
-                    "temperature": self.temperature,
+                    "temperature": model_call.temperature,
                     "stopSequences": [self.response_close],
                 },
             )
-            logger.info({"usage": response["usage"]})
-            return response
-        except botocore.exceptions.ClientError as e:
-            self._handle_client_error(e)
 
     def _handle_client_error(self, error: botocore.exceptions.ClientError):
         if error.response["Error"]["Code"] == "ThrottlingException":
@@ -201,29 +860,31 @@ class ProductClassifier:
     def _extract_response_text(self, response: dict) -> str:
         try:
             return response["output"]["message"]["content"][0]["text"]
-        except KeyError:
+        except KeyError as e:
             logger.error(f"Failed to get prediction from response: {response}")
-            raise ModelResponseError("Failed to get prediction from response")
+            raise ModelResponseError("Failed to get prediction from response") from e
 
-    def _build_xml_response(self, response: dict, text: str) -> str:
-        if response["stopReason"] == "stop_sequence":
-            return self.response_open + text + self.response_close
+    def _build_xml_response(self, response: dict, text: str, response_open: str | None = None) -> str:
+        response_open = response_open or self.response_open
+        if response["stopReason"] in ("stop_sequence", EARLY_TERMINATION):
+            return response_open + text + self.response_close
         elif response["stopReason"] == "end_turn" and text.endswith(self.response_close):
-            return self.response_open + text
+            return response_open + text
         else:
             logger.error(f"Stop reason: {response['stopReason']}")
             raise ModelResponseError(response["stopReason"])
 
     def _handle_prediction(self, xml_response: str, prompt: str) -> CategorizationPrediction:
         try:
-            parsed_response = parse_response(
-                xml_response,
-                cdata_tags=[
-                    "predicted_category_id",
-                    "predicted_category_name",
-                    "explanation",
-                ],
-            )
+            with STAGE_TIMER.stage(STAGE_XML_PARSE):
+                parsed_response = parse_response(
+                    xml_response,
+                    cdata_tags=[
+                        "predicted_category_id",
+                        "predicted_category_name",
+                        "explanation",
+                    ],
+                )
             prediction = CategorizationPrediction.model_validate(parsed_response["response"]["prediction"])
 
             if parsed_response.get("response", {}).get("thinking"):
@@ -234,9 +895,11 @@ class ProductClassifier:
         except (ValidationError, KeyError) as e:
             logger.exception(e)
             logger.error(f"Failed to parse prediction from response: {xml_response}")
-            raise ModelResponseError("Failed to parse prediction from response")
+            raise ModelResponseError("Failed to parse prediction from response") from e
 
-    def _handle_hallucination(self, full_response: str, prompt: str) -> ConverseResponseTypeDef:
+    def _handle_hallucination(
+        self, full_response: str, prompt: str, model_call: _ModelCall | None = None
+    ) -> ConverseResponseTypeDef:
         messages = [
             {
                 "role": "user",
@@ -246,20 +909,75 @@ class ProductClassifier:
                 "role": "assistant",
                 "content": [{"text": full_response}],
             },
+            {
+                "role": "user",
+                "content": [{"text": HALLUCINATION_CORRECTION}],
+            },
+        ]
+        return self._get_model_response(messages, model_call=model_call)
+
+    @retry(
+        retry=retry_if_exception_type(RateLimitError),
+        stop=stop_after_attempt(3) | stop_at_deadline,
+        wait=THROTTLE_RETRY_WAIT,
+        reraise=True,
+    )
+    def _get_tool_response(
+        self, messages: list[MessageTypeDef | MessageOutputTypeDef], model_call: _ModelCall | None = None
+    ) -> ConverseResponseTypeDef:
+        model_call = model_call or self._model_call()
+        try:
+            with STAGE_TIMER.stage(STAGE_CONVERSE, model_call.model_id):
+                response = call_within(
+                    self.deadline,
+                    "converse",
+                    model_call.bedrock.converse,
+                    modelId=model_call.model_id,
+                    messages=messages,
+                    inferenceConfig={"temperature": model_call.temperature},
+                    toolConfig=(
+                        CONFIDENT_PREDICTION_TOOL_CONFIG if model_call.request_confidence else PREDICTION_TOOL_CONFIG
+                    ),
+                )
+            logger.info({"usage": response["usage"]})
+            return response
+        except botocore.exceptions.ClientError as e:
+            self._handle_client_error(e)
+            raise
+
+    def _handle_tool_prediction(self, response: ConverseResponseTypeDef) -> CategorizationPrediction:
+        tool_use = extract_tool_use(response, PREDICTION_TOOL_NAME)
+        try:
+            return CategorizationPrediction.model_validate(tool_use["input"])
+        except ValidationError as e:
+            logger.exception(e)
+            logger.error(f"Failed to validate prediction from tool input: {tool_use}")
+            raise ModelResponseError("Failed to parse prediction from response") from e
+
+    def _handle_tool_hallucination(
+        self, response: ConverseResponseTypeDef, prompt: str, model_call: _ModelCall | None = None
+    ) -> ConverseResponseTypeDef:
+        tool_use = extract_tool_use(response, PREDICTION_TOOL_NAME)
+        messages = [
+            {
+                "role": "user",
+                "content": [{"text": prompt}],
+            },
+            response["output"]["message"],
             {
                 "role": "user",
                 "content": [
                     {
-                        "text": "The predicted_category_id does not exist in the list of candidate categories, or the "
-                        "name of the predicted_category_id did not match the predicted_category_name. "
-                        "Please provide a corrected response that ensures the predicted category exists "
-                        "in the candidate list and matches the predicted name. Include both the corrected "
-                        "category ID and name in your response in the same XML format."
+                        "toolResult": {
+                            "toolUseId": tool_use["toolUseId"],
+                            "content": [{"text": TOOL_HALLUCINATION_CORRECTION}],
+                            "status": "error",
+                        }
                     }
                 ],
             },
         ]
-        return self._get_model_response(messages)
+        return self._get_tool_response(messages, model_call)
 
     def validate_prediction(self, prediction: CategorizationPrediction) -> bool:
         """Validate that the predicted category id is in the category tree and matches the predicted category name."""
@@ -267,10 +985,11 @@ class ProductClassifier:
             logger.error(f"Predicted category id {prediction.predicted_category_id} not in category tree")
             return False
         # It's okay if predicted_category_name is just the name of the leaf or the entire path
-        if not prediction.predicted_category_name.endswith(self.category_tree[prediction.predicted_category_id].name):
+        category_name = self.category_tree.entry(prediction.predicted_category_id).name
+        if not prediction.predicted_category_name.endswith(category_name):
             logger.error(
                 f"Predicted category name {prediction.predicted_category_name} does not match category name "
-                f"{self.category_tree[prediction.predicted_category_id].name}"
+                f"{category_name}"
             )
             return False
         return True
@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import re
+from collections import defaultdict
+from collections.abc import Collection, Iterable
+from typing import Protocol
+
+from amzn_smart_product_onboarding_core_utils.models import CategorizationPrediction
+
+PATH_SEPARATOR = ">"
+MAX_ID_DISTANCE = 1
+
+_PUNCTUATION_RE = re.compile(r"[^\w>]+")
+
+
+def normalize_name(name: str) -> str:
+    """Casefold a category name or path and collapse punctuation and whitespace."""
+    levels = (_PUNCTUATION_RE.sub(" ", level).split() for level in name.casefold().split(PATH_SEPARATOR))
+    return f" {PATH_SEPARATOR} ".join(" ".join(words) for words in levels if words)
+
+
+class _Category(Protocol):
+    id: str
+    name: str
+    formatted_path: str
+
+
+def _deletes(value: str) -> set[str]:
+    return {value[:i] + value[i + 1 :] for i in range(len(value))}
+
+
+def _id_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)."""
+    previous_previous: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[len(b)]
+
+
+class CategoryResolver:
+    """Repair hallucinated predictions locally, without another model call.
+
+    The index is built once from the category tree (``ProductCategory`` objects or ``CategoryStore`` entries):
+    normalized leaf names, normalized full paths and a deletion neighbourhood of every category ID so that
+    single-character ID typos can be looked up without scanning the tree. A prediction is only repaired when exactly
+    one category is consistent with both the predicted name and the predicted ID.
+    """
+
+    def __init__(self, categories: Iterable[_Category]):
+        self.names: dict[str, set[str]] = defaultdict(set)
+        self.paths: dict[str, set[str]] = defaultdict(set)
+        self.id_deletes: dict[str, set[str]] = defaultdict(set)
+        self.ids: set[str] = set()
+
+        for category in categories:
+            self.ids.add(category.id)
+            self.names[normalize_name(category.name)].add(category.id)
+            self.paths[normalize_name(category.formatted_path)].add(category.id)
+            self.id_deletes[category.id].add(category.id)
+            for deleted in _deletes(category.id):
+                self.id_deletes[deleted].add(category.id)
+
+    def match_name(self, name: str) -> set[str]:
+        """Return the IDs of categories whose full path or leaf name matches *name*."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return set()
+        if normalized in self.paths:
+            return set(self.paths[normalized])
+        leaf = normalized.rsplit(PATH_SEPARATOR, 1)[-1].strip()
+        return set(self.names.get(leaf, ()))
+
+    def match_id(self, category_id: str) -> set[str]:
+        """Return the IDs within ``MAX_ID_DISTANCE`` edits of *category_id*, or the ID itself if it exists."""
+        category_id = category_id.strip()
+        if category_id in self.ids:
+            return {category_id}
+        neighbours: set[str] = set(self.id_deletes.get(category_id, ()))
+        for deleted in _deletes(category_id):
+            neighbours.update(self.id_deletes.get(deleted, ()))
+        return {c for c in neighbours if _id_distance(category_id, c) <= MAX_ID_DISTANCE}
+
+    def resolve(
+        self,
+        prediction: CategorizationPrediction,
+        candidate_ids: Collection[str] | None = None,
+    ) -> str | None:
+        """Return the single category ID consistent with *prediction*, or ``None`` if it is missing or ambiguous.
+
+        :param prediction: The prediction that failed validation
+        :param candidate_ids: Restrict the repair to these category IDs, e.g. the candidates in the prompt
+        """
+        by_name = self.match_name(prediction.predicted_category_name)
+        by_id = self.match_id(prediction.predicted_category_id)
+        if candidate_ids is not None:
+            by_name &= set(candidate_ids)
+            by_id &= set(candidate_ids)
+
+        # The name must always agree; the ID (or its typo neighbourhood) only narrows down ambiguous names.
+        matches = by_name & by_id if by_id else by_name
+        return next(iter(matches)) if len(matches) == 1 else None
@@ -0,0 +1,123 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from amzn_smart_product_onboarding_core_utils.models import ProductCategory
+from pydantic import PrivateAttr
+
+PATH_SEPARATOR = " > "
+
+
+class _StoredProductCategory(ProductCategory):
+    """ProductCategory that returns the path precomputed by the store instead of joining ``full_path``."""
+
+    _formatted_path: str = PrivateAttr()
+
+    @property
+    def formatted_path(self) -> str:
+        return self._formatted_path
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryEntry:
+    """What is known about a category without validating its record."""
+
+    id: str
+    name: str
+    formatted_path: str
+    xml_fragment: str
+
+
+def render_category_xml(record: dict[str, Any], formatted_path: str) -> str:
+    """Render a raw category record as a ``<category>`` element of the categorization prompt."""
+    lines = [
+        "    <category>",
+        f"      <id>{record['id']}</id>",
+        f"      <name>{formatted_path}</name>",
+    ]
+    if record.get("description"):
+        lines.append(f"      <description>{record['description']}</description>")
+    if record.get("examples"):
+        lines.append("      <examples>")
+        for example in record["examples"]:
+            lines += [
+                "        <product>",
+                f"          <title>{example['title']}</title>",
+                f"          <description>{example['description']}</description>",
+                "        </product>",
+            ]
+        lines.append("      </examples>")
+    lines.append("    </category>")
+    return "\n".join(lines) + "\n"
+
+
+def _entry(record: dict[str, Any], formatted_path: str) -> CategoryEntry:
+    return CategoryEntry(
+        id=record["id"],
+        name=record["name"],
+        formatted_path=formatted_path,
+        xml_fragment=render_category_xml(record, formatted_path),
+    )
+
+
+class CategoryStore(Mapping[str, ProductCategory]):
+    """Read-only category tree that validates each category the first time it is read.
+
+    Loading the tree eagerly validates every node with its nested ``full_path``, ``childs`` and ``examples``, although
+    an invocation only ever reads the handful of candidate categories. The store keeps the raw records instead and
+    precomputes, for every category, the formatted path and the XML fragment used in the categorization prompt.
+    """
+
+    def __init__(self, records: Mapping[str, dict[str, Any]]):
+        self._records = dict(records)
+        self._validated: dict[str, ProductCategory] = {}
+        self._entries: dict[str, CategoryEntry] = {}
+        for category_id, record in self._records.items():
+            formatted_path = PATH_SEPARATOR.join(level["name"] for level in record["full_path"])
+            self._entries[category_id] = _entry(record, formatted_path)
+
+    @classmethod
+    def from_json(cls, document: str | bytes) -> "CategoryStore":
+        return cls(json.loads(document))
+
+    @classmethod
+    def from_categories(cls, categories: Mapping[str, ProductCategory]) -> "CategoryStore":
+        """Wrap categories that are already validated, e.g. a tree built in code."""
+        store = cls({})
+        for category_id, category in categories.items():
+            store._validated[category_id] = category
+            store._entries[category_id] = _entry(category.model_dump(), category.formatted_path)
+        return store
+
+    def __getitem__(self, category_id: str) -> ProductCategory:
+        category = self._validated.get(category_id)
+        if category is None:
+            category = _StoredProductCategory.model_validate(self._records[category_id])
+            category._formatted_path = self._entries[category_id].formatted_path
+            self._validated[category_id] = category
+            # the validated category replaces the raw record
+            self._records.pop(category_id, None)
+        return category
+
+    def __contains__(self, category_id: object) -> bool:
+        return category_id in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entry(self, category_id: str) -> CategoryEntry:
+        return self._entries[category_id]
+
+    def entries(self) -> Iterator[CategoryEntry]:
+        return iter(self._entries.values())
+
+    @property
+    def validated_count(self) -> int:
+        return len(self._validated)
@@ -0,0 +1,173 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Speculative attribute extraction: extract the attributes of the most likely categories while the product is
+categorized, instead of waiting for the category.
+
+The top-ranked metaclass candidates are extracted concurrently with the categorization. When the predicted category
+is one of them its extraction is kept, and the product is served in about the longer of the two calls instead of
+their sum. The other extractions are cancelled if they have not started and discarded otherwise, their tokens are
+counted as wasted. When the category was not speculated on, it is extracted after the categorization as before.
+
+A discarded extraction keeps its worker until its call returns, possibly into the next request. The pool is sized
+independently of the candidates, and a request only speculates on as many candidates as there are workers not held
+by discarded extractions, so that its speculations never queue behind stale work.
+"""
+
+import copy
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from amzn_smart_product_onboarding_core_utils.logger import logger
+from amzn_smart_product_onboarding_core_utils.model_routing import UsageMeter
+from amzn_smart_product_onboarding_core_utils.models import Attributes, CategorizationPrediction, Product
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+
+COUNTERS = (
+    "requests",
+    "hits",
+    "misses",
+    "cancelled",
+    "discarded",
+    "skipped",
+    "wasted_input_tokens",
+    "wasted_output_tokens",
+    "latency_saved_ms",
+)
+
+
+@dataclass
+class _Speculation:
+    category_id: str
+    meter: UsageMeter
+    future: Future | None = None
+    started: float = 0
+    finished: float = 0
+
+
+class SpeculativeExtraction:
+    """Categorize a product and extract its attributes, speculating on the top candidate categories.
+
+    :param name: Component name used in the logs and metrics
+    :param candidates: Top-ranked candidates extracted while the product is categorized, 0 extracts after it
+    :param max_workers: Threads running the extractions, including the discarded ones still running, 4 per candidate
+        by default
+    """
+
+    def __init__(
+        self,
+        name: str,
+        candidates: int = 1,
+        max_workers: int | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.name = name
+        self.candidates = candidates
+        self.max_workers = max_workers or 4 * max(candidates, 1)
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="speculative-extraction")
+        self._lock = threading.Lock()
+        self._counters: Counter[str] = Counter()
+        # discarded extractions still holding a worker
+        self._stale = 0
+
+    def run(
+        self,
+        extractor: AttributesExtractor,
+        product: Product,
+        ranked_categories: Sequence[str],
+        categorize: Callable[[], CategorizationPrediction],
+    ) -> tuple[CategorizationPrediction, Attributes]:
+        """Return the prediction of *categorize* and the attributes of the predicted category.
+
+        :param ranked_categories: Candidate categories, most likely first
+        """
+        with self._lock:
+            candidates = max(min(self.candidates, self.max_workers - self._stale), 0)
+            self._counters["skipped"] += len(ranked_categories[: self.candidates]) - len(ranked_categories[:candidates])
+        speculations = {
+            category_id: self._start(extractor, product, category_id) for category_id in ranked_categories[:candidates]
+        }
+        speculated = list(speculations)
+        try:
+            prediction = categorize()
+            categorized = self._clock()
+            winner = speculations.pop(prediction.predicted_category_id, None)
+            if winner is None:
+                attributes = extractor.extract_attributes(product, prediction.predicted_category_id)
+                saved_ms = 0
+            else:
+                attributes = winner.future.result()
+                # without speculation the extraction would only have started once the product was categorized
+                saved_ms = max((categorized + winner.finished - winner.started - self._clock()) * 1000, 0)
+        finally:
+            for speculation in speculations.values():
+                self._discard(speculation)
+
+        self._record(speculated, winner, saved_ms)
+        return prediction, attributes
+
+    def _start(self, extractor: AttributesExtractor, product: Product, category_id: str) -> _Speculation:
+        speculation = _Speculation(category_id, UsageMeter(extractor.bedrock_runtime_client))
+        speculative_extractor = copy.copy(extractor)
+        speculative_extractor.bedrock_runtime_client = speculation.meter
+
+        def extract() -> Attributes:
+            speculation.started = self._clock()
+            try:
+                return speculative_extractor.extract_attributes(product, category_id)
+            finally:
+                speculation.finished = self._clock()
+
+        speculation.future = self._executor.submit(extract)
+        return speculation
+
+    def _discard(self, speculation: _Speculation) -> None:
+        with self._lock:
+            if speculation.future.cancel():
+                self._counters["cancelled"] += 1
+                return
+            self._stale += 1
+
+        def waste(_: Future) -> None:
+            with self._lock:
+                self._stale -= 1
+                self._counters["discarded"] += 1
+                self._counters["wasted_input_tokens"] += speculation.meter.input_tokens
+                self._counters["wasted_output_tokens"] += speculation.meter.output_tokens
+
+        # a running extraction cannot be interrupted, its tokens are counted once it is done
+        speculation.future.add_done_callback(waste)
+
+    def _record(self, speculated: list[str], winner: _Speculation | None, saved_ms: float) -> None:
+        with self._lock:
+            self._counters["requests"] += 1
+            if speculated:
+                self._counters["hits" if winner else "misses"] += 1
+            self._counters["latency_saved_ms"] += round(saved_ms)
+        logger.info(
+            {
+                "speculation": self.name,
+                "speculated": speculated,
+                "hit": winner is not None,
+                "latency_saved_ms": round(saved_ms),
+            }
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        """Requests, hit rate, latency saved and tokens wasted by discarded extractions of this process."""
+        with self._lock:
+            speculated = self._counters["hits"] + self._counters["misses"]
+            return {
+                **{counter: 0 for counter in COUNTERS},
+                **self._counters,
+                "hit_rate": self._counters["hits"] / speculated if speculated else None,
+                "avg_latency_saved_ms": round(self._counters["latency_saved_ms"] / max(self._counters["requests"], 1)),
+            }
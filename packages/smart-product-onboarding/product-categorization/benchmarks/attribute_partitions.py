@@ -0,0 +1,125 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare the latency of extracting the attributes of a large schema in one call with extracting it over partitions.
+
+Bedrock is faked: a call takes a time to first token plus a time per attribute of its prompt, the generation, with
+log-normal jitter, and answers every attribute of its prompt. Reports the p50, p95 and max latency of each partition
+size over the same products, and the calls and tokens they make. Sleeps are scaled by ``--time-scale`` to keep the run
+short, the latencies are reported unscaled.
+
+    LOG_LEVEL=CRITICAL python benchmarks/attribute_partitions.py
+    LOG_LEVEL=CRITICAL python benchmarks/attribute_partitions.py --attributes 60 --partition-sizes 30 15 8
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import re
+import statistics
+import threading
+import time
+
+from amzn_smart_product_onboarding_core_utils.models import CategorySchema, Product
+from amzn_smart_product_onboarding_core_utils.stage_timer import percentile
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+
+ATTRIBUTE_TITLE = re.compile(r"<Title>(Attribute \d+)</Title>")
+PRODUCT = Product(title="Stainless steel water bottle, 750 ml", description="Double walled, keeps drinks cold. " * 10)
+
+
+class FakeBedrock:
+    def __init__(self, first_token: float, per_attribute: float, jitter: float, time_scale: float, seed: int = 0):
+        self.first_token = first_token
+        self.per_attribute = per_attribute
+        self.jitter = jitter
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def converse(self, messages, **kwargs):
+        prompt = messages[0]["content"][0]["text"]
+        names = ATTRIBUTE_TITLE.findall(prompt)
+        attrs = "".join(f"<attribute><name>{n}</name><value>value of {n}</value></attribute>" for n in names)
+        text = f"{' '.join(names)}</scratchpad><attributes>{attrs}</attributes>"
+        with self.lock:
+            jitter = self.random.lognormvariate(0, self.jitter)
+            self.calls += 1
+            self.input_tokens += len(prompt) // 4
+            self.output_tokens += len(text) // 4
+        time.sleep((self.first_token + self.per_attribute * len(names)) * jitter * self.time_scale)
+        return {
+            "output": {"message": {"content": [{"text": text}]}},
+            "stopReason": "stop_sequence",
+            "usage": {"inputTokens": len(prompt) // 4, "outputTokens": len(text) // 4},
+        }
+
+
+class Schemas:
+    def __init__(self, category_schema: CategorySchema):
+        self.category_schema = category_schema
+
+    def get(self, category_id: str) -> CategorySchema:
+        return self.category_schema
+
+
+def large_schema(attributes: int, values: int = 10) -> CategorySchema:
+    return CategorySchema(
+        category_name="Category",
+        subcategory_name="Subcategory",
+        attributes_schema=[
+            {
+                "Title": f"Attribute {a}",
+                "Definition": f"Definition of attribute {a}, in a sentence or two.",
+                "Childs": [
+                    {"Title": f"Value {v}", "Definition": f"Value {v} of attribute {a}."} for v in range(values)
+                ],
+            }
+            for a in range(attributes)
+        ],
+    )
+
+
+def measure(partition_size: int | None, args: argparse.Namespace) -> None:
+    bedrock = FakeBedrock(args.first_token, args.per_attribute, args.jitter, args.time_scale)
+    schemas = Schemas(large_schema(args.attributes))
+    extractor = AttributesExtractor(
+        bedrock_runtime_client=bedrock, schema_retriever=schemas, partition_size=partition_size
+    )
+    latencies = []
+    for _ in range(args.products):
+        started = time.perf_counter()
+        # the extractor prints the attributes it extracted
+        with contextlib.redirect_stdout(io.StringIO()):
+            extracted = extractor.extract_attributes(PRODUCT, "1")
+        latencies.append((time.perf_counter() - started) / args.time_scale)
+        assert len(extracted.attributes) == args.attributes
+    print(
+        f"{'single' if partition_size is None else f'size {partition_size}':<8}"
+        f" p50 {statistics.median(latencies):>6.2f} s   p95 {percentile(latencies, 0.95):>6.2f} s"
+        f"   max {max(latencies):>6.2f} s   {bedrock.calls / args.products:>4.1f} calls"
+        f"   {bedrock.input_tokens / args.products:>6.0f} input"
+        f" and {bedrock.output_tokens / args.products:>5.0f} output tokens per product"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attributes", type=int, default=40, help="attributes of the category schema")
+    parser.add_argument("--partition-sizes", type=int, nargs="+", default=[20, 10, 5])
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--per-attribute", type=float, default=0.15, help="seconds of generation per attribute")
+    parser.add_argument("--jitter", type=float, default=0.3, help="sigma of the log-normal jitter of a call")
+    parser.add_argument("--time-scale", type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{args.attributes} attributes, {args.products} products")
+    for partition_size in [None, *args.partition_sizes]:
+        measure(partition_size, args)
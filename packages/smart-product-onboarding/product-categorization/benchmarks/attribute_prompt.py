@@ -0,0 +1,81 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare the size and build time of the attribute extraction prompt across every category of the attribute schema.
+
+"per call" renders the schema with the indented ``json_to_xml`` on every prompt, as AttributesExtractor used to.
+"compact" is the current AttributesExtractor.create_prompt: the schema is rendered once per category without
+indentation and kept on the schema, so later prompts of the category only fill in the template. Tokens are estimated
+as four characters each. Without ``--schema``, the synthetic schema of ``schema_store.py`` is used.
+
+    LOG_LEVEL=CRITICAL python benchmarks/attribute_prompt.py
+    LOG_LEVEL=CRITICAL python benchmarks/attribute_prompt.py --schema linted_attrs.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from unittest.mock import Mock
+
+from amzn_smart_product_onboarding_core_utils.json_to_xml import json_to_xml
+from amzn_smart_product_onboarding_core_utils.models import CategorySchema, Product
+from schema_store import synthetic_schema
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+
+PRODUCT = Product(title="Stainless steel water bottle, 750 ml", description="Double walled, keeps drinks cold. " * 10)
+
+
+def per_call(extractor: AttributesExtractor, category_schema: CategorySchema) -> str:
+    return extractor.template.render(
+        category=category_schema.category_name,
+        subcategory=category_schema.subcategory_name,
+        attributes_schema=json_to_xml(category_schema.attributes_schema),
+        product=PRODUCT,
+        output_mode=extractor.output_mode,
+        request_confidence=False,
+    )
+
+
+def compact(extractor: AttributesExtractor, category_schema: CategorySchema) -> str:
+    return extractor.create_prompt(category_schema, PRODUCT)
+
+
+def measure(name: str, build, extractor: AttributesExtractor, schemas: list[CategorySchema], repeat: int) -> None:
+    sizes = []
+    first = []
+    later = []
+    for category_schema in schemas:
+        started = time.perf_counter()
+        sizes.append(len(build(extractor, category_schema)))
+        first.append(time.perf_counter() - started)
+        for _ in range(repeat):
+            started = time.perf_counter()
+            build(extractor, category_schema)
+            later.append(time.perf_counter() - started)
+    print(
+        f"{name:<8} prompt {statistics.mean(sizes):>8.0f} chars (~{statistics.mean(sizes) / 4:>6.0f} tokens)"
+        f"   max {max(sizes):>7} chars   first build {statistics.mean(first) * 1e6:>7.1f} us"
+        f"   later builds {statistics.mean(later) * 1e6:>7.1f} us   total {(sum(first) + sum(later)):>6.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", help="attribute schema JSON document, as written by the configuration notebook")
+    parser.add_argument("--repeat", type=int, default=3, help="prompts built per category after the first")
+    args = parser.parse_args()
+
+    if args.schema:
+        with open(args.schema) as f:
+            records = json.load(f)
+    else:
+        records = synthetic_schema()
+    extractor = AttributesExtractor(bedrock_runtime_client=Mock(), schema_retriever=Mock())
+
+    print(f"{len(records)} categories, {args.repeat} prompts per category after the first")
+    # fresh schemas for each, the compact XML is kept on the schema once rendered
+    measure("per call", per_call, extractor, [CategorySchema.model_validate(r) for r in records.values()], args.repeat)
+    measure("compact", compact, extractor, [CategorySchema.model_validate(r) for r in records.values()], args.repeat)
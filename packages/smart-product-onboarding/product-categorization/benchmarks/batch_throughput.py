@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare ProductClassifier.classify, one product per call, with classify_many at several batch sizes.
+
+Bedrock is replaced by a stub that predicts the first candidate category of the prompt for every product it finds, and
+leaves out a share of the batched predictions to exercise the retries. Token usage is estimated as characters/4 of the
+prompt and of the response, so the numbers compare requests and tokens per product, not model quality.
+
+    LOG_LEVEL=CRITICAL python benchmarks/batch_throughput.py
+"""
+
+import argparse
+import random
+import re
+import time
+from collections import Counter
+
+from amzn_smart_product_onboarding_core_utils.models import Product
+
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import CategoryStore
+
+CANDIDATE_RE = re.compile(r"<id>(.*?)</id>\s*<name>(.*?)</name>")
+PRODUCT_ID_RE = re.compile(r'<product id="(.*?)">')
+THINKING = "The product is a consumer good. The first candidate category matches its core purpose best. " * 4
+
+
+class StubBedrock:
+    def __init__(self, drop_rate: float, seed: int = 0):
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.usage = Counter()
+
+    def converse(self, modelId, messages, inferenceConfig, **kwargs):
+        prompt = messages[0]["content"][0]["text"]
+        category_id, category_name = CANDIDATE_RE.search(prompt).groups()
+        product_ids = PRODUCT_ID_RE.findall(prompt)
+        if product_ids:
+            text = "".join(
+                f"<prediction><product_id>{product_id}</product_id>"
+                f"<predicted_category_id>{category_id}</predicted_category_id>"
+                f"<predicted_category_name>{category_name}</predicted_category_name>"
+                f"<explanation>The product matches the category.</explanation></prediction>"
+                for product_id in product_ids
+                if self.random.random() >= self.drop_rate
+            )
+        else:
+            text = (
+                f"{THINKING}</thinking><prediction><predicted_category_id>{category_id}</predicted_category_id>"
+                f"<predicted_category_name>{category_name}</predicted_category_name>"
+                f"<explanation>The product matches the category because of its purpose and features.</explanation>"
+                f"</prediction>"
+            )
+        usage = {"inputTokens": len(prompt) // 4, "outputTokens": len(text) // 4}
+        self.usage["requests"] += 1
+        self.usage.update(usage)
+        return {"output": {"message": {"content": [{"text": text}]}}, "stopReason": "stop_sequence", "usage": usage}
+
+
+def category_tree(size: int) -> CategoryStore:
+    return CategoryStore(
+        {
+            str(i): {
+                "id": str(i),
+                "name": f"Category {i}",
+                "description": f"Products that belong to category {i}, described in one or two sentences.",
+                "full_path": [{"id": "0", "name": "Root"}, {"id": str(i), "name": f"Category {i}"}],
+                "childs": [],
+                "examples": [{"title": f"Example {i}", "description": f"Example product of category {i}."}],
+            }
+            for i in range(size)
+        }
+    )
+
+
+def workload(products: int, candidate_sets: int, candidates: int, seed: int = 0) -> list[tuple[Product, list[str]]]:
+    rng = random.Random(seed)
+    sets = [[str(c) for c in rng.sample(range(200), candidates)] for _ in range(candidate_sets)]
+    return [
+        (
+            Product(title=f"Product {i}", description=f"Description of product {i}, with its main features. " * 3),
+            rng.choice(sets),
+        )
+        for i in range(products)
+    ]
+
+
+def report(name: str, bedrock: StubBedrock, products: int, elapsed: float, failed: int = 0) -> None:
+    print(
+        f"{name:<16} {bedrock.usage['requests'] / products:>9.2f} {bedrock.usage['inputTokens'] / products:>10.0f}"
+        f" {bedrock.usage['outputTokens'] / products:>11.0f} {failed:>7} {elapsed * 1000:>9.0f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--candidate-sets", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--drop-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tree = category_tree(200)
+    items = workload(args.products, args.candidate_sets, args.candidates)
+    print(f"{'mode':<16} {'req/prod':>9} {'in tok/prod':>10} {'out tok/prod':>11} {'failed':>7} {'wall ms':>9}")
+
+    bedrock = StubBedrock(args.drop_rate)
+    classifier = ProductClassifier(bedrock, tree)
+    started = time.perf_counter()
+    for product, candidate_ids in items:
+        classifier.classify(product, candidate_ids)
+    report("classify", bedrock, len(items), time.perf_counter() - started)
+
+    for batch_size in (5, 10, 20):
+        bedrock = StubBedrock(args.drop_rate)
+        classifier = ProductClassifier(bedrock, tree)
+        started = time.perf_counter()
+        results = classifier.classify_many(items, max_batch_size=batch_size)
+        failed = sum(isinstance(result, Exception) for result in results)
+        report(f"classify_many {batch_size}", bedrock, len(items), time.perf_counter() - started, failed)
@@ -0,0 +1,101 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare loading the category tree into an eagerly validated dict with loading it into a CategoryStore.
+
+Reports the cold start (parsing the JSON document and building the tree) and the memory held by the tree afterwards,
+then the time to read a typical invocation's candidate categories. Without ``--tree``, a synthetic tree shaped like the
+GS1 GPC (segments > families > classes > bricks, about 5,000 nodes with product examples on the bricks) is used.
+
+    LOG_LEVEL=CRITICAL python benchmarks/category_store.py
+    LOG_LEVEL=CRITICAL python benchmarks/category_store.py --tree category_tree.json
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from amzn_smart_product_onboarding_core_utils.models import ProductCategory
+
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import (
+    CategoryStore,
+)
+
+
+def synthetic_tree(segments: int = 40, fanout: int = 5, examples: int = 3) -> dict:
+    tree = {}
+
+    def add(path: list[dict], depth: int):
+        node_id = str(len(tree) + 10000000)
+        node = {"id": node_id, "name": f"Category {node_id} level {depth}"}
+        full_path = [*path, node]
+        record = {
+            **node,
+            "description": f"Products that belong to category {node_id}, described in one or two sentences.",
+            "full_path": full_path,
+            "childs": [],
+            "examples": [],
+        }
+        tree[node_id] = record
+        if depth == 3:
+            record["examples"] = [
+                {"title": f"Example product {i} of {node_id}", "description": f"Description of product {i}. " * 8}
+                for i in range(examples)
+            ]
+            return node
+        record["childs"] = [add(full_path, depth + 1) for _ in range(fanout)]
+        return node
+
+    for _ in range(segments):
+        add([], 0)
+    return tree
+
+
+def eager(document: bytes) -> dict[str, ProductCategory]:
+    return {k: ProductCategory.model_validate(v) for k, v in json.loads(document).items()}
+
+
+def measure(name: str, build, document: bytes, candidates: list[str]) -> None:
+    gc.collect()
+    started = time.perf_counter()
+    build(document)
+    cold_start = time.perf_counter() - started
+
+    # tracing allocations slows the build down, so memory is measured on a second build
+    gc.collect()
+    tracemalloc.start()
+    tree = build(document)
+    resident, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for category_id in candidates:
+        _ = tree[category_id].formatted_path
+    first_read = time.perf_counter() - started
+
+    print(
+        f"{name:<8} cold start {cold_start * 1000:>8.1f} ms   resident {resident / 2**20:>7.1f} MiB"
+        f"   peak {peak / 2**20:>7.1f} MiB   first read of {len(candidates)} candidates {first_read * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tree", help="category tree JSON document, as written by the configuration notebook")
+    parser.add_argument("--candidates", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.tree:
+        with open(args.tree, "rb") as f:
+            document = f.read()
+    else:
+        document = json.dumps(synthetic_tree()).encode()
+    candidates = random.Random(0).sample(list(json.loads(document)), args.candidates)
+
+    print(f"{len(document) / 2**20:.1f} MiB document, {len(json.loads(document))} categories")
+    measure("eager", eager, document, candidates)
+    measure("store", CategoryStore.from_json, document, candidates)
@@ -0,0 +1,132 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare categorizing a product and extracting its attributes in two calls with doing both in one combined call.
+
+"two calls" is ProductClassifier.classify then AttributesExtractor.extract_attributes, with a Lambda hop of
+``--hop-ms`` between them as in the Step Functions workflow. "combined" is ProductClassifier.classify_and_extract. Both
+render their real prompts. Bedrock is faked: a call takes a time to first token plus a time per output token, with
+log-normal jitter, and answers with a chain of thought, the prediction and the attributes its prompt asks for. Tokens
+are estimated as four characters each. Sleeps are scaled by ``--time-scale``, the latencies are reported unscaled.
+
+    LOG_LEVEL=CRITICAL python benchmarks/combined_extraction.py
+    LOG_LEVEL=CRITICAL python benchmarks/combined_extraction.py --candidates 2 --attributes 20
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import re
+import statistics
+import time
+
+from amzn_smart_product_onboarding_core_utils.models import BaseProductCategory, ProductCategory
+from amzn_smart_product_onboarding_core_utils.stage_timer import percentile
+from attribute_partitions import PRODUCT, Schemas, large_schema
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+
+ATTRIBUTE_TITLE = re.compile(r"<Title>(Attribute \d+)</Title>")
+THINKING = "The product is a bottle for drinks, it is insulated and made of steel. " * 4
+PREDICTION = (
+    "<prediction><predicted_category_id>1</predicted_category_id>"
+    "<predicted_category_name>Category 1</predicted_category_name>"
+    "<explanation>The product is a reusable drinks bottle, which matches the definition of the category.</explanation>"
+    "</prediction>"
+)
+
+
+class FakeBedrock:
+    def __init__(self, first_token: float, per_token: float, jitter: float, time_scale: float, seed: int = 0):
+        self.first_token = first_token
+        self.per_token = per_token
+        self.jitter = jitter
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def converse(self, messages, **kwargs):
+        prompt = messages[0]["content"][0]["text"]
+        # one schema of the combined prompt, the attributes of the chosen category
+        names = list(dict.fromkeys(ATTRIBUTE_TITLE.findall(prompt)))
+        attrs = "".join(f"<attribute><name>{n}</name><value>value of {n}</value></attribute>" for n in names)
+        scratchpad = " ".join(f"{n} is mentioned." for n in names)
+        if "<attribute_schemas>" in prompt:
+            text = f"{THINKING}{scratchpad}</thinking>{PREDICTION}<attributes>{attrs}</attributes>"
+        elif "<candidate_categories>" in prompt:
+            text = f"{THINKING}</thinking>{PREDICTION}"
+        else:
+            text = f"{scratchpad}</scratchpad><attributes>{attrs}</attributes>"
+        self.calls += 1
+        self.input_tokens += len(prompt) // 4
+        self.output_tokens += len(text) // 4
+        jitter = self.random.lognormvariate(0, self.jitter)
+        time.sleep((self.first_token + self.per_token * (len(text) // 4)) * jitter * self.time_scale)
+        return {
+            "output": {"message": {"content": [{"text": text}]}},
+            "stopReason": "stop_sequence",
+            "usage": {"inputTokens": len(prompt) // 4, "outputTokens": len(text) // 4},
+        }
+
+
+def category_tree(categories: int) -> dict[str, ProductCategory]:
+    return {
+        str(i): ProductCategory(
+            id=str(i),
+            name=f"Category {i}",
+            description=f"Products of category {i}, described in a sentence or two.",
+            full_path=[BaseProductCategory(id=str(i), name=f"Category {i}")],
+            childs=[],
+            examples=[],
+        )
+        for i in range(1, categories + 1)
+    }
+
+
+def measure(name: str, combined: bool, args: argparse.Namespace) -> None:
+    bedrock = FakeBedrock(args.first_token, args.per_token, args.jitter, args.time_scale)
+    schemas = Schemas(large_schema(args.attributes))
+    classifier = ProductClassifier(bedrock=bedrock, category_tree=category_tree(args.candidates))
+    extractor = AttributesExtractor(bedrock_runtime_client=bedrock, schema_retriever=schemas)
+    candidates = [str(i) for i in range(1, args.candidates + 1)]
+
+    latencies = []
+    for _ in range(args.products):
+        started = time.perf_counter()
+        # the extractor prints the attributes it extracted
+        with contextlib.redirect_stdout(io.StringIO()):
+            if combined:
+                prediction, attributes = classifier.classify_and_extract(PRODUCT, candidates, schemas)
+            if not combined or prediction is None:
+                prediction = classifier.classify(PRODUCT, candidates)
+                time.sleep(args.hop_ms / 1000 * args.time_scale)
+                attributes = extractor.extract_attributes(PRODUCT, prediction.predicted_category_id)
+        latencies.append((time.perf_counter() - started) / args.time_scale)
+        assert len(attributes.attributes) == args.attributes
+    print(
+        f"{name:<9} p50 {statistics.median(latencies):>5.2f} s   p95 {percentile(latencies, 0.95):>5.2f} s"
+        f"   {bedrock.calls / args.products:>3.1f} calls   {bedrock.input_tokens / args.products:>6.0f} input"
+        f" and {bedrock.output_tokens / args.products:>5.0f} output tokens per product"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=1, help="candidate categories, each with a schema")
+    parser.add_argument("--attributes", type=int, default=10, help="attributes of each category schema")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds to the first token")
+    parser.add_argument("--per-token", type=float, default=0.01, help="seconds per output token")
+    parser.add_argument("--hop-ms", type=float, default=150, help="Lambda hop between the two calls")
+    parser.add_argument("--jitter", type=float, default=0.2, help="sigma of the log-normal jitter of a call")
+    parser.add_argument("--time-scale", type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{args.candidates} candidates of {args.attributes} attributes, {args.products} products")
+    measure("two calls", False, args)
+    measure("combined", True, args)
@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Time building the categorization prompt for 50, 500 and 5000 candidate categories.
+
+"per call" rebuilds the Jinja environment and renders the candidate loop on every prompt, as ProductClassifier used
+to. "fragments" is the current ProductClassifier.create_prompt: the template is compiled once and the candidates are
+joined from the XML fragments pre-rendered by the category store.
+
+    LOG_LEVEL=CRITICAL python benchmarks/prompt_build.py
+"""
+
+import argparse
+import os
+import statistics
+import time
+from unittest.mock import Mock
+
+import jinja2
+from amzn_smart_product_onboarding_core_utils.models import Product
+
+from amzn_smart_product_onboarding_product_categorization import product_classifier
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import CategoryStore
+
+# the candidate loop as it was rendered before the fragments were pre-rendered
+CANDIDATE_LOOP = """<candidate_categories>
+  {% for category in candidate_categories %}
+    <category>
+      <id>{{ category.id }}</id>
+      <name>{{ category.formatted_path }}</name>
+      {% if category.description -%}
+        <description>{{ category.description }}</description>
+      {% endif %}
+      {% if category.examples -%}
+        <examples>
+          {% for example in category.examples %}
+            <product>
+              <title>{{ example.title }}</title>
+              <description>{{ example.description }}</description>
+            </product>
+          {% endfor %}
+        </examples>
+      {% endif %}
+    </category>
+  {% endfor %}
+</candidate_categories>"""
+
+
+def category_tree(size: int) -> CategoryStore:
+    return CategoryStore(
+        {
+            str(i): {
+                "id": str(i),
+                "name": f"Category {i}",
+                "description": f"Products that belong to category {i}.",
+                "full_path": [{"id": "0", "name": "Root"}, {"id": str(i), "name": f"Category {i}"}],
+                "childs": [],
+                "examples": [{"title": f"Example {i}", "description": f"Example product of category {i}."}],
+            }
+            for i in range(size)
+        }
+    )
+
+
+def per_call_prompt(classifier: ProductClassifier, product: Product, candidates: list) -> str:
+    loader = jinja2.FileSystemLoader(os.path.join(os.path.dirname(product_classifier.__file__), "prompt_templates"))
+    source = loader.get_source(jinja2.Environment(), "product_category.jinja2")[0]
+    start = source.index("<candidate_categories>")
+    end = source.index("</candidate_categories>") + len("</candidate_categories>")
+    # nosemgrep: direct-use-of-jinja2,missing-autoescape-disabled - jinja2 output is not rendered by a browser
+    template = jinja2.Environment(  # nosec B701 - template output is not used on a website
+        loader=jinja2.DictLoader({"prompt": source[:start] + CANDIDATE_LOOP + source[end:]}),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    ).get_template("prompt")
+    return template.render(product=product, candidate_categories=candidates, output_mode=classifier.output_mode)
+
+
+def timed(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    product = Product(title="iPhone 12", description="Latest Apple smartphone", short_description="5G phone")
+    print(f"{'candidates':>10} {'per call ms':>12} {'fragments ms':>13} {'speedup':>8}")
+    for size in (50, 500, 5000):
+        tree = category_tree(size)
+        classifier = ProductClassifier(Mock(), tree)
+        categories = [tree[category_id] for category_id in tree]
+        entries = [tree.entry(category_id) for category_id in tree]
+        per_call = timed(
+            lambda classifier=classifier, categories=categories: per_call_prompt(classifier, product, categories),
+            args.repeat,
+        )
+        fragments = timed(
+            lambda classifier=classifier, entries=entries: classifier.create_prompt(product, entries), args.repeat
+        )
+        print(f"{size:>10} {per_call:>12.2f} {fragments:>13.2f} {per_call / fragments:>7.1f}x")
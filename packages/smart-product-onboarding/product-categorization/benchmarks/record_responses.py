@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Record the streamed responses of a model to the categorization, attribute extraction and combined prompts, as the
+fixtures of tests/test_recorded_responses.py.
+
+Each product of ``--products`` is categorized among its possible categories, and its attributes are extracted for the
+first of them with an attribute schema, with the prompts the functions render. The deltas of converse_stream are saved
+as they arrived, with the prefill and the stop reason, one JSON file per product and prompt in ``--output``. The
+products are a JSON list of objects with ``title``, ``description`` and ``possibleCategories``. Needs Bedrock access,
+and the category tree and attribute schema written by the configuration notebooks.
+
+    python benchmarks/record_responses.py --category-tree category_tree.json --schema attributes_schema.json \\
+        --products products.json --model-id us.anthropic.claude-3-haiku-20240307-v1:0
+"""
+
+import argparse
+import json
+import os
+
+import boto3
+from amzn_smart_product_onboarding_core_utils.models import Product
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    LocalSchemaSource,
+    category_schema_store,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier import (
+    PREDICTION_CDATA_TAGS,
+    ProductClassifier,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import CategoryStore
+
+RESPONSE_CLOSE = "</response>"
+
+
+def record(bedrock, model_id: str, prompt: str, prefill: str, cdata_tags: list[str] | None) -> dict:
+    response = bedrock.converse_stream(
+        modelId=model_id,
+        messages=[
+            {"role": "user", "content": [{"text": prompt}]},
+            {"role": "assistant", "content": [{"text": prefill}]},
+        ],
+        inferenceConfig={"temperature": 0, "stopSequences": [RESPONSE_CLOSE]},
+    )
+    deltas, stop_reason = [], None
+    for event in response["stream"]:
+        if "contentBlockDelta" in event:
+            deltas.append(event["contentBlockDelta"]["delta"].get("text", ""))
+        elif "messageStop" in event:
+            stop_reason = event["messageStop"]["stopReason"]
+    return {
+        "model_id": model_id,
+        "cdata_tags": cdata_tags,
+        "prefill": prefill,
+        "deltas": deltas,
+        "stop_reason": stop_reason,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--category-tree", required=True)
+    parser.add_argument("--schema", required=True, help="attribute schema JSON document")
+    parser.add_argument("--products", required=True)
+    parser.add_argument("--model-id", required=True)
+    parser.add_argument("--region", default=os.getenv("AWS_REGION", "us-east-1"))
+    parser.add_argument(
+        "--output", default=os.path.join(os.path.dirname(__file__), "..", "tests", "recorded_responses")
+    )
+    args = parser.parse_args()
+
+    bedrock = boto3.client("bedrock-runtime", region_name=args.region)
+    with open(args.category_tree, "rb") as f:
+        classifier = ProductClassifier(bedrock, CategoryStore.from_json(f.read()))
+    schema_store = category_schema_store(
+        LocalSchemaSource(os.path.dirname(os.path.abspath(args.schema))), os.path.basename(args.schema)
+    )
+    extractor = AttributesExtractor(bedrock, schema_store)
+    with open(args.products) as f:
+        products = json.load(f)
+
+    os.makedirs(args.output, exist_ok=True)
+    for number, item in enumerate(products):
+        product = Product(title=item["title"], description=item["description"])
+        candidates = [classifier.category_tree.entry(category_id) for category_id in item["possibleCategories"]]
+        schemas = {
+            category_id: schema
+            for category_id in item["possibleCategories"]
+            if (schema := schema_store.get(category_id)) and schema.attributes_schema
+        }
+        recordings = {
+            "categorization": (classifier.create_prompt(product, candidates), classifier.response_open),
+            "combined": (classifier.create_combined_prompt(product, candidates, schemas), classifier.response_open),
+        }
+        if schemas:
+            recordings["attributes"] = (
+                extractor.create_prompt(next(iter(schemas.values())), product),
+                extractor.response_open,
+            )
+        for kind, (prompt, prefill) in recordings.items():
+            cdata_tags = None if kind == "attributes" else PREDICTION_CDATA_TAGS
+            recording = record(bedrock, args.model_id, prompt, prefill, cdata_tags)
+            path = os.path.join(args.output, f"{number:03}-{kind}.json")
+            with open(path, "w") as f:
+                json.dump({"prompt": kind, **recording}, f, indent=1)
+            print(f"{path}: {len(recording['deltas'])} deltas, {recording['stop_reason']}")
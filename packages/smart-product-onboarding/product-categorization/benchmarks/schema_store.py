@@ -0,0 +1,89 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare reading attribute schemas from the whole schema document with reading them from the packed schema.
+
+Both are read from a local directory, so the bytes read stand in for the bytes an S3 GET would transfer. Reports the
+cold read of a typical invocation's categories (loading the document or the offset table, then the categories) and the
+bytes it read. Without ``--schema``, a synthetic schema shaped like the GS1 GPC attribute schema (about 5,000 bricks
+of eight attributes with enumerated values) is used.
+
+    LOG_LEVEL=CRITICAL python benchmarks/schema_store.py
+    LOG_LEVEL=CRITICAL python benchmarks/schema_store.py --schema linted_attrs.json
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    CategorySchemaStore,
+    LocalSchemaSource,
+    PackedCategorySchemaStore,
+    pack_schemas,
+)
+
+DOCUMENT_PATH = "attributes_schema.json"
+INDEX_PATH = "attributes_schema.index.json"
+
+
+def synthetic_schema(categories: int = 5000, attributes: int = 8, values: int = 10) -> dict:
+    return {
+        str(10000000 + i): {
+            "category_name": f"Category {i}",
+            "subcategory_name": f"Subcategory {i}",
+            "attributes_schema": [
+                {
+                    "Title": f"Attribute {a}",
+                    "Definition": f"Definition of attribute {a} of category {i}, in a sentence or two.",
+                    "Childs": [
+                        {"Title": f"Value {v}", "Definition": f"Value {v} of attribute {a}."} for v in range(values)
+                    ],
+                }
+                for a in range(attributes)
+            ],
+        }
+        for i in range(categories)
+    }
+
+
+def measure(name: str, store: CategorySchemaStore, categories: list[str]) -> None:
+    started = time.perf_counter()
+    for category_id in categories:
+        store.get(category_id)
+    cold_read = time.perf_counter() - started
+    metrics = store.metrics()
+    print(
+        f"{name:<8} cold read of {len(categories)} categories {cold_read * 1000:>8.1f} ms"
+        f"   {metrics['s3_requests']:>3} reads   {metrics['s3_bytes'] / 2**20:>7.2f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", help="attribute schema JSON document, as written by the configuration notebook")
+    parser.add_argument("--categories", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.schema:
+        with open(args.schema) as f:
+            schemas = json.load(f)
+    else:
+        schemas = synthetic_schema()
+    categories = random.Random(0).sample(list(schemas), args.categories)
+
+    with tempfile.TemporaryDirectory() as root:
+        document = json.dumps(schemas).encode()
+        (Path(root) / DOCUMENT_PATH).write_bytes(document)
+        index, data = pack_schemas(schemas)
+        (Path(root) / index["data"]).write_bytes(data)
+        (Path(root) / INDEX_PATH).write_text(json.dumps(index))
+
+        print(f"{len(document) / 2**20:.1f} MiB document, {len(schemas)} categories")
+        source = LocalSchemaSource(root)
+        measure("document", CategorySchemaStore(source, DOCUMENT_PATH), categories)
+        measure("packed", PackedCategorySchemaStore(source, INDEX_PATH), categories)
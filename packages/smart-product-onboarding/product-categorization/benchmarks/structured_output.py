@@ -0,0 +1,190 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare the XML and tool-use output modes of ProductClassifier and AttributesExtractor.
+
+Offline (default), the same predictions are rendered as XML text and as tool-use JSON, a share of them is corrupted
+by leaving out a required field, and each mode's parse path is timed. Output size is reported as characters/4, a
+rough stand-in for output tokens.
+
+With ``--model-id``, the products in ``--products`` (a JSON list of {"title", "description"} objects) are sent to
+Bedrock in both modes instead, and the reported failure rate and output tokens come from the real responses.
+
+    LOG_LEVEL=CRITICAL python benchmarks/structured_output.py
+    LOG_LEVEL=CRITICAL python benchmarks/structured_output.py \
+        --model-id us.anthropic.claude-3-haiku-20240307-v1:0 --products products.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from unittest.mock import Mock
+
+from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.models import (
+    BaseProductCategory,
+    Product,
+    ProductCategory,
+)
+from amzn_smart_product_onboarding_core_utils.structured_output import (
+    OUTPUT_MODE_TOOL,
+    OUTPUT_MODE_XML,
+)
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
+    AttributesExtractor,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier import (
+    PREDICTION_TOOL_NAME,
+    ProductClassifier,
+)
+
+EXPLANATION = "The product is a smartphone and its description mentions 5G, a camera and a touch screen."
+
+
+def _category_tree(size: int) -> dict[str, ProductCategory]:
+    return {
+        str(i): ProductCategory(
+            id=str(i),
+            name=f"Category {i}",
+            description=f"Description of category {i}",
+            full_path=[BaseProductCategory(id=str(i), name=f"Category {i}")],
+            childs=[],
+            examples=[],
+        )
+        for i in range(size)
+    }
+
+
+def _xml_prediction(category_id: str, corrupt: bool) -> dict:
+    # a corrupted response leaves out a required field, same as in _tool_prediction
+    explanation = "" if corrupt else f"<explanation>{EXPLANATION}</explanation>\n"
+    text = (
+        "The product is a phone.</thinking>\n<prediction>\n"
+        f"<predicted_category_id>{category_id}</predicted_category_id>\n"
+        f"<predicted_category_name>Category {category_id}</predicted_category_name>\n"
+        f"{explanation}</prediction>"
+    )
+    return {"output": {"message": {"content": [{"text": text}]}}, "stopReason": "stop_sequence"}
+
+
+def _tool_prediction(category_id: str, corrupt: bool) -> dict:
+    tool_input = {
+        "predicted_category_id": category_id,
+        "predicted_category_name": f"Category {category_id}",
+        "explanation": EXPLANATION,
+    }
+    if corrupt:
+        # schema violations are the tool-mode equivalent: a missing required field
+        del tool_input["explanation"]
+    return {
+        "output": {
+            "message": {
+                "content": [{"toolUse": {"toolUseId": "tool-1", "name": PREDICTION_TOOL_NAME, "input": tool_input}}]
+            }
+        },
+        "stopReason": "tool_use",
+    }
+
+
+def _output_chars(response: dict) -> int:
+    block = response["output"]["message"]["content"][0]
+    return len(block["text"]) if "text" in block else len(json.dumps(block["toolUse"]["input"]))
+
+
+def _parse(classifier: ProductClassifier, response: dict):
+    if classifier.output_mode == OUTPUT_MODE_TOOL:
+        return classifier._handle_tool_prediction(response)
+    text = classifier._extract_response_text(response)
+    return classifier._handle_prediction(classifier._build_xml_response(response, text), "")
+
+
+def offline(iterations: int, corruption_rate: float, seed: int) -> None:
+    tree = _category_tree(100)
+    rng = random.Random(seed)
+    cases = [(rng.choice(list(tree)), rng.random() < corruption_rate) for _ in range(iterations)]
+
+    print(f"{'mode':<6} {'parse p50 µs':>13} {'parse p95 µs':>13} {'failures':>9} {'~output tokens':>15}")
+    for mode, render in ((OUTPUT_MODE_XML, _xml_prediction), (OUTPUT_MODE_TOOL, _tool_prediction)):
+        classifier = ProductClassifier(Mock(), tree, output_mode=mode)
+        responses = [render(category_id, corrupt) for category_id, corrupt in cases]
+        timings, failures = [], 0
+        for response in responses:
+            started = time.perf_counter()
+            try:
+                _parse(classifier, response)
+            except ModelResponseError:
+                failures += 1
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        tokens = statistics.mean(_output_chars(r) for r in responses) / 4
+        print(
+            f"{mode:<6} {statistics.median(timings):>13.1f} {timings[int(len(timings) * 0.95)]:>13.1f}"
+            f" {failures / len(responses):>9.1%} {tokens:>15.0f}"
+        )
+
+
+class _UsageRecorder:
+    """Wrap a Bedrock Runtime client and keep the usage of every converse call."""
+
+    def __init__(self, client):
+        self.client = client
+        self.usage = Counter()
+
+    def converse(self, **kwargs):
+        response = self.client.converse(**kwargs)
+        self.usage["calls"] += 1
+        self.usage["outputTokens"] += response["usage"]["outputTokens"]
+        return response
+
+
+def live(model_id: str, products_path: str, stage: str) -> None:
+    import boto3
+
+    with open(products_path) as f:
+        products = [Product.model_validate(p) for p in json.load(f)]
+    tree = _category_tree(20)
+
+    for mode in (OUTPUT_MODE_XML, OUTPUT_MODE_TOOL):
+        bedrock = _UsageRecorder(boto3.client("bedrock-runtime"))
+        failures, started = 0, time.perf_counter()
+        for product in products:
+            try:
+                if stage == "categorization":
+                    ProductClassifier(bedrock, tree, model_id=model_id, output_mode=mode).classify(product, list(tree))
+                else:
+                    schema_retriever = Mock()
+                    schema_retriever.get.return_value.attributes_schema = [
+                        {"Title": "Colour", "Definition": "Main colour of the product", "Childs": []},
+                        {"Title": "Material", "Definition": "Main material of the product", "Childs": []},
+                    ]
+                    extractor = AttributesExtractor(bedrock, schema_retriever, model_id=model_id, output_mode=mode)
+                    extractor.extract_attributes(product, "1")
+            except ModelResponseError:
+                failures += 1
+        elapsed = time.perf_counter() - started
+        print(
+            f"{mode:<6} failures={failures / len(products):.1%} calls={bedrock.usage['calls']}"
+            f" output_tokens/product={bedrock.usage['outputTokens'] / len(products):.0f}"
+            f" seconds/product={elapsed / len(products):.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--corruption-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-id")
+    parser.add_argument("--products")
+    parser.add_argument("--stage", choices=("categorization", "attributes"), default="categorization")
+    args = parser.parse_args()
+
+    if args.model_id:
+        live(args.model_id, args.products, args.stage)
+    else:
+        offline(args.iterations, args.corruption_rate, args.seed)
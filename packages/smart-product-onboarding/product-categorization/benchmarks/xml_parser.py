@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare parse_response with the incremental XmlStreamParser on the responses of the categorization prompts.
+
+The responses are rendered like the models write them: a chain of thought, the prediction and, for the attribute
+and combined prompts, ``--attributes`` attributes. Each is parsed
+
+- whole with parse_response, after the full response arrived
+- whole with parse_xml_stream
+- in ``--chunk``-character deltas with XmlStreamParser, as converse_stream delivers them. "deltas" is the parsing
+  time summed over the stream, spread over the time the model takes to write it, "last" the part left once the last
+  delta arrived, the latency the parse still adds to the call
+- in deltas with ``stop_after=["prediction"]``, which stops at the end of the prediction
+
+and the median time per response is reported.
+
+    LOG_LEVEL=CRITICAL python benchmarks/xml_parser.py
+    LOG_LEVEL=CRITICAL python benchmarks/xml_parser.py --attributes 100 --chunk 4
+"""
+
+import argparse
+import statistics
+import time
+
+from amzn_smart_product_onboarding_core_utils.xml_output import parse_response
+from amzn_smart_product_onboarding_core_utils.xml_stream import XmlStreamParser, parse_xml_stream
+
+from amzn_smart_product_onboarding_product_categorization.product_classifier import PREDICTION_CDATA_TAGS
+
+THINKING = "- The product is an insulated bottle for drinks, made of steel, so bottles > flasks here.\n" * 6
+PREDICTION = (
+    "<prediction>\n<predicted_category_id>1</predicted_category_id>\n"
+    "<predicted_category_name>Drinkware > Water Bottles</predicted_category_name>\n"
+    "<explanation>The product is a reusable drinks bottle, which matches the definition of the category.</explanation>"
+    "\n</prediction>\n"
+)
+
+
+def attributes(count: int) -> str:
+    return (
+        "<attributes>\n"
+        + "".join(
+            f"<attribute>\n<name>Attribute {i}</name>\n<value>value &amp; unit {i}</value>\n</attribute>\n"
+            for i in range(count)
+        )
+        + "</attributes>\n"
+    )
+
+
+def responses(count: int) -> dict[str, tuple[str, list[str] | None]]:
+    return {
+        "categorization": (
+            f"<response>\n<thinking>{THINKING}</thinking>\n{PREDICTION}</response>",
+            PREDICTION_CDATA_TAGS,
+        ),
+        "attributes": (f"<response>\n<scratchpad>{THINKING}</scratchpad>\n{attributes(count)}</response>", None),
+        "combined": (
+            f"<response>\n<thinking>{THINKING}</thinking>\n{PREDICTION}{attributes(count)}</response>",
+            PREDICTION_CDATA_TAGS,
+        ),
+    }
+
+
+def median_us(parse, repeat: int, setup=lambda: None) -> float:
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        parse(state)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1e6
+
+
+def fed_but_last(chunks: list[str], cdata_tags: list[str] | None) -> XmlStreamParser:
+    parser = XmlStreamParser(cdata_tags)
+    for chunk in chunks[:-1]:
+        parser.feed(chunk)
+    return parser
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attributes", type=int, default=20, help="attributes in the attribute responses")
+    parser.add_argument("--chunk", type=int, default=16, help="characters per streamed delta")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    print(
+        f"{'response':<15} {'chars':>6} {'parse_response':>15} {'stream whole':>13}"
+        f" {'deltas':>8} {'last':>6} {'stop':>8}"
+    )
+    for name, (text, cdata_tags) in responses(args.attributes).items():
+        chunks = [text[i : i + args.chunk] for i in range(0, len(text), args.chunk)]
+        assert parse_xml_stream(chunks, cdata_tags) == parse_response(text, cdata_tags)
+        timings = [
+            median_us(lambda _, text=text, cdata_tags=cdata_tags: parse_response(text, cdata_tags), args.repeat),
+            median_us(lambda _, text=text, cdata_tags=cdata_tags: parse_xml_stream([text], cdata_tags), args.repeat),
+            median_us(
+                lambda _, chunks=chunks, cdata_tags=cdata_tags: parse_xml_stream(chunks, cdata_tags), args.repeat
+            ),
+            median_us(
+                lambda stream, chunks=chunks: (stream.feed(chunks[-1]), stream.close()),
+                args.repeat,
+                lambda chunks=chunks, cdata_tags=cdata_tags: fed_but_last(chunks, cdata_tags),
+            ),
+        ]
+        stop = "-"
+        if "<prediction>" in text:
+            stop_us = median_us(
+                lambda _, chunks=chunks, cdata_tags=cdata_tags: parse_xml_stream(chunks, cdata_tags, ["prediction"]),
+                args.repeat,
+            )
+            stop = f"{stop_us:.0f}us"
+        print(
+            f"{name:<15} {len(text):>6} {timings[0]:>13.0f}us {timings[1]:>11.0f}us {timings[2]:>6.0f}us"
+            f" {timings[3]:>4.0f}us {stop:>8}"
+        )
@@ -0,0 +1,152 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compare the peak memory and throughput of extracting the images of a zip archive downloaded whole with the
+extraction pipeline reading it by ranged GETs.
+
+"download" is the former ImagesExtractor.process_zip_file: the archive is downloaded into a BytesIO, then its images
+are read and uploaded by ten threads. "pipeline" is the current one, reading the archive through S3RangedFile with
+``--decompression-workers`` extracting the images into a bounded queue for ``--upload-workers`` to upload. Archives of
+``--sizes`` MB of ``--image-kb`` KB images are written to a temporary directory, deflated, and S3 is faked over them:
+a GET reads the file on disk and an upload sleeps ``--upload-ms`` per MB, then drops the data, so the memory measured
+is the extractor's. Each run is a fresh process, and the peak RSS it reports is the growth of ``ru_maxrss`` while
+extracting.
+
+    LOG_LEVEL=CRITICAL python benchmarks/zip_extraction.py
+    LOG_LEVEL=CRITICAL python benchmarks/zip_extraction.py --sizes 100 500 1000 --read-ahead-mb 8 --upload-workers 20
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from amzn_smart_product_onboarding_product_categorization.images_extractor import (
+    ImagesExtractor,
+    extract_images_from_zip,
+)
+
+MB = 1024 * 1024
+
+
+class FakeS3:
+    def __init__(self, directory: str, upload_ms: float):
+        self.directory = directory
+        self.upload_ms = upload_ms
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": os.path.getsize(os.path.join(self.directory, Key)), "ETag": '"etag"'}
+
+    def get_object(self, Bucket, Key, Range, **kwargs):
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        with open(os.path.join(self.directory, Key), "rb") as file:
+            file.seek(start)
+            return {"Body": io.BytesIO(file.read(end - start + 1))}
+
+    def download_fileobj(self, Bucket, Key, Fileobj):
+        with open(os.path.join(self.directory, Key), "rb") as file:
+            shutil.copyfileobj(file, Fileobj, MB)
+
+    def put_object(self, Body, **kwargs):
+        time.sleep(self.upload_ms / 1000 * len(Body) / MB)
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload"}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        time.sleep(self.upload_ms / 1000 * len(Body) / MB)
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+
+def write_archive(path: str, size_mb: int, image_kb: int) -> int:
+    rng = random.Random(size_mb)
+    images = size_mb * 1024 // image_kb
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for i in range(images):
+            # half noise, half padding, so that deflating takes time but still saves some space
+            noise = rng.randbytes(image_kb * 512)
+            archive.writestr(f"images/{i:05}.jpg", b"\xFF\xD8\xFF" + noise + bytes(image_kb * 1024 - 3 - len(noise)))
+    return images
+
+
+def download_and_extract(extractor: ImagesExtractor, key: str, image_prefix: str) -> None:
+    with io.BytesIO() as tmpfile:
+        extractor.s3.download_fileobj(extractor.bucket, key, tmpfile)
+        tmpfile.seek(0)
+        with zipfile.ZipFile(tmpfile, "r") as zip_ref:
+
+            def upload_image(img_file):
+                extractor.upload_image_to_s3(f"{image_prefix}/{img_file.filename}", zip_ref.read(img_file))
+
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                futures = [executor.submit(upload_image, img_file) for img_file in extract_images_from_zip(zip_ref)]
+                for future in as_completed(futures):
+                    future.result()
+
+
+def run(mode: str, directory: str, key: str, args: argparse.Namespace, results: multiprocessing.Queue) -> None:
+    extractor = ImagesExtractor(
+        FakeS3(directory, args.upload_ms),
+        "bucket",
+        read_ahead=int(args.read_ahead_mb * MB),
+        decompression_workers=args.decompression_workers,
+        upload_workers=args.upload_workers,
+        queue_size=2 * args.upload_workers,
+    )
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == "download":
+        download_and_extract(extractor, key, "images")
+    else:
+        extractor.process_zip_file(key, "images")
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KB on Linux
+    results.put(((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, elapsed))
+
+
+def measure(mode: str, directory: str, key: str, args: argparse.Namespace) -> tuple[float, float]:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run, args=(mode, directory, key, args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 500], help="archive sizes in MB")
+    parser.add_argument("--image-kb", type=int, default=500)
+    parser.add_argument("--read-ahead-mb", type=float, default=4, help="bytes fetched by each ranged GET, at least")
+    parser.add_argument("--decompression-workers", type=int, default=2)
+    parser.add_argument("--upload-workers", type=int, default=10)
+    parser.add_argument("--upload-ms", type=float, default=20, help="upload time per MB")
+    args = parser.parse_args()
+
+    print(
+        f"{'archive':>8} {'images':>7} {'download peak':>14} {'pipeline peak':>14}"
+        f" {'download':>13} {'pipeline':>13}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in args.sizes:
+            key = f"{size_mb}.zip"
+            images = write_archive(os.path.join(directory, key), size_mb, args.image_kb)
+            download_peak, download_time = measure("download", directory, key, args)
+            pipeline_peak, pipeline_time = measure("pipeline", directory, key, args)
+            os.remove(os.path.join(directory, key))
+            print(
+                f"{size_mb:>6}MB {images:>7} {download_peak:>12.0f}MB {pipeline_peak:>12.0f}MB"
+                f" {images / download_time:>6.0f} img/s {images / pipeline_time:>6.0f} img/s"
+            )
@@ -4,15 +4,19 @@
 import json
 import pytest
 import random
+import time
 from unittest.mock import Mock, ANY
 
+from amzn_smart_product_onboarding_core_utils import models
 from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.models import Attribute, Attributes
 from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
     AttributesExtractor,
     SchemaRetriever,
     CategorySchema,
     GPCSchemaRetriever,
     CategorySchemaNotFound,
+    merge_attributes,
 )
 
 
@@ -120,6 +124,49 @@ def test_attributes_extractor_when_category_is_found(
     assert [r.model_dump() for r in results.attributes] == random_attributes
 
 
+def _a_stream_from_bedrock(with_text, chunk_size=5):
+    yield {"messageStart": {"role": "assistant"}}
+    for i in range(0, len(with_text), chunk_size):
+        yield {"contentBlockDelta": {"delta": {"text": with_text[i : i + chunk_size]}, "contentBlockIndex": 0}}
+    yield {"messageStop": {"stopReason": "stop_sequence"}}
+    yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": 50}}}
+
+
+def test_streaming_attributes_extractor_parses_the_response_as_it_arrives(
+    mock_bedrock, schema_retriever, text_response_with_random_attributes, random_attributes, product, predicted_category
+):
+    # given
+    mock_bedrock.converse_stream = Mock(
+        return_value={"stream": _a_stream_from_bedrock(text_response_with_random_attributes)}
+    )
+    extractor = AttributesExtractor(
+        bedrock_runtime_client=mock_bedrock, schema_retriever=schema_retriever, streaming=True
+    )
+
+    # when
+    results = extractor.extract_attributes(product=product, category_id=predicted_category.predicted_category_id)
+
+    # then
+    assert [r.model_dump() for r in results.attributes] == random_attributes
+    mock_bedrock.converse.assert_not_called()
+    messages = mock_bedrock.converse_stream.call_args.kwargs["messages"]
+    assert messages[-1]["content"][0]["text"] == extractor.response_open
+
+
+def test_streaming_attributes_extractor_rejects_a_response_without_attributes(
+    mock_bedrock, schema_retriever, product, predicted_category
+):
+    # given
+    mock_bedrock.converse_stream = Mock(return_value={"stream": _a_stream_from_bedrock("no attributes</scratchpad>")})
+    extractor = AttributesExtractor(
+        bedrock_runtime_client=mock_bedrock, schema_retriever=schema_retriever, streaming=True
+    )
+
+    # then
+    with pytest.raises(ModelResponseError, match="Failed to parse extracted attributes from response"):
+        extractor.extract_attributes(product=product, category_id=predicted_category.predicted_category_id)
+
+
 def test_attributes_extractor_will_throw_xml_validation_error(
     mock_bedrock, schema_retriever, an_invalid_xml_response_from_bedrock, product, predicted_category
 ):
@@ -194,6 +241,51 @@ def test_attributes_extractor_will_throw_for_invalid_stop_reason(
         extractor.extract_attributes(product=product, category_id=predicted_category.predicted_category_id)
 
 
+def _a_tool_response_from_bedrock(with_input):
+    return {
+        "output": {
+            "message": {
+                "content": [{"toolUse": {"toolUseId": "tool-1", "name": "record_attributes", "input": with_input}}]
+            }
+        },
+        "stopReason": "tool_use",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+
+
+def test_attributes_extractor_tool_mode(mock_bedrock, schema_retriever, random_attributes, product, predicted_category):
+    # given
+    mock_bedrock.converse.return_value = _a_tool_response_from_bedrock({"attributes": random_attributes})
+    extractor = AttributesExtractor(
+        bedrock_runtime_client=mock_bedrock, schema_retriever=schema_retriever, output_mode="tool"
+    )
+
+    # when
+    results = extractor.extract_attributes(product=product, category_id=predicted_category.predicted_category_id)
+
+    # then
+    assert [r.model_dump() for r in results.attributes] == random_attributes
+    call_kwargs = mock_bedrock.converse.call_args.kwargs
+    assert call_kwargs["toolConfig"]["toolChoice"] == {"tool": {"name": "record_attributes"}}
+    assert "stopSequences" not in call_kwargs["inferenceConfig"]
+    assert [m["role"] for m in call_kwargs["messages"]] == ["user"]
+    assert "record_attributes tool" in call_kwargs["messages"][0]["content"][0]["text"]
+
+
+def test_attributes_extractor_tool_mode_will_throw_when_input_does_not_validate(
+    mock_bedrock, schema_retriever, product, predicted_category
+):
+    # given
+    mock_bedrock.converse.return_value = _a_tool_response_from_bedrock({"attributes": [{"name": "missing value"}]})
+    extractor = AttributesExtractor(
+        bedrock_runtime_client=mock_bedrock, schema_retriever=schema_retriever, output_mode="tool"
+    )
+
+    # then
+    with pytest.raises(ModelResponseError, match="Failed to parse extracted attributes from response"):
+        extractor.extract_attributes(product=product, category_id=predicted_category.predicted_category_id)
+
+
 def test_attributes_extractor_returns_empty_list_of_attrs_when_category_has_no_attrs_schema(
     faker, product, predicted_category
 ):
@@ -357,3 +449,125 @@ def test_prompt_generation_when_metadata_not_present(product, category_schema):
 Your task is to extract the actual attributes and their values from the title and description."""
         in rendered_prompt
     )
+
+
+def test_prompt_renders_the_schema_as_compact_xml_once(product, category_schema, monkeypatch):
+    # given
+    renders = Mock(side_effect=models.json_to_compact_xml)
+    monkeypatch.setattr(models, "json_to_compact_xml", renders)
+    extractor = AttributesExtractor(bedrock_runtime_client=Mock(), schema_retriever=Mock())
+
+    # when
+    extractor.create_prompt(product=product, category_schema=category_schema)
+    rendered_prompt = extractor.create_prompt(product=product, category_schema=category_schema)
+
+    # then
+    assert "<Title>Type of Material</Title><Definition>" in rendered_prompt
+    assert "\n  " not in category_schema.attributes_schema_xml
+    renders.assert_called_once()
+
+
+def test_partitioned_schema_is_extracted_concurrently_and_merged_in_schema_order(mock_bedrock, product):
+    # given
+    category_schema = CategorySchema(
+        category_name="Shoes",
+        subcategory_name="Sneakers",
+        attributes_schema=[{"Title": f"Attribute {i}", "Childs": []} for i in range(5)],
+    )
+    retriever = Mock()
+    retriever.get.return_value = category_schema
+
+    def converse(messages, **kwargs):
+        prompt = messages[0]["content"][0]["text"]
+        names = [f"Attribute {i}" for i in range(5) if f"<Title>Attribute {i}</Title>" in prompt]
+        # the first partition answers last, and the last one also names an attribute of the first
+        time.sleep(0.1 if "Attribute 0" in names else 0.05)
+        attrs = "".join(f"<attribute><name>{n}</name><value>{n} value</value></attribute>" for n in names)
+        if "Attribute 4" in names:
+            attrs += "<attribute><name>attribute 0</name><value>null</value></attribute>"
+        return _a_response_from_bedrock(f"</scratchpad><attributes>{attrs}</attributes>")
+
+    mock_bedrock.converse.side_effect = converse
+    extractor = AttributesExtractor(bedrock_runtime_client=mock_bedrock, schema_retriever=retriever, partition_size=2)
+
+    # when
+    started = time.monotonic()
+    results = extractor.extract_attributes(product=product, category_id="1")
+
+    # then
+    assert mock_bedrock.converse.call_count == 3
+    assert time.monotonic() - started < 0.18
+    expected = [(f"Attribute {i}", f"Attribute {i} value") for i in range(5)]
+    assert [(a.name, a.value) for a in results.attributes] == expected
+    assert category_schema.partitions(2) is category_schema.partitions(2)
+
+
+def test_merge_keeps_the_first_value_that_is_not_null():
+    # given
+    first = Attributes(
+        attributes=[Attribute(name="Color", value="null"), Attribute(name="Size", value="M")], confidence=0.9
+    )
+    second = Attributes(
+        attributes=[Attribute(name="color", value="Red"), Attribute(name="size", value="L")], confidence=0.6
+    )
+
+    # when
+    merged = merge_attributes([first, second])
+
+    # then
+    assert [(a.name, a.value) for a in merged.attributes] == [("color", "Red"), ("Size", "M")]
+    assert merged.confidence == 0.6
+
+
+def test_lexicon_matches_are_extracted_without_the_model(mock_bedrock, product):
+    # given
+    category_schema = CategorySchema(
+        category_name="Clothing",
+        subcategory_name="Hoodies",
+        attributes_schema=[
+            {"Title": "Colour", "Childs": [{"Title": "NAVY"}, {"Title": "RED"}]},
+            {"Title": "Material", "Childs": [{"Title": "COTTON"}, {"Title": "WOOL"}]},
+            {"Title": "Care Instructions"},
+        ],
+    )
+    retriever = Mock()
+    retriever.get.return_value = category_schema
+    mock_bedrock.converse.return_value = _a_response_from_bedrock(
+        "</scratchpad><attributes><attribute><name>Care Instructions</name><value>Machine wash</value></attribute>"
+        "</attributes>"
+    )
+    extractor = AttributesExtractor(bedrock_runtime_client=mock_bedrock, schema_retriever=retriever, lexicon=True)
+
+    # when
+    results = extractor.extract_attributes(
+        models.Product(title="Navy hoodie", description="Soft cotton, machine wash cold"), "1"
+    )
+
+    # then
+    prompt = mock_bedrock.converse.call_args.kwargs["messages"][0]["content"][0]["text"]
+    assert "<Title>Care Instructions</Title>" in prompt
+    assert "<Title>Colour</Title>" not in prompt
+    assert [(a.name, a.value) for a in results.attributes] == [
+        ("Colour", "NAVY"),
+        ("Material", "COTTON"),
+        ("Care Instructions", "Machine wash"),
+    ]
+
+
+def test_model_is_not_called_when_the_lexicon_matches_every_attribute(mock_bedrock):
+    # given
+    category_schema = CategorySchema(
+        category_name="Clothing",
+        subcategory_name="Hoodies",
+        attributes_schema=[{"Title": "Colour", "Childs": [{"Title": "NAVY"}, {"Title": "RED"}]}],
+    )
+    retriever = Mock()
+    retriever.get.return_value = category_schema
+    extractor = AttributesExtractor(bedrock_runtime_client=mock_bedrock, schema_retriever=retriever, lexicon=True)
+
+    # when
+    results = extractor.extract_attributes(models.Product(title="Red hoodie", description="A hoodie"), "1")
+
+    # then
+    mock_bedrock.converse.assert_not_called()
+    assert results.attributes == [Attribute(name="Colour", value="RED")]
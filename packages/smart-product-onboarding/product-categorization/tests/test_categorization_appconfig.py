@@ -174,3 +174,134 @@ class TestCategorizationHandlerAppConfigFallback:
         handler_module._mock_appconfig_client.get_configuration.assert_called_with("productCategorization")
         assert handler_module.product_classifier.model_id == "env-var-model-id"
         assert handler_module.product_classifier.temperature == 0
+
+
+class TestCategorizationHandlerCombinedExtraction:
+    """Test categorization handler extracts the attributes in the same call when there are few candidates."""
+
+    def test_handler_returns_attributes_at_or_below_the_candidate_threshold(self, handler_module):
+        from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigSettings
+        from amzn_smart_product_onboarding_core_utils.models import Attribute, Attributes, CategorizationPrediction
+
+        handler_module._mock_appconfig_client.get_configuration.return_value = AppConfigSettings(
+            model_id="categorization-model", temperature=0, combined_max_candidates=1
+        )
+        handler_module._mock_appconfig_client.get_cached_configuration.return_value = AppConfigSettings(
+            model_id="extraction-model", temperature=0
+        )
+        prediction = CategorizationPrediction(
+            predicted_category_id="1", predicted_category_name="Electronics", explanation="test"
+        )
+        handler_module.product_classifier.classify_and_extract = MagicMock(
+            return_value=(prediction, Attributes(attributes=[Attribute(name="Color", value="Black")]))
+        )
+        handler_module.product_classifier.classify = MagicMock(return_value=prediction)
+        event = {
+            "product": {"title": "Test Product", "description": "A test product description"},
+            "metaclass": {"possible_categories": ["1"]},
+        }
+
+        combined = handler_module.handler(event, None)
+        separate = handler_module.handler({**event, "metaclass": {"possible_categories": ["1", "2"]}}, None)
+
+        assert handler_module.product_classifier.classify_and_extract.call_args.kwargs["model_id"] == "extraction-model"
+        assert combined["attributes"] == [{"name": "Color", "value": "Black"}]
+        handler_module.product_classifier.classify.assert_called_once()
+        assert "attributes" not in separate
+
+    def test_handler_counts_the_reclassification_of_a_combined_call_against_the_categorization_model(
+        self, handler_module
+    ):
+        from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigSettings
+        from amzn_smart_product_onboarding_core_utils.models import CategorizationPrediction
+
+        handler_module._mock_appconfig_client.get_configuration.return_value = AppConfigSettings(
+            model_id="categorization-model", temperature=0, combined_max_candidates=1
+        )
+        handler_module._mock_appconfig_client.get_cached_configuration.return_value = AppConfigSettings(
+            model_id="extraction-model", temperature=0
+        )
+        handler_module.product_classifier.classify_and_extract = MagicMock(return_value=(None, None))
+        handler_module.product_classifier.classify = MagicMock(
+            return_value=CategorizationPrediction(
+                predicted_category_id="1", predicted_category_name="Electronics", explanation="test"
+            )
+        )
+
+        result = handler_module.handler(
+            {
+                "product": {"title": "Test Product", "description": "A test product description"},
+                "metaclass": {"possible_categories": ["1"]},
+            },
+            None,
+        )
+
+        assert result["predicted_category_id"] == "1"
+        assert "attributes" not in result
+        handler_module.product_classifier.classify.assert_called_once()
+        metrics = handler_module.router.metrics()
+        assert metrics["extraction-model"]["requests"] == 1
+        assert metrics["categorization-model"]["requests"] == 1
+
+    def test_handler_makes_separate_calls_with_the_default_threshold(self, handler_module):
+        from amzn_smart_product_onboarding_core_utils.appconfig_client import AppConfigSettings
+        from amzn_smart_product_onboarding_core_utils.models import CategorizationPrediction
+
+        handler_module._mock_appconfig_client.get_configuration.return_value = AppConfigSettings(
+            model_id="categorization-model", temperature=0
+        )
+        handler_module.product_classifier.classify_and_extract = MagicMock()
+        handler_module.product_classifier.classify = MagicMock(
+            return_value=CategorizationPrediction(
+                predicted_category_id="1", predicted_category_name="Electronics", explanation="test"
+            )
+        )
+
+        result = handler_module.handler(
+            {
+                "product": {"title": "Test Product", "description": "A test product description"},
+                "metaclass": {"possible_categories": []},
+            },
+            None,
+        )
+
+        handler_module.product_classifier.classify_and_extract.assert_not_called()
+        assert "attributes" not in result
+
+    def test_handler_routes_the_combined_call_and_leaves_extraction_cascades_to_the_extraction_task(
+        self, handler_module
+    ):
+        from amzn_smart_product_onboarding_core_utils.appconfig_client import (
+            AppConfigSettings,
+            CascadeTier,
+            ModelRoute,
+        )
+        from amzn_smart_product_onboarding_core_utils.models import Attributes, CategorizationPrediction
+
+        handler_module._mock_appconfig_client.get_configuration.return_value = AppConfigSettings(
+            model_id="categorization-model", temperature=0, combined_max_candidates=1
+        )
+        prediction = CategorizationPrediction(
+            predicted_category_id="1", predicted_category_name="Electronics", explanation="test"
+        )
+        handler_module.product_classifier.classify_and_extract = MagicMock(
+            return_value=(prediction, Attributes(attributes=[]))
+        )
+        handler_module.product_classifier.classify = MagicMock(return_value=prediction)
+        event = {
+            "product": {"title": "Test Product", "description": "A test product description"},
+            "metaclass": {"possible_categories": ["1"]},
+        }
+
+        handler_module._mock_appconfig_client.get_cached_configuration.return_value = AppConfigSettings(
+            model_id="extraction-model", temperature=0, routes=[ModelRoute(model_id="routed-model")]
+        )
+        handler_module.handler(event, None)
+        handler_module._mock_appconfig_client.get_cached_configuration.return_value = AppConfigSettings(
+            model_id="extraction-model", temperature=0, cascade=[CascadeTier(model_id="small-model")]
+        )
+        separate = handler_module.handler(event, None)
+
+        handler_module.product_classifier.classify_and_extract.assert_called_once()
+        assert handler_module.product_classifier.classify_and_extract.call_args.kwargs["model_id"] == "routed-model"
+        assert "attributes" not in separate
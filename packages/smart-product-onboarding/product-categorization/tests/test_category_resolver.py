@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+from amzn_smart_product_onboarding_core_utils.models import (
+    BaseProductCategory,
+    CategorizationPrediction,
+    ProductCategory,
+)
+
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_resolver import (
+    CategoryResolver,
+    normalize_name,
+)
+
+
+def _category(category_id: str, *path: str) -> ProductCategory:
+    return ProductCategory(
+        id=category_id,
+        name=path[-1],
+        full_path=[BaseProductCategory(id=str(i), name=name) for i, name in enumerate(path)],
+        childs=[],
+    )
+
+
+@pytest.fixture
+def resolver():
+    return CategoryResolver(
+        [
+            _category("10001234", "Electronics", "Smartphones"),
+            _category("10001235", "Electronics", "Tablets"),
+            _category("10002000", "Home", "Other"),
+            _category("10003000", "Garden", "Other"),
+        ]
+    )
+
+
+def _prediction(category_id: str, name: str) -> CategorizationPrediction:
+    return CategorizationPrediction(predicted_category_id=category_id, predicted_category_name=name, explanation="")
+
+
+def test_normalize_name():
+    assert normalize_name("  Electronics >  Smart-Phones ") == "electronics > smart phones"
+
+
+def test_resolves_unique_leaf_name_with_unknown_id(resolver):
+    assert resolver.resolve(_prediction("42", "smartphones")) == "10001234"
+
+
+def test_resolves_full_path(resolver):
+    assert resolver.resolve(_prediction("42", "Garden > Other")) == "10003000"
+
+
+def test_ambiguous_name_is_narrowed_by_id_typo(resolver):
+    assert resolver.resolve(_prediction("10020000", "Other")) == "10002000"
+
+
+def test_ambiguous_name_without_id_is_not_resolved(resolver):
+    assert resolver.resolve(_prediction("42", "Other")) is None
+
+
+def test_name_and_id_disagreement_is_not_resolved(resolver):
+    assert resolver.resolve(_prediction("10001235", "Smartphones")) is None
+
+
+def test_unknown_name_is_not_resolved(resolver):
+    assert resolver.resolve(_prediction("10001234", "Laptops")) is None
+
+
+def test_resolution_is_restricted_to_candidates(resolver):
+    assert resolver.resolve(_prediction("42", "Other"), candidate_ids={"10003000"}) == "10003000"
+    assert resolver.resolve(_prediction("42", "Smartphones"), candidate_ids={"10003000"}) is None
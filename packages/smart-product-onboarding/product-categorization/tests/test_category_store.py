@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+from unittest.mock import Mock
+
+import pytest
+from amzn_smart_product_onboarding_core_utils.models import ProductCategory
+
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import CategoryStore
+
+RECORDS = {
+    "1": {
+        "id": "1",
+        "name": "Electronics",
+        "full_path": [{"id": "1", "name": "Electronics"}],
+        "childs": [{"id": "2", "name": "Smartphones"}],
+    },
+    "2": {
+        "id": "2",
+        "name": "Smartphones",
+        "description": "Mobile phones",
+        "full_path": [{"id": "1", "name": "Electronics"}, {"id": "2", "name": "Smartphones"}],
+        "childs": [],
+        "examples": [{"title": "iPhone 12", "description": "Apple smartphone"}],
+    },
+    "3": {"id": "3", "name": "Broken"},
+}
+
+
+@pytest.fixture
+def store():
+    return CategoryStore.from_json(json.dumps({k: v for k, v in RECORDS.items() if k != "3"}))
+
+
+def test_categories_are_validated_on_first_access(store):
+    assert store.validated_count == 0
+    assert "2" in store and len(store) == 2 and list(store) == ["1", "2"]
+    assert store.validated_count == 0
+
+    category = store["2"]
+
+    assert isinstance(category, ProductCategory)
+    assert category.examples[0].title == "iPhone 12"
+    assert store["2"] is category
+    assert store.validated_count == 1
+
+
+def test_formatted_path_is_precomputed(store):
+    assert store.entry("2").formatted_path == "Electronics > Smartphones"
+    assert store["2"].formatted_path == "Electronics > Smartphones"
+    assert store["2"].formatted_path == ProductCategory.model_validate(RECORDS["2"]).formatted_path
+
+
+def test_xml_fragment_is_precomputed(store):
+    fragment = store.entry("2").xml_fragment
+
+    assert "<name>Electronics > Smartphones</name>" in fragment
+    assert "<description>Mobile phones</description>" in fragment
+    assert "<title>iPhone 12</title>" in fragment
+    assert "<examples>" not in store.entry("1").xml_fragment
+
+
+def test_invalid_record_fails_on_access_only():
+    store = CategoryStore(RECORDS | {"3": {**RECORDS["3"], "full_path": [{"id": "3", "name": "Broken"}]}})
+
+    assert store["1"].name == "Electronics"
+    with pytest.raises(ValueError):
+        store["3"]
+
+
+def test_unknown_category_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store["42"]
+
+
+def test_product_classifier_validates_only_the_categories_it_reads(store):
+    bedrock = Mock()
+    bedrock.converse.return_value = {
+        "output": {
+            "message": {
+                "content": [
+                    {
+                        "text": "chain of thought</thinking><prediction>"
+                        "<predicted_category_id>22</predicted_category_id>"
+                        "<predicted_category_name>Smartphones</predicted_category_name>"
+                        "<explanation>This is a smartphone.</explanation></prediction>"
+                    }
+                ]
+            }
+        },
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+    classifier = ProductClassifier(bedrock, store)
+
+    prediction = classifier.get_product_category("prompt", candidate_ids={"2"})
+
+    assert prediction.predicted_category_id == "2"
+    assert prediction.predicted_category_name == "Electronics > Smartphones"
+    assert classifier.hallucination_repairs == {"local": 1}
+    assert store.validated_count == 1
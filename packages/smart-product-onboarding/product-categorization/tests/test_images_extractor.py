@@ -3,6 +3,7 @@
 
 import io
 import os
+import time
 import zipfile
 from unittest.mock import Mock, patch
 
@@ -11,6 +12,7 @@ from moto import mock_aws
 
 from amzn_smart_product_onboarding_core_utils.boto3_helper.s3_client import S3Client
 from amzn_smart_product_onboarding_product_categorization.images_extractor import (
+    MIN_PART_SIZE,
     ImagesExtractor,
     extract_images_from_zip,
     is_supported_image,
@@ -31,6 +33,15 @@ def create_test_bucket(s3_client, bucket_name):
         )
 
 
+def mock_ranged_gets(s3: Mock, archive: bytes) -> None:
+    def mock_get_object(Bucket, Key, Range, **kwargs):
+        start, end = map(int, Range.removeprefix("bytes=").split("-"))
+        return {"Body": io.BytesIO(archive[start : end + 1])}
+
+    s3.head_object = Mock(return_value={"ContentLength": len(archive), "ETag": '"etag"'})
+    s3.get_object = Mock(side_effect=mock_get_object)
+
+
 @pytest.fixture()
 def test_zip_file():
     zip_buffer = io.BytesIO()
@@ -94,15 +105,11 @@ class TestImagesExtractor:
         )
 
     def test_process_zip_file(self, extractor, test_zip_file):
-        # Mock S3 download
-
-        def mock_download(bucket, key, file_obj):
-            file_obj.write(test_zip_file.getvalue())
-
-        extractor.s3.download_fileobj = Mock(side_effect=mock_download)
+        # Mock S3 ranged GETs
+        mock_ranged_gets(extractor.s3, test_zip_file.getvalue())
 
         # Test process_zip_file
-        extractor.process_zip_file("test.zip", "prefix")
+        metrics = extractor.process_zip_file("test.zip", "prefix")
 
         # Verify upload calls
         assert extractor.s3.put_object.call_count == 3
@@ -110,6 +117,102 @@ class TestImagesExtractor:
         assert "prefix/test1.jpg" in upload_keys
         assert "prefix/subfolder/test2.png" in upload_keys
         assert "prefix/test3.webp" in upload_keys
+        # the archive is small enough for a single ranged GET, never downloaded whole
+        extractor.s3.get_object.assert_called_once()
+        assert extractor.s3.get_object.call_args[1]["IfMatch"] == '"etag"'
+        extractor.s3.download_fileobj.assert_not_called()
+        assert metrics.images == 3
+        assert metrics.image_bytes == 17 + 21 + 25
+        assert metrics.images_per_second > 0
+
+    def test_process_zip_file_uploads_large_images_in_parts(self, mock_s3):
+        # given
+        large_image = b"\xFF\xD8\xFF" + bytes(MIN_PART_SIZE + 1000)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("small.png", b"\x89PNG\r\n\x1a\nfake png data")
+            zip_file.writestr("large.jpg", large_image)
+        mock_ranged_gets(mock_s3, buffer.getvalue())
+        mock_s3.create_multipart_upload.return_value = {"UploadId": "upload-id"}
+        mock_s3.upload_part.side_effect = lambda PartNumber, **kwargs: {"ETag": f"etag-{PartNumber}"}
+        extractor = ImagesExtractor(mock_s3, "test-bucket", multipart_threshold=1000, part_size=MIN_PART_SIZE)
+
+        # when
+        metrics = extractor.process_zip_file("test.zip", "prefix")
+
+        # then
+        mock_s3.put_object.assert_called_once()
+        mock_s3.create_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key="prefix/large.jpg", ContentType="image/jpeg"
+        )
+        parts = [call[1]["Body"] for call in mock_s3.upload_part.call_args_list]
+        assert [len(part) for part in parts] == [MIN_PART_SIZE, 1003]
+        assert b"".join(parts) == large_image
+        mock_s3.complete_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket",
+            Key="prefix/large.jpg",
+            UploadId="upload-id",
+            MultipartUpload={"Parts": [{"ETag": "etag-1", "PartNumber": 1}, {"ETag": "etag-2", "PartNumber": 2}]},
+        )
+        assert (metrics.images, metrics.multipart_uploads) == (2, 1)
+
+    def test_failed_part_aborts_the_multipart_upload(self, extractor):
+        # given
+        extractor.s3.create_multipart_upload.return_value = {"UploadId": "upload-id"}
+        extractor.s3.upload_part.side_effect = RuntimeError("upload failed")
+
+        # then
+        with pytest.raises(RuntimeError, match="upload failed"):
+            extractor.upload_large_image_to_s3("large.jpg", io.BytesIO(b"\xFF\xD8\xFF" + bytes(100)))
+        extractor.s3.abort_multipart_upload.assert_called_once_with(
+            Bucket="test-bucket", Key="large.jpg", UploadId="upload-id"
+        )
+        extractor.s3.complete_multipart_upload.assert_not_called()
+
+    def test_process_zip_file_bounds_the_extracted_images(self, mock_s3):
+        # given
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zip_file:
+            for i in range(30):
+                zip_file.writestr(f"image{i}.jpg", b"\xFF\xD8\xFF" + bytes(100))
+        mock_ranged_gets(mock_s3, buffer.getvalue())
+        extractor = ImagesExtractor(mock_s3, "test-bucket", decompression_workers=2, upload_workers=1, queue_size=3)
+        read = zipfile.ZipFile.read
+        reads = []
+        extracted_at_first_upload = []
+
+        def counted_read(*args):
+            reads.append(1)
+            return read(*args)
+
+        def slow_upload(**kwargs):
+            if not extracted_at_first_upload:
+                time.sleep(0.2)
+                extracted_at_first_upload.append(len(reads))
+
+        mock_s3.put_object.side_effect = slow_upload
+
+        # when
+        with patch.object(zipfile.ZipFile, "read", autospec=True, side_effect=counted_read):
+            metrics = extractor.process_zip_file("test.zip", "prefix")
+
+        # then
+        # one image in upload, three in the queue and one in the hands of each decompression worker
+        assert 1 < extracted_at_first_upload[0] <= 1 + 3 + 2
+        assert metrics.images == mock_s3.put_object.call_count == 30
+
+    def test_process_zip_file_raises_a_failed_upload(self, extractor, test_zip_file):
+        # given
+        mock_ranged_gets(extractor.s3, test_zip_file.getvalue())
+        extractor.s3.put_object.side_effect = RuntimeError("upload failed")
+
+        # then
+        with pytest.raises(RuntimeError, match="upload failed"):
+            extractor.process_zip_file("test.zip", "prefix")
+
+    def test_part_size_below_the_s3_minimum_is_rejected(self, mock_s3):
+        with pytest.raises(ValueError, match="part size"):
+            ImagesExtractor(mock_s3, "test-bucket", part_size=MIN_PART_SIZE - 1)
 
 
 # Integration Tests
@@ -0,0 +1,221 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+from amzn_smart_product_onboarding_core_utils.appconfig_client import CascadeTier
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import BedrockRuntimeSimulator, SimulatedModel
+from amzn_smart_product_onboarding_core_utils.models import (
+    BaseProductCategory,
+    CategorySchema,
+    Product,
+    ProductCategory,
+)
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
+    AttributesExtractor,
+    SchemaRetriever,
+)
+from amzn_smart_product_onboarding_product_categorization.model_cascade import ModelCascade
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+
+CHEAP = "cheap"
+STRONG = "strong"
+
+
+def _category(category_id: str, name: str) -> ProductCategory:
+    return ProductCategory(
+        id=category_id,
+        name=name,
+        description=f"{name} products",
+        full_path=[BaseProductCategory(id=category_id, name=name)],
+        childs=[],
+        examples=[],
+    )
+
+
+def _prediction(category_id: str, name: str, confidence: str | None = None) -> str:
+    confidence = f"<confidence>{confidence}</confidence>" if confidence is not None else ""
+    return (
+        f"thinking</thinking><prediction><predicted_category_id>{category_id}</predicted_category_id>"
+        f"<predicted_category_name>{name}</predicted_category_name><explanation>because</explanation>"
+        f"{confidence}</prediction></response>"
+    )
+
+
+def _attributes(value: str, confidence: str | None = None) -> str:
+    confidence = f"<confidence>{confidence}</confidence>" if confidence is not None else ""
+    return (
+        f"thinking</scratchpad><attributes><attribute><name>Type of Material</name><value>{value}</value>"
+        f"</attribute></attributes>{confidence}</response>"
+    )
+
+
+def _bedrock(cheap_text: str, strong_text: str) -> BedrockRuntimeSimulator:
+    return BedrockRuntimeSimulator(
+        {
+            CHEAP: SimulatedModel(responder=lambda request: cheap_text),
+            STRONG: SimulatedModel(responder=lambda request: strong_text),
+        }
+    )
+
+
+@pytest.fixture
+def product():
+    return Product(title="iPhone 12", description="Latest Apple smartphone")
+
+
+def _classifier(bedrock) -> ProductClassifier:
+    return ProductClassifier(
+        bedrock,
+        {"1": _category("1", "Electronics"), "2": _category("2", "Smartphones"), "3": _category("3", "Books")},
+        always_categories=["3"],
+    )
+
+
+def _cascade(min_confidence=None, require_agreement=False) -> ModelCascade:
+    return ModelCascade(
+        "test",
+        [
+            CascadeTier(model_id=CHEAP, min_confidence=min_confidence, require_agreement=require_agreement),
+            CascadeTier(model_id=STRONG),
+        ],
+    )
+
+
+def test_confident_cheap_prediction_is_accepted(product):
+    bedrock = _bedrock(_prediction("2", "Smartphones", "0.9"), _prediction("1", "Electronics"))
+    cascade = _cascade(min_confidence=0.8)
+
+    prediction = _classifier(bedrock).classify_cascade(product, ["1", "2"], cascade)
+
+    assert prediction.predicted_category_id == "2"
+    assert prediction.confidence == pytest.approx(0.9)
+    assert bedrock.stats[STRONG]["requests"] == 0
+    metrics = cascade.metrics()[CHEAP]
+    assert metrics["acceptance_rate"] == 1
+    assert metrics["input_tokens"] == bedrock.stats[CHEAP]["inputTokens"]
+    assert metrics["output_tokens"] == bedrock.stats[CHEAP]["outputTokens"]
+
+
+def test_low_confidence_escalates_to_the_next_tier(product):
+    bedrock = _bedrock(_prediction("2", "Smartphones", "0.5"), _prediction("1", "Electronics"))
+    cascade = _cascade(min_confidence=0.8)
+    classifier = _classifier(bedrock)
+
+    prediction = classifier.classify_cascade(product, ["1", "2"], cascade)
+
+    assert prediction.predicted_category_id == "1"
+    assert cascade.metrics()[CHEAP]["rejected_low_confidence"] == 1
+    assert cascade.metrics()[STRONG]["accepted"] == 1
+    # the classifier is left as it was configured
+    assert classifier.model_id != STRONG
+    assert classifier.bedrock is bedrock
+
+
+def test_disagreement_with_the_metaclass_candidates_escalates(product):
+    bedrock = _bedrock(_prediction("3", "Books"), _prediction("2", "Smartphones"))
+    cascade = _cascade(require_agreement=True)
+
+    prediction = _classifier(bedrock).classify_cascade(product, ["1", "2"], cascade)
+
+    assert prediction.predicted_category_id == "2"
+    assert cascade.metrics()[CHEAP]["rejected_disagreement"] == 1
+
+
+def test_invalid_cheap_prediction_escalates_without_a_model_repair(product):
+    bedrock = _bedrock(_prediction("42", "Unknown"), _prediction("2", "Smartphones"))
+    cascade = _cascade()
+
+    prediction = _classifier(bedrock).classify_cascade(product, ["1", "2"], cascade)
+
+    assert prediction.predicted_category_id == "2"
+    assert bedrock.stats[CHEAP]["requests"] == 1
+    assert cascade.metrics()[CHEAP]["rejected_invalid"] == 1
+
+
+def test_classification_during_a_cascade_keeps_the_classifier_model(product):
+    # given a cascade whose cheap tier is still waiting for its response
+    cheap_called, release = threading.Event(), threading.Event()
+
+    def cheap(request):
+        cheap_called.set()
+        release.wait(5)
+        return _prediction("2", "Smartphones")
+
+    bedrock = BedrockRuntimeSimulator(
+        {CHEAP: SimulatedModel(cheap), STRONG: SimulatedModel(lambda request: _prediction("1", "Electronics"))}
+    )
+    classifier = _classifier(bedrock)
+    classifier.model_id = STRONG
+
+    with ThreadPoolExecutor(1) as executor:
+        cascaded = executor.submit(classifier.classify_cascade, product, ["1", "2"], _cascade())
+        assert cheap_called.wait(5)
+
+        # when the same classifier classifies another product meanwhile
+        prediction = classifier.classify(product, ["1", "2"])
+        release.set()
+
+    # then each call used its own model
+    assert prediction.predicted_category_id == "1"
+    assert cascaded.result().predicted_category_id == "2"
+    assert bedrock.stats[CHEAP]["requests"] == 1
+    assert bedrock.stats[STRONG]["requests"] == 1
+
+
+def test_confidence_is_only_requested_from_tiers_that_check_it(product):
+    requests = []
+
+    def respond(request):
+        requests.append(request["messages"][0]["content"][0]["text"])
+        return _prediction("2", "Smartphones", "0.1")
+
+    bedrock = BedrockRuntimeSimulator({CHEAP: SimulatedModel(respond), STRONG: SimulatedModel(respond)})
+
+    _classifier(bedrock).classify_cascade(product, ["1", "2"], _cascade(min_confidence=0.8))
+
+    assert "<confidence>" in requests[0]
+    assert "<confidence>" not in requests[1]
+
+
+@pytest.fixture
+def schema_retriever():
+    schema_retriever = Mock(spec_set=SchemaRetriever)
+    schema_retriever.get.return_value = CategorySchema(
+        category_name="Toys",
+        subcategory_name="Building Blocks",
+        attributes_schema=[
+            {
+                "Title": "Type of Material",
+                "Definition": "The material the product is made of.",
+                "Childs": [{"Title": "PLASTIC", "Definition": "A synthetic material.", "Childs": []}],
+            }
+        ],
+    )
+    return schema_retriever
+
+
+def test_attributes_outside_the_schema_values_escalate(product, schema_retriever):
+    bedrock = _bedrock(_attributes("Aluminium"), _attributes("PLASTIC"))
+    cascade = _cascade(require_agreement=True)
+    extractor = AttributesExtractor(bedrock, schema_retriever)
+
+    attributes = extractor.extract_attributes_cascade(product, "1", cascade)
+
+    assert attributes.attributes[0].value == "PLASTIC"
+    assert cascade.metrics()[CHEAP]["rejected_disagreement"] == 1
+
+
+def test_confident_cheap_attributes_are_accepted(product, schema_retriever):
+    bedrock = _bedrock(_attributes("plastic", "0.95"), _attributes("PLASTIC"))
+    cascade = _cascade(min_confidence=0.8, require_agreement=True)
+    extractor = AttributesExtractor(bedrock, schema_retriever)
+
+    attributes = extractor.extract_attributes_cascade(product, "1", cascade)
+
+    assert attributes.attributes[0].value == "plastic"
+    assert bedrock.stats[STRONG]["requests"] == 0
@@ -1,17 +1,19 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 
 import pytest
-
-from amzn_smart_product_onboarding_core_utils.exceptions import ModelResponseError
+from amzn_smart_product_onboarding_core_utils.deadline import Deadline
+from amzn_smart_product_onboarding_core_utils.exceptions import DeadlineExceeded, ModelResponseError
 from amzn_smart_product_onboarding_core_utils.models import (
-    Product,
-    ProductCategory,
     BaseProductCategory,
     CategorizationPrediction,
+    CategorySchema,
+    Product,
+    ProductCategory,
 )
+
 from amzn_smart_product_onboarding_product_categorization.product_classifier import (
     ProductClassifier,
 )
@@ -78,6 +80,21 @@ def test_create_prompt(product_classifier):
     assert "Smartphones" in prompt
 
 
+def test_create_prompt_joins_pre_rendered_fragments(product_classifier):
+    product = Product(title="iPhone 12", description="Latest Apple smartphone")
+
+    with patch("jinja2.Environment") as environment:
+        prompt = product_classifier.create_prompt(
+            product, [product_classifier.category_tree["1"], product_classifier.category_tree.entry("2")]
+        )
+
+    environment.assert_not_called()
+    candidates = prompt[prompt.index("<candidate_categories>") : prompt.index("</candidate_categories>")]
+    assert product_classifier.category_tree.entry("1").xml_fragment in candidates
+    assert product_classifier.category_tree.entry("2").xml_fragment in candidates
+    assert "<name>Electronics > Smartphones</name>" in candidates
+
+
 def test_get_product_category_success(product_classifier):
     product_classifier.bedrock.converse.return_value = {
         "output": {
@@ -126,7 +143,7 @@ def test_classify(product_classifier):
     assert result.predicted_category_name == "Smartphones"
     product_classifier.create_prompt.assert_called_once()
     product_classifier.get_product_category.assert_called_once_with(
-        "Mocked prompt", dryrun=False
+        "Mocked prompt", dryrun=False, candidate_ids=set(candidate_category_ids + product_classifier.always_categories)
     )
 
 
@@ -152,7 +169,7 @@ def test_classify_with_always_categories(product_classifier):
     assert result.explanation == "This is a book."
     product_classifier.create_prompt.assert_called_once()
     product_classifier.get_product_category.assert_called_once_with(
-        "Mocked prompt", dryrun=False
+        "Mocked prompt", dryrun=False, candidate_ids=set(candidate_category_ids + product_classifier.always_categories)
     )
 
     # Check if the always_categories were included in the candidate categories
@@ -182,11 +199,12 @@ def test_classify_with_include_prompt(product_classifier):
     assert result.prompt == "Mocked prompt"
     product_classifier.create_prompt.assert_called_once()
     product_classifier.get_product_category.assert_called_once_with(
-        "Mocked prompt", dryrun=False
+        "Mocked prompt", dryrun=False, candidate_ids=set(candidate_category_ids + product_classifier.always_categories)
     )
 
 
 def test_classify_with_hallucination(product_classifier):
+    product_classifier.local_repair = False
     prompt = "Mocked prompt"
     product_classifier._get_model_response = Mock(
         return_value={
@@ -220,7 +238,8 @@ def test_classify_with_hallucination(product_classifier):
                         "role": "user",
                         "content": [{"text": prompt}],
                     },
-                ]
+                ],
+                model_call=product_classifier._model_call(),
             ),
             call(
                 [
@@ -253,7 +272,8 @@ def test_classify_with_hallucination(product_classifier):
                             }
                         ],
                     },
-                ]
+                ],
+                model_call=product_classifier._model_call(),
             ),
         ]
     )
@@ -305,3 +325,459 @@ def test_validate_prediction_does_not_match_id(product_classifier):
     result = product_classifier.validate_prediction(prediction)
 
     assert result is False
+
+
+def test_get_product_category_repairs_wrong_id_locally(product_classifier):
+    product_classifier._get_model_response = Mock(
+        return_value={
+            "output": {
+                "message": {
+                    "content": [
+                        {
+                            "text": "chain of thought</thinking>"
+                            "<prediction>"
+                            "<predicted_category_id>42</predicted_category_id>"
+                            "<predicted_category_name>Smartphones</predicted_category_name>"
+                            "<explanation>This is a smartphone.</explanation>"
+                            "</prediction>"
+                        }
+                    ]
+                }
+            },
+            "stopReason": "stop_sequence",
+            "usage": {"inputTokens": 100, "outputTokens": 50},
+        }
+    )
+
+    result = product_classifier.get_product_category("Mocked prompt", candidate_ids={"1", "2"})
+
+    assert result.predicted_category_id == "2"
+    assert result.predicted_category_name == "Electronics > Smartphones"
+    product_classifier._get_model_response.assert_called_once()
+    assert product_classifier.hallucination_repairs == {"local": 1}
+
+
+def test_get_product_category_falls_back_to_model_when_repair_is_ambiguous(product_classifier):
+    invalid = {
+        "output": {
+            "message": {
+                "content": [
+                    {
+                        "text": "chain of thought</thinking>"
+                        "<prediction>"
+                        "<predicted_category_id>2</predicted_category_id>"
+                        "<predicted_category_name>Books</predicted_category_name>"
+                        "<explanation>This is a book.</explanation>"
+                        "</prediction>"
+                    }
+                ]
+            }
+        },
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+    corrected = {
+        "output": {
+            "message": {
+                "content": [
+                    {
+                        "text": "chain of thought</thinking>"
+                        "<prediction>"
+                        "<predicted_category_id>3</predicted_category_id>"
+                        "<predicted_category_name>Books</predicted_category_name>"
+                        "<explanation>This is a book.</explanation>"
+                        "</prediction>"
+                    }
+                ]
+            }
+        },
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+    product_classifier._get_model_response = Mock(side_effect=[invalid, corrected])
+
+    result = product_classifier.get_product_category("Mocked prompt")
+
+    assert result.predicted_category_id == "3"
+    assert product_classifier._get_model_response.call_count == 2
+    assert product_classifier.hallucination_repairs == {"llm": 1}
+
+
+def _stream_events(*deltas, stop_reason="end_turn"):
+    yield {"messageStart": {"role": "assistant"}}
+    for delta in deltas:
+        yield {"contentBlockDelta": {"delta": {"text": delta}, "contentBlockIndex": 0}}
+    yield {"contentBlockStop": {"contentBlockIndex": 0}}
+    yield {"messageStop": {"stopReason": stop_reason}}
+    yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": 50}, "metrics": {"latencyMs": 10}}}
+
+
+def test_streaming_stops_reading_when_prediction_closes(product_classifier):
+    product_classifier.streaming = True
+    consumed = []
+
+    def events():
+        for event in _stream_events(
+            "chain of thought</thin",
+            "king><prediction><predicted_category_id>2</predicted_category_id>",
+            "<predicted_category_name>Smartphones</predicted_category_name>",
+            "<explanation>This is a smartphone.</explanation></prediction>\n</resp",
+            "onse>",
+        ):
+            consumed.append(event)
+            yield event
+
+    product_classifier.bedrock.converse_stream = Mock(return_value={"stream": events()})
+
+    result = product_classifier.get_product_category("Test prompt")
+
+    assert result.predicted_category_id == "2"
+    assert result.predicted_category_name == "Electronics > Smartphones"
+    assert not any("messageStop" in event for event in consumed)
+    assert product_classifier.last_stream_metrics.terminated_early
+    assert product_classifier.last_stream_metrics.time_to_first_token_ms is not None
+    assert product_classifier.last_stream_metrics.time_to_stop_ms is not None
+
+
+def test_skip_thinking_prefills_the_prediction(product_classifier):
+    product_classifier.max_thinking_chars = 0
+    product_classifier.bedrock.converse.return_value = {
+        "output": {
+            "message": {
+                "content": [
+                    {
+                        "text": "<predicted_category_id>3</predicted_category_id>"
+                        "<predicted_category_name>Books</predicted_category_name>"
+                        "<explanation>A book.</explanation>"
+                        "</prediction>"
+                    }
+                ]
+            }
+        },
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 20},
+    }
+
+    result = product_classifier.get_product_category("Test prompt")
+
+    assert result.predicted_category_id == "3"
+    prefill = product_classifier.bedrock.converse.call_args.kwargs["messages"][-1]["content"][0]["text"]
+    assert prefill == "<response>\n<thinking></thinking>\n<prediction>"
+
+
+def test_thinking_cap_without_streaming_is_rejected(mock_bedrock, category_tree):
+    with pytest.raises(ValueError, match="needs streaming"):
+        ProductClassifier(mock_bedrock, category_tree, max_thinking_chars=500)
+
+    assert ProductClassifier(mock_bedrock, category_tree, max_thinking_chars=0).max_thinking_chars == 0
+
+
+def test_streaming_caps_thinking_and_continues_into_prediction(product_classifier):
+    product_classifier.streaming = True
+    product_classifier.max_thinking_chars = 10
+    product_classifier.bedrock.converse_stream = Mock(
+        side_effect=[
+            {"stream": _stream_events("a very long chain ", "of thought that never ends")},
+            {
+                "stream": _stream_events(
+                    "<predicted_category_id>3</predicted_category_id>"
+                    "<predicted_category_name>Books</predicted_category_name>"
+                    "<explanation>A book.</explanation></prediction>"
+                )
+            },
+        ]
+    )
+
+    result = product_classifier.get_product_category("Test prompt")
+
+    assert result.predicted_category_id == "3"
+    continuation_prefill = product_classifier.bedrock.converse_stream.call_args.kwargs["messages"][-1]["content"][0][
+        "text"
+    ]
+    assert continuation_prefill == "<response>\n<thinking>a very lon</thinking>\n<prediction>"
+
+
+def _tool_response(tool_use_id, category_id, category_name):
+    return {
+        "output": {
+            "message": {
+                "role": "assistant",
+                "content": [
+                    {
+                        "toolUse": {
+                            "toolUseId": tool_use_id,
+                            "name": "record_category_prediction",
+                            "input": {
+                                "predicted_category_id": category_id,
+                                "predicted_category_name": category_name,
+                                "explanation": "This is a smartphone.",
+                            },
+                        }
+                    }
+                ],
+            }
+        },
+        "stopReason": "tool_use",
+        "usage": {"inputTokens": 100, "outputTokens": 20},
+    }
+
+
+def test_tool_mode_validates_tool_input(product_classifier):
+    product_classifier.output_mode = "tool"
+    product_classifier.bedrock.converse.return_value = _tool_response("tool-1", "2", "Smartphones")
+
+    result = product_classifier.get_product_category("Test prompt")
+
+    assert result.predicted_category_id == "2"
+    assert result.predicted_category_name == "Electronics > Smartphones"
+    call_kwargs = product_classifier.bedrock.converse.call_args.kwargs
+    assert call_kwargs["toolConfig"]["toolChoice"] == {"tool": {"name": "record_category_prediction"}}
+    assert "prompt" not in call_kwargs["toolConfig"]["tools"][0]["toolSpec"]["inputSchema"]["json"]["properties"]
+    assert call_kwargs["inferenceConfig"] == {"temperature": 0}
+    assert [m["role"] for m in call_kwargs["messages"]] == ["user"]
+
+
+def test_tool_mode_raises_when_tool_input_is_invalid(product_classifier):
+    product_classifier.output_mode = "tool"
+    response = _tool_response("tool-1", "2", "Smartphones")
+    del response["output"]["message"]["content"][0]["toolUse"]["input"]["explanation"]
+    product_classifier.bedrock.converse.return_value = response
+
+    with pytest.raises(ModelResponseError, match="Failed to parse prediction from response"):
+        product_classifier.get_product_category("Test prompt")
+
+
+def test_tool_mode_hallucination_is_corrected_through_tool_result(product_classifier):
+    product_classifier.output_mode = "tool"
+    product_classifier.local_repair = False
+    product_classifier.bedrock.converse.side_effect = [
+        _tool_response("tool-1", "2", "Books"),
+        _tool_response("tool-2", "2", "Smartphones"),
+    ]
+
+    result = product_classifier.get_product_category("Test prompt")
+
+    assert result.predicted_category_id == "2"
+    retry_messages = product_classifier.bedrock.converse.call_args.kwargs["messages"]
+    assert [m["role"] for m in retry_messages] == ["user", "assistant", "user"]
+    tool_result = retry_messages[2]["content"][0]["toolResult"]
+    assert tool_result["toolUseId"] == "tool-1"
+    assert tool_result["status"] == "error"
+    assert product_classifier.hallucination_repairs == {"llm": 1}
+
+
+def test_create_prompt_tool_mode_drops_xml_format(product_classifier):
+    product_classifier.output_mode = "tool"
+    product = Product(title="iPhone 12", description="Latest Apple smartphone")
+
+    prompt = product_classifier.create_prompt(product, [product_classifier.category_tree["2"]])
+
+    assert "record_category_prediction tool" in prompt
+    assert "<predicted_category_id>" not in prompt
+
+
+def _batch_response(*predictions):
+    text = "".join(
+        f"<prediction><product_id>{product_id}</product_id>"
+        f"<predicted_category_id>{category_id}</predicted_category_id>"
+        f"<predicted_category_name>{category_name}</predicted_category_name>"
+        f"<explanation>Because.</explanation></prediction>"
+        for product_id, category_id, category_name in predictions
+    )
+    return {
+        "output": {"message": {"content": [{"text": text}]}},
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+
+
+def _prompt_of(call_args):
+    return call_args.kwargs["messages"][0]["content"][0]["text"]
+
+
+def test_classify_many_groups_products_by_candidate_set(product_classifier):
+    phones = [Product(title=f"Phone {i}", description="A smartphone") for i in range(3)]
+    book = Product(title="Novel", description="A fiction book")
+    product_classifier.bedrock.converse.side_effect = [
+        _batch_response(("1", "2", "Smartphones"), ("2", "2", "Smartphones"), ("3", "2", "Smartphones")),
+        _batch_response(("1", "3", "Books")),
+    ]
+
+    results = product_classifier.classify_many(
+        [(phones[0], ["1", "2"]), (book, ["3"]), (phones[1], ["2", "1"]), (phones[2], ["1", "2"])]
+    )
+
+    assert [r.predicted_category_id for r in results] == ["2", "3", "2", "2"]
+    assert results[0].predicted_category_name == "Electronics > Smartphones"
+    assert product_classifier.bedrock.converse.call_count == 2
+    first_prompt = _prompt_of(product_classifier.bedrock.converse.call_args_list[0])
+    assert all(f"<title>Phone {i}</title>" in first_prompt for i in range(3))
+    assert "<title>Novel</title>" not in first_prompt
+    assert product_classifier.batch_stats == {"requests": 2, "products": 4}
+
+
+def test_classify_many_retries_only_failed_products(product_classifier):
+    phones = [Product(title=f"Phone {i}", description="A smartphone") for i in range(3)]
+    product_classifier.bedrock.converse.side_effect = [
+        # product 2 is missing and product 3 predicts a category that does not exist
+        _batch_response(("1", "2", "Smartphones"), ("3", "42", "Tablets")),
+        _batch_response(("1", "2", "Smartphones"), ("2", "2", "Smartphones")),
+    ]
+
+    results = product_classifier.classify_many([(phone, ["1", "2"]) for phone in phones])
+
+    assert [r.predicted_category_id for r in results] == ["2", "2", "2"]
+    retry_prompt = _prompt_of(product_classifier.bedrock.converse.call_args_list[1])
+    assert "<title>Phone 0</title>" not in retry_prompt
+    assert "<title>Phone 1</title>" in retry_prompt and "<title>Phone 2</title>" in retry_prompt
+    assert product_classifier.batch_stats["retried"] == 2
+
+
+def test_classify_many_returns_errors_when_retries_are_exhausted(product_classifier):
+    phone = Product(title="Phone", description="A smartphone")
+    product_classifier.bedrock.converse.return_value = _batch_response(("1", "42", "Tablets"))
+
+    results = product_classifier.classify_many([(phone, ["1", "2"])], max_retries=1)
+
+    assert isinstance(results[0], ModelResponseError)
+    assert product_classifier.bedrock.converse.call_count == 2
+    assert product_classifier.batch_stats["failed"] == 1
+
+
+def test_classify_many_packs_batches_within_token_budget(product_classifier):
+    phones = [Product(title=f"Phone {i}", description="A smartphone " * 100) for i in range(4)]
+    product_classifier.bedrock.converse.side_effect = lambda **kwargs: _batch_response(
+        *(
+            (str(position), "2", "Smartphones")
+            for position in range(1, _prompt_of(Mock(kwargs=kwargs)).count('<product id="') + 1)
+        )
+    )
+    prompt_tokens = len(product_classifier.create_batch_prompt([], [product_classifier.category_tree.entry("2")])) // 4
+
+    results = product_classifier.classify_many([(phone, ["2"]) for phone in phones], token_budget=prompt_tokens + 1000)
+
+    assert all(r.predicted_category_id == "2" for r in results)
+    assert product_classifier.bedrock.converse.call_count == 2
+
+
+def test_classify_does_not_start_a_call_it_cannot_finish(product_classifier):
+    product_classifier.deadline = Deadline.after(1, min_call_seconds=5)
+
+    with pytest.raises(DeadlineExceeded):
+        product_classifier.classify(Product(title="Phone", description="A smartphone"), ["2"])
+
+    product_classifier.bedrock.converse.assert_not_called()
+
+
+def _combined_response(category_id, category_name, attributes):
+    text = (
+        "chain of thought</thinking>"
+        f"<prediction><predicted_category_id>{category_id}</predicted_category_id>"
+        f"<predicted_category_name>{category_name}</predicted_category_name>"
+        "<explanation>This is a smartphone.</explanation></prediction>"
+        f"<attributes>{attributes}</attributes>"
+    )
+    return {
+        "output": {"message": {"content": [{"text": text}]}},
+        "stopReason": "stop_sequence",
+        "usage": {"inputTokens": 100, "outputTokens": 50},
+    }
+
+
+@pytest.fixture
+def schema_retriever():
+    schemas = {
+        "2": CategorySchema(
+            category_name="Electronics",
+            subcategory_name="Smartphones",
+            attributes_schema=[{"Title": "Color"}, {"Title": "Storage"}],
+        )
+    }
+    retriever = Mock()
+    retriever.get.side_effect = schemas.get
+    return retriever
+
+
+def test_classify_and_extract_predicts_the_category_and_its_attributes_in_one_call(
+    product_classifier, schema_retriever
+):
+    product_classifier.bedrock.converse.return_value = _combined_response(
+        "2",
+        "Smartphones",
+        "<attribute><name>Color</name><value>Black</value></attribute>"
+        "<attribute><name>Storage</name><value>128 GB</value></attribute>",
+    )
+
+    prediction, attributes = product_classifier.classify_and_extract(
+        Product(title="Phone", description="A black smartphone, 128 GB"), ["1", "2"], schema_retriever, "big-model"
+    )
+
+    assert prediction.predicted_category_name == "Electronics > Smartphones"
+    assert [(a.name, a.value) for a in attributes.attributes] == [("Color", "Black"), ("Storage", "128 GB")]
+    kwargs = product_classifier.bedrock.converse.call_args.kwargs
+    assert kwargs["modelId"] == "big-model"
+    assert '<attribute_schema category_id="2"><Title>Color</Title>' in _prompt_of(
+        product_classifier.bedrock.converse.call_args
+    )
+    assert product_classifier.model_id != "big-model"
+
+
+def test_classify_and_extract_drops_the_attributes_of_a_repaired_category(product_classifier, schema_retriever):
+    product_classifier.bedrock.converse.return_value = _combined_response(
+        "42", "Smartphones", "<attribute><name>Color</name><value>Black</value></attribute>"
+    )
+
+    prediction, attributes = product_classifier.classify_and_extract(
+        Product(title="Phone", description="A smartphone"), ["1", "2"], schema_retriever
+    )
+
+    assert prediction.predicted_category_id == "2"
+    assert attributes is None
+    assert product_classifier.combined_stats == {"requests": 1, "without_attributes": 1}
+
+
+def test_classify_and_extract_leaves_an_unrepairable_prediction_to_the_caller(product_classifier, schema_retriever):
+    product_classifier.bedrock.converse.return_value = _combined_response(
+        "42", "Unknown", "<attribute><name>Color</name><value>Black</value></attribute>"
+    )
+
+    prediction, attributes = product_classifier.classify_and_extract(
+        Product(title="Phone", description="A smartphone"), ["1", "2"], schema_retriever, "big-model"
+    )
+
+    assert (prediction, attributes) == (None, None)
+    product_classifier.bedrock.converse.assert_called_once()
+    assert product_classifier.combined_stats == {"requests": 1, "reclassified": 1}
+
+
+def test_classify_and_extract_returns_no_attributes_for_a_category_without_schema(
+    product_classifier, schema_retriever
+):
+    product_classifier.bedrock.converse.return_value = _combined_response("1", "Electronics", "")
+
+    prediction, attributes = product_classifier.classify_and_extract(
+        Product(title="Cable", description="A charging cable"), ["1", "2"], schema_retriever
+    )
+
+    assert prediction.predicted_category_id == "1"
+    assert attributes.attributes == []
+
+
+def test_streamed_classify_and_extract_parses_the_response_as_it_arrives(product_classifier, schema_retriever):
+    product_classifier.streaming = True
+    text = _combined_response(
+        "2", "Smartphones", "<attribute><name>Color</name><value>Black &amp; silver</value></attribute>"
+    )["output"]["message"]["content"][0]["text"]
+    deltas = [text[i : i + 7] for i in range(0, len(text), 7)]
+    product_classifier.bedrock.converse_stream = Mock(
+        return_value={"stream": _stream_events(*deltas, stop_reason="stop_sequence")}
+    )
+
+    prediction, attributes = product_classifier.classify_and_extract(
+        Product(title="Phone", description="A black and silver smartphone"), ["1", "2"], schema_retriever
+    )
+
+    assert prediction.predicted_category_name == "Electronics > Smartphones"
+    assert [(a.name, a.value) for a in attributes.attributes] == [("Color", "Black & silver")]
+    product_classifier.bedrock.converse.assert_not_called()
+    assert not product_classifier.last_stream_metrics.terminated_early
@@ -0,0 +1,96 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+from pathlib import Path
+
+import pytest
+from amzn_smart_product_onboarding_core_utils.xml_output import parse_response
+from amzn_smart_product_onboarding_core_utils.xml_stream import XmlStreamParser
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import AttributesExtractor
+from amzn_smart_product_onboarding_product_categorization.product_classifier import (
+    PREDICTION_CDATA_TAGS,
+    ProductClassifier,
+)
+
+# responses in the shape the models write them, after the prefill of each prompt
+SAMPLES = {
+    "categorization": {
+        "cdata_tags": PREDICTION_CDATA_TAGS,
+        "prefill": ProductClassifier.response_open,
+        "text": (
+            "\nThe title says <b>wireless</b> earbuds and a charging case, so the audio categories fit best. "
+            "Headphones (3.1) are over-ear, earbuds (3.2) match.\n</thinking>\n<prediction>\n"
+            "<predicted_category_id>3.2</predicted_category_id>\n"
+            "<predicted_category_name>Earbuds & In-Ear Headphones</predicted_category_name>\n"
+            "<explanation>The product is a pair of <i>true wireless</i> earbuds with a charging case.</explanation>\n"
+            "</prediction>\n"
+        ),
+        "stop_reason": "stop_sequence",
+    },
+    "attributes": {
+        "cdata_tags": None,
+        "prefill": AttributesExtractor.response_open,
+        "text": (
+            "\nThe description gives the color and the battery life, the material is not stated.\n</scratchpad>\n"
+            "<attributes>\n"
+            "  <attribute>\n    <name>Color</name>\n    <value>Black &amp; silver</value>\n  </attribute>\n"
+            "  <attribute>\n    <name>Battery Life</name>\n    <value>&lt; 30 hours</value>\n  </attribute>\n"
+            "  <attribute>\n    <name>Material</name>\n    <value>null</value>\n  </attribute>\n"
+            "</attributes>\n<confidence>0.8</confidence>\n</response>"
+        ),
+        "stop_reason": "end_turn",
+    },
+    "combined": {
+        "cdata_tags": PREDICTION_CDATA_TAGS,
+        "prefill": ProductClassifier.response_open,
+        "text": (
+            "\nA 6.1 inch phone with 128 GB, the smartphones category.\n</thinking>\n<prediction>\n"
+            "<predicted_category_id>2</predicted_category_id>\n"
+            "<predicted_category_name>Smartphones</predicted_category_name>\n"
+            "<explanation>It is a smartphone.</explanation>\n</prediction>\n"
+            "<attributes>\n"
+            "<attribute><name>Storage</name><value>128 GB</value></attribute>\n"
+            "<attribute><name>Screen Size</name><value>6.1&quot;</value></attribute>\n"
+            "</attributes>\n"
+        ),
+        "stop_reason": "stop_sequence",
+    },
+}
+# delta sizes: every character, sizes that split tags and entities, and about a token
+DELTA_SIZES = [1, 3, 7, 16]
+
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def _recordings() -> list:
+    samples = [
+        pytest.param({**sample, "deltas": _chunks(sample["text"], size)}, id=f"{name}-{size}")
+        for name, sample in SAMPLES.items()
+        for size in DELTA_SIZES
+    ]
+    # written by benchmarks/record_responses.py from the responses of a model
+    recorded = sorted((Path(__file__).parent / "recorded_responses").glob("*.json"))
+    return samples + [pytest.param(json.loads(path.read_text()), id=path.stem) for path in recorded]
+
+
+@pytest.mark.parametrize("recording", _recordings())
+def test_streamed_response_parses_like_the_whole_response(recording):
+    # given
+    parser = XmlStreamParser(cdata_tags=recording["cdata_tags"])
+    parser.feed(recording["prefill"])
+
+    # when, fed as converse_stream_until passes the text received so far
+    text = ""
+    for delta in recording["deltas"]:
+        text += delta
+        parser.watch(text)
+
+    # then
+    response = recording["prefill"] + text
+    if recording["stop_reason"] == "stop_sequence":
+        response += "</response>"
+    assert parser.close() == parse_response(response, cdata_tags=recording["cdata_tags"])
@@ -0,0 +1,245 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import hashlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from botocore.exceptions import ClientError
+
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor.schema_store import (
+    CategorySchemaStore,
+    LocalSchemaSource,
+    PackedCategorySchemaStore,
+    category_schema_store,
+    pack_schemas,
+)
+
+SCHEMA_PATH = "data/attributes_schema.json"
+INDEX_PATH = "data/attributes_schema.index.json"
+
+
+class FakeBucket:
+    """The conditional GET of an S3 bucket resource, with ETags."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+
+    def put_object(self, Key: str, Body: bytes) -> None:
+        self.objects[Key] = Body
+
+    def Object(self, key: str) -> "FakeBucket":
+        self.key = key
+        return self
+
+    def delete(self) -> None:
+        del self.objects[self.key]
+
+    def get(self, IfNoneMatch: str | None = None) -> dict:
+        if self.key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, "GetObject")
+        body = self.objects[self.key]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'  # nosec B324 - an ETag, not a secret
+        if IfNoneMatch == etag:
+            raise ClientError({"Error": {"Code": "304", "Message": "Not Modified"}}, "GetObject")
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _schema(name: str) -> dict:
+    return {
+        "category_name": name,
+        "subcategory_name": f"{name} subcategory",
+        "attributes_schema": [{"Title": "Color", "Definition": "The color", "Childs": []}],
+    }
+
+
+@pytest.fixture
+def bucket():
+    bucket = FakeBucket()
+    bucket.put_object(Key=SCHEMA_PATH, Body=json.dumps({"1": _schema("Shoes"), "2": _schema("Shirts")}).encode())
+    return bucket
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_schema_is_downloaded_once_and_categories_validated_on_demand(bucket, clock):
+    store = CategorySchemaStore(bucket, SCHEMA_PATH, clock=clock)
+
+    assert store.get("1").category_name == "Shoes"
+    assert store.get("1").category_name == "Shoes"
+    assert store.get("404") is None
+
+    metrics = store.metrics()
+    assert metrics["s3_requests"] == 1
+    assert metrics["s3_bytes"] > 0
+    assert metrics["hits"] == 1
+    assert metrics["misses"] == 2
+    assert metrics["cached_categories"] == 2
+
+
+def test_unchanged_schema_is_not_downloaded_again(bucket, clock):
+    store = CategorySchemaStore(bucket, SCHEMA_PATH, check_interval_seconds=60, clock=clock)
+    store.get("1")
+    store.metrics(reset=True)
+
+    clock.now = 30
+    store.get("1")
+    assert store.metrics()["s3_requests"] == 0
+
+    clock.now = 61
+    assert store.get("1").category_name == "Shoes"
+    metrics = store.metrics()
+    assert metrics["s3_requests"] == 1
+    assert metrics["not_modified"] == 1
+    assert metrics["s3_bytes"] == 0
+    assert metrics["hits"] == 2
+
+
+def test_changed_schema_replaces_the_cached_categories(bucket, clock):
+    store = CategorySchemaStore(bucket, SCHEMA_PATH, check_interval_seconds=60, clock=clock)
+    store.get("1")
+    version = store.version
+
+    bucket.put_object(Key=SCHEMA_PATH, Body=json.dumps({"1": _schema("Boots")}).encode())
+    clock.now = 61
+
+    assert store.get("1").category_name == "Boots"
+    assert store.version != version
+    assert store.metrics()["versions"] == 2
+
+
+def test_lru_keeps_the_most_recent_categories(bucket, clock):
+    store = CategorySchemaStore(bucket, SCHEMA_PATH, max_categories=1, clock=clock)
+
+    store.get("1")
+    store.get("2")
+    store.get("1")
+
+    assert store.metrics()["misses"] == 3
+
+
+def test_failed_version_check_keeps_serving_the_loaded_schema(bucket, clock):
+    store = CategorySchemaStore(bucket, SCHEMA_PATH, check_interval_seconds=60, clock=clock)
+    store.get("1")
+
+    bucket.Object(SCHEMA_PATH).delete()
+    clock.now = 61
+
+    assert store.get("2").category_name == "Shirts"
+
+
+def _write_packed(root, schemas: dict) -> bytes:
+    index, data = pack_schemas(schemas)
+    (root / "data").mkdir(exist_ok=True)
+    (root / "data" / index["data"]).write_bytes(data)
+    (root / INDEX_PATH).write_text(json.dumps(index))
+    return data
+
+
+def test_packed_schema_reads_only_the_asked_categories(tmp_path, clock):
+    schemas = {str(i): _schema(f"Category {i}") for i in range(100)}
+    data = _write_packed(tmp_path, schemas)
+
+    store = category_schema_store(LocalSchemaSource(tmp_path), INDEX_PATH, clock=clock)
+    assert isinstance(store, PackedCategorySchemaStore)
+    assert store.get("404") is None
+    index_bytes = store.metrics(reset=True)["s3_bytes"]
+
+    assert store.get("42").model_dump() == schemas["42"]
+    assert store.get("42").category_name == "Category 42"
+    metrics = store.metrics()
+    assert metrics["s3_requests"] == 1
+    assert metrics["s3_bytes"] == len(json.dumps(schemas["42"], separators=(",", ":")))
+    assert index_bytes + metrics["s3_bytes"] < len(data)
+
+
+def test_repacked_schema_replaces_the_cached_categories(tmp_path, clock):
+    _write_packed(tmp_path, {"1": _schema("Shoes")})
+    store = PackedCategorySchemaStore(LocalSchemaSource(tmp_path), INDEX_PATH, check_interval_seconds=60, clock=clock)
+    assert store.get("1").category_name == "Shoes"
+
+    _write_packed(tmp_path, {"1": _schema("Boots"), "2": _schema("Shirts")})
+    clock.now = 61
+
+    assert store.get("1").category_name == "Boots"
+    assert store.get("2").category_name == "Shirts"
+
+
+class BlockingSource(LocalSchemaSource):
+    """Holds the ranged reads of the categories in ``blocked`` until ``release`` is set."""
+
+    def __init__(self, root, blocked: dict[int, str]):
+        super().__init__(root)
+        self.blocked = blocked
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.ranged_reads = 0
+
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        self.ranged_reads += 1
+        if offset in self.blocked:
+            self.started.set()
+            assert self.release.wait(5)
+        return super().read_range(key, offset, length)
+
+
+def test_reads_of_other_categories_do_not_wait_for_a_slow_one(tmp_path, clock):
+    schemas = {"1": _schema("Shoes"), "2": _schema("Shirts")}
+    _write_packed(tmp_path, schemas)
+    index = json.loads((tmp_path / INDEX_PATH).read_text())
+    source = BlockingSource(tmp_path, {index["categories"]["1"][0]: "1"})
+    store = PackedCategorySchemaStore(source, INDEX_PATH, clock=clock)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        slow = [executor.submit(store.get, "1") for _ in range(2)]
+        assert source.started.wait(5)
+
+        # the first category is still being read
+        assert store.get("2").category_name == "Shirts"
+        while store.metrics()["waits"] < 1:
+            time.sleep(0.001)
+        source.release.set()
+        assert [future.result().category_name for future in slow] == ["Shoes", "Shoes"]
+
+    metrics = store.metrics()
+    assert source.ranged_reads == 2
+    assert metrics["misses"] == 2
+    assert metrics["waits"] == 1
+
+
+def test_schema_read_from_a_replaced_version_is_not_cached(tmp_path, clock):
+    _write_packed(tmp_path, {"1": _schema("Shoes")})
+    index = json.loads((tmp_path / INDEX_PATH).read_text())
+    source = BlockingSource(tmp_path, {index["categories"]["1"][0]: "1"})
+    store = PackedCategorySchemaStore(source, INDEX_PATH, check_interval_seconds=60, clock=clock)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stale = executor.submit(store.get, "1")
+        assert source.started.wait(5)
+        source.blocked.clear()
+        _write_packed(tmp_path, {"1": _schema("Boots")})
+        clock.now = 61
+        store.get("404")
+        source.release.set()
+        assert stale.result().category_name == "Shoes"
+
+    assert store.get("1").category_name == "Boots"
+
+
+def test_unpacked_schema_path_keeps_the_whole_document_store(bucket):
+    assert type(category_schema_store(bucket, SCHEMA_PATH)) is CategorySchemaStore
@@ -0,0 +1,139 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import time
+
+import pytest
+from amzn_smart_product_onboarding_core_utils.models import (
+    Attribute,
+    Attributes,
+    CategorizationPrediction,
+    Product,
+)
+
+from amzn_smart_product_onboarding_product_categorization.speculative_extraction import SpeculativeExtraction
+
+PRODUCT = Product(title="Running shoes", description="Lightweight running shoes")
+
+
+class FakeBedrock:
+    def converse(self, **kwargs):
+        return {"usage": {"inputTokens": 100, "outputTokens": 10}}
+
+
+class FakeExtractor:
+    """Takes *latency* seconds per extraction and reports its tokens through its client."""
+
+    def __init__(self, latency: float):
+        self.bedrock_runtime_client = FakeBedrock()
+        self.latency = latency
+        self.extracted: list[str] = []
+
+    def extract_attributes(self, product: Product, category_id: str) -> Attributes:
+        self.bedrock_runtime_client.converse()
+        time.sleep(self.latency)
+        self.extracted.append(category_id)
+        return Attributes(attributes=[Attribute(name="Category", value=category_id)])
+
+
+def _categorize_as(category_id: str, latency: float):
+    def categorize() -> CategorizationPrediction:
+        time.sleep(latency)
+        return CategorizationPrediction(
+            predicted_category_id=category_id, predicted_category_name="Shoes", explanation="Running shoes"
+        )
+
+    return categorize
+
+
+def test_hit_overlaps_extraction_with_categorization():
+    speculation = SpeculativeExtraction("test", candidates=2)
+
+    started = time.monotonic()
+    prediction, attributes = speculation.run(FakeExtractor(0.1), PRODUCT, ["1", "2", "3"], _categorize_as("2", 0.1))
+
+    assert time.monotonic() - started < 0.18
+    assert prediction.predicted_category_id == "2"
+    assert attributes.attributes[0].value == "2"
+    speculation._executor.shutdown(wait=True)
+    metrics = speculation.metrics()
+    assert metrics["hits"] == 1
+    assert metrics["hit_rate"] == 1
+    assert metrics["latency_saved_ms"] >= 50
+    assert metrics["discarded"] == 1
+    assert metrics["wasted_input_tokens"] == 100
+
+
+def test_miss_extracts_the_predicted_category_and_counts_the_wasted_tokens():
+    speculation = SpeculativeExtraction("test", candidates=2)
+    extractor = FakeExtractor(0.01)
+
+    prediction, attributes = speculation.run(extractor, PRODUCT, ["1", "2"], _categorize_as("3", 0.05))
+
+    assert attributes.attributes[0].value == "3"
+    speculation._executor.shutdown(wait=True)
+    metrics = speculation.metrics()
+    assert metrics["misses"] == 1
+    assert metrics["latency_saved_ms"] == 0
+    assert metrics["wasted_input_tokens"] == 200
+    assert metrics["wasted_output_tokens"] == 20
+
+
+def test_without_candidates_extraction_waits_for_the_category():
+    speculation = SpeculativeExtraction("test", candidates=0)
+    extractor = FakeExtractor(0)
+
+    speculation.run(extractor, PRODUCT, ["1", "2"], _categorize_as("1", 0))
+
+    assert extractor.extracted == ["1"]
+    assert speculation.metrics()["hit_rate"] is None
+
+
+def test_failed_categorization_discards_the_speculations():
+    speculation = SpeculativeExtraction("test", candidates=1)
+
+    def categorize():
+        raise ValueError("no category")
+
+    with pytest.raises(ValueError):
+        speculation.run(FakeExtractor(0.01), PRODUCT, ["1"], categorize)
+
+    speculation._executor.shutdown(wait=True)
+    metrics = speculation.metrics()
+    assert metrics["cancelled"] + metrics["discarded"] == 1
+
+
+def test_discarded_extractions_do_not_delay_the_next_speculation():
+    speculation = SpeculativeExtraction("test", candidates=1)
+
+    def categorize():
+        time.sleep(0.02)
+        raise ValueError("no category")
+
+    # the discarded extraction is still running when the next request speculates
+    with pytest.raises(ValueError):
+        speculation.run(FakeExtractor(0.3), PRODUCT, ["1"], categorize)
+    started = time.monotonic()
+    speculation.run(FakeExtractor(0.05), PRODUCT, ["2"], _categorize_as("2", 0.05))
+
+    assert time.monotonic() - started < 0.2
+    assert speculation.metrics()["hits"] == 1
+
+
+def test_speculation_is_skipped_while_discarded_extractions_hold_every_worker():
+    speculation = SpeculativeExtraction("test", candidates=1, max_workers=1)
+    extractor = FakeExtractor(0.2)
+
+    def categorize():
+        time.sleep(0.02)
+        raise ValueError("no category")
+
+    with pytest.raises(ValueError):
+        speculation.run(extractor, PRODUCT, ["1"], categorize)
+    speculation.run(FakeExtractor(0), PRODUCT, ["2"], _categorize_as("2", 0))
+
+    speculation._executor.shutdown(wait=True)
+    metrics = speculation.metrics()
+    assert metrics["skipped"] == 1
+    assert metrics["hits"] == 0
+    assert metrics["discarded"] == 1
@@ -0,0 +1,254 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Offline load test of the metaclass, categorization and attribute extraction stages against the Bedrock simulator.
+
+Products are started at a target rate and go through the three model calls of the workflow: the title normalization of
+MetaclassClassifier, ProductClassifier.classify and AttributesExtractor.extract_attributes. Each stage uses its own
+simulated model ID, with a long-tailed latency, an output token rate and the per-minute quotas given on the command
+line, so the Bedrock throttling and the tenacity retries of the code under test are exercised without AWS access.
+Calls go through a RateLimitedBedrockRuntime with its own AdaptiveRateLimiter, as in the Lambda functions, unless
+``--no-rate-limiter`` is given.
+
+``--time-scale`` shrinks the simulated delays, the quota window, the rate limiter and the tenacity waits together.
+Rates, throughput and latencies are reported in simulated seconds.
+
+    LOG_LEVEL=CRITICAL uv run scripts/load_test.py --rps 5 --products 200 --time-scale 0.01
+"""
+
+import argparse
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from amzn_smart_product_onboarding_core_utils.bedrock_simulator import (
+    BedrockRuntimeSimulator,
+    SimulatedModel,
+    lognormal_latency,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_rate_limiter import (
+    AdaptiveRateLimiter,
+    RateLimitedBedrockRuntime,
+)
+from amzn_smart_product_onboarding_core_utils.boto3_helper.bedrock_runtime_client import get_model_response
+from amzn_smart_product_onboarding_core_utils.models import CategorySchema, Product
+from amzn_smart_product_onboarding_metaclasses.metaclass_classifier import MetaclassClassifier
+from amzn_smart_product_onboarding_product_categorization.attributes_extractor import (
+    AttributesExtractor,
+    SchemaRetriever,
+)
+from amzn_smart_product_onboarding_product_categorization.product_classifier import ProductClassifier
+from amzn_smart_product_onboarding_product_categorization.product_classifier.category_store import CategoryStore
+
+METACLASS_MODEL_ID = "simulated.metaclass"
+CATEGORIZATION_MODEL_ID = "simulated.categorization"
+ATTRIBUTES_MODEL_ID = "simulated.attributes"
+STAGES = ("metaclass", "categorization", "attributes")
+
+CANDIDATE_RE = re.compile(r"<id>(.*?)</id>\s*<name>(.*?)</name>")
+TITLE_RE = re.compile(r"<title>(.*?)</title>")
+THINKING = "The product is a consumer good. The first candidate category matches its core purpose best. " * 4
+
+
+def prompt_of(request: dict) -> str:
+    return request["messages"][0]["content"][0]["text"]
+
+
+def metaclass_responder(request: dict) -> str:
+    return 'Normalized product title"}'
+
+
+def categorization_responder(request: dict) -> str:
+    category_id, category_name = CANDIDATE_RE.search(prompt_of(request)).groups()
+    return (
+        f"{THINKING}</thinking><prediction><predicted_category_id>{category_id}</predicted_category_id>"
+        f"<predicted_category_name>{category_name}</predicted_category_name>"
+        f"<explanation>The product matches the category because of its purpose and features.</explanation>"
+        f"</prediction></response>"
+    )
+
+
+def attributes_responder(request: dict) -> str:
+    return (
+        "The title names the material of the product.</scratchpad><attributes>"
+        "<attribute><name>Type of Material</name><value>PLASTIC</value></attribute>"
+        "</attributes></response>"
+    )
+
+
+class StaticSchemaRetriever(SchemaRetriever):
+    def __init__(self):
+        self.schema = CategorySchema(
+            category_name="Category",
+            subcategory_name="Subcategory",
+            attributes_schema=[
+                {
+                    "Title": "Type of Material",
+                    "Definition": "The material the product is made of.",
+                    "Childs": [{"Title": "PLASTIC", "Definition": "A synthetic material.", "Childs": []}],
+                }
+            ],
+        )
+
+    def get(self, category_id: str) -> CategorySchema:
+        return self.schema
+
+
+def category_tree(size: int) -> CategoryStore:
+    return CategoryStore(
+        {
+            str(i): {
+                "id": str(i),
+                "name": f"Category {i}",
+                "description": f"Products that belong to category {i}, described in one or two sentences.",
+                "full_path": [{"id": "0", "name": "Root"}, {"id": str(i), "name": f"Category {i}"}],
+                "childs": [],
+                "examples": [{"title": f"Example {i}", "description": f"Example product of category {i}."}],
+            }
+            for i in range(size)
+        }
+    )
+
+
+def scale_retry_waits(time_scale: float) -> None:
+    """Shrink the tenacity waits of the model calls by the simulator's time scale."""
+    waits = {
+        id(fn.retry.wait): fn.retry.wait
+        for fn in (
+            get_model_response,
+            ProductClassifier._get_model_response,
+            ProductClassifier._get_streamed_model_response,
+            ProductClassifier._get_tool_response,
+        )
+    }
+    # the call sites may share one wait object, scale each of them once
+    for wait_strategy in waits.values():
+        wait_strategy.multiplier *= time_scale
+        wait_strategy.min *= time_scale
+        wait_strategy.max *= time_scale
+
+
+class LoadTest:
+    def __init__(self, bedrock, candidates: int, seed: int = 0):
+        self.metaclass_classifier = MetaclassClassifier(None, None, None, {}, bedrock, model_id=METACLASS_MODEL_ID)
+        self.product_classifier = ProductClassifier(bedrock, category_tree(200), model_id=CATEGORIZATION_MODEL_ID)
+        self.attributes_extractor = AttributesExtractor(bedrock, StaticSchemaRetriever(), model_id=ATTRIBUTES_MODEL_ID)
+        self.candidates = candidates
+        self.random = random.Random(seed)
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+        self.errors: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def run_product(self, i: int) -> None:
+        product = Product(title=f"Product {i}", description=f"Description of product {i}, with its main features.")
+        with self._lock:
+            candidate_ids = [str(c) for c in self.random.sample(range(200), self.candidates)]
+        stages = (
+            ("metaclass", lambda: self.metaclass_classifier.normalize_product(product)),
+            ("categorization", lambda: self.product_classifier.classify(product, candidate_ids)),
+            ("attributes", lambda: self.attributes_extractor.extract_attributes(product, candidate_ids[0])),
+        )
+        for stage, call in stages:
+            started = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                with self._lock:
+                    self.errors[stage][type(e).__name__] += 1
+                return
+            finally:
+                with self._lock:
+                    self.latencies[stage].append(time.perf_counter() - started)
+        with self._lock:
+            self.completed += 1
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def report(
+    load_test: LoadTest,
+    bedrock: BedrockRuntimeSimulator,
+    limiter: AdaptiveRateLimiter | None,
+    products: int,
+    elapsed: float,
+) -> None:
+    print(f"products: {products}  completed: {load_test.completed}  throughput: {load_test.completed / elapsed:.2f}/s")
+    print(f"{'stage':<15} {'requests':>9} {'throttled':>10} {'errors':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for stage, model_id in zip(STAGES, (METACLASS_MODEL_ID, CATEGORIZATION_MODEL_ID, ATTRIBUTES_MODEL_ID), strict=True):
+        latencies = [latency / bedrock.time_scale for latency in load_test.latencies[stage]]
+        stats = bedrock.stats[model_id]
+        print(
+            f"{stage:<15} {stats['requests']:>9} {stats['throttled']:>10} {sum(load_test.errors[stage].values()):>7}"
+            f" {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}"
+        )
+    if limiter is not None:
+        for model_id, metrics in limiter.metrics().items():
+            # the limiter runs on the simulated clock, its wait times are simulated already
+            print(f"{model_id} rate limiter: {metrics}")
+    for stage in STAGES:
+        if load_test.errors[stage]:
+            print(f"{stage} errors: {dict(load_test.errors[stage])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=2, help="products started per simulated second")
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="quota of each simulated model")
+    parser.add_argument("--tokens-per-minute", type=int, default=None, help="quota of each simulated model")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--no-rate-limiter", action="store_true")
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    def simulated_model(responder, median_latency, tokens_per_second):
+        return SimulatedModel(
+            responder=responder,
+            latency=lognormal_latency(median_latency, 0.5),
+            output_tokens_per_second=tokens_per_second,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            malformed_rate=args.malformed_rate,
+        )
+
+    bedrock = BedrockRuntimeSimulator(
+        {
+            METACLASS_MODEL_ID: simulated_model(metaclass_responder, 0.3, 200),
+            CATEGORIZATION_MODEL_ID: simulated_model(categorization_responder, 0.8, 80),
+            ATTRIBUTES_MODEL_ID: simulated_model(attributes_responder, 0.8, 80),
+        },
+        seed=args.seed,
+        time_scale=args.time_scale,
+    )
+    scale_retry_waits(args.time_scale)
+    limiter = None
+    client = bedrock
+    if not args.no_rate_limiter:
+        limiter = AdaptiveRateLimiter(
+            clock=lambda: time.monotonic() / args.time_scale,
+            sleep=lambda seconds: time.sleep(seconds * args.time_scale),
+        )
+        client = RateLimitedBedrockRuntime(bedrock, limiter)
+    load_test = LoadTest(client, args.candidates, args.seed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = []
+        for i in range(args.products):
+            futures.append(executor.submit(load_test.run_product, i))
+            time.sleep(args.time_scale / args.rps)
+        wait(futures)
+    report(load_test, bedrock, limiter, args.products, (time.perf_counter() - started) / args.time_scale)